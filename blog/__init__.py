@@ -22,6 +22,7 @@ from .settings import Config
 from blog.scheduler_tasks import scheduled_check_all_user_notifications
 from blog.notification_service import BrowserPushService
 from blog.models import load_user
+from blog.scheduler_leader import scheduler_leader
 from blog.utils.logger import configure_blog_logger
 
 _root = logging.getLogger()
@@ -67,6 +68,33 @@ if not db_path.parent.exists():
 # Thick Mode отключен, так как не требует установки Oracle Instant Client
 logger.info("🟢 [INIT] Oracle DB работает в Thin Mode (без Oracle Client)")
 
+def start_scheduler(app):
+    """Запускает планировщик с единственной глобальной проверкой уведомлений"""
+    if scheduler.running:
+        return
+    try:
+        scheduler.init_app(app) # Инициализируем планировщик с приложением
+        scheduler.start()
+        app.logger.info(f"Scheduler started in leader process {os.getpid()}.")
+
+        job_id = 'check_all_user_notifications_job'
+        if not scheduler.get_job(job_id):
+            scheduler.add_job(
+                func=scheduled_check_all_user_notifications,
+                trigger=IntervalTrigger(minutes=1), # или app.config.get('SCHEDULER_INTERVAL_MINUTES', 1)
+                id=job_id,
+                name='Check all user notifications every 1 minute',
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+            app.logger.info(f"Job '{job_id}' added to scheduler.")
+        else:
+            app.logger.info(f"Job '{job_id}' already exists in scheduler.")
+    except Exception as e_scheduler_init:
+        app.logger.error(f"Error initializing or starting scheduler: {e_scheduler_init}", exc_info=True)
+
+
 def create_app():
     app = Flask(__name__)
 
@@ -230,6 +258,20 @@ def create_app():
     from blog.services.search_service import search_service
     search_service.init_app(app)
 
+    # Журнал событий уведомлений, общий для воркеров (поток /api/notifications/stream)
+    from blog.notification_events import notification_event_bus
+    notification_event_bus.init_app(app)
+
+    # Сброс кеша по тегам (задачи) доходит до всех воркеров и без Redis
+    from blog.utils.cache_manager import cache_manager
+    cache_manager.init_tag_spool(
+        os.getenv("CACHE_TAG_SPOOL", os.path.join(app.instance_path, "cache_tags.spool"))
+    )
+
+    # Один поток записи в SQLite: отметки прочтения и уведомления Redmine пачками
+    from blog.db_writer import db_writer
+    db_writer.init_app(app)
+
 
 
     # Дополнительная инициализация в контексте приложения
@@ -266,6 +308,17 @@ def create_app():
                     else:
                         app.logger.info("[INIT] Поле show_kanban_tips уже существует")
 
+                    # Составные индексы для выборки непрочитанных уведомлений
+                    cursor.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_notifications_user_read_date "
+                        "ON notifications (user_id, is_read, date_created)"
+                    )
+                    cursor.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_notifications_add_notes_user_read_date "
+                        "ON notifications_add_notes (user_id, is_read, date_created)"
+                    )
+                    conn.commit()
+
                     conn.close()
                 else:
                     app.logger.warning(f"[INIT] База данных не найдена: {db_path}")
@@ -281,28 +334,9 @@ def create_app():
     # Инициализация и запуск планировщика только в основном процессе Werkzeug
     # Это предотвратит запуск нескольких экземпляров планировщика в режиме отладки с автоперезагрузкой
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not app.debug:
-        if not scheduler.running:
-            try:
-                scheduler.init_app(app) # Инициализируем планировщик с приложением
-                scheduler.start()
-                app.logger.info("Scheduler initialized and started successfully ONLY in main process or production.")
-
-                job_id = 'check_all_user_notifications_job'
-                if not scheduler.get_job(job_id):
-                    scheduler.add_job(
-                        func=scheduled_check_all_user_notifications,
-                        trigger=IntervalTrigger(minutes=1), # или app.config.get('SCHEDULER_INTERVAL_MINUTES', 1)
-                        id=job_id,
-                        name='Check all user notifications every 1 minute',
-                        replace_existing=True
-                    )
-                    app.logger.info(f"Job '{job_id}' added to scheduler.")
-                else:
-                    app.logger.info(f"Job '{job_id}' already exists in scheduler.")
-
-
-            except Exception as e_scheduler_init:
-                app.logger.error(f"Error initializing or starting scheduler: {e_scheduler_init}", exc_info=True)
+        # Из воркеров gunicorn планировщик запускает только лидер (блокировка файла)
+        scheduler_leader.init_app(app)
+        scheduler_leader.start(lambda: start_scheduler(app))
     else:
         if app.debug: # Только в режиме отладки, для дочернего процесса
             app.logger.info("Scheduler NOT started in Werkzeug reloader child process.")
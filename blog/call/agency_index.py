@@ -0,0 +1,305 @@
+"""
+Поисковый индекс справочника агентств (таблица agentstvo в tez_tour_cc).
+
+Раньше каждый запрос /api/agencies сканировал agentstvo с LIKE '%...%' по
+тринадцати колонкам и собирал телефоны семью коррелированными подзапросами
+на строку. Теперь справочник один раз читается целиком (телефоны
+присоединяются LEFT JOIN в том же запросе), а поиск идет по индексу в памяти
+процесса: триграммы для подстрок от трех символов и префиксы слов для
+коротких запросов. Номера телефонов индексируются и как есть, и только
+цифрами, поэтому "+7 (495) 123" и "7495123" находят одно и то же агентство.
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymysql.cursors import DictCursor
+
+logger = logging.getLogger(__name__)
+
+PHONE_COLUMNS = 7
+
+AGENCIES_SELECT_SQL = (
+    """
+    SELECT
+        ag.id AS ID_TR,
+        ag.name AS NAME_RU,
+        ag.english_name AS NAME_EN,
+        ag.adres AS ADDRESS,
+        c.name AS CITY_NAME,
+        m.name AS METRO_STATION_NAME,
+        d.name AS DISTRICT_NAME,
+        """
+    + ",\n        ".join(
+        f"t{i}.number AS telephone_{i}_number" for i in range(1, PHONE_COLUMNS + 1)
+    )
+    + """
+    FROM agentstvo ag
+    LEFT JOIN city c ON ag.city_id = c.id
+    LEFT JOIN metro m ON ag.metro_id = m.id
+    LEFT JOIN district d ON ag.district_id = d.id
+    """
+    + "\n    ".join(
+        f"LEFT JOIN telephone t{i} ON t{i}.id = ag.tel_{i}_id"
+        for i in range(1, PHONE_COLUMNS + 1)
+    )
+    + """
+    WHERE (ag.hidden = 0 OR ag.hidden IS NULL)
+    """
+)
+
+TEXT_FIELDS = (
+    "NAME_RU",
+    "NAME_EN",
+    "ADDRESS",
+    "CITY_NAME",
+    "METRO_STATION_NAME",
+    "DISTRICT_NAME",
+)
+
+_WORD_RE = re.compile(r"\w+")
+_PHONE_QUERY_RE = re.compile(r"^[\d\s()+\-.]+$")
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Нижний регистр, ё -> е, схлопнутые пробелы"""
+    if not value:
+        return ""
+    return " ".join(str(value).lower().replace("ё", "е").split())
+
+
+def phone_digits(value: Optional[str]) -> str:
+    return _NON_DIGIT_RE.sub("", str(value)) if value else ""
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class _AgencySnapshot:
+    """
+    Неизменяемый срез справочника. Дополнение строит новый срез, копируя
+    только затронутые списки триграмм, поэтому читатели без блокировки
+    всегда видят согласованные rows, postings и order одной версии.
+    """
+
+    def __init__(self):
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.texts: Dict[int, str] = {}
+        self.names: Dict[int, str] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.tokens: List[Tuple[str, int]] = []  # отсортированные (слово, id)
+        self.order: List[int] = []  # id по названию
+        self.max_id = 0
+
+    def extended(self, rows: List[Dict[str, Any]]) -> "_AgencySnapshot":
+        snapshot = _AgencySnapshot()
+        snapshot.rows = dict(self.rows)
+        snapshot.texts = dict(self.texts)
+        snapshot.names = dict(self.names)
+        snapshot.postings = dict(self.postings)
+        snapshot.max_id = self.max_id
+        copied: Set[str] = set()
+        new_tokens = []
+        for row in rows:
+            agency_id = row["ID_TR"]
+            phones = [
+                row.get(f"telephone_{i}_number")
+                for i in range(1, PHONE_COLUMNS + 1)
+            ]
+            phones = [phone for phone in phones if phone]
+            row["ALL_TELEPHONES_CONCAT"] = " ".join(phones)
+
+            parts = [normalize_text(row.get(field)) for field in TEXT_FIELDS]
+            parts.extend(normalize_text(phone) for phone in phones)
+            parts.extend(phone_digits(phone) for phone in phones)
+            # Разделитель не дает подстроке склеиться из соседних полей
+            text = "\x00".join(part for part in parts if part)
+
+            snapshot.rows[agency_id] = row
+            snapshot.texts[agency_id] = text
+            snapshot.names[agency_id] = normalize_text(row.get("NAME_RU"))
+            for trigram in _trigrams(text):
+                if trigram not in copied:
+                    snapshot.postings[trigram] = set(snapshot.postings.get(trigram, ()))
+                    copied.add(trigram)
+                snapshot.postings[trigram].add(agency_id)
+            new_tokens.extend(
+                (token, agency_id) for token in set(_WORD_RE.findall(text))
+            )
+            if agency_id > snapshot.max_id:
+                snapshot.max_id = agency_id
+
+        snapshot.tokens = sorted(self.tokens + new_tokens)
+        names = snapshot.names
+        snapshot.order = sorted(snapshot.rows, key=lambda i: (names[i], i))
+        return snapshot
+
+
+class AgencySearchIndex:
+    """
+    Справочник агентств в памяти процесса с триграммным индексом.
+
+    Первое обращение загружает все видимые агентства одним запросом. Дальше
+    не чаще refresh_interval догружаются новые записи (ag.id больше уже
+    загруженного максимума), а раз в full_reload_interval справочник
+    перечитывается целиком — так подхватываются правки и скрытые агентства.
+    Запросы от трех символов ищутся как подстрока (пересечение триграммных
+    списков и проверка кандидатов), более короткие — по началу слов.
+    Загрузка собирает новый _AgencySnapshot и подменяет его одним
+    присваиванием: поиск и страницы идут без блокировки по старому или новому
+    срезу, но никогда по частично собранному.
+    """
+
+    def __init__(
+        self,
+        connection_factory,
+        refresh_interval: int = 60,
+        full_reload_interval: int = 900,
+    ):
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self._lock = threading.Lock()
+        self._snapshot = _AgencySnapshot()
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+
+    def __len__(self):
+        return len(self._snapshot.order)
+
+    # ------------------------------------------------------------------ загрузка
+
+    def ensure_fresh(self, force: bool = False) -> None:
+        """Загружает или обновляет справочник, если подошел срок"""
+        now = time.time()
+        if (
+            not force
+            and self._loaded
+            and now - self._last_refresh < self.refresh_interval
+        ):
+            return
+
+        with self._lock:
+            now = time.time()
+            if (
+                not force
+                and self._loaded
+                and now - self._last_refresh < self.refresh_interval
+            ):
+                return
+            full = (
+                force
+                or not self._loaded
+                or now - self._last_full_load >= self.full_reload_interval
+            )
+            current = self._snapshot
+            rows = self._fetch(None if full else current.max_id)
+            if full:
+                self._snapshot = _AgencySnapshot().extended(rows)
+                self._last_full_load = now
+            elif rows:
+                self._snapshot = current.extended(rows)
+            self._loaded = True
+            self._last_refresh = now
+            if full or rows:
+                logger.info(
+                    f"Индекс агентств {'перезагружен' if full else 'дополнен'}: "
+                    f"{len(rows)} записей, всего {len(self._snapshot.order)}"
+                )
+
+    def _fetch(self, after_id: Optional[int]) -> List[Dict[str, Any]]:
+        query = AGENCIES_SELECT_SQL
+        params = []
+        if after_id is not None:
+            query += " AND ag.id > %s"
+            params.append(after_id)
+
+        connection = self.connection_factory()
+        if not connection:
+            raise RuntimeError(
+                "Не удалось установить соединение с базой данных для получения списка агентств"
+            )
+        try:
+            with connection.cursor(DictCursor) as cursor:
+                cursor.execute(query, params)
+                return list(cursor.fetchall())
+        finally:
+            connection.close()
+
+    # -------------------------------------------------------------------- поиск
+
+    def page(self, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Страница справочника по названию и общее число агентств"""
+        snapshot = self._snapshot
+        start = (page - 1) * per_page
+        ids = snapshot.order[start : start + per_page]
+        return [snapshot.rows[i] for i in ids], len(snapshot.order)
+
+    def search(self, term: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        Агентства, у которых каждое слово запроса встречается в названиях,
+        адресе, городе, метро, районе или телефонах. Сначала идут агентства,
+        название которых начинается с запроса, затем остальные по названию.
+        """
+        query = normalize_text(term)
+        if not query:
+            return []
+        if _PHONE_QUERY_RE.match(query) and len(phone_digits(query)) >= 3:
+            words = [phone_digits(query)]
+        else:
+            words = _WORD_RE.findall(query) or [query]
+
+        snapshot = self._snapshot
+        matched: Optional[Set[int]] = None
+        for word in sorted(words, key=len, reverse=True):
+            candidates = self._match_word(snapshot, word, matched)
+            matched = candidates if matched is None else matched & candidates
+            if not matched:
+                return []
+
+        names = snapshot.names
+        ranked = sorted(
+            matched,
+            key=lambda i: (not names[i].startswith(query), names[i], i),
+        )
+        return [snapshot.rows[i] for i in ranked[:limit]]
+
+    @classmethod
+    def _match_word(
+        cls, snapshot: _AgencySnapshot, word: str, within: Optional[Set[int]]
+    ) -> Set[int]:
+        if len(word) < 3:
+            return cls._match_prefix(snapshot.tokens, word)
+
+        postings = []
+        for trigram in _trigrams(word):
+            ids = snapshot.postings.get(trigram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0]) if within is None else within & postings[0]
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                return candidates
+        return {i for i in candidates if word in snapshot.texts[i]}
+
+    @staticmethod
+    def _match_prefix(tokens: List[Tuple[str, int]], prefix: str) -> Set[int]:
+        result = set()
+        position = bisect.bisect_left(tokens, (prefix, -1))
+        while position < len(tokens):
+            token, agency_id = tokens[position]
+            if not token.startswith(prefix):
+                break
+            result.add(agency_id)
+            position += 1
+        return result
@@ -45,15 +45,34 @@ import urllib3
 from flask_session import Session
 import base64
 import threading
+import queue
+import atexit
+from collections import deque
 from blog.migrations import (
     engine_oracle_crm,
     engine_sales_schema,
 )  # Использовать готовые движки
 from logging.handlers import RotatingFileHandler
+from blog.call.stats_rollup import CallStatsRollup
+from blog.call.agency_index import AgencySearchIndex
 
 # Константы для работы с XML API
 XML_AUTH_URL = "http://xml.teztour.com/xmlgate/auth_data.jsp?j_login_request=1&j_login=cmcrm&j_passwd=eGUEbmsQA"
 
+XML_AGENCY_URL = "http://xml.teztour.com/xmlgate/agency/view?agencyId={agency_id}&aid={session_id}"
+
+# Время жизни сессии XML-шлюза в секундах; при ошибке запроса сессия обновляется раньше
+XML_SESSION_TTL = int(os.getenv("XML_SESSION_TTL", "900"))
+# Время жизни разобранной карточки агентства и сопоставления телефон -> агентство
+XML_AGENCY_CACHE_TTL = int(os.getenv("XML_AGENCY_CACHE_TTL", "120"))
+AGENCY_BY_ANI_CACHE_TTL = int(os.getenv("AGENCY_BY_ANI_CACHE_TTL", "600"))
+
+# Последовательность Oracle для CALL_INFO_ID и размер блока ID, выбираемого за один запрос
+CALL_INFO_SEQUENCE = os.getenv("CALL_INFO_SEQUENCE", "SEQ_T_CALL_INFO")
+CALL_INFO_ID_BLOCK = int(os.getenv("CALL_INFO_ID_BLOCK", "20"))
+# Toggle for background batched writes to T_CALL_INFO (off = synchronous writes)
+CALL_STAT_ASYNC_WRITES = os.getenv("CALL_STAT_ASYNC_WRITES", "on").lower()
+
 # Хранилище активных сессий
 active_sessions = {}
 
@@ -94,6 +113,7 @@ if not logger.handlers:
 
 # Импортируем декораторы для защиты отладочных эндпоинтов
 from blog.utils.decorators import debug_only, development_only, admin_required_in_production
+from blog.utils.cache_manager import cache_manager, UncachedResult
 
 calls = Blueprint("calls", __name__, template_folder="templates")
 
@@ -359,38 +379,68 @@ def get_agency_id_by_ani(ani) -> Union[Any, Literal["0"]]:
     else:
         ani = ani_str  # оставляем как есть, если номер уже с +
 
+    def lookup():
+        try:
+            session_with_oracle_crm_schema = get_session_with_bind("oracle_crm")
+            agency_phone = (
+                session_with_oracle_crm_schema.query(AgencyPhone)
+                .filter_by(agency_phone=ani)
+                .order_by(AgencyPhone.agency_id.desc())
+                .first()
+            )
+
+            if agency_phone:
+                return agency_phone.agency_id
+
+            return "0"
+        except Exception as e:
+            logger.error(f"Ошибка в функции get_agency_id_by_ani: {str(e)}")
+            # Ошибку БД не кешируем, следующий звонок повторит поиск
+            raise UncachedResult("0")
+
     try:
-        session_with_oracle_crm_schema = get_session_with_bind("oracle_crm")
-        agency_phone = (
-            session_with_oracle_crm_schema.query(AgencyPhone)
-            .filter_by(agency_phone=ani)
-            .order_by(AgencyPhone.agency_id.desc())
-            .first()
+        return cache_manager.get_or_set(
+            f"ani:{ani}", lookup, ttl=AGENCY_BY_ANI_CACHE_TTL, namespace="agency_by_ani"
         )
+    except UncachedResult as uncached:
+        return uncached.value
 
-        if agency_phone:
-            return agency_phone.agency_id
 
-        return "0"
-    except Exception as e:
-        logger.error(f"Ошибка в функции get_agency_id_by_ani: {str(e)}")
-        return "0"
+def find_agency_id_by_phone_digits(phone_digits: str) -> Optional[Any]:
+    """
+    Ищет агентство по цифрам номера телефона в T_AGENCY_PHONE.
+
+    Результат (включая "не найдено") кешируется на AGENCY_BY_ANI_CACHE_TTL,
+    поэтому повторные звонки с того же номера не обращаются к Oracle CRM.
+    Возвращает ID агентства или None.
+    """
+
+    def lookup():
+        sql = text(
+            """
+        SELECT AGENCY_ID, AGENCY_PHONE
+        FROM T_AGENCY_PHONE
+        WHERE REPLACE(AGENCY_PHONE, ' ', '') LIKE :phone
+        """
+        )
+        with SessionOracleCRM() as session_crm:
+            agency = session_crm.execute(sql, {"phone": f"%{phone_digits}%"}).fetchone()
+        return agency[0] if agency else "0"
+
+    agency_id = cache_manager.get_or_set(
+        f"digits:{phone_digits}",
+        lookup,
+        ttl=AGENCY_BY_ANI_CACHE_TTL,
+        namespace="agency_by_ani",
+    )
+    return None if agency_id == "0" else agency_id
 
 
 def get_xml_agency_not_blacklist(agency_id):
     # Игнорируем предупреждения Pylint о неизвестных членах lxml.etree
     # pylint: disable=I1101
     try:
-        auth_url = XML_AUTH_URL
-        response = requests.get(auth_url, timeout=10)
-        sess_id = etree.fromstring(response.content).findtext("sessionId")
-
-        agency_url = f"http://xml.teztour.com/xmlgate/agency/view?agencyId={agency_id}&aid={sess_id}"
-        response_agency = requests.get(agency_url, timeout=10)
-        root = etree.fromstring(response_agency.content)
-        root_mess = root.findtext("agency/blaсkList")
-
-        return root_mess == "false"
+        return get_agency_card(agency_id)["agency_blacklist"] == "No"
     except Exception as err:
         logger.error("Error in get_xml_agency_not_blacklist:%s", {str(err)})
         return False
@@ -726,8 +776,7 @@ def parse_xml_data(pk_record, ani: str, agency_id: str) -> dict:
     # Игнорируем предупреждения Pylint о неизвестных членах lxml.etree
     # pylint: disable=I1101
     try:
-        jsession_agency_id = authenticate_and_get_session_id()
-        root = fetch_agency_data(agency_id, jsession_agency_id)
+        root = fetch_agency_root(agency_id)
 
         value = defaultdict(str)
         extract_agency_data(pk_record, root, value)
@@ -750,23 +799,126 @@ def parse_xml_data(pk_record, ani: str, agency_id: str) -> dict:
         }
 
 
+class XmlGatewaySession:
+    """
+    Идентификатор сессии XML-шлюза, общий для всех запросов процесса.
+
+    Логин выполняется один раз и повторяется только по истечении ttl или
+    после явного invalidate (ошибка запроса с текущей сессией). Логин
+    выполняется под блокировкой, поэтому при всплеске звонков в шлюз уходит
+    один запрос авторизации.
+    """
+
+    def __init__(self, ttl: int = 900):
+        self.ttl = ttl
+        self._session_id = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, force_refresh: bool = False) -> str:
+        with self._lock:
+            if (
+                force_refresh
+                or not self._session_id
+                or time.monotonic() >= self._expires_at
+            ):
+                self._session_id = self._login()
+                self._expires_at = time.monotonic() + self.ttl
+                logger.info("Получена новая сессия XML-шлюза")
+            return self._session_id
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._session_id = None
+            self._expires_at = 0.0
+
+    @staticmethod
+    def _login() -> str:
+        # pylint: disable=I1101
+        response = requests.get(XML_AUTH_URL, timeout=10)
+        response.raise_for_status()
+        session_id = etree.fromstring(response.content).findtext(".//sessionId")
+        if not session_id:
+            raise ValueError("XML-шлюз не вернул sessionId")
+        return session_id
+
+
+xml_gateway_session = XmlGatewaySession(ttl=XML_SESSION_TTL)
+
+
 def authenticate_and_get_session_id() -> str:
-    # Используем константу вместо жесткого URL
-    response = requests.get(XML_AUTH_URL, timeout=10)
-    response.raise_for_status()
-    sess = etree.fromstring(response.content)
-    return sess.find(".//sessionId").text
+    return xml_gateway_session.get()
 
 
 def fetch_agency_data(agency_id: str, jsession_agency_id: str) -> etree.Element:
     # Игнорируем предупреждения Pylint о неизвестных членах lxml.etree
     # pylint: disable=I1101
-    agency_url = f"http://xml.teztour.com/xmlgate/agency/view?agencyId={agency_id}&aid={jsession_agency_id}"
+    agency_url = XML_AGENCY_URL.format(agency_id=agency_id, session_id=jsession_agency_id)
     response = requests.get(agency_url, timeout=10)
     response.raise_for_status()
     return etree.fromstring(response.content)
 
 
+def fetch_agency_root(agency_id) -> etree.Element:
+    """
+    Получает XML агентства, переиспользуя сессию шлюза.
+
+    Если запрос с текущей сессией завершился ошибкой или вернул ответ без
+    данных агентства (например, сессия истекла на стороне шлюза), сессия
+    обновляется и запрос повторяется один раз.
+    """
+    # pylint: disable=I1101
+    try:
+        root = fetch_agency_data(agency_id, xml_gateway_session.get())
+        if root.find(".//name") is not None:
+            return root
+        logger.info(f"Ответ XML-шлюза для агентства {agency_id} без данных, обновляем сессию")
+    except (requests.RequestException, etree.XMLSyntaxError) as e:
+        logger.warning(f"Ошибка запроса к XML-шлюзу для агентства {agency_id}: {e}. Обновляем сессию")
+    return fetch_agency_data(agency_id, xml_gateway_session.get(force_refresh=True))
+
+
+def _parse_agency_card(root: etree.Element, agency_id) -> Dict[str, Any]:
+    """Разбирает XML агентства в карточку для agency_data.html (контакты - списком)"""
+    # pylint: disable=I1101
+    managers = root.findall(".//managers/manager")
+    return {
+        "agency_name": root.findtext(
+            ".//name", f"Имя агентства не получено (ID: {agency_id})"
+        ),
+        "company_name_en": root.findtext(".//nameEng", ""),
+        "agency_city": root.findtext(".//city", ""),
+        "agency_percent": root.findtext(".//percent", ""),
+        "agency_front_office": root.findtext(".//frontOffice", ""),
+        "agency_contract": root.findtext(".//contract", ""),
+        "agency_quantity_tourists": root.findtext(".//sentTourists", "0"),
+        "agency_boss": root.findtext(".//boss", ""),
+        "agency_curator_name": root.findtext(".//curator/fullName", ""),
+        "agency_blacklist": "Yes" if root.findtext(".//blackList") == "true" else "No",
+        "agency_employee": " / ".join(
+            [m.text for m in managers if m.text is not None]
+        ),
+        "contacts": [
+            {
+                "value": contact.findtext("value", ""),
+                "person": contact.findtext("person", ""),
+                "description": contact.findtext("description", ""),
+            }
+            for contact in root.findall(".//contacts/contact")
+        ],
+    }
+
+
+def get_agency_card(agency_id) -> Dict[str, Any]:
+    """Карточка агентства из XML-шлюза с кешированием на XML_AGENCY_CACHE_TTL"""
+    return cache_manager.get_or_set(
+        str(agency_id),
+        lambda: _parse_agency_card(fetch_agency_root(agency_id), agency_id),
+        ttl=XML_AGENCY_CACHE_TTL,
+        namespace="xml_agency",
+    )
+
+
 def extract_agency_data(pk_record, root: etree.Element, value: defaultdict) -> None:
     # Игнорируем предупреждения Pylint о неизвестных членах lxml.etree
     # pylint: disable=I1101
@@ -910,32 +1062,240 @@ def get_max_call_info_id(db_session):
         raise
 
 
+CALL_INFO_INSERT_SQL = """
+INSERT INTO T_CALL_INFO
+(CALL_INFO_ID, TIME_BEGIN, TIME_END, PHONE_NUMBER, CURRATOR, THEME, AGENCY_ID, REGION)
+VALUES (:id, :time_begin, :time_end, :phone, :curator, :theme, :agency_id, :region)
+"""
+CALL_INFO_END_SQL = "UPDATE T_CALL_INFO SET TIME_END = :time_end WHERE CALL_INFO_ID = :call_id"
+CALL_INFO_AGENCY_NAME_SQL = "UPDATE T_CALL_INFO SET AGENCY_NAME = :agency_name WHERE CALL_INFO_ID = :call_id"
+CALL_INFO_AGENCY_MANAGER_SQL = "UPDATE T_CALL_INFO SET AGENCY_MANAGER = :manager_name WHERE CALL_INFO_ID = :call_id"
+
+
+# Создает последовательность, если ее нет, начиная выше текущего MAX(CALL_INFO_ID).
+# Выполняется scripts/create_call_info_sequence.py (нужно право CREATE SEQUENCE)
+CALL_INFO_SEQUENCE_DDL = """
+DECLARE
+    v_count NUMBER;
+    v_start NUMBER;
+BEGIN
+    SELECT COUNT(*) INTO v_count FROM user_sequences WHERE sequence_name = '{sequence_name}';
+    IF v_count = 0 THEN
+        SELECT NVL(MAX(CALL_INFO_ID), 0) + 1 INTO v_start FROM T_CALL_INFO;
+        EXECUTE IMMEDIATE 'CREATE SEQUENCE {sequence_name} START WITH ' || v_start || ' CACHE 100';
+    END IF;
+END;
+"""
+
+
+class CallInfoIdUnavailable(RuntimeError):
+    """Последовательность CALL_INFO_ID недоступна — запись звонка не создается"""
+
+
+class CallInfoIdAllocator:
+    """
+    Выдает CALL_INFO_ID из последовательности Oracle блоками по block_size.
+
+    Последовательность создается скриптом scripts/create_call_info_sequence.py
+    (DDL — CALL_INFO_SEQUENCE_DDL). Блок выбирается одним запросом и
+    расходуется из памяти, поэтому большинство звонков не обращается к БД
+    за ID. После fork (gunicorn) блок родителя сбрасывается.
+
+    Прежнего MAX(CALL_INFO_ID) + 1 больше нет: между воркерами он выдает
+    одинаковые ID и пересекается со значениями последовательности. Если
+    блок получить не удалось, next_id поднимает CallInfoIdUnavailable, а
+    следующая попытка обращения к последовательности делается не раньше
+    чем через retry_interval секунд (интервал удваивается до max_retry_interval).
+    """
+
+    def __init__(self, engine, sequence_name: str, block_size: int = 20,
+                 retry_interval: float = 1.0, max_retry_interval: float = 60.0):
+        if not re.fullmatch(r"[A-Za-z0-9_$#]+", sequence_name or ""):
+            raise ValueError(f"Некорректное имя последовательности: {sequence_name!r}")
+        self.engine = engine
+        self.sequence_name = sequence_name.upper()
+        self.block_size = max(1, block_size)
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._ids = deque()
+        self._pid = os.getpid()
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._ids.clear()
+                self._pid = os.getpid()
+
+            if not self._ids:
+                if time.monotonic() < self._retry_at:
+                    raise CallInfoIdUnavailable(
+                        f"Последовательность {self.sequence_name} недоступна: {self._last_error}"
+                    )
+                try:
+                    self._ids.extend(self._fetch_block())
+                except Exception as e:
+                    self._failures += 1
+                    delay = min(
+                        self.retry_interval * 2 ** (self._failures - 1), self.max_retry_interval
+                    )
+                    self._retry_at = time.monotonic() + delay
+                    self._last_error = e
+                    logger.error(
+                        f"Не удалось получить блок ID из {self.sequence_name} (попытка {self._failures}, повтор через {delay:.0f} с): {e}"
+                    )
+                    raise CallInfoIdUnavailable(
+                        f"Последовательность {self.sequence_name} недоступна: {e}"
+                    ) from e
+                self._failures = 0
+                self._retry_at = 0.0
+            return self._ids.popleft()
+
+    def _fetch_block(self) -> List[int]:
+        sql = text(
+            f"SELECT {self.sequence_name}.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :block_size"
+        )
+        with self.engine.connect() as connection:
+            return [
+                int(row[0])
+                for row in connection.execute(sql, {"block_size": self.block_size})
+            ]
+
+    def create_sequence(self) -> None:
+        """Создает последовательность, если ее еще нет (CALL_INFO_SEQUENCE_DDL)"""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                CALL_INFO_SEQUENCE_DDL.format(sequence_name=self.sequence_name)
+            )
+
+
+class CallStatWriter:
+    """
+    Фоновая запись статистики звонков в T_CALL_INFO.
+
+    Операции (вставка строки, время окончания, имя агентства, менеджер)
+    ставятся в очередь и выполняются одним потоком в порядке поступления,
+    поэтому обновление строки никогда не опережает ее вставку. За один
+    проход выбирается до batch_size операций; подряд идущие одинаковые
+    операции отправляются одним executemany в общей транзакции. Если пакет
+    не записался, операции повторяются по одной, чтобы ошибочная строка не
+    потеряла остальные.
+    """
+
+    def __init__(self, engine, batch_size: int = 100, maxsize: int = 10000,
+                 put_timeout: float = 30.0):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, sql: str, params: Dict[str, Any]) -> bool:
+        self._ensure_started()
+        try:
+            # Синхронная запись в обход очереди могла бы опередить вставку
+            # строки, поэтому при переполнении ждем место в очереди
+            self._queue.put((sql, params), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            logger.error(
+                f"Очередь записи статистики звонков переполнена дольше {self.put_timeout} с, операция отброшена: {params}"
+            )
+            return False
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Ожидает записи всех поставленных операций. Возвращает False по таймауту."""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="call-stat-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._execute_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _execute_batch(self, batch):
+        groups = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+
+        try:
+            with self.engine.begin() as connection:
+                for sql, params_list in groups:
+                    connection.execute(text(sql), params_list)
+            logger.debug(f"Записан пакет статистики звонков: {len(batch)} операций")
+        except Exception as e:
+            logger.error(f"Ошибка пакетной записи статистики звонков ({len(batch)} операций): {e}")
+            for sql, params in batch:
+                try:
+                    with self.engine.begin() as connection:
+                        connection.execute(text(sql), params)
+                except Exception as row_error:
+                    logger.error(f"Ошибка записи статистики звонка {params}: {row_error}")
+
+
+call_info_id_allocator = CallInfoIdAllocator(
+    engine_sales_schema, CALL_INFO_SEQUENCE, block_size=CALL_INFO_ID_BLOCK
+)
+call_stat_writer = CallStatWriter(engine_sales_schema)
+atexit.register(call_stat_writer.drain)
+
+
 def record_stat_to_db(
     session, curator=None, ag_id=None, tel=None, theme=None, region="lt"
 ):
-    """Записывает информацию о звонке в базу данных"""
+    """
+    Записывает информацию о звонке в базу данных.
+
+    ID берется из последовательности (см. CallInfoIdAllocator); при
+    CALL_STAT_ASYNC_WRITES=on вставка выполняется фоновым CallStatWriter,
+    и функция сразу возвращает ID новой записи. Если последовательность
+    недоступна, запись не создается и возвращается None.
+    """
     try:
         # Проверяем и очищаем номер телефона
         if not tel or tel == "+" or len(tel) < 3:
             logger.warning(f"Отклонена запись с некорректным номером телефона: '{tel}'")
             return None  # Прекращаем создание записи, возвращаем None
 
-        # Получаем максимальный ID в таблице и увеличиваем на 1
-        max_id_query = text("SELECT NVL(MAX(CALL_INFO_ID), 0) FROM T_CALL_INFO")
-        max_id_result = session.execute(max_id_query).scalar()
-        new_id = (max_id_result or 0) + 1
+        new_id = call_info_id_allocator.next_id()
 
         time_now = datetime.datetime.now()
 
-        # Создаем запись с явным указанием ID
-        insert_query = text(
-            """
-        INSERT INTO T_CALL_INFO
-        (CALL_INFO_ID, TIME_BEGIN, TIME_END, PHONE_NUMBER, CURRATOR, THEME, AGENCY_ID, REGION)
-        VALUES (:id, :time_begin, :time_end, :phone, :curator, :theme, :agency_id, :region)
-        """
-        )
-
         params = {
             "id": new_id,
             "time_begin": time_now,
@@ -949,8 +1309,13 @@ def record_stat_to_db(
             "region": region,
         }
 
+        if CALL_STAT_ASYNC_WRITES == "on":
+            call_stat_writer.submit(CALL_INFO_INSERT_SQL, params)
+            logger.info(f"Запись звонка с ID: {new_id} для номера {tel} поставлена в очередь")
+            return new_id
+
         # Выполняем запрос
-        session.execute(insert_query, params)
+        session.execute(text(CALL_INFO_INSERT_SQL), params)
 
         # Только логируем - не делаем commit здесь, т.к. это может делаться в контексте
         logger.info(f"Создана новая запись звонка с ID: {new_id} для номера {tel}")
@@ -965,7 +1330,12 @@ def record_stat_to_db(
 
 def write_end_call(pk_record, sales_schema):
     try:
-        if call_info_table is not None:
+        if CALL_STAT_ASYNC_WRITES == "on":
+            call_stat_writer.submit(
+                CALL_INFO_END_SQL,
+                {"time_end": datetime.datetime.now(), "call_id": pk_record},
+            )
+        elif call_info_table is not None:
             update_stmt = (
                 call_info_table.update()
                 .where(call_info_table.c.call_info_id == pk_record)
@@ -993,6 +1363,9 @@ def update_call_theme():
 
         logger.info(f"Обновление темы: pk_record={pk_record}, тема: {theme}")
 
+        # Строка звонка могла еще не быть записана фоновым CallStatWriter
+        call_stat_writer.drain(timeout=2)
+
         # Прямой SQL запрос без использования ORM
         with engine_sales_schema.connect() as connection:
             # Формируем SQL запрос напрямую к таблице
@@ -1025,6 +1398,11 @@ def update_call_theme():
 
 def write_agency_name(call_id, agency_name, engine):
     """Обновляет имя агентства для записи о звонке"""
+    if CALL_STAT_ASYNC_WRITES == "on":
+        # Запись идет после вставки строки в той же очереди CallStatWriter
+        return call_stat_writer.submit(
+            CALL_INFO_AGENCY_NAME_SQL, {"agency_name": agency_name, "call_id": call_id}
+        )
     try:
         # Исправляем SQL-запрос, добавляя точное соответствие ID
         update_query = text(
@@ -1068,6 +1446,10 @@ def write_agency_name(call_id, agency_name, engine):
 
 def write_agency_manager(call_id, manager_name, engine):
     """Обновляет имя менеджера агентства для записи о звонке"""
+    if CALL_STAT_ASYNC_WRITES == "on":
+        return call_stat_writer.submit(
+            CALL_INFO_AGENCY_MANAGER_SQL, {"manager_name": manager_name, "call_id": call_id}
+        )
     try:
         # Используем begin() вместо connect() для автоматического commit
         update_query = text(
@@ -1204,7 +1586,7 @@ def contact_center_moscow(ani=None, agent_id=None):
                 LEFT JOIN telephone t ON cd.telephone_id = t.id
                 LEFT JOIN operators op ON cls.operator_id = op.id
                 LEFT JOIN privat_processing pp ON cls.privat_processing_id = pp.id -- <--- Добавляем JOIN
-                WHERE DATE(cls.datetime) = CURDATE()
+                WHERE cls.datetime >= CURDATE() AND cls.datetime < CURDATE() + INTERVAL 1 DAY
                 ORDER BY cls.datetime DESC
                 """
                 cursor.execute(query)
@@ -1309,6 +1691,23 @@ def get_moscow_calls():
             date_filter_sql = "CURDATE()"
             selected_date = date_filter  # Устанавливаем selected_date для логгера
 
+        # Keyset-пагинация: limit включает ее, cursor - "<datetime>|<id>" последней строки
+        page_limit = request.args.get("limit", type=int)
+        cursor_param = request.args.get("cursor", "")
+        cursor_time = cursor_id = None
+        if page_limit is not None:
+            page_limit = max(1, min(page_limit, MOSCOW_CALLS_MAX_PAGE_SIZE))
+            if cursor_param:
+                try:
+                    cursor_time_str, cursor_id_str = cursor_param.rsplit("|", 1)
+                    cursor_time = datetime.datetime.fromisoformat(cursor_time_str)
+                    cursor_id = int(cursor_id_str)
+                except ValueError:
+                    return (
+                        jsonify({"success": False, "error": "Некорректный cursor", "calls": []}),
+                        400,
+                    )
+
         logger.info(f"Запрос звонков для даты: {selected_date}")
 
         connection = get_db_connection()
@@ -1365,16 +1764,28 @@ def get_moscow_calls():
                 LEFT JOIN telephone t ON cd.telephone_id = t.id
                 LEFT JOIN operators op ON cls.operator_id = op.id
                 LEFT JOIN privat_processing pp ON cls.privat_processing_id = pp.id -- <--- Добавляем JOIN
-                WHERE DATE(cls.datetime) = {date_filter_sql}
-                ORDER BY cls.datetime DESC
+                WHERE cls.datetime >= {date_filter_sql}
+                  AND cls.datetime < {date_filter_sql} + INTERVAL 1 DAY
                 """
                 # Передаем дату как параметр, если используется плейсхолдер
-                if date_filter_sql == "%s":
-                    cursor.execute(query, (date_filter,))
-                else:
-                    cursor.execute(query)  # Выполняем без параметра для CURDATE()
+                query_params = [date_filter, date_filter] if date_filter_sql == "%s" else []
+                if cursor_time is not None:
+                    query += """
+                  AND (cls.datetime < %s OR (cls.datetime = %s AND cls.id < %s))
+                """
+                    query_params += [cursor_time, cursor_time, cursor_id]
+                query += " ORDER BY cls.datetime DESC, cls.id DESC"
+                if page_limit is not None:
+                    # Одна лишняя строка показывает, есть ли следующая страница
+                    query += " LIMIT %s"
+                    query_params.append(page_limit + 1)
+
+                cursor.execute(query, query_params)
 
                 calls = cursor.fetchall()
+                has_more = page_limit is not None and len(calls) > page_limit
+                if has_more:
+                    calls = calls[:page_limit]
 
                 # Форматируем данные (остальная часть функции без изменений)
                 formatted_calls = []
@@ -1422,7 +1833,16 @@ def get_moscow_calls():
                 logger.info(
                     f"Получено {len(formatted_calls)} записей о звонках для API за {selected_date}"
                 )
-                return jsonify({"success": True, "calls": formatted_calls})
+                response_data = {"success": True, "calls": formatted_calls}
+                if page_limit is not None:
+                    last_call = calls[-1] if calls else None
+                    response_data["has_more"] = has_more
+                    response_data["next_cursor"] = (
+                        f"{last_call['timestamp'].isoformat()}|{last_call['id']}"
+                        if has_more and last_call
+                        else None
+                    )
+                return jsonify(response_data)
 
         finally:
             connection.close()
@@ -1688,7 +2108,7 @@ def get_call_stats():
                     count_query = """
                     SELECT COUNT(*) as total_calls
                     FROM calls
-                    WHERE DATE(datetime) = CURDATE()
+                    WHERE datetime >= CURDATE() AND datetime < CURDATE() + INTERVAL 1 DAY
                     """
                     cursor.execute(count_query)
                     total_calls_result = cursor.fetchone()
@@ -1716,7 +2136,7 @@ def get_call_stats():
                         avg_time_query = f"""
                         SELECT AVG(TIMESTAMPDIFF(SECOND, datetime, {end_column})) as avg_seconds
                         FROM calls
-                        WHERE DATE(datetime) = CURDATE()
+                        WHERE datetime >= CURDATE() AND datetime < CURDATE() + INTERVAL 1 DAY
                         AND {end_column} IS NOT NULL
                         """
                         try:
@@ -2589,44 +3009,28 @@ def contact_center_vilnius_tel():
             logger.warning("Oracle CRM недоступна, невозможно найти агентство по телефону")
             return render_template("agency_not_found.html", ani=ani)
 
-        # Получаем данные агентства
-        with SessionOracleCRM() as session_crm:
-            # Поиск агентства по телефону с улучшенным поиском
-            sql = text(
-                """
-            SELECT AGENCY_ID, AGENCY_PHONE
-            FROM T_AGENCY_PHONE
-            WHERE REPLACE(AGENCY_PHONE, ' ', '') LIKE :phone
-            """
-            )
-
-            # Для большей надежности ищем только по цифрам номера
-            clean_ani_digits = "".join(
-                c for c in clean_ani_input if c.isdigit()
-            )  # Используем чистое имя clean_ani_digits
+        # Для большей надежности ищем только по цифрам номера
+        clean_ani_digits = "".join(
+            c for c in clean_ani_input if c.isdigit()
+        )  # Используем чистое имя clean_ani_digits
 
-            # <<< НАЧАЛО ИЗМЕНЕНИЯ: Проверка на пустые цифры >>>
-            if not clean_ani_digits:
-                logger.warning(
-                    f"Не удалось извлечь цифры из номера: '{clean_ani_input}'. Поиск агентства невозможен."
-                )
-                return render_template("agency_not_found.html", ani=ani)
-            # <<< КОНЕЦ ИЗМЕНЕНИЯ >>>
+        if not clean_ani_digits:
+            logger.warning(
+                f"Не удалось извлечь цифры из номера: '{clean_ani_input}'. Поиск агентства невозможен."
+            )
+            return render_template("agency_not_found.html", ani=ani)
 
-            logger.info(f"Поиск по чистым цифрам номера: {clean_ani_digits}")
-            agency = session_crm.execute(
-                sql, {"phone": f"%{clean_ani_digits}%"}
-            ).fetchone()
+        logger.info(f"Поиск по чистым цифрам номера: {clean_ani_digits}")
+        # Повторные звонки с того же номера обслуживаются из кеша
+        agency_id = find_agency_id_by_phone_digits(clean_ani_digits)
 
-            if not agency:
-                logger.warning(
-                    f"Агентство с телефоном {ani} ({clean_ani_digits}) не найдено"
-                )
-                return render_template("agency_not_found.html", ani=ani)
+        if agency_id is None:
+            logger.warning(
+                f"Агентство с телефоном {ani} ({clean_ani_digits}) не найдено"
+            )
+            return render_template("agency_not_found.html", ani=ani)
 
-            # Здесь определяем agency_id
-            agency_id = agency[0]
-            logger.info(f"Найдено агентство с ID: {agency_id}")
+        logger.info(f"Найдено агентство с ID: {agency_id}")
 
         # Получаем историю звонков через прямой запрос
         call_history = []
@@ -2685,59 +3089,22 @@ def contact_center_vilnius_tel():
             )
 
         try:
-            # Получаем данные агентства из XML-шлюза
-            # Аутентификация в XML API
-            auth_url = XML_AUTH_URL
-            response = requests.get(auth_url, timeout=10)
-            sess_id = etree.fromstring(response.content).findtext("sessionId")
-
-            # Запрос данных агентства
-            agency_url = f"http://xml.teztour.com/xmlgate/agency/view?agencyId={agency_id}&aid={sess_id}"
-            logger.info(f"Запрос данных агентства через XML API: {agency_url}")
-            response_agency = requests.get(agency_url, timeout=10)
-            root = etree.fromstring(response_agency.content)
-
-            # Извлекаем данные агентства из XML
-            agency_data = {}
-
-            # Базовые данные агентства
-            agency_data["agency_name"] = root.findtext(
-                ".//name", f"Имя агентства не получено (ID: {agency_id})"
-            )
-            agency_data["company_name_en"] = root.findtext(".//nameEng", "")
-            agency_data["agency_city"] = root.findtext(".//city", "")
-            agency_data["agency_percent"] = root.findtext(".//percent", "")
-            agency_data["agency_front_office"] = root.findtext(".//frontOffice", "")
-            agency_data["agency_contract"] = root.findtext(".//contract", "")
-            agency_data["agency_quantity_tourists"] = root.findtext(
-                ".//sentTourists", "0"
-            )
-            agency_data["agency_boss"] = root.findtext(".//boss", "")
-            agency_data["agency_curator_name"] = root.findtext(
-                ".//curator/fullName", ""
-            )
-            agency_data["agency_blacklist"] = (
-                "Yes" if root.findtext(".//blackList") == "true" else "No"
-            )
-
-            # Получаем сотрудников агентства
-            managers = root.findall(".//managers/manager")
-            agency_data["agency_employee"] = " / ".join(
-                [m.text for m in managers if m.text is not None]
-            )
+            # Получаем данные агентства из XML-шлюза (сессия и карточка кешируются)
+            agency_card = get_agency_card(agency_id)
+            agency_data = {
+                key: value for key, value in agency_card.items() if key != "contacts"
+            }
 
             # Ищем контактную информацию, связанную с номером телефона
             clean_ani = ani.replace("+", "").replace(" ", "")
             contact_found = False
-            for contact in root.findall(".//contacts/contact"):
-                contact_value = contact.findtext("value", "")
+            for contact in agency_card.get("contacts", []):
+                contact_value = contact.get("value", "")
                 if contact_value and clean_ani in contact_value.replace(
                     "+", ""
                 ).replace(" ", ""):
-                    agency_data["agency_contact_person"] = contact.findtext(
-                        "person", ""
-                    )
-                    agency_data["agency_contact_description"] = contact.findtext(
+                    agency_data["agency_contact_person"] = contact.get("person", "")
+                    agency_data["agency_contact_description"] = contact.get(
                         "description", ""
                     )
                     contact_found = True
@@ -2920,30 +3287,26 @@ def get_calls():
     return get_moscow_calls()
 
 
-# Глобальная переменная для кэширования
-_calls_cache = None
-_cache_timestamp = None
+# Максимальный размер страницы /api/moscow-calls при keyset-пагинации (?limit=)
+MOSCOW_CALLS_MAX_PAGE_SIZE = 1000
 
+# Статистика операторов и помесячная статистика из дневной сводки call_daily_stats
+call_stats_rollup = CallStatsRollup(get_db_connection)
 
-def get_cached_calls():
-    """Возвращает кэшированные данные о звонках, если они актуальны"""
-    global _calls_cache, _cache_timestamp
 
-    if not _calls_cache or not _cache_timestamp:
-        return None
+# Кэш звонков за текущую дату (namespace "calls" в cache_manager, TTL 30 секунд)
+CALLS_CACHE_TTL = 30
+CALLS_CACHE_KEY = "today"
 
-    # Проверяем, не устарел ли кэш (30 секунд)
-    if (datetime.datetime.now() - _cache_timestamp).total_seconds() > 30:
-        return None
 
-    return _calls_cache
+def get_cached_calls():
+    """Возвращает кэшированные данные о звонках, если они актуальны"""
+    return cache_manager.get(CALLS_CACHE_KEY, namespace="calls") or None
 
 
 def update_calls_cache(calls):
     """Обновляет кэш звонков"""
-    global _calls_cache, _cache_timestamp
-    _calls_cache = calls
-    _cache_timestamp = datetime.datetime.now()
+    cache_manager.set(CALLS_CACHE_KEY, calls, ttl=CALLS_CACHE_TTL, namespace="calls")
 
 
 @calls.route("/api/moscow-operator-stats")
@@ -2951,73 +3314,27 @@ def get_moscow_operator_stats():
     """Возвращает статистику звонков по операторам за указанную дату."""
     try:
         # Получаем дату из параметров запроса, по умолчанию - сегодня
+        selected_date = datetime.date.today()
         selected_date_str = request.args.get("date")
         if selected_date_str:
             try:
                 selected_date = datetime.datetime.strptime(
                     selected_date_str, "%Y-%m-%d"
                 ).date()
-                date_filter_sql = "%s"
-                query_params = (selected_date,)
             except ValueError:
                 logger.warning(
                     f"Неверный формат даты для статистики: {selected_date_str}. Используется текущая дата."
                 )
-                date_filter_sql = "CURDATE()"
-                query_params = ()
-        else:
-            selected_date = datetime.date.today()
-            date_filter_sql = "CURDATE()"
-            query_params = ()
 
         logger.info(f"Запрос статистики операторов для даты: {selected_date}")
 
-        connection = get_db_connection()
-        if not connection:
-            logger.error(
-                "Не удалось подключиться к базе данных для статистики операторов"
-            )
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": "Ошибка подключения к базе данных",
-                        "stats": [],
-                    }
-                ),
-                500,
-            )
+        # Завершенные дни читаются из сводки, текущие - диапазонным запросом к calls
+        stats = call_stats_rollup.operator_stats(selected_date)
 
-        try:
-            with connection.cursor(DictCursor) as cursor:
-                query = f"""
-                SELECT
-                    op.name AS operator_name,
-                    COUNT(cls.id) AS call_count
-                FROM calls cls
-                JOIN operators op ON cls.operator_id = op.id
-                WHERE DATE(cls.datetime) = {date_filter_sql}
-                GROUP BY cls.operator_id, op.name
-                ORDER BY op.name; -- Сортируем по имени оператора
-                """
-
-                cursor.execute(query, query_params)
-                stats = cursor.fetchall()
-
-                logger.info(
-                    f"Получено {len(stats)} записей статистики операторов за {selected_date}"
-                )
-                return jsonify({"success": True, "stats": stats})
-
-        except Exception as e:
-            logger.error(
-                f"Ошибка при выполнении запроса статистики операторов: {str(e)}"
-            )
-            logger.error(traceback.format_exc())
-            return jsonify({"success": False, "error": str(e), "stats": []}), 500
-        finally:
-            if connection:
-                connection.close()
+        logger.info(
+            f"Получено {len(stats)} записей статистики операторов за {selected_date}"
+        )
+        return jsonify({"success": True, "stats": stats})
 
     except Exception as e:
         logger.error(f"Общая ошибка в get_moscow_operator_stats: {str(e)}")
@@ -3029,48 +3346,10 @@ def get_moscow_operator_stats():
 def get_moscow_calls_monthly_stats():
     """Возвращает ежемесячную статистику звонков (год, месяц, количество) для графика."""
     try:
-        connection = get_db_connection()
-        if not connection:
-            logger.error(
-                "Не удалось подключиться к базе данных для ежемесячной статистики"
-            )
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": "Ошибка подключения к базе данных",
-                        "stats": [],
-                    }
-                ),
-                500,
-            )
-
-        try:
-            with connection.cursor(DictCursor) as cursor:
-                query = """
-                SELECT
-                    YEAR(datetime) AS year,
-                    MONTH(datetime) AS month,
-                    COUNT(*) AS count
-                FROM calls
-                GROUP BY YEAR(datetime), MONTH(datetime)
-                ORDER BY year, month;
-                """
-                cursor.execute(query)
-                stats = cursor.fetchall()
+        stats = call_stats_rollup.monthly_stats()
 
-                logger.info(f"Получено {len(stats)} записей ��жемесячной статистики")
-                return jsonify({"success": True, "stats": stats})
-
-        except Exception as e:
-            logger.error(
-                f"Ошибка при выполнении запроса ежемесячной статистики: {str(e)}"
-            )
-            logger.error(traceback.format_exc())
-            return jsonify({"success": False, "error": str(e), "stats": []}), 500
-        finally:
-            if connection:
-                connection.close()
+        logger.info(f"Получено {len(stats)} записей ежемесячной статистики")
+        return jsonify({"success": True, "stats": stats})
 
     except Exception as e:
         logger.error(f"Общая ошибка в get_moscow_calls_monthly_stats: {str(e)}")
@@ -3078,92 +3357,56 @@ def get_moscow_calls_monthly_stats():
         return jsonify({"success": False, "error": str(e), "stats": []}), 500
 
 
+# Справочник агентств: индекс в памяти вместо LIKE-сканирования agentstvo
+AGENCY_SEARCH_LIMIT = 200
+AGENCY_PAGE_SIZE = int(os.getenv("AGENCY_PAGE_SIZE", "100"))
+AGENCY_MAX_PAGE_SIZE = 500
+agency_search_index = AgencySearchIndex(
+    get_db_connection,
+    refresh_interval=int(os.getenv("AGENCY_INDEX_REFRESH_INTERVAL", "60")),
+    full_reload_interval=int(os.getenv("AGENCY_INDEX_FULL_RELOAD_INTERVAL", "900")),
+)
+
+
 @calls.route("/api/agencies")
 def get_agencies():
     logger = logging.getLogger(__name__)
     search_term = request.args.get("search", "").strip()
-    agencies_list = []
-    connection_error = None
-
-    connection = get_db_connection()
-    if not connection:
-        connection_error = "Не удалось установить соединение с базой данных для получения списка агентств"
-        logger.error(connection_error)
-        return (
-            jsonify({"success": False, "error": connection_error, "agencies": []}),
-            500,
-        )
+    force_refresh = request.args.get("refresh", "").lower() in ("1", "true", "yes")
 
     try:
-        with connection.cursor(DictCursor) as cursor:
-            base_query = """
-                SELECT
-                    ag.id AS ID_TR,
-                    ag.name AS NAME_RU,
-                    ag.english_name AS NAME_EN,
-                    ag.adres AS ADDRESS,
-                    c.name AS CITY_NAME,
-                    m.name AS METRO_STATION_NAME,
-                    d.name AS DISTRICT_NAME,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_1_id) AS telephone_1_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_2_id) AS telephone_2_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_3_id) AS telephone_3_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_4_id) AS telephone_4_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_5_id) AS telephone_5_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_6_id) AS telephone_6_number,
-                    (SELECT t.number FROM telephone t WHERE t.id = ag.tel_7_id) AS telephone_7_number
-                FROM agentstvo ag
-                LEFT JOIN city c ON ag.city_id = c.id
-                LEFT JOIN metro m ON ag.metro_id = m.id
-                LEFT JOIN district d ON ag.district_id = d.id
-                WHERE (ag.hidden = 0 OR ag.hidden IS NULL)
-            """
-            params = []
-            if search_term:
-                search_like = f"%{search_term}%"
-                base_query += """ AND (
-                    ag.name LIKE %s OR
-                    ag.english_name LIKE %s OR
-                    ag.adres LIKE %s OR
-                    c.name LIKE %s OR
-                    m.name LIKE %s OR
-                    d.name LIKE %s OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_1_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_2_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_3_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_4_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_5_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_6_id AND t.number LIKE %s) OR
-                    EXISTS (SELECT 1 FROM telephone t WHERE t.id = ag.tel_7_id AND t.number LIKE %s)
-                ) """
-                params.extend([search_like] * 13)  # Было 6, стало 6 + 7 = 13
-                base_query += " ORDER BY ag.name LIMIT 200"  # Ограничиваем вывод, если есть поисковый запрос
-            else:
-                base_query += (
-                    " ORDER BY ag.name"  # Без LIMIT, если поискового запроса нет
-                )
-
-            logger.debug(
-                f"Executing agencies query: {cursor.mogrify(base_query, params) if params else base_query}"
+        agency_search_index.ensure_fresh(force=force_refresh)
+        if search_term:
+            agencies_list = agency_search_index.search(
+                search_term, limit=AGENCY_SEARCH_LIMIT
             )
-            cursor.execute(base_query, params)
-            agencies_raw = cursor.fetchall()
             logger.info(
-                f"Найдено {len(agencies_raw)} агентств по запросу: '{search_term}'"
+                f"Найдено {len(agencies_list)} агентств по запросу: '{search_term}'"
+            )
+            return jsonify(
+                {"success": True, "agencies": agencies_list, "total": len(agencies_list)}
             )
 
-            agencies_list = []
-            for agency_data in agencies_raw:
-                all_phones_parts = []
-                for i in range(1, 8):
-                    phone_key = f"telephone_{i}_number"
-                    if agency_data.get(phone_key):
-                        all_phones_parts.append(agency_data[phone_key])
-                agency_data["ALL_TELEPHONES_CONCAT"] = " ".join(
-                    filter(None, all_phones_parts)
-                )
-                agencies_list.append(agency_data)
+        try:
+            page = max(int(request.args.get("page", 1)), 1)
+            per_page = int(request.args.get("per_page", AGENCY_PAGE_SIZE))
+        except ValueError:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Некорректные параметры page/per_page",
+                        "agencies": [],
+                    }
+                ),
+                400,
+            )
+        per_page = min(max(per_page, 1), AGENCY_MAX_PAGE_SIZE)
+        agencies_list, total = agency_search_index.page(page, per_page)
 
+    except RuntimeError as e:
+        logger.error(str(e))
+        return jsonify({"success": False, "error": str(e), "agencies": []}), 500
     except pymysql.MySQLError as e:
         logger.error(f"MySQL ошибка при получении списка агентств: {e}")
         return (
@@ -3185,11 +3428,17 @@ def get_agencies():
             ),
             500,
         )
-    finally:
-        if connection:
-            connection.close()
 
-    return jsonify({"success": True, "agencies": agencies_list})
+    return jsonify(
+        {
+            "success": True,
+            "agencies": agencies_list,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "has_more": page * per_page < total,
+        }
+    )
 
 
 @calls.route("/api/agency-details/<int:agency_id>")
@@ -0,0 +1,227 @@
+"""
+Дневная сводка звонков московского контакт-центра (таблица calls в tez_tour_cc).
+
+Статистика по операторам и по месяцам раньше пересчитывалась по всем сырым
+строкам calls при каждом обновлении дашборда. Теперь завершенные дни
+сворачиваются один раз в локальную таблицу call_daily_stats (blog.db), а по
+сырым строкам считаются только последние дни, которые еще могут меняться.
+Все запросы к calls фильтруют по полуоткрытому диапазону datetime, чтобы
+использовался индекс по calls.datetime.
+"""
+
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from pymysql.cursors import DictCursor
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from blog import db
+from blog.models import CallDailyStat
+
+logger = logging.getLogger(__name__)
+
+# operator_id строки с общим числом звонков за день
+TOTAL_OPERATOR_ID = 0
+
+
+def day_range(day: datetime.date):
+    """Полуоткрытый диапазон [начало дня, начало следующего дня)"""
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + datetime.timedelta(days=1)
+
+
+class CallStatsRollup:
+    """
+    Инкрементальная дневная сводка звонков по операторам.
+
+    Дни старше live_days считаются завершенными: при первом обращении они
+    сворачиваются одним запросом с GROUP BY по диапазону от последнего
+    свернутого дня, дальше читаются из call_daily_stats. Последние live_days
+    дней (с запасом на расхождение часовых поясов) всегда считаются по calls.
+    """
+
+    def __init__(self, connection_factory, live_days: int = 2):
+        self.connection_factory = connection_factory
+        self.live_days = live_days
+        self._rolled_until = None  # первый еще не свернутый день
+        self._lock = threading.Lock()
+        self._table_checked = False
+
+    def first_live_day(self) -> datetime.date:
+        return datetime.date.today() - datetime.timedelta(days=self.live_days - 1)
+
+    def operator_stats(self, day: datetime.date) -> List[Dict[str, Any]]:
+        """Статистика [{operator_name, call_count}] за день, отсортированная по имени"""
+        if day < self.first_live_day():
+            self.refresh()
+            rows = (
+                CallDailyStat.query.filter(
+                    CallDailyStat.day == day,
+                    CallDailyStat.operator_id != TOTAL_OPERATOR_ID,
+                )
+                .order_by(CallDailyStat.operator_name)
+                .all()
+            )
+            return [
+                {"operator_name": row.operator_name, "call_count": row.call_count}
+                for row in rows
+            ]
+
+        start, end = day_range(day)
+        rows = self._aggregate(start, end)
+        stats = [
+            {"operator_name": row["operator_name"], "call_count": row["call_count"]}
+            for row in rows
+            if row["operator_name"] is not None
+        ]
+        return sorted(stats, key=lambda item: item["operator_name"])
+
+    def monthly_stats(self) -> List[Dict[str, int]]:
+        """Число звонков по месяцам [{year, month, count}] в хронологическом порядке"""
+        self.refresh()
+        counts = defaultdict(int)
+        rows = (
+            db.session.query(CallDailyStat.day, CallDailyStat.call_count)
+            .filter(CallDailyStat.operator_id == TOTAL_OPERATOR_ID)
+            .all()
+        )
+        for day, call_count in rows:
+            counts[(day.year, day.month)] += call_count
+
+        live_start = datetime.datetime.combine(self.first_live_day(), datetime.time.min)
+        for row in self._aggregate(live_start, None):
+            counts[(row["day"].year, row["day"].month)] += row["call_count"]
+
+        return [
+            {"year": year, "month": month, "count": count}
+            for (year, month), count in sorted(counts.items())
+        ]
+
+    def refresh(self) -> None:
+        """Сворачивает завершенные дни, которых еще нет в call_daily_stats"""
+        first_live_day = self.first_live_day()
+        if self._rolled_until is not None and self._rolled_until >= first_live_day:
+            return
+
+        with self._lock:
+            self._ensure_table()
+            rolled_until = self._load_rolled_until()
+            if rolled_until is None:
+                rolled_until = self._first_call_day()
+                if rolled_until is None:
+                    return
+            if rolled_until >= first_live_day:
+                self._rolled_until = rolled_until
+                return
+
+            start = datetime.datetime.combine(rolled_until, datetime.time.min)
+            end = datetime.datetime.combine(first_live_day, datetime.time.min)
+            rows = self._aggregate(start, end)
+            self._store(rows, rolled_until, first_live_day)
+            self._rolled_until = first_live_day
+
+    def _ensure_table(self):
+        # Страховка для установок, где миграция еще не применена
+        if not self._table_checked:
+            CallDailyStat.__table__.create(db.engine, checkfirst=True)
+            self._table_checked = True
+
+    @staticmethod
+    def _load_rolled_until() -> Optional[datetime.date]:
+        last_day = (
+            db.session.query(func.max(CallDailyStat.day))
+            .filter(CallDailyStat.operator_id == TOTAL_OPERATOR_ID)
+            .scalar()
+        )
+        return last_day + datetime.timedelta(days=1) if last_day else None
+
+    def _first_call_day(self) -> Optional[datetime.date]:
+        connection = self.connection_factory()
+        if not connection:
+            raise RuntimeError("Нет соединения с базой звонков")
+        try:
+            with connection.cursor(DictCursor) as cursor:
+                # MIN по индексированной колонке читает одну запись индекса
+                cursor.execute("SELECT MIN(datetime) AS first_call FROM calls")
+                row = cursor.fetchone()
+        finally:
+            connection.close()
+        first_call = row and row["first_call"]
+        return first_call.date() if first_call else None
+
+    def _aggregate(self, start: datetime.datetime, end: Optional[datetime.datetime]):
+        """Число звонков по дням и операторам в диапазоне [start, end)"""
+        query = """
+        SELECT
+            DATE(cls.datetime) AS day,
+            cls.operator_id,
+            op.name AS operator_name,
+            COUNT(*) AS call_count
+        FROM calls cls
+        LEFT JOIN operators op ON cls.operator_id = op.id
+        WHERE cls.datetime >= %s
+        """
+        params = [start]
+        if end is not None:
+            query += " AND cls.datetime < %s"
+            params.append(end)
+        query += " GROUP BY DATE(cls.datetime), cls.operator_id, op.name"
+
+        connection = self.connection_factory()
+        if not connection:
+            raise RuntimeError("Нет соединения с базой звонков")
+        try:
+            with connection.cursor(DictCursor) as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+        finally:
+            connection.close()
+
+        for row in rows:
+            if isinstance(row["day"], datetime.datetime):
+                row["day"] = row["day"].date()
+        return rows
+
+    @staticmethod
+    def _store(rows, first_day: datetime.date, end_day: datetime.date) -> None:
+        totals = defaultdict(int)
+        records = []
+        for row in rows:
+            totals[row["day"]] += row["call_count"]
+            if row["operator_name"] is not None:
+                records.append(
+                    CallDailyStat(
+                        day=row["day"],
+                        operator_id=row["operator_id"],
+                        operator_name=row["operator_name"],
+                        call_count=row["call_count"],
+                    )
+                )
+
+        # Строка-итог пишется и для дней без звонков: это отметка "день свернут"
+        day = first_day
+        while day < end_day:
+            records.append(
+                CallDailyStat(
+                    day=day,
+                    operator_id=TOTAL_OPERATOR_ID,
+                    operator_name=None,
+                    call_count=totals.get(day, 0),
+                )
+            )
+            day += datetime.timedelta(days=1)
+
+        try:
+            db.session.add_all(records)
+            db.session.commit()
+            logger.info(
+                f"Свернута статистика звонков за {first_day} - {end_day - datetime.timedelta(days=1)}: {len(records)} строк"
+            )
+        except IntegrityError:
+            # Другой воркер успел свернуть эти дни
+            db.session.rollback()
+            logger.info(f"Статистика звонков с {first_day} уже свернута другим процессом")
@@ -1,4 +1,12 @@
+import logging
+import os
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
 
 # Создаем экземпляр SQLAlchemy с явными настройками
 db = SQLAlchemy(
@@ -7,3 +15,36 @@ db = SQLAlchemy(
         "pool_recycle": 300,
     }
 )
+
+# Настройки SQLite для каждого нового соединения.
+# WAL: readers never wait for the writer and the writer never waits for readers
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+# NORMAL is durable in WAL mode except for the last transactions on power loss
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+# How long a writer waits for the write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "20000"))
+# Page cache per connection, KiB
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """PRAGMA для соединений SQLite; остальные СУБД не затрагиваются"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_JOURNAL_MODE:
+            # Режим журнала хранится в файле базы, для :memory: игнорируется
+            try:
+                cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            except sqlite3.OperationalError as e:
+                # Смена режима требует монопольного доступа; WAL, включенный
+                # однажды, сохраняется, так что ошибка возможна только при первом запуске
+                logger.warning(f"Не удалось установить journal_mode={SQLITE_JOURNAL_MODE}: {e}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
@@ -0,0 +1,170 @@
+"""
+Очередь записи в SQLite с одним писателем на процесс.
+
+В SQLite одновременно пишет только одно соединение. Отметка уведомления
+прочитанным и сохранение уведомлений Redmine раньше открывали по транзакции
+на каждый запрос, и при десятках потоков gunicorn они стояли в очереди за
+блокировкой записи (busy_timeout), а каждый commit отдельно синхронизировал
+журнал. Теперь такие записи передаются в submit() как задания job(session):
+фоновый поток забирает все задания, накопившиеся в очереди, пока шла
+предыдущая транзакция (не больше max_batch), и выполняет их в одной
+транзакции. Одиночная запись не ждет: пачки складываются сами под
+нагрузкой, а max_delay (по умолчанию 0) лишь добавляет ожидание попутных
+заданий. Если транзакция падает, задания повторяются по одному, чтобы
+ошибка одного не отменила остальные.
+
+submit() ждет результат до timeout, а затем снимает задание с очереди. Если
+писатель уже начал его выполнять, ожидание продолжается до конца: иначе
+вызывающий получил бы ошибку, а запись все равно была бы сохранена.
+
+Задание должно вернуть простые значения (id, числа), а не объекты ORM:
+сессия потока-писателя закрывается после каждой пачки. Чтение идет через
+обычную db.session запроса и в режиме WAL писателя не ждет.
+
+Без init_app (тесты, скрипты) или при SQLITE_WRITE_QUEUE=off задание
+выполняется сразу в текущей сессии с собственным commit.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+
+from blog.db_config import db
+
+logger = logging.getLogger(__name__)
+
+# Batch notification writes through one writer thread per worker
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "on").lower()
+
+WriteJob = Callable[[Any], Any]
+
+
+class SQLiteWriteQueue:
+    def __init__(self, max_batch: int = 200, max_delay: float = 0.0, timeout: float = 30):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._app = None
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[WriteJob, Future]]" = queue.Queue()
+        self._writer_pid: Optional[int] = None
+        self._writer_thread: Optional[threading.Thread] = None
+
+    def init_app(self, app):
+        self._app = app
+
+    @property
+    def enabled(self) -> bool:
+        return self._app is not None and SQLITE_WRITE_QUEUE == "on"
+
+    def submit(self, job: WriteJob) -> Any:
+        """Выполняет job(session) в пачке потока-писателя и возвращает его результат"""
+        if not self.enabled or threading.current_thread() is self._writer_thread:
+            return self._run_inline(job)
+
+        self._ensure_writer()
+        future: Future = Future()
+        self._queue.put((job, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise
+            # Задание уже выполняется — его результат будет, дожидаемся
+            logger.warning(
+                f"Запись в SQLite выполняется дольше {self.timeout} с, продолжаем ожидание"
+            )
+            return future.result()
+
+    @staticmethod
+    def _run_inline(job: WriteJob) -> Any:
+        try:
+            result = job(db.session)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # ------------------------------------------------------------ писатель
+
+    def _ensure_writer(self) -> None:
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            # После fork поток родителя в дочернем процессе не существует
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._queue = queue.Queue()
+            self._writer_thread = threading.Thread(
+                target=self._run, name="sqlite-writer", daemon=True
+            )
+            self._writer_thread.start()
+
+    def _collect(self) -> List[Tuple[WriteJob, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Без ожидания забираем то, что пришло за время прошлой пачки
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        pid = os.getpid()
+        while self._writer_pid == pid:
+            batch = self._collect()
+            try:
+                with self._app.app_context():
+                    self.write_batch(batch)
+            except Exception as e:
+                logger.error(f"Ошибка потока записи SQLite: {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def write_batch(self, batch: List[Tuple[WriteJob, Future]]) -> None:
+        """Выполняет задания в одной транзакции, при ошибке — по одному"""
+        pending = [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        try:
+            try:
+                results = [job(db.session) for job, _ in pending]
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                if len(pending) == 1:
+                    pending[0][1].set_exception(e)
+                    return
+                logger.warning(
+                    f"Пачка из {len(pending)} записей в SQLite не выполнена ({e}), повтор по одной"
+                )
+                for job, future in pending:
+                    try:
+                        future.set_result(self._run_inline(job))
+                    except Exception as job_error:
+                        future.set_exception(job_error)
+                return
+
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+        finally:
+            db.session.remove()
+
+
+db_writer = SQLiteWriteQueue(
+    max_batch=int(os.getenv("SQLITE_WRITE_BATCH", "200")),
+    max_delay=float(os.getenv("SQLITE_WRITE_DELAY_MS", "0")) / 1000,
+)
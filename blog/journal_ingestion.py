@@ -0,0 +1,492 @@
+"""
+Инкрементальное чтение журнала Redmine для уведомлений.
+
+Вместо опроса очередей u_its_update_status / u_its_add_notes по каждому
+пользователю новые записи journals читаются прямо из MySQL Redmine от
+сохраненной позиции (created_on, id). За одну порцию выполняется три
+запроса — записи журнала с задачами, смены статуса из journal_details и
+наблюдатели — независимо от числа пользователей онлайн. Получатели (автор,
+исполнитель, наблюдатели и заявитель из easy_email_to) сопоставляются с
+локальными пользователями в памяти, уведомления пишутся пакетно.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+import pymysql
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from blog import db
+from blog.models import IngestionWatermark, User
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "redmine_journals"
+
+JOURNAL_INGEST_BATCH_SIZE = int(os.getenv("JOURNAL_INGEST_BATCH_SIZE", "500"))
+JOURNAL_INGEST_MAX_BATCHES = int(os.getenv("JOURNAL_INGEST_MAX_BATCHES", "10"))
+JOURNAL_INGEST_MIN_INTERVAL = float(os.getenv("JOURNAL_INGEST_MIN_INTERVAL", "5"))
+JOURNAL_INGEST_OVERLAP = float(os.getenv("JOURNAL_INGEST_OVERLAP", "30"))
+# Retire requester queue rows already covered by the journal watermark
+JOURNAL_RETIRE_REQUESTER_QUEUES = os.getenv("JOURNAL_RETIRE_REQUESTER_QUEUES", "on").lower()
+
+# Очереди заявителя, которые заполняет Redmine; при чтении журнала те же
+# события приходят из journals, и строки очередей только накапливаются
+REQUESTER_QUEUE_TABLES = ("u_its_update_status", "u_its_add_notes")
+
+RETIRE_QUEUE_SQL = "DELETE FROM {table} WHERE RowDateCreated < %s LIMIT %s"
+
+JOURNALS_SELECT = """
+    SELECT
+        j.id, j.journalized_id AS issue_id, j.user_id, j.notes, j.created_on,
+        COALESCE(j.private_notes, 0) AS private_notes,
+        i.project_id, i.subject, i.author_id, i.assigned_to_id, i.easy_email_to,
+        CONCAT(IFNULL(u.firstname, ''), ' ', IFNULL(u.lastname, '')) AS author_name
+    FROM journals j
+    JOIN issues i ON i.id = j.journalized_id
+    LEFT JOIN users u ON u.id = j.user_id
+    WHERE j.journalized_type = 'Issue'
+"""
+
+JOURNALS_SQL = JOURNALS_SELECT + """
+      AND (j.created_on > %s OR (j.created_on = %s AND j.id > %s))
+    ORDER BY j.created_on, j.id
+    LIMIT %s
+"""
+
+# Записи не новее позиции за последние JOURNAL_INGEST_OVERLAP секунд
+OVERLAP_JOURNALS_SQL = JOURNALS_SELECT + """
+      AND j.created_on >= %s
+      AND (j.created_on < %s OR (j.created_on = %s AND j.id <= %s))
+    ORDER BY j.created_on, j.id
+    LIMIT %s
+"""
+
+STATUS_DETAILS_SQL = """
+    SELECT jd.journal_id, so.name AS old_status, sn.name AS new_status
+    FROM journal_details jd
+    LEFT JOIN issue_statuses so ON so.id = jd.old_value
+    LEFT JOIN issue_statuses sn ON sn.id = jd.value
+    WHERE jd.journal_id IN ({placeholders})
+      AND jd.property = 'attr' AND jd.prop_key = 'status_id'
+"""
+
+WATCHERS_SQL = """
+    SELECT watchable_id AS issue_id, user_id
+    FROM watchers
+    WHERE watchable_type = 'Issue' AND watchable_id IN ({placeholders})
+"""
+
+# Кто видит приватные комментарии: участники проекта с правом
+# view_private_notes (в том числе через группу) и администраторы (project_id NULL)
+PRIVATE_NOTES_READERS_SQL = """
+    SELECT m.project_id, COALESCE(gu.user_id, m.user_id) AS user_id
+    FROM members m
+    JOIN member_roles mr ON mr.member_id = m.id
+    JOIN roles r ON r.id = mr.role_id
+    LEFT JOIN groups_users gu ON gu.group_id = m.user_id
+    WHERE m.project_id IN ({placeholders})
+      AND r.permissions LIKE '%%view_private_notes%%'
+    UNION
+    SELECT NULL AS project_id, id AS user_id FROM users WHERE admin = 1
+"""
+
+LATEST_JOURNAL_SQL = """
+    SELECT created_on, id FROM journals
+    WHERE journalized_type = 'Issue'
+    ORDER BY created_on DESC, id DESC
+    LIMIT 1
+"""
+
+
+class JournalIngestor:
+    """
+    Чтение новых записей журнала Redmine порциями от сохраненной позиции.
+
+    Позиция хранится в ingestion_watermarks (blog.db). Перед записью
+    уведомлений она сдвигается условным UPDATE (WHERE created_on/last_id
+    равны прочитанным) в той же транзакции SQLite, что и вставка: один
+    commit на порцию, при ошибке откатываются и уведомления, и позиция.
+    Если другой воркер уже забрал порцию, UPDATE не затрагивает строк и
+    порция пропускается. При первом запуске позиция ставится на последнюю запись
+    журнала — история задним числом не рассылается.
+
+    created_on в Redmine ставится до commit и хранится с точностью до
+    секунды, поэтому запись может стать видимой уже после того, как позиция
+    ушла за нее. Каждый запуск заново читает записи за overlap секунд до
+    позиции; уже отправленное отсекают дедупликатор и проверка
+    существующих уведомлений, позиция при этом не сдвигается.
+
+    Пока чтение журнала включено, уведомления заявителю тоже строятся из
+    journals (easy_email_to), а очереди u_its_update_status / u_its_add_notes
+    больше не читаются. Строки очередей старше позиции (минус overlap)
+    удаляются после каждого запуска: эти события уже разосланы из журнала.
+    """
+
+    def __init__(self, connection_factory, notification_service_factory,
+                 batch_size: int = JOURNAL_INGEST_BATCH_SIZE,
+                 max_batches: int = JOURNAL_INGEST_MAX_BATCHES,
+                 min_interval: float = JOURNAL_INGEST_MIN_INTERVAL,
+                 overlap: float = JOURNAL_INGEST_OVERLAP):
+        self.connection_factory = connection_factory
+        self.notification_service_factory = notification_service_factory
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.min_interval = min_interval
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self._last_run = 0.0
+        self._table_checked = False
+
+    def run(self, force: bool = False) -> Dict[int, int]:
+        """
+        Обрабатывает накопившиеся записи журнала.
+
+        Returns:
+            Dict[int, int]: число новых уведомлений по локальным user_id
+        """
+        if not force and time.monotonic() - self._last_run < self.min_interval:
+            return {}
+        # Параллельный вызов в этом же процессе просто пропускаем
+        if not self._lock.acquire(blocking=False):
+            return {}
+        try:
+            self._last_run = time.monotonic()
+            return self._run_batches()
+        finally:
+            self._lock.release()
+
+    def _run_batches(self) -> Dict[int, int]:
+        request_id = uuid.uuid4()
+        self._ensure_table()
+        created = defaultdict(int)
+
+        connection = self.connection_factory()
+        if not connection:
+            logger.error(f"[REQ_ID:{request_id}] Нет соединения с MySQL Redmine для чтения журнала")
+            return {}
+        try:
+            watermark, initialized = self._load_watermark(connection)
+            if not initialized:
+                for user_id, count in self._reread_overlap(connection, watermark, request_id).items():
+                    created[user_id] += count
+            for _ in range(self.max_batches):
+                journals = self._fetch_journals(connection, watermark)
+                if not journals:
+                    break
+                new_watermark = (journals[-1]["created_on"], journals[-1]["id"])
+                statuses, watchers, private_readers = self._fetch_related(connection, journals)
+                notifications = self._fan_out(journals, statuses, watchers, private_readers)
+
+                if not self._claim(watermark, new_watermark):
+                    logger.info(
+                        f"[REQ_ID:{request_id}] Порция журнала после {watermark} уже обработана другим процессом"
+                    )
+                    break
+                for user_id, count in self._save(notifications, request_id).items():
+                    created[user_id] += count
+                watermark = new_watermark
+                logger.info(
+                    f"[REQ_ID:{request_id}] Обработано записей журнала: {len(journals)}, уведомлений: {len(notifications)}, позиция: {watermark}"
+                )
+                if len(journals) < self.batch_size:
+                    break
+            if JOURNAL_RETIRE_REQUESTER_QUEUES == "on":
+                self._retire_requester_queues(connection, watermark, request_id)
+        except pymysql.MySQLError as e:
+            logger.error(f"[REQ_ID:{request_id}] Ошибка чтения журнала Redmine: {e}", exc_info=True)
+        except SQLAlchemyError as e:
+            # Порция откачена целиком, позиция не сдвинута — повторим в следующий запуск
+            logger.error(f"[REQ_ID:{request_id}] Ошибка записи уведомлений из журнала: {e}", exc_info=True)
+        finally:
+            connection.close()
+        return dict(created)
+
+    def _ensure_table(self):
+        # Страховка для установок, где миграция еще не применена
+        if not self._table_checked:
+            IngestionWatermark.__table__.create(db.engine, checkfirst=True)
+            self._table_checked = True
+
+    def _load_watermark(self, connection) -> Tuple[Tuple[datetime, int], bool]:
+        """Позиция и признак того, что она только что создана"""
+        row = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        if row is not None:
+            return (row.created_on, row.last_id), False
+
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(LATEST_JOURNAL_SQL)
+            latest = cursor.fetchone()
+        watermark = (latest["created_on"], latest["id"]) if latest else (datetime.utcnow(), 0)
+        try:
+            db.session.add(
+                IngestionWatermark(name=WATERMARK_NAME, created_on=watermark[0], last_id=watermark[1])
+            )
+            db.session.commit()
+        except Exception:
+            # Позицию одновременно создал другой воркер
+            db.session.rollback()
+            row = db.session.get(IngestionWatermark, WATERMARK_NAME)
+            watermark = (row.created_on, row.last_id)
+        logger.info(f"Позиция чтения журнала Redmine инициализирована: {watermark}")
+        return watermark, True
+
+    def _fetch_journals(self, connection, watermark) -> List[Dict]:
+        created_on, last_id = watermark
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(JOURNALS_SQL, (created_on, created_on, last_id, self.batch_size))
+            return list(cursor.fetchall())
+
+    def _reread_overlap(self, connection, watermark, request_id) -> Dict[int, int]:
+        """Досылает записи журнала, зафиксированные в MySQL позже соседних"""
+        if self.overlap <= 0:
+            return {}
+        created_on, last_id = watermark
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                OVERLAP_JOURNALS_SQL,
+                (created_on - timedelta(seconds=self.overlap), created_on, created_on, last_id, self.batch_size),
+            )
+            journals = list(cursor.fetchall())
+        if not journals:
+            return {}
+        statuses, watchers, private_readers = self._fetch_related(connection, journals)
+        return self._save(self._fan_out(journals, statuses, watchers, private_readers), request_id)
+
+    def _retire_requester_queues(self, connection, watermark, request_id) -> None:
+        """Удаляет строки очередей заявителя, события которых уже прочитаны из журнала"""
+        cutoff = watermark[0] - timedelta(seconds=max(self.overlap, 0))
+        limit = self.batch_size * self.max_batches
+        deleted = {}
+        with connection.cursor() as cursor:
+            for table in REQUESTER_QUEUE_TABLES:
+                cursor.execute(RETIRE_QUEUE_SQL.format(table=table), (cutoff, limit))
+                deleted[table] = cursor.rowcount
+        connection.commit()
+        if any(deleted.values()):
+            logger.info(
+                f"[REQ_ID:{request_id}] Удалены строки очередей заявителя до {cutoff}: {deleted}"
+            )
+
+    @staticmethod
+    def _fetch_related(connection, journals):
+        journal_ids = [journal["id"] for journal in journals]
+        issue_ids = sorted({journal["issue_id"] for journal in journals})
+        private_project_ids = sorted(
+            {journal["project_id"] for journal in journals if journal.get("private_notes")}
+        )
+        statuses = {}
+        watchers = defaultdict(set)
+        private_readers = defaultdict(set)
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                STATUS_DETAILS_SQL.format(placeholders=", ".join(["%s"] * len(journal_ids))),
+                journal_ids,
+            )
+            for row in cursor.fetchall():
+                statuses[row["journal_id"]] = (row["old_status"], row["new_status"])
+            cursor.execute(
+                WATCHERS_SQL.format(placeholders=", ".join(["%s"] * len(issue_ids))),
+                issue_ids,
+            )
+            for row in cursor.fetchall():
+                watchers[row["issue_id"]].add(row["user_id"])
+            if private_project_ids:
+                cursor.execute(
+                    PRIVATE_NOTES_READERS_SQL.format(
+                        placeholders=", ".join(["%s"] * len(private_project_ids))
+                    ),
+                    private_project_ids,
+                )
+                for row in cursor.fetchall():
+                    private_readers[row["project_id"]].add(row["user_id"])
+        return statuses, watchers, private_readers
+
+    @staticmethod
+    def _resolve_recipients(redmine_ids: Set[int], emails: Set[str]):
+        """Локальные пользователи по ID Redmine и по email заявителя"""
+        conditions = []
+        if redmine_ids:
+            conditions.append(and_(User.is_redmine_user.is_(True), User.id_redmine_user.in_(redmine_ids)))
+        if emails:
+            conditions.append(func.lower(User.email).in_(emails))
+        if not conditions:
+            return {}, {}
+
+        by_redmine_id = defaultdict(set)
+        by_email = defaultdict(set)
+        rows = db.session.query(User.id, User.email, User.id_redmine_user, User.is_redmine_user).filter(
+            or_(*conditions)
+        )
+        for user_id, email, id_redmine_user, is_redmine_user in rows:
+            if is_redmine_user and id_redmine_user in redmine_ids:
+                by_redmine_id[id_redmine_user].add(user_id)
+            if email and email.strip().lower() in emails:
+                by_email[email.strip().lower()].add(user_id)
+        return by_redmine_id, by_email
+
+    def _fan_out(self, journals, statuses, watchers, private_readers=None):
+        from blog.notification_service import NotificationData, NotificationType
+
+        redmine_ids = set()
+        emails = set()
+        for journal in journals:
+            redmine_ids.update(
+                user_id for user_id in (journal["author_id"], journal["assigned_to_id"]) if user_id
+            )
+            redmine_ids.update(watchers.get(journal["issue_id"], ()))
+            if journal["user_id"]:
+                redmine_ids.add(journal["user_id"])
+            if journal.get("easy_email_to"):
+                emails.add(journal["easy_email_to"].strip().lower())
+        by_redmine_id, by_email = self._resolve_recipients(redmine_ids, emails)
+
+        notifications = []
+        for journal in journals:
+            status_change = statuses.get(journal["id"])
+            notes = (journal.get("notes") or "").strip()
+            if not status_change and not notes:
+                continue
+
+            recipients = set()
+            for redmine_id in (journal["author_id"], journal["assigned_to_id"], *watchers.get(journal["issue_id"], ())):
+                recipients |= by_redmine_id.get(redmine_id, set())
+            if journal.get("easy_email_to"):
+                recipients |= by_email.get(journal["easy_email_to"].strip().lower(), set())
+            # Автору изменения уведомление о собственном действии не нужно
+            recipients -= by_redmine_id.get(journal["user_id"], set())
+
+            note_recipients = recipients
+            if notes and journal.get("private_notes"):
+                # Приватный комментарий — только тем, кто видит его в Redmine;
+                # заявитель по email и пользователи без учетки Redmine его не получают
+                readers = private_readers or {}
+                allowed = readers.get(journal["project_id"], set()) | readers.get(None, set())
+                note_recipients = set()
+                for redmine_id in allowed:
+                    note_recipients |= by_redmine_id.get(redmine_id, set())
+                note_recipients &= recipients
+
+            author_name = " ".join((journal.get("author_name") or "").split())
+            for user_id in sorted(recipients):
+                if status_change:
+                    old_status, new_status = status_change
+                    notifications.append(
+                        NotificationData(
+                            user_id=user_id,
+                            issue_id=journal["issue_id"],
+                            notification_type=NotificationType.STATUS_CHANGE,
+                            title=f"Изменение статуса заявки #{journal['issue_id']}",
+                            message=f"Статус изменился с '{old_status}' на '{new_status}'",
+                            data={
+                                "old_status": old_status,
+                                "new_status": new_status,
+                                "subject": journal["subject"],
+                                "author": author_name,
+                            },
+                            created_at=journal["created_on"],
+                            source_id=journal["id"],
+                        )
+                    )
+                if notes and user_id in note_recipients:
+                    notifications.append(
+                        NotificationData(
+                            user_id=user_id,
+                            issue_id=journal["issue_id"],
+                            notification_type=NotificationType.COMMENT_ADDED,
+                            title=f"Новый комментарий к заявке #{journal['issue_id']}",
+                            message=f"Добавлен комментарий от '{author_name}'",
+                            data={"author": author_name, "notes": notes},
+                            created_at=journal["created_on"],
+                            source_id=journal["id"],
+                        )
+                    )
+        return notifications
+
+    @staticmethod
+    def _claim(watermark, new_watermark) -> bool:
+        """Сдвигает позицию, если ее не сдвинул другой процесс (без commit)"""
+        result = db.session.execute(
+            update(IngestionWatermark)
+            .where(
+                IngestionWatermark.name == WATERMARK_NAME,
+                IngestionWatermark.created_on == watermark[0],
+                IngestionWatermark.last_id == watermark[1],
+            )
+            .values(created_on=new_watermark[0], last_id=new_watermark[1], updated_at=datetime.utcnow())
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return False
+        return True
+
+    def _save(self, notifications, request_id) -> Dict[int, int]:
+        """
+        Пакетная запись в одной транзакции со сдвигом позиции (если был _claim).
+
+        Уведомления только добавляются в сессию (flush), commit один; при
+        любой ошибке откатывается вся порция вместе с позицией и исключение
+        уходит наверх. Сброс счетчиков и PUSH — после commit.
+        """
+        from blog.notification_service import NotificationType
+
+        service = self.notification_service_factory()
+        status_notifications = []
+        comment_notifications = []
+        for notification in notifications:
+            if service.deduplicator.is_duplicate(notification, request_id):
+                continue
+            if notification.notification_type == NotificationType.STATUS_CHANGE:
+                status_notifications.append(notification)
+            else:
+                comment_notifications.append(notification)
+
+        try:
+            new_notifications = []
+            if status_notifications:
+                new_notifications += service._stage_status_notifications(status_notifications)[1]
+            if comment_notifications:
+                new_notifications += service._stage_comment_notifications(comment_notifications)[1]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            service.deduplicator.release(*status_notifications, *comment_notifications)
+            raise
+
+        if new_notifications:
+            service._after_notifications_saved(new_notifications, request_id)
+        created = defaultdict(int)
+        for notification in new_notifications:
+            created[notification.user_id] += 1
+        return created
+
+
+def _redmine_connection():
+    from blog.notification_service import (
+        DB_REDMINE_DB,
+        DB_REDMINE_HOST,
+        DB_REDMINE_PASSWORD,
+        DB_REDMINE_PORT,
+        DB_REDMINE_USER,
+    )
+    import redmine
+
+    return redmine.get_connection(
+        DB_REDMINE_HOST, DB_REDMINE_USER, DB_REDMINE_PASSWORD, DB_REDMINE_DB, port=DB_REDMINE_PORT
+    )
+
+
+def _notification_service():
+    from blog.notification_service import get_notification_service
+
+    return get_notification_service()
+
+
+journal_ingestor = JournalIngestor(_redmine_connection, _notification_service)
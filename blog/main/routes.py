@@ -9,16 +9,22 @@ import time
 from datetime import datetime
 import pymysql.cursors
 from datetime import datetime, timedelta, timezone, date
-import threading
 from types import SimpleNamespace
 
-# Простой кэш для счётчика уведомлений (TTL 10 секунд)
-_notification_count_cache = {}
-_notification_count_cache_lock = threading.Lock()
+# Кэш счётчика уведомлений (TTL 10 секунд, namespace "notification_count" в cache_manager)
 NOTIFICATION_CACHE_TTL = 10  # секунд
 
-_my_issues_cache = {}
-_my_issues_cache_lock = threading.Lock()
+# Поток уведомлений (SSE): время жизни соединения, интервал keep-alive (меньше
+# proxy_read_timeout nginx), интервал полной синхронизации с Redmine и предел
+# одновременных потоков на процесс (каждый занимает поток gunicorn gthread)
+NOTIFICATION_STREAM = os.getenv("NOTIFICATION_STREAM", "on").lower()
+NOTIFICATION_STREAM_LIFETIME = int(os.getenv("NOTIFICATION_STREAM_LIFETIME", "300"))
+NOTIFICATION_STREAM_HEARTBEAT = int(os.getenv("NOTIFICATION_STREAM_HEARTBEAT", "20"))
+NOTIFICATION_STREAM_RESYNC = int(os.getenv("NOTIFICATION_STREAM_RESYNC", "60"))
+NOTIFICATION_STREAM_MAX = int(os.getenv("NOTIFICATION_STREAM_MAX", "80"))
+NOTIFICATION_STREAM_RETRY_MS = 10000
+
+# TTL записей namespace "my_issues" в cache_manager
 MY_ISSUES_USER_TYPE_CACHE_TTL = 60
 MY_ISSUES_STATUS_CACHE_TTL = 300
 MY_ISSUES_SUMMARY_CACHE_TTL = 60
@@ -38,6 +44,7 @@ from flask import (
     current_app,
     Response,
     send_file,
+    stream_with_context,
 )
 from flask_login import login_required, current_user
 from flask_wtf.csrf import CSRFProtect
@@ -59,8 +66,10 @@ from blog.models import (
 )
 from blog.user.forms import AddCommentRedmine
 from blog.main.forms import IssueForm
+from blog.notification_events import format_sse, notification_event_bus
 from blog.notification_service import (
     get_notification_service,
+    notification_count_store,
     NotificationData,
     NotificationType,
     NotificationService,
@@ -98,19 +107,11 @@ from redmine import (
     generate_optimized_property_names,
 )
 
-from erp_oracle import (
-    connect_oracle,
-    db_host,
-    db_port,
-    db_service_name,
-    db_user_name,
-    db_password,
-    get_user_erp_password,
-)
+from erp_oracle import fetch_user_erp_password
 
 from blog.utils.cache_manager import (
-    CacheManager,
     TasksCacheOptimizer,
+    cache_manager,
     cached_response,
     weekend_performance_optimizer,
 )
@@ -135,7 +136,6 @@ from blog.utils.decorators import (
 )
 
 
-cache_manager = CacheManager()
 tasks_cache_optimizer = TasksCacheOptimizer()
 
 main = Blueprint("main", __name__)
@@ -153,19 +153,15 @@ def get_user_password_with_fallback(user):
 
     # Попытка 1: Oracle ERP
     try:
-        oracle_conn = connect_oracle(
-            db_host, db_port, db_service_name, db_user_name, db_password
-        )
-        if oracle_conn:
-            password = get_user_erp_password(oracle_conn, user.username)
-            oracle_conn.close()
-            if password:
-                actual_password = (
-                    password[0] if isinstance(password, tuple) else password
-                )
-                # Кешируем в сессию для будущих запросов
-                session["user_password_erp"] = actual_password
-                return actual_password
+        # Повторные запросы обслуживаются из кеша учетных данных без обращения к Oracle
+        password = fetch_user_erp_password(user.username)
+        if password:
+            actual_password = (
+                password[0] if isinstance(password, tuple) else password
+            )
+            # Кешируем в сессию для будущих запросов
+            session["user_password_erp"] = actual_password
+            return actual_password
     except Exception as e:
         logging.warning(f"Oracle недоступен для {user.username}: {e}")
 
@@ -221,23 +217,11 @@ def _my_issues_cache_key(prefix, *parts):
 
 
 def _my_issues_cache_get(cache_key):
-    now = time.time()
-    with _my_issues_cache_lock:
-        cached_entry = _my_issues_cache.get(cache_key)
-        if not cached_entry:
-            return None
-        if cached_entry["expires_at"] <= now:
-            _my_issues_cache.pop(cache_key, None)
-            return None
-        return cached_entry["value"]
+    return cache_manager.get(cache_key, namespace="my_issues")
 
 
 def _my_issues_cache_set(cache_key, value, ttl_seconds):
-    with _my_issues_cache_lock:
-        _my_issues_cache[cache_key] = {
-            "value": value,
-            "expires_at": time.time() + ttl_seconds,
-        }
+    cache_manager.set(cache_key, value, ttl=ttl_seconds, namespace="my_issues")
     return value
 
 
@@ -589,12 +573,30 @@ def get_total_notification_count_for_page(user):
         return status_count + comment_count + redmine_count
 
 
+def get_cached_notification_count(user):
+    """Счетчик уведомлений для шапки страниц из кеша NotificationCountStore.
+
+    Не синхронизирует очереди Redmine (это делает планировщик и страница
+    /notifications), поэтому рендер страницы не ждет MySQL.
+    """
+    if user is None:
+        return 0
+
+    try:
+        return notification_count_store.get_counts(user.id)["total"]
+    except Exception as e:
+        logger.warning(
+            "Не удалось получить счетчик уведомлений из кеша: %s", str(e)
+        )
+        return 0
+
+
 # Использование в контекстном процессоре
 @main.context_processor
 def inject_notification_count():
     # ИЗМЕНЕНО: Теперь везде показываем все уведомления для согласованности
     user = g.current_user if hasattr(g, "current_user") else None
-    count = get_total_notification_count_for_page(user)
+    count = get_cached_notification_count(user)
 
     # Для страницы /notifications тот же счётчик
     page_count = 0
@@ -610,17 +612,14 @@ def get_notification_count():
     try:
         user_id = current_user.id
         cache_key = f"notif_count_{user_id}"
-        now = time.time()
 
         # Проверяем кэш
-        with _notification_count_cache_lock:
-            if cache_key in _notification_count_cache:
-                cached_count, cached_time = _notification_count_cache[cache_key]
-                if now - cached_time < NOTIFICATION_CACHE_TTL:
-                    logger.debug(
-                        f"📦 Счётчик уведомлений из кэша для {current_user.username}: {cached_count}"
-                    )
-                    return jsonify({"count": cached_count})
+        cached_count = cache_manager.get(cache_key, namespace="notification_count")
+        if cached_count is not None:
+            logger.debug(
+                f"📦 Счётчик уведомлений из кэша для {current_user.username}: {cached_count}"
+            )
+            return jsonify({"count": cached_count})
 
         logger.info(
             f"🔄 Запрос количества уведомлений для пользователя {current_user.username}"
@@ -630,8 +629,9 @@ def get_notification_count():
         count = get_total_notification_count_for_page(current_user)
 
         # Сохраняем в кэш
-        with _notification_count_cache_lock:
-            _notification_count_cache[cache_key] = (count, now)
+        cache_manager.set(
+            cache_key, count, ttl=NOTIFICATION_CACHE_TTL, namespace="notification_count"
+        )
 
         logger.info(f"✅ Получено количество уведомлений: {count}")
         return jsonify({"count": count})
@@ -643,39 +643,52 @@ def get_notification_count():
         return jsonify({"count": 0, "error": str(e)}), 500
 
 
+def build_notifications_payload(user_id, limit=50, before=None, sync=True, redmine_notifications=None):
+    """Ответ /api/notifications/poll; тот же формат отправляет поток уведомлений"""
+    notifications_data = get_notification_service().get_user_notifications(
+        user_id,
+        limit=limit,
+        before=before,
+        sync=sync,
+        redmine_notifications=redmine_notifications,
+    )
+    return {
+        "success": True,
+        "notifications": {
+            "status_notifications": notifications_data["status_notifications"],
+            "comment_notifications": notifications_data["comment_notifications"],
+            "redmine_notifications": notifications_data[
+                "redmine_notifications"
+            ],  # НОВОЕ
+        },
+        "timestamp": datetime.now().isoformat(),
+        "total_count": notifications_data["total_count"],
+        "next_cursor": notifications_data.get("next_cursor"),
+    }
+
+
 @main.route("/api/notifications/poll", methods=["GET"])
 @login_required
 def poll_notifications():
     """API для опроса уведомлений (для JavaScript)"""
     try:
-        from datetime import datetime
-
         logger.info(f"🔄 Запрос уведомлений для пользователя {current_user.username}")
 
-        # Получаем уведомления пользователя (теперь включая Redmine)
-        notifications_data = get_notification_service().get_user_notifications(
-            current_user.id
-        )
+        # Пагинация: limit (по умолчанию 50, максимум 200) и курсор before (next_cursor)
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+        before = request.args.get("before") or None
+        if before:
+            try:
+                NotificationService.parse_page_cursor(before)
+            except ValueError:
+                return jsonify({"success": False, "error": "Invalid before cursor"}), 400
 
-        logger.info(
-            f"✅ Получены уведомления: {notifications_data.get('total_count', 0)} шт."
+        # Получаем уведомления пользователя (теперь включая Redmine)
+        response_data = build_notifications_payload(
+            current_user.id, limit=limit, before=before
         )
 
-        # Формируем ответ в ожидаемом формате
-        response_data = {
-            "success": True,
-            "notifications": {
-                "status_notifications": notifications_data["status_notifications"],
-                "comment_notifications": notifications_data["comment_notifications"],
-                "redmine_notifications": notifications_data[
-                    "redmine_notifications"
-                ],  # НОВОЕ
-            },
-            "timestamp": datetime.now().isoformat(),
-            "total_count": notifications_data["total_count"],
-        }
-
-        logger.info(f"✅ API уведомлений успешно завершён")
+        logger.info(f"✅ Получены уведомления: {response_data['total_count']} шт.")
         return jsonify(response_data)
 
     except Exception as e:
@@ -698,6 +711,102 @@ def poll_notifications():
         ), 500
 
 
+def iter_notification_stream(user_id, lifetime=None, heartbeat=None, resync=None):
+    """
+    События потока уведомлений пользователя.
+
+    Сразу отправляет счетчик (event: count) и список (event: notifications),
+    дальше — только когда они изменились: поток спит на событии
+    notification_event_bus. Сам поток Redmine не синхронизирует — новые
+    уведомления пишут планировщик и чтение журнала, и запись будит поток
+    через шину (между воркерами — через spool). Раз в resync секунд список
+    перечитывается только из blog.db, с прежним списком u_redmine_notifications,
+    так что открытые потоки не нагружают MySQL по таймеру.
+    В паузах уходит комментарий-keep-alive. Через lifetime секунд поток
+    закрывается, и EventSource переподключается (заодно освобождая поток
+    gunicorn и перепроверяя сессию).
+    """
+    lifetime = NOTIFICATION_STREAM_LIFETIME if lifetime is None else lifetime
+    heartbeat = NOTIFICATION_STREAM_HEARTBEAT if heartbeat is None else heartbeat
+    resync = NOTIFICATION_STREAM_RESYNC if resync is None else resync
+
+    wakeup = notification_event_bus.subscribe(user_id)
+    try:
+        started = time.monotonic()
+        deadline = started + lifetime
+        next_resync = started
+        last_counts = None
+        last_notifications = None
+        redmine_notifications = None
+        event_id = 0
+
+        yield f"retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n"
+        while True:
+            now = time.monotonic()
+            if now >= next_resync:
+                next_resync = now + resync
+            # Список Redmine из MySQL — при подключении и по событию, не по таймеру
+            if wakeup.is_set():
+                redmine_notifications = None
+            wakeup.clear()
+            try:
+                payload = build_notifications_payload(
+                    user_id, sync=False, redmine_notifications=redmine_notifications
+                )
+                redmine_notifications = payload["notifications"]["redmine_notifications"]
+                counts = notification_count_store.get_counts(user_id)
+            finally:
+                # Не держим соединение SQLite и транзакцию между событиями
+                db.session.remove()
+
+            notifications = payload["notifications"], payload["total_count"]
+            if counts != last_counts:
+                event_id += 1
+                yield format_sse("count", {"count": counts["total"], "unread": counts["unread"]}, event_id)
+                last_counts = counts
+            if notifications != last_notifications:
+                event_id += 1
+                yield format_sse("notifications", payload, event_id)
+                last_notifications = notifications
+
+            # Ждем события пользователя; keep-alive, если его долго нет
+            while not wakeup.is_set():
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                timeout = min(heartbeat, next_resync - now, deadline - now)
+                if timeout <= 0:
+                    break
+                if not wakeup.wait(timeout) and time.monotonic() < next_resync:
+                    yield ": keep-alive\n\n"
+            if time.monotonic() >= deadline:
+                return
+    finally:
+        notification_event_bus.unsubscribe(user_id, wakeup)
+
+
+@main.route("/api/notifications/stream", methods=["GET"])
+@login_required
+def stream_notifications():
+    """Поток уведомлений (text/event-stream) вместо опроса /api/notifications/poll"""
+    if NOTIFICATION_STREAM != "on":
+        return jsonify({"success": False, "fallback": "poll"}), 404
+    if notification_event_bus.subscriber_count() >= NOTIFICATION_STREAM_MAX:
+        logger.warning(
+            f"Достигнут предел потоков уведомлений ({NOTIFICATION_STREAM_MAX}), "
+            f"{current_user.username} переходит на опрос"
+        )
+        return jsonify({"success": False, "fallback": "poll"}), 503
+
+    response = Response(
+        stream_with_context(iter_notification_stream(current_user.id)),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @main.route("/check-connection", methods=["GET"])
 @login_required
 def check_connection():
@@ -926,19 +1035,12 @@ def api_mark_notification_read():
 
         if notification_type == "status-change":
             # Отмечаем уведомление об изменении статуса как прочитанное
-            notification = Notifications.query.filter_by(
-                id=real_id, user_id=current_user.id
-            ).first()
-
-            if not notification:
-                # Попытка найти без user_id (на случай рассинхронизации)
-                notification = Notifications.query.filter_by(id=real_id).first()
+            # (ищем по id без user_id — на случай рассинхронизации)
+            owner_id = get_notification_service().mark_local_notification_as_read(
+                Notifications, real_id
+            )
 
-            if notification and (
-                notification.is_read is None or notification.is_read is False
-            ):
-                notification.is_read = True
-                db.session.commit()
+            if owner_id is not None:
                 return jsonify(
                     {
                         "success": True,
@@ -955,18 +1057,11 @@ def api_mark_notification_read():
 
         elif notification_type == "comment":
             # Отмечаем уведомление о комментарии как прочитанное
-            notification = NotificationsAddNotes.query.filter_by(
-                id=real_id, user_id=current_user.id
-            ).first()
-
-            if not notification:
-                notification = NotificationsAddNotes.query.filter_by(id=real_id).first()
+            owner_id = get_notification_service().mark_local_notification_as_read(
+                NotificationsAddNotes, real_id
+            )
 
-            if notification and (
-                notification.is_read is None or notification.is_read is False
-            ):
-                notification.is_read = True
-                db.session.commit()
+            if owner_id is not None:
                 return jsonify(
                     {
                         "success": True,
@@ -2104,17 +2199,13 @@ def new_issue():
             # Действия, если файл не был прикреплен
             temp_file_path = None
         # Проверяем, тек. пользователь пользователь имеет акааунт в Redmine?
-        oracle_connect = connect_oracle(
-            db_host, db_port, db_service_name, db_user_name, db_password
-        )
-        current_user_password_erp = get_user_erp_password(
-            oracle_connect, current_user.username
-        )
+        # Пароль из кеша учетных данных; соединение Oracle сразу возвращается в пул
+        current_user_password_erp = fetch_user_erp_password(current_user.username)
         if current_user_password_erp is not None:
             redmine_connector = RedmineConnector(
                 url=redmine_url,
                 username=current_user.username,
-                password=current_user_password_erp[0],
+                password=current_user_password_erp,
                 api_key=None,
             )
         else:
@@ -2315,6 +2406,7 @@ def delete_notification_status(notification_id):
         if notification:
             db.session.delete(notification)
             db.session.commit()
+            notification_count_store.invalidate(current_user.id)
             if (
                 request.is_json
                 or request.headers.get("X-Requested-With") == "XMLHttpRequest"
@@ -2364,6 +2456,7 @@ def delete_notification_add_notes(notification_id):
         if notification:
             db.session.delete(notification)
             db.session.commit()
+            notification_count_store.invalidate(current_user.id)
             if (
                 request.is_json
                 or request.headers.get("X-Requested-With") == "XMLHttpRequest"
@@ -84,6 +84,11 @@ class Notifications(db.Model):
     date_created = db.Column(db.DateTime)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Индекс под выборку непрочитанных уведомлений пользователя по дате
+    __table_args__ = (
+        db.Index("ix_notifications_user_read_date", "user_id", "is_read", "date_created"),
+    )
+
     def __init__(
         self, user_id, issue_id, old_status, new_status, old_subj, date_created
     ):
@@ -107,6 +112,11 @@ class NotificationsAddNotes(db.Model):
     source_id = db.Column(db.Integer)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Индекс под выборку непрочитанных уведомлений пользователя по дате
+    __table_args__ = (
+        db.Index("ix_notifications_add_notes_user_read_date", "user_id", "is_read", "date_created"),
+    )
+
     def __init__(self, user_id, issue_id, author, notes, date_created, source_id):
         self.user_id = user_id
         self.issue_id = issue_id
@@ -207,6 +217,45 @@ class ChatMessage(db.Model):
     def __repr__(self):
         return f"<ChatMessage {self.message_id}>"
 
+class CallDailyStat(db.Model):
+    """Дневная сводка звонков московского контакт-центра по операторам.
+
+    Заполняется инкрементально (blog.call.stats_rollup) только для завершенных
+    дней. Строка с operator_id = 0 хранит общее число звонков за день и служит
+    отметкой, что день уже свернут.
+    """
+    __tablename__ = "call_daily_stats"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    operator_id = db.Column(db.Integer, nullable=False, default=0)
+    operator_name = db.Column(db.String(255), nullable=True)
+    call_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'operator_id', name='uq_call_daily_stats_day_operator'),
+    )
+
+    def __repr__(self):
+        return f"<CallDailyStat {self.day} op={self.operator_id} count={self.call_count}>"
+
+class IngestionWatermark(db.Model):
+    """Позиция инкрементального чтения внешнего источника.
+
+    Для журнала Redmine (blog.journal_ingestion) хранит (created_on, id)
+    последней обработанной записи journals. Обновляется сравнением со старым
+    значением, чтобы два воркера не обработали одну порцию дважды.
+    """
+    __tablename__ = "ingestion_watermarks"
+
+    name = db.Column(db.String(64), primary_key=True)
+    created_on = db.Column(db.DateTime, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IngestionWatermark {self.name} {self.created_on} id={self.last_id}>"
+
 class AgencyPhone(db.Model):
     """Модель для хранения информации о телефонах агентств"""
     __tablename__ = "T_AGENCY_PHONE"
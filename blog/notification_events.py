@@ -0,0 +1,205 @@
+"""
+Шина событий уведомлений для потока /api/notifications/stream (SSE).
+
+Раньше каждая вкладка раз в 10-30 секунд опрашивала /get-notification-count
+и /api/notifications/poll, даже когда ничего не менялось. Теперь запись,
+прочтение или удаление уведомлений публикует id пользователя в шину
+(notification_count_store.invalidate), а открытые потоки этого пользователя
+просыпаются и отправляют клиенту новый счетчик и список.
+
+Внутри процесса подписчики будятся через threading.Event. Воркеры gunicorn
+узнают о событиях друг друга через общий файл-журнал в instance/: публикация
+дописывает в него строки "pid user_id", а фоновый поток каждого воркера
+читает новые строки раз в poll_interval. Журнал обрезается при превышении
+max_spool_bytes; пропущенное при обрезке событие потоки подхватят при
+очередной сверке счетчиков.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: Optional[str], data=None, event_id: Optional[str] = None) -> str:
+    """Сообщение в формате text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f"data: {line}" for line in payload.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class NotificationEventBus:
+    """
+    Публикация "у пользователя изменились уведомления" и подписка на нее.
+
+    subscribe() возвращает threading.Event, который выставляется при
+    каждом событии пользователя; поток сбрасывает его перед чтением данных.
+    Слушатели add_remote_listener получают id пользователей из событий
+    других воркеров (например, чтобы сбросить локальный кеш счетчиков).
+    """
+
+    def __init__(
+        self,
+        spool_path: Optional[str] = None,
+        poll_interval: float = 1.0,
+        max_spool_bytes: int = 256 * 1024,
+    ):
+        self.spool_path = spool_path
+        self.poll_interval = poll_interval
+        self.max_spool_bytes = max_spool_bytes
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[threading.Event]] = {}
+        self._remote_listeners: List[Callable[[Set[int]], None]] = []
+        self._listener_pid: Optional[int] = None
+        self._offset = 0
+
+    def init_app(self, app):
+        self.spool_path = os.getenv(
+            "NOTIFICATION_EVENTS_SPOOL",
+            os.path.join(app.instance_path, "notification_events.spool"),
+        )
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        # Слушаем с самого старта: события других воркеров сбрасывают кеш счетчиков
+        self._ensure_listener()
+
+    def add_remote_listener(self, callback: Callable[[Set[int]], None]) -> None:
+        self._remote_listeners.append(callback)
+
+    # -------------------------------------------------------------- подписка
+
+    def subscribe(self, user_id: int) -> threading.Event:
+        self._ensure_listener()
+        event = threading.Event()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, user_id: int, event: threading.Event) -> None:
+        with self._lock:
+            events = self._subscribers.get(user_id)
+            if events is None:
+                return
+            events.discard(event)
+            if not events:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(events) for events in self._subscribers.values())
+
+    def _wake(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            events = [
+                event
+                for user_id in user_ids
+                for event in self._subscribers.get(user_id, ())
+            ]
+        for event in events:
+            event.set()
+
+    def _wake_all(self) -> None:
+        with self._lock:
+            events = [event for group in self._subscribers.values() for event in group]
+        for event in events:
+            event.set()
+
+    # ------------------------------------------------------------- публикация
+
+    def publish(self, *user_ids: int) -> None:
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return
+        self._wake(user_ids)
+        if not self.spool_path:
+            return
+        self._ensure_listener()
+        pid = os.getpid()
+        data = "".join(f"{pid} {user_id}\n" for user_id in sorted(user_ids)).encode()
+        try:
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # O_APPEND + один write: строки разных воркеров не перемешиваются
+                os.write(fd, data)
+                if os.fstat(fd).st_size > self.max_spool_bytes:
+                    os.ftruncate(fd, 0)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"Не удалось записать событие уведомлений в {self.spool_path}: {e}")
+
+    # ------------------------------------------------ события других воркеров
+
+    def _ensure_listener(self) -> None:
+        if not self.spool_path or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            # После fork поток родителя в дочернем процессе не существует
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            try:
+                self._offset = os.path.getsize(self.spool_path)
+            except OSError:
+                self._offset = 0
+        threading.Thread(
+            target=self._listen, name="notification-events", daemon=True
+        ).start()
+
+    def _listen(self) -> None:
+        pid = os.getpid()
+        while self._listener_pid == pid:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll_spool()
+            except Exception as e:
+                logger.error(f"Ошибка чтения журнала событий уведомлений: {e}", exc_info=True)
+
+    def poll_spool(self) -> Set[int]:
+        """Читает новые строки журнала и будит подписчиков; возвращает id пользователей"""
+        try:
+            size = os.path.getsize(self.spool_path)
+        except OSError:
+            return set()
+        if size < self._offset:
+            # Журнал обрезан: часть событий могла потеряться, будим всех
+            self._offset = 0
+            self._wake_all()
+        if size == self._offset:
+            return set()
+
+        with open(self.spool_path, "rb") as spool:
+            spool.seek(self._offset)
+            chunk = spool.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        self._offset += end
+
+        own_pid = str(os.getpid())
+        user_ids = set()
+        for line in chunk[:end].decode(errors="ignore").splitlines():
+            pid, _, user_id = line.partition(" ")
+            if pid != own_pid and user_id.isdigit():
+                user_ids.add(int(user_id))
+        if not user_ids:
+            return user_ids
+
+        for callback in self._remote_listeners:
+            try:
+                callback(user_ids)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика событий уведомлений: {e}", exc_info=True)
+        self._wake(user_ids)
+        return user_ids
+
+
+notification_event_bus = NotificationEventBus(
+    poll_interval=float(os.getenv("NOTIFICATION_EVENTS_POLL_INTERVAL", "1")),
+)
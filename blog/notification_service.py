@@ -6,15 +6,18 @@ import logging
 import sqlite3
 import json
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
 import threading
+import time
+import queue
+from collections import OrderedDict
 from contextlib import contextmanager
 from flask import current_app, request, url_for
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, case
 import uuid
 from urllib.parse import urlparse
 import pymysql.cursors
@@ -22,6 +25,8 @@ import os
 from configparser import ConfigParser
 
 from blog import db
+from blog.db_writer import db_writer
+from blog.notification_events import notification_event_bus
 from blog.models import (
     User,
     Notifications,
@@ -37,6 +42,29 @@ logger = logging.getLogger(__name__)
 # Toggle for Redmine notifications (off disables DB calls)
 REDMINE_NOTIFICATIONS = os.getenv("REDMINE_NOTIFICATIONS", "on").lower()
 
+# Toggle for batched requester-queue sync in the scheduler (off = per-user sync)
+NOTIFICATION_BATCH_SYNC = os.getenv("NOTIFICATION_BATCH_SYNC", "on").lower()
+
+# Toggle for Redmine journal ingestion by watermark (off = polling of requester queue tables)
+JOURNAL_INGESTION = os.getenv("JOURNAL_INGESTION", "on").lower()
+
+# Shared store for notification deduplication across workers: auto (Redis if configured,
+# else SQLite file next to blog.db), redis, sqlite or memory (per-process only)
+NOTIFICATION_DEDUP_STORE = os.getenv("NOTIFICATION_DEDUP_STORE", "auto").lower()
+
+# Toggle for asynchronous push delivery via in-process queue (off = synchronous fan-out)
+PUSH_DELIVERY_QUEUE = os.getenv("PUSH_DELIVERY_QUEUE", "on").lower()
+
+# Параметры очереди доставки push-уведомлений
+PUSH_DELIVERY_WORKERS = int(os.getenv("PUSH_DELIVERY_WORKERS", "4"))
+PUSH_DELIVERY_QUEUE_SIZE = int(os.getenv("PUSH_DELIVERY_QUEUE_SIZE", "1000"))
+PUSH_DELIVERY_TIMEOUT = float(os.getenv("PUSH_DELIVERY_TIMEOUT", "10"))
+PUSH_DELIVERY_MAX_RETRIES = int(os.getenv("PUSH_DELIVERY_MAX_RETRIES", "3"))
+PUSH_DELIVERY_BACKOFF = float(os.getenv("PUSH_DELIVERY_BACKOFF", "2"))
+
+# Максимум строк очереди на одного получателя за один проход синхронизации
+REQUESTER_QUEUE_LIMIT_PER_RECIPIENT = 50
+
 # Читаем конфигурацию для доступа к БД Redmine из переменных окружения
 try:
     import os
@@ -133,13 +161,161 @@ class NotificationData:
         return hashlib.md5(content.encode()).hexdigest()
 
 
+class RedisDedupStore:
+    """Общая отметка "уже отправлено" в Redis: SET NX EX атомарен между воркерами"""
+
+    prefix = "notification_dedup:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def claim(self, hash_key: str, ttl_seconds: int) -> bool:
+        return bool(self.client.set(f"{self.prefix}{hash_key}", "1", nx=True, ex=ttl_seconds))
+
+    def release(self, *hash_keys: str) -> None:
+        if hash_keys:
+            self.client.delete(*(f"{self.prefix}{hash_key}" for hash_key in hash_keys))
+
+
+class SQLiteDedupStore:
+    """
+    Общая отметка "уже отправлено" в отдельном файле SQLite.
+
+    Отдельный файл, а не таблица в blog.db: дедупликатор вызывается внутри
+    транзакций сохранения (например, после CAS водяного знака журнала), и
+    запись в blog.db вторым соединением ждала бы их блокировку. Захват —
+    один UPSERT с уникальным ключом: новая или просроченная строка
+    становится нашей, живая остается за тем, кто записал ее первым.
+    """
+
+    CLEANUP_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._claims = 0
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS notification_dedup "
+                        "(hash TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_notification_dedup_expires "
+                        "ON notification_dedup (expires_at)"
+                    )
+                    self._schema_ready = True
+        return connection
+
+    def claim(self, hash_key: str, ttl_seconds: int) -> bool:
+        connection = self._connection()
+        now = time.time()
+        cursor = connection.execute(
+            "INSERT INTO notification_dedup (hash, expires_at) VALUES (?, ?) "
+            "ON CONFLICT(hash) DO UPDATE SET expires_at = excluded.expires_at "
+            "WHERE notification_dedup.expires_at < ?",
+            (hash_key, now + ttl_seconds, now),
+        )
+        claimed = cursor.rowcount == 1
+
+        self._claims += 1
+        if self._claims % self.CLEANUP_EVERY == 0:
+            self.cleanup(now)
+        return claimed
+
+    def release(self, *hash_keys: str) -> None:
+        self._connection().executemany(
+            "DELETE FROM notification_dedup WHERE hash = ?",
+            [(hash_key,) for hash_key in hash_keys],
+        )
+
+    def cleanup(self, now: Optional[float] = None) -> None:
+        """Удаляет просроченные отметки и самые старые сверх max_entries"""
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM notification_dedup WHERE expires_at < ?",
+            (now or time.time(),),
+        )
+        connection.execute(
+            "DELETE FROM notification_dedup WHERE hash IN ("
+            "SELECT hash FROM notification_dedup ORDER BY expires_at DESC "
+            "LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
 class NotificationDeduplicator:
-    """Класс для дедупликации уведомлений"""
+    """
+    Дедупликация уведомлений по NotificationData.get_hash().
+
+    Локально хеши хранятся в OrderedDict в порядке добавления: TTL у всех
+    одинаковый, поэтому просроченные всегда в начале и снимаются оттуда
+    (амортизированно O(1) на проверку), а при превышении max_entries
+    вытесняются самые старые. Хеш, которого нет локально, захватывается в
+    общем хранилище (Redis, если подключен, иначе файл SQLite рядом с
+    blog.db), поэтому одно событие отправляется один раз, сколько бы
+    воркеров и запусков планировщика его ни увидели. Если сохранение не
+    удалось, отметки снимаются через release(), чтобы повтор не отбросил
+    событие. NOTIFICATION_DEDUP_STORE: auto (по умолчанию), redis, sqlite
+    или memory.
+    """
 
-    def __init__(self, ttl_minutes: int = 60):
+    def __init__(self, ttl_minutes: int = 60, max_entries: int = 10000, store=None):
         self.ttl_minutes = ttl_minutes
-        self._cache = {}
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
         self._lock = threading.Lock()
+        self._store = store
+        self._store_resolved = store is not None
+
+    @property
+    def ttl_seconds(self) -> int:
+        return int(self.ttl_minutes * 60)
+
+    def _shared_store(self):
+        if self._store_resolved:
+            return self._store
+        self._store_resolved = True
+        mode = NOTIFICATION_DEDUP_STORE
+        if mode == "memory":
+            return None
+
+        from blog.utils.cache_manager import cache_manager
+
+        if mode in ("auto", "redis") and cache_manager.redis_client is not None:
+            self._store = RedisDedupStore(cache_manager.redis_client)
+        elif mode in ("auto", "sqlite"):
+            path = os.getenv("NOTIFICATION_DEDUP_DB")
+            if not path:
+                try:
+                    database = db.engine.url.database
+                    directory = (
+                        os.path.dirname(database)
+                        if db.engine.url.get_backend_name() == "sqlite" and database
+                        else current_app.instance_path
+                    )
+                except RuntimeError:
+                    # Вне контекста приложения путь неизвестен — попробуем при следующем вызове
+                    self._store_resolved = False
+                    return None
+                path = os.path.join(directory, "notification_dedup.db")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._store = SQLiteDedupStore(path)
+        logger.info(
+            f"[DEDUPLICATOR] Общее хранилище: {type(self._store).__name__ if self._store else 'нет'}"
+        )
+        return self._store
 
     def is_duplicate(
         self, notification: NotificationData, request_id: Optional[uuid.UUID] = None
@@ -149,36 +325,145 @@ class NotificationDeduplicator:
         log_prefix = (
             f"[REQ_ID:{request_id}][DEDUPLICATOR]" if request_id else "[DEDUPLICATOR]"
         )
+        hash_key = notification.get_hash()
+        now = time.monotonic()
 
         with self._lock:
-            hash_key = notification.get_hash()
-            now = datetime.now()
-
-            # Очищаем устаревшие записи
             self._cleanup_expired(now)
-
-            # Проверяем наличие дубликата
             if hash_key in self._cache:
                 logger.info(
-                    f"{log_prefix} Проверка хеша: {hash_key}. Результат: ДУБЛИКАТ (Найден в кеше). Время в кеше: {self._cache[hash_key]}"
+                    f"{log_prefix} Проверка хеша: {hash_key}. Результат: ДУБЛИКАТ (Найден в кеше)."
                 )
                 return True
+            self._remember(hash_key, now)
 
-            # Добавляем новую запись
-            self._cache[hash_key] = now
-            logger.info(
-                f"{log_prefix} Проверка хеша: {hash_key}. Результат: НОВЫЙ. Добавлен в кеш с временем {now}"
-            )
+        store = self._shared_store()
+        if store is None:
+            logger.info(f"{log_prefix} Проверка хеша: {hash_key}. Результат: НОВЫЙ.")
+            return False
+        try:
+            claimed = store.claim(hash_key, self.ttl_seconds)
+        except Exception as e:
+            # Хранилище недоступно — остаемся на локальной проверке
+            logger.warning(f"{log_prefix} Ошибка общего хранилища дедупликации: {e}")
             return False
 
-    def _cleanup_expired(self, now: datetime):
-        """Очистка устаревших записей"""
-        cutoff = now - timedelta(minutes=self.ttl_minutes)
-        expired_keys = [
-            key for key, timestamp in self._cache.items() if timestamp < cutoff
-        ]
-        for key in expired_keys:
-            del self._cache[key]
+        logger.info(
+            f"{log_prefix} Проверка хеша: {hash_key}. Результат: "
+            f"{'НОВЫЙ' if claimed else 'ДУБЛИКАТ (Обработан другим воркером)'}."
+        )
+        return not claimed
+
+    def release(self, *notifications: NotificationData) -> None:
+        """
+        Снимает отметки, захваченные is_duplicate, если уведомления так и не
+        были сохранены: иначе повторная попытка сочла бы их дубликатами.
+        """
+        hash_keys = {notification.get_hash() for notification in notifications}
+        if not hash_keys:
+            return
+        with self._lock:
+            for hash_key in hash_keys:
+                self._cache.pop(hash_key, None)
+        store = self._shared_store()
+        if store is None:
+            return
+        try:
+            store.release(*hash_keys)
+        except Exception as e:
+            logger.warning(f"[DEDUPLICATOR] Не удалось снять отметки в общем хранилище: {e}")
+
+    def _remember(self, hash_key: str, now: float) -> None:
+        self._cache[hash_key] = now + self.ttl_seconds
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _cleanup_expired(self, now: float):
+        """Снимает просроченные записи с начала очереди"""
+        while self._cache:
+            hash_key, expires_at = next(iter(self._cache.items()))
+            if expires_at > now:
+                break
+            self._cache.popitem(last=False)
+
+
+class NotificationCountStore:
+    """
+    Кеш счетчиков уведомлений пользователя для шапки страниц.
+
+    Счетчики считаются только по локальной базе blog.db (без обращения к MySQL
+    Redmine) и сбрасываются при записи, прочтении или удалении уведомлений;
+    сбросы в других воркерах gunicorn приходят через notification_event_bus,
+    а TTL страхует от пропущенных событий.
+    """
+
+    def __init__(self, ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+        self._counts = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_counts(self, user_id: int) -> Dict[str, int]:
+        """Возвращает {'total': ..., 'unread': ...} для пользователя"""
+        now = time.monotonic()
+        with self._lock:
+            cached_entry = self._counts.get(user_id)
+            if cached_entry and cached_entry[1] > now:
+                return cached_entry[0]
+            version = self._versions.get(user_id, 0)
+
+        counts = self._count_local_notifications(user_id)
+
+        with self._lock:
+            # Не сохраняем результат, если за время подсчета был сброс
+            if self._versions.get(user_id, 0) == version:
+                self._counts[user_id] = (counts, now + self.ttl_seconds)
+        return counts
+
+    def invalidate(self, *user_ids: int):
+        """Сбрасывает счетчики и сообщает открытым потокам уведомлений"""
+        self.forget(*user_ids)
+        notification_event_bus.publish(*user_ids)
+
+    def forget(self, *user_ids: int):
+        """Сбрасывает счетчики указанных пользователей только в этом процессе"""
+        with self._lock:
+            for user_id in user_ids:
+                self._counts.pop(user_id, None)
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    @staticmethod
+    def _count_local_notifications(user_id: int) -> Dict[str, int]:
+        """Подсчет уведомлений пользователя агрегирующими запросами к blog.db"""
+        total = 0
+        unread = 0
+        for model in (Notifications, NotificationsAddNotes):
+            model_total, model_unread = (
+                db.session.query(
+                    func.count(model.id),
+                    func.coalesce(
+                        func.sum(case((model.is_read == True, 0), else_=1)), 0  # noqa: E712
+                    ),
+                )
+                .filter(model.user_id == user_id)
+                .one()
+            )
+            total += model_total
+            unread += model_unread
+
+        # Локальные копии Redmine-уведомлений не имеют флага прочтения
+        redmine_total = (
+            db.session.query(func.count(RedmineNotification.id))
+            .filter(RedmineNotification.user_id == user_id)
+            .scalar()
+        )
+        return {"total": total + redmine_total, "unread": unread + redmine_total}
+
+
+notification_count_store = NotificationCountStore()
+notification_event_bus.add_remote_listener(
+    lambda user_ids: notification_count_store.forget(*user_ids)
+)
 
 
 class NotificationService:
@@ -199,6 +484,10 @@ class NotificationService:
         Returns:
             int: Количество обработанных уведомлений
         """
+        if JOURNAL_INGESTION == "on":
+            # Журнал читается один раз на все получателей, а не по пользователю
+            return self.ingest_redmine_journals().get(user_id, 0)
+
         request_id = uuid.uuid4()
         return self._sync_requester_queue_notifications(
             user_id=user_id,
@@ -206,6 +495,18 @@ class NotificationService:
             request_id=request_id,
         )
 
+    def ingest_redmine_journals(self, force: bool = False) -> Dict[int, int]:
+        """
+        Читает новые записи журнала Redmine от сохраненной позиции и
+        рассылает уведомления всем получателям (см. blog.journal_ingestion).
+
+        Returns:
+            Dict[int, int]: число новых уведомлений по user_id
+        """
+        from blog.journal_ingestion import journal_ingestor
+
+        return journal_ingestor.run(force=force)
+
     @staticmethod
     def _normalize_recipient_email(user_email: Optional[str]) -> Optional[str]:
         """Нормализует email получателя для поиска в очередях уведомлений."""
@@ -290,6 +591,547 @@ class NotificationService:
             )
             return 0
 
+    def sync_requester_queues_batch(
+        self,
+        recipients: List[Tuple[int, Optional[str]]],
+        request_id: Optional[uuid.UUID] = None,
+    ) -> int:
+        """
+        Пакетная синхронизация очередей статусных и коммент-уведомлений
+        для нескольких получателей за один проход.
+
+        Вместо двух запросов на каждого пользователя выполняется фиксированное
+        число запросов: одна выборка WHERE Author IN (...) на очередь, одна
+        выборка авторов комментариев, одна пакетная вставка в локальную базу
+        и одно удаление обработанных ID на очередь.
+
+        Args:
+            recipients: Список пар (user_id, email) получателей
+
+        Returns:
+            int: Количество обработанных уведомлений
+        """
+        if JOURNAL_INGESTION == "on":
+            return sum(self.ingest_redmine_journals(force=True).values())
+
+        request_id = request_id or uuid.uuid4()
+
+        user_ids_by_email = {}
+        for user_id, user_email in recipients:
+            recipient_email = self._normalize_recipient_email(user_email)
+            if recipient_email is not None:
+                user_ids_by_email[recipient_email] = user_id
+
+        if not user_ids_by_email:
+            logger.info(
+                f"[REQ_ID:{request_id}] Пакетная синхронизация requester-очередей пропущена: нет получателей с email."
+            )
+            return 0
+
+        logger.info(
+            f"[REQ_ID:{request_id}] Начало пакетной синхронизации requester-очередей для {len(user_ids_by_email)} получателей"
+        )
+
+        try:
+            connection = redmine.get_connection(
+                DB_REDMINE_HOST,
+                DB_REDMINE_USER,
+                DB_REDMINE_PASSWORD,
+                DB_REDMINE_DB,
+                port=DB_REDMINE_PORT,
+            )
+
+            if not connection:
+                logger.error(
+                    f"[REQ_ID:{request_id}] Не удалось подключиться к MySQL для пакетной синхронизации requester-очередей"
+                )
+                return 0
+
+            try:
+                status_count = self._process_status_notifications_batch(
+                    connection, user_ids_by_email, request_id
+                )
+                comment_count = self._process_comment_notifications_batch(
+                    connection, user_ids_by_email, request_id
+                )
+                total_processed = status_count + comment_count
+
+                logger.info(
+                    f"[REQ_ID:{request_id}] Пакетная синхронизация requester-очередей завершена: recipients={len(user_ids_by_email)}, status={status_count}, comments={comment_count}"
+                )
+                return total_processed
+            finally:
+                connection.close()
+
+        except Exception as e:
+            logger.error(
+                f"[REQ_ID:{request_id}] Ошибка при пакетной синхронизации requester-очередей: {e}",
+                exc_info=True,
+            )
+            return 0
+
+    def _fetch_requester_queue_rows(
+        self,
+        cursor,
+        query_template: str,
+        user_ids_by_email: Dict[str, int],
+        request_id: uuid.UUID,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Выбирает строки очереди для всех получателей одним запросом и
+        группирует их по нормализованному email получателя (поле Author).
+
+        Лимит применяется к каждому получателю в SQL (ROW_NUMBER по Author):
+        общий LIMIT на всех отдавал его целиком получателю с большой
+        очередью, и остальные не получали ничего за проход.
+        """
+        emails = list(user_ids_by_email.keys())
+        placeholders = ", ".join(["%s"] * len(emails))
+        query = query_template.format(placeholders=placeholders)
+        cursor.execute(query, (*emails, REQUESTER_QUEUE_LIMIT_PER_RECIPIENT))
+
+        rows_by_email = {}
+        for row in cursor.fetchall():
+            recipient_email = self._normalize_recipient_email(row.get("Author"))
+            if recipient_email not in user_ids_by_email:
+                continue
+            recipient_rows = rows_by_email.setdefault(recipient_email, [])
+            # Остаток очереди получателя заберет следующий проход
+            if len(recipient_rows) < REQUESTER_QUEUE_LIMIT_PER_RECIPIENT:
+                recipient_rows.append(row)
+
+        logger.info(
+            f"[REQ_ID:{request_id}] Пакетная выборка очереди: {sum(len(rows) for rows in rows_by_email.values())} строк для {len(rows_by_email)} получателей"
+        )
+        return rows_by_email
+
+    def _process_status_notifications_batch(
+        self, connection, user_ids_by_email: Dict[str, int], request_id: uuid.UUID
+    ) -> int:
+        """Пакетная обработка очереди u_its_update_status для нескольких получателей"""
+        cursor = None
+        try:
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            rows_by_email = self._fetch_requester_queue_rows(
+                cursor,
+                """
+                    SELECT ID, IssueID, OldStatus, NewStatus, OldSubj, Body, RowDateCreated, Author
+                    FROM (
+                        SELECT ID, IssueID, OldStatus, NewStatus, OldSubj, Body, RowDateCreated, Author,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY LOWER(TRIM(Author)) ORDER BY RowDateCreated DESC
+                               ) AS recipient_row
+                        FROM u_its_update_status
+                        WHERE Author IN ({placeholders})
+                    ) queue
+                    WHERE recipient_row <= %s
+                    ORDER BY RowDateCreated DESC
+                """,
+                user_ids_by_email,
+                request_id,
+            )
+
+            notifications_to_save = []
+            duplicates = []
+            for recipient_email, rows in rows_by_email.items():
+                user_id = user_ids_by_email[recipient_email]
+                for row in rows:
+                    notification_data = self._build_status_notification(
+                        row, user_id, recipient_email
+                    )
+                    if self.deduplicator.is_duplicate(notification_data, request_id):
+                        duplicates.append(notification_data)
+                    else:
+                        notifications_to_save.append(notification_data)
+
+            processed_ids = []
+            if notifications_to_save:
+                processed_ids = self._bulk_save_status_notifications(
+                    notifications_to_save, request_id
+                )
+            # Дубликаты, уже лежащие в SQLite, убираем из очереди, иначе они
+            # навсегда занимают лимит получателя
+            processed_ids.extend(
+                self._saved_source_ids(
+                    duplicates, self._existing_status_keys, self._status_key
+                )
+            )
+            if processed_ids:
+                self._delete_processed_status_notifications(
+                    connection, processed_ids, request_id
+                )
+            return len(notifications_to_save)
+
+        except Exception as e:
+            logger.error(
+                f"[REQ_ID:{request_id}] Ошибка при пакетной обработке уведомлений о статусах: {e}",
+                exc_info=True,
+            )
+            return 0
+        finally:
+            if cursor:
+                cursor.close()
+
+    def _process_comment_notifications_batch(
+        self, connection, user_ids_by_email: Dict[str, int], request_id: uuid.UUID
+    ) -> int:
+        """Пакетная обработка очереди u_its_add_notes для нескольких получателей"""
+        cursor = None
+        try:
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            rows_by_email = self._fetch_requester_queue_rows(
+                cursor,
+                """
+                    SELECT ID, issue_id, Author, notes, date_created, RowDateCreated
+                    FROM (
+                        SELECT ID, issue_id, Author, notes, date_created, RowDateCreated,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY LOWER(TRIM(Author)) ORDER BY RowDateCreated DESC
+                               ) AS recipient_row
+                        FROM u_its_add_notes
+                        WHERE Author IN ({placeholders})
+                    ) queue
+                    WHERE recipient_row <= %s
+                    ORDER BY RowDateCreated DESC
+                """,
+                user_ids_by_email,
+                request_id,
+            )
+
+            all_rows = [row for rows in rows_by_email.values() for row in rows]
+            if not all_rows:
+                return 0
+
+            latest_authors = self._fetch_latest_comment_authors(cursor, all_rows)
+
+            notifications_to_save = []
+            duplicates = []
+            for recipient_email, rows in rows_by_email.items():
+                user_id = user_ids_by_email[recipient_email]
+                for row in rows:
+                    author_name = row["Author"]
+                    latest_author = latest_authors.get(row["issue_id"])
+                    if latest_author and latest_author[0] >= row["RowDateCreated"]:
+                        author_name = latest_author[1]
+
+                    notification_data = self._build_comment_notification(
+                        row, user_id, recipient_email, author_name
+                    )
+                    if self.deduplicator.is_duplicate(notification_data, request_id):
+                        duplicates.append(notification_data)
+                    else:
+                        notifications_to_save.append(notification_data)
+
+            processed_ids = []
+            if notifications_to_save:
+                processed_ids = self._bulk_save_comment_notifications(
+                    notifications_to_save, request_id
+                )
+            processed_ids.extend(
+                self._saved_source_ids(
+                    duplicates, self._existing_comment_keys, self._comment_key
+                )
+            )
+            if processed_ids:
+                self._delete_processed_comment_notifications(
+                    connection, processed_ids, request_id
+                )
+            return len(notifications_to_save)
+
+        except Exception as e:
+            logger.error(
+                f"[REQ_ID:{request_id}] Ошибка при пакетной обработке уведомлений о комментариях: {e}",
+                exc_info=True,
+            )
+            return 0
+        finally:
+            if cursor:
+                cursor.close()
+
+    @staticmethod
+    def _fetch_latest_comment_authors(cursor, rows: List[Dict]) -> Dict[int, Tuple]:
+        """
+        Одним запросом получает автора последнего комментария по каждой заявке.
+
+        Returns:
+            Dict[int, Tuple]: issue_id -> (created_on, author_name)
+        """
+        issue_ids = sorted({row["issue_id"] for row in rows})
+        oldest_row_date = min(row["RowDateCreated"] for row in rows)
+        placeholders = ", ".join(["%s"] * len(issue_ids))
+        cursor.execute(
+            f"""
+                SELECT j.journalized_id AS issue_id, j.created_on,
+                       CONCAT(IFNULL(u.firstname, ''), ' ', IFNULL(u.lastname, '')) as author_name
+                FROM journals j
+                LEFT JOIN users u ON j.user_id = u.id
+                WHERE j.journalized_id IN ({placeholders})
+                AND j.journalized_type = 'Issue'
+                AND j.notes IS NOT NULL
+                AND j.notes != ''
+                AND j.created_on >= %s
+                ORDER BY j.created_on DESC
+            """,
+            (*issue_ids, oldest_row_date),
+        )
+
+        latest_authors = {}
+        for journal_row in cursor.fetchall():
+            latest_authors.setdefault(
+                journal_row["issue_id"],
+                (journal_row["created_on"], journal_row["author_name"]),
+            )
+        return latest_authors
+
+    @staticmethod
+    def _build_status_notification(
+        row: Dict, user_id: int, recipient_email: str
+    ) -> NotificationData:
+        """Создает NotificationData из строки очереди u_its_update_status"""
+        return NotificationData(
+            user_id=user_id,
+            issue_id=row["IssueID"],
+            notification_type=NotificationType.STATUS_CHANGE,
+            title=f"Изменение статуса заявки #{row['IssueID']}",
+            message=f"Статус изменился с '{row['OldStatus']}' на '{row['NewStatus']}'",
+            data={
+                "old_status": row["OldStatus"],
+                "new_status": row["NewStatus"],
+                "subject": row["OldSubj"],
+                "body": row["Body"],
+                "recipient_email": recipient_email,
+            },
+            created_at=row["RowDateCreated"],
+            source_id=row["ID"],
+        )
+
+    @staticmethod
+    def _build_comment_notification(
+        row: Dict, user_id: int, recipient_email: str, author_name: str
+    ) -> NotificationData:
+        """Создает NotificationData из строки очереди u_its_add_notes"""
+        return NotificationData(
+            user_id=user_id,
+            issue_id=row["issue_id"],
+            notification_type=NotificationType.COMMENT_ADDED,
+            title=f"Новый комментарий к заявке #{row['issue_id']}",
+            message=f"Добавлен комментарий от '{author_name}'",
+            data={
+                "author": author_name,
+                "notes": row["notes"],
+                "recipient_email": recipient_email,
+            },
+            created_at=row["RowDateCreated"],
+            source_id=row["ID"],
+        )
+
+    def _bulk_save_status_notifications(
+        self, notifications: List[NotificationData], request_id: uuid.UUID
+    ) -> List[int]:
+        """
+        Пакетное сохранение статус-уведомлений одной транзакцией.
+
+        Существующие записи определяются одним запросом. Возвращает MySQL ID
+        строк, которые можно удалить из очереди: новые сохраненные и те,
+        что уже были сохранены ранее.
+        """
+        return self._commit_staged(
+            notifications, self._stage_status_notifications, "статус-уведомлений", request_id
+        )
+
+    def _bulk_save_comment_notifications(
+        self, notifications: List[NotificationData], request_id: uuid.UUID
+    ) -> List[int]:
+        """
+        Пакетное сохранение коммент-уведомлений одной транзакцией.
+
+        Возвращает MySQL ID строк, которые можно удалить из очереди.
+        """
+        return self._commit_staged(
+            notifications, self._stage_comment_notifications, "коммент-уведомлений", request_id
+        )
+
+    def _commit_staged(self, notifications, stage, kind: str, request_id: uuid.UUID) -> List[int]:
+        processed_ids: List[int] = []
+        try:
+            processed_ids, new_notifications = stage(notifications)
+            if not new_notifications:
+                return processed_ids
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            # Уведомления не сохранены — следующая попытка не должна считать их дубликатами
+            self.deduplicator.release(*notifications)
+            logger.error(
+                f"[REQ_ID:{request_id}] Ошибка SQLAlchemy при пакетном сохранении {kind}: {e}",
+                exc_info=True,
+            )
+            return processed_ids
+
+        logger.info(
+            f"[REQ_ID:{request_id}] Пакетно сохранено {len(new_notifications)} новых {kind}."
+        )
+        self._after_notifications_saved(new_notifications, request_id)
+        processed_ids.extend(n.source_id for n in new_notifications if n.source_id)
+        return processed_ids
+
+    def _after_notifications_saved(
+        self, new_notifications: List[NotificationData], request_id: uuid.UUID
+    ) -> None:
+        """Сброс счетчиков и PUSH — только после commit"""
+        notification_count_store.invalidate(*{n.user_id for n in new_notifications})
+        self._send_push_notifications(new_notifications, request_id)
+
+    @staticmethod
+    def _saved_source_ids(
+        notifications: List[NotificationData], existing_keys, key
+    ) -> List[int]:
+        """MySQL ID строк очереди, уведомления по которым уже есть в SQLite"""
+        if not notifications:
+            return []
+        saved_keys = existing_keys(notifications)
+        return [
+            n.source_id for n in notifications if n.source_id and key(n) in saved_keys
+        ]
+
+    @staticmethod
+    def _status_key(notification_data: NotificationData) -> Tuple:
+        return (
+            notification_data.user_id,
+            notification_data.issue_id,
+            notification_data.data.get("old_status"),
+            notification_data.data.get("new_status"),
+            notification_data.data.get("subject"),
+            notification_data.created_at,
+        )
+
+    @staticmethod
+    def _existing_status_keys(notifications: List[NotificationData]) -> Set[Tuple]:
+        return {
+            (
+                row.user_id,
+                row.issue_id,
+                row.old_status,
+                row.new_status,
+                row.old_subj,
+                row.date_created,
+            )
+            for row in Notifications.query.filter(
+                Notifications.user_id.in_({n.user_id for n in notifications}),  # type: ignore
+                Notifications.date_created.in_({n.created_at for n in notifications}),  # type: ignore
+            ).all()
+        }
+
+    @staticmethod
+    def _comment_key(notification_data: NotificationData) -> Tuple:
+        return (
+            notification_data.user_id,
+            notification_data.issue_id,
+            notification_data.message,
+            notification_data.data.get("author"),
+            notification_data.created_at,
+        )
+
+    @staticmethod
+    def _existing_comment_keys(notifications: List[NotificationData]) -> Set[Tuple]:
+        return {
+            (row.user_id, row.issue_id, row.notes, row.author, row.date_created)
+            for row in NotificationsAddNotes.query.filter(
+                NotificationsAddNotes.user_id.in_({n.user_id for n in notifications}),  # type: ignore
+                NotificationsAddNotes.date_created.in_({n.created_at for n in notifications}),  # type: ignore
+            ).all()
+        }
+
+    @classmethod
+    def _stage_status_notifications(
+        cls,
+        notifications: List[NotificationData],
+    ) -> Tuple[List[int], List[NotificationData]]:
+        """
+        Добавляет новые статус-уведомления в сессию (flush без commit).
+
+        Returns:
+            MySQL ID уже сохраненных ранее строк и список новых уведомлений
+        """
+        existing_keys = cls._existing_status_keys(notifications)
+
+        processed_ids = []
+        new_notifications = []
+        new_models = []
+        for notification_data in notifications:
+            key = cls._status_key(notification_data)
+            if key in existing_keys:
+                if notification_data.source_id:
+                    processed_ids.append(notification_data.source_id)
+                continue
+
+            existing_keys.add(key)
+            new_notifications.append(notification_data)
+            new_models.append(
+                Notifications(
+                    user_id=notification_data.user_id,
+                    issue_id=notification_data.issue_id,
+                    old_status=notification_data.data.get("old_status"),
+                    new_status=notification_data.data.get("new_status"),
+                    old_subj=notification_data.data.get("subject"),
+                    date_created=notification_data.created_at,
+                )
+            )
+
+        if new_models:
+            db.session.add_all(new_models)
+            db.session.flush()
+        return processed_ids, new_notifications
+
+    @classmethod
+    def _stage_comment_notifications(
+        cls,
+        notifications: List[NotificationData],
+    ) -> Tuple[List[int], List[NotificationData]]:
+        """Добавляет новые коммент-уведомления в сессию (flush без commit)"""
+        existing_keys = cls._existing_comment_keys(notifications)
+
+        processed_ids = []
+        new_notifications = []
+        new_models = []
+        for notification_data in notifications:
+            key = cls._comment_key(notification_data)
+            if key in existing_keys:
+                if notification_data.source_id:
+                    processed_ids.append(notification_data.source_id)
+                continue
+
+            existing_keys.add(key)
+            new_notifications.append(notification_data)
+            new_models.append(
+                NotificationsAddNotes(
+                    user_id=notification_data.user_id,
+                    issue_id=notification_data.issue_id,
+                    author=notification_data.data.get("author"),
+                    notes=notification_data.message,
+                    date_created=notification_data.created_at,
+                    source_id=notification_data.source_id,
+                )
+            )
+
+        if new_models:
+            db.session.add_all(new_models)
+            db.session.flush()
+        return processed_ids, new_notifications
+
+    def _send_push_notifications(
+        self, notifications: List[NotificationData], request_id: uuid.UUID
+    ):
+        """Отправляет PUSH по списку только что сохраненных уведомлений"""
+        for notification_data in notifications:
+            try:
+                self.push_service.send_push_notification(notification_data)
+            except Exception as push_error:
+                logger.error(
+                    f"[REQ_ID:{request_id}] Ошибка отправки PUSH для source_id={notification_data.source_id}, issue_id={notification_data.issue_id}, recipient_email={notification_data.data.get('recipient_email')}: {push_error}",
+                    exc_info=True,
+                )
+
     def _fetch_and_save_redmine_notifications(self, user_id: int):
         """
         Получает непрочитанные уведомления из u_redmine_notifications и сохраняет их
@@ -328,60 +1170,62 @@ class NotificationService:
 
                 # logger.info(f"Найдено {len(notifications_from_source)} непрочитанных Redmine уведомлений для пользователя {user_id}")
 
-                new_notifications_count = 0
+                new_notifications = []
                 for row in notifications_from_source:
-                    try:
-                        # Проверяем, существует ли уже такое уведомление в локальной базе
-                        exists = (
-                            db.session.query(RedmineNotification)
-                            .filter_by(
-                                user_id=user_id, source_notification_id=row["id"]
-                            )
-                            .first()
-                        )
-
-                        if not exists:
+                    group_name_value = row.get("group_name")
+                    new_notifications.append(
+                        RedmineNotification(
+                            user_id=user_id,
+                            redmine_issue_id=row["redmine_issue_id"],
+                            issue_subject=row["issue_subject"],
                             # Создаем URL для задачи Redmine
-                            issue_url = f"http://helpdesk.teztour.com/issues/{row['redmine_issue_id']}"
-
-                            group_name_value = row.get("group_name")
-                            is_group = (
-                                bool(group_name_value and group_name_value.strip())
-                                if group_name_value
-                                else False
-                            )
-
-                            new_notification = RedmineNotification(
-                                user_id=user_id,
-                                redmine_issue_id=row["redmine_issue_id"],
-                                issue_subject=row["issue_subject"],
-                                issue_url=issue_url,
-                                is_group_notification=is_group,
-                                group_name=group_name_value,
-                                easy_email_to=row.get(
-                                    "author_email"
-                                ),  # Используем author_email из MySQL
-                                created_at=row["created_at"],
-                                source_notification_id=row["id"],
-                            )
-                            db.session.add(new_notification)
-                            new_notifications_count += 1
-
-                    except Exception as e:
-                        logger.error(
-                            f"Ошибка при обработке Redmine уведомления (source_id: {row.get('id', 'N/A')}): {e}"
+                            issue_url=f"http://helpdesk.teztour.com/issues/{row['redmine_issue_id']}",
+                            is_group_notification=bool(group_name_value and group_name_value.strip()),
+                            group_name=group_name_value,
+                            easy_email_to=row.get("author_email"),  # Используем author_email из MySQL
+                            created_at=row["created_at"],
+                            source_notification_id=row["id"],
                         )
-                        db.session.rollback()
+                    )
 
-                if new_notifications_count > 0:
-                    try:
-                        db.session.commit()
-                        logger.info(
-                            f"Сохранено {new_notifications_count} новых Redmine уведомлений в локальную базу для user_id {user_id}."
-                        )
-                    except Exception as commit_error:
-                        logger.error(f"Ошибка при сохранении уведомлений: {commit_error}")
-                        db.session.rollback()
+            def existing_source_ids(session, notifications):
+                return {
+                    source_id
+                    for (source_id,) in session.query(RedmineNotification.source_notification_id)
+                    .filter(
+                        RedmineNotification.user_id == user_id,
+                        RedmineNotification.source_notification_id.in_(
+                            [n.source_notification_id for n in notifications]
+                        ),
+                    )
+                    .all()
+                }
+
+            # Обычно все уже сохранено: проверяем чтением в сессии запроса и не
+            # ставим задание в очередь писателя, если сохранять нечего
+            already_saved = existing_source_ids(db.session, new_notifications)
+            new_notifications = [
+                n for n in new_notifications if n.source_notification_id not in already_saved
+            ]
+            if not new_notifications:
+                return
+
+            def save_new(session):
+                # Повторная проверка внутри транзакции писателя,
+                # чтобы параллельные синхронизации не сохранили дубликаты
+                existing_ids = existing_source_ids(session, new_notifications)
+                to_add = [
+                    n for n in new_notifications if n.source_notification_id not in existing_ids
+                ]
+                session.add_all(to_add)
+                return len(to_add)
+
+            new_notifications_count = db_writer.submit(save_new)
+            if new_notifications_count > 0:
+                notification_count_store.invalidate(user_id)
+                logger.info(
+                    f"Сохранено {new_notifications_count} новых Redmine уведомлений в локальную базу для user_id {user_id}."
+                )
 
         except Exception as e:
             logger.error(
@@ -439,21 +1283,8 @@ class NotificationService:
                 logger.info(
                     f"[REQ_ID:{request_id}] Queue pickup status: source_id={row['ID']}, issue_id={row['IssueID']}, recipient_email={recipient_email}, row_author={row.get('Author')}"
                 )
-                notification_data = NotificationData(
-                    user_id=user_id,
-                    issue_id=row["IssueID"],
-                    notification_type=NotificationType.STATUS_CHANGE,
-                    title=f"Изменение статуса заявки #{row['IssueID']}",
-                    message=f"Статус изменился с '{row['OldStatus']}' на '{row['NewStatus']}'",
-                    data={
-                        "old_status": row["OldStatus"],
-                        "new_status": row["NewStatus"],
-                        "subject": row["OldSubj"],
-                        "body": row["Body"],
-                        "recipient_email": recipient_email,
-                    },
-                    created_at=row["RowDateCreated"],
-                    source_id=row["ID"],
+                notification_data = self._build_status_notification(
+                    row, user_id, recipient_email
                 )
 
                 if not self.deduplicator.is_duplicate(notification_data, request_id):
@@ -566,19 +1397,8 @@ class NotificationService:
                     author_result["author_name"] if author_result else row["Author"]
                 )
 
-                notification_data = NotificationData(
-                    user_id=user_id,
-                    issue_id=row["issue_id"],
-                    notification_type=NotificationType.COMMENT_ADDED,
-                    title=f"Новый комментарий к заявке #{row['issue_id']}",
-                    message=f"Добавлен комментарий от '{author_name}'",
-                    data={
-                        "author": author_name,
-                        "notes": row["notes"],
-                        "recipient_email": recipient_email,
-                    },
-                    created_at=row["RowDateCreated"],
-                    source_id=row["ID"],
+                notification_data = self._build_comment_notification(
+                    row, user_id, recipient_email, author_name
                 )
 
                 if not self.deduplicator.is_duplicate(notification_data, request_id):
@@ -632,235 +1452,38 @@ class NotificationService:
     def _save_status_notifications(
         self, notifications: List[NotificationData], request_id: uuid.UUID
     ) -> List[int]:
-        """Сохранение уведомлений об изменении статуса в базу данных. Возвращает список успешно сохраненных MySQL ID."""
+        """
+        Сохранение уведомлений об изменении статуса в базу данных.
+
+        Одна проверка существующих и один commit на вызов (см.
+        _bulk_save_status_notifications) вместо запроса и flush на каждую строку.
+        Возвращает MySQL ID строк, которые можно удалить из очереди.
+        """
         logger.info(
             f"[REQ_ID:{request_id}] _save_status_notifications: {len(notifications)} уведомлений"
         )
-        saved_count = 0
-        newly_created_notifications_for_push = []
-        successfully_saved_mysql_ids = []
-
         if not notifications:
             logger.info(f"[REQ_ID:{request_id}] Нет статус-уведомлений для сохранения.")
             return []
-
-        try:
-            for notification_data in notifications:
-                try:
-                    recipient_email = notification_data.data.get("recipient_email")
-                    existing_notification = Notifications.query.filter_by(
-                        user_id=notification_data.user_id,
-                        issue_id=notification_data.issue_id,
-                        old_status=notification_data.data.get("old_status"),
-                        new_status=notification_data.data.get("new_status"),
-                        old_subj=notification_data.data.get("subject"),
-                        date_created=notification_data.created_at,
-                    ).first()
-
-                    if existing_notification:
-                        logger.info(
-                            f"[REQ_ID:{request_id}] Статус-уведомление уже существует (DB ID: {existing_notification.id}, source_id={notification_data.source_id}, issue_id={notification_data.issue_id}, recipient_email={recipient_email}). Пропуск."
-                        )
-                        continue
-
-                    new_notification_db = Notifications(
-                        user_id=notification_data.user_id,
-                        issue_id=notification_data.issue_id,
-                        old_status=notification_data.data.get("old_status"),
-                        new_status=notification_data.data.get("new_status"),
-                        old_subj=notification_data.data.get("subject"),
-                        date_created=notification_data.created_at,
-                    )
-                    db.session.add(new_notification_db)
-                    db.session.flush()  # Для получения ID до коммита, если нужно
-                    logger.info(
-                        f"[REQ_ID:{request_id}] Local save status prepared: source_id={notification_data.source_id}, db_id={new_notification_db.id}, issue_id={notification_data.issue_id}, recipient_email={recipient_email}"
-                    )
-                    newly_created_notifications_for_push.append(notification_data)
-                    saved_count += 1
-
-                    # Добавляем MySQL ID в список успешно сохраненных
-                    if notification_data.source_id:
-                        successfully_saved_mysql_ids.append(notification_data.source_id)
-
-                except SQLAlchemyError as e:
-                    db.session.rollback()
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Ошибка SQLAlchemy при сохранении статус-уведомления: {e}",
-                        exc_info=True,
-                    )
-                except Exception as e:
-                    db.session.rollback()
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Непредвиденная ошибка при подготовке статус-уведомления: {e}",
-                        exc_info=True,
-                    )
-                    continue
-
-            if saved_count > 0:
-                db.session.commit()
-                logger.info(
-                    f"[REQ_ID:{request_id}] Успешно сохранено {saved_count} новых статус-уведомлений."
-                )
-            else:
-                logger.info(
-                    f"[REQ_ID:{request_id}] Нет новых уникальных статус-уведомлений для сохранения."
-                )
-
-        except RuntimeError as e:
-            if "Working outside of application context" in str(e):
-                logger.error(
-                    f"[REQ_ID:{request_id}] КРИТИЧЕСКАЯ ОШИБКА КОНТЕКСТА в _save_status_notifications: {e}",
-                    exc_info=True,
-                )
-            else:
-                logger.error(
-                    f"[REQ_ID:{request_id}] Непредвиденная RuntimeError в _save_status_notifications: {e}",
-                    exc_info=True,
-                )
-        except Exception as e:
-            logger.error(
-                f"[REQ_ID:{request_id}] Общая ошибка в _save_status_notifications: {e}",
-                exc_info=True,
-            )
-            try:
-                db.session.rollback()
-            except:
-                pass
-
-        if newly_created_notifications_for_push:
-            logger.info(
-                f"[REQ_ID:{request_id}] Отправка {len(newly_created_notifications_for_push)} PUSH о статусах."
-            )
-            for notification_data_to_push in newly_created_notifications_for_push:
-                try:
-                    self.push_service.send_push_notification(notification_data_to_push)
-                except Exception as push_error:
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Ошибка отправки PUSH о статусе для source_id={notification_data_to_push.source_id}, issue_id={notification_data_to_push.issue_id}, recipient_email={notification_data_to_push.data.get('recipient_email')}: {push_error}",
-                        exc_info=True,
-                    )
-        else:
-            logger.info(f"[REQ_ID:{request_id}] Нет статус-уведомлений для PUSH.")
-
-        return successfully_saved_mysql_ids
+        return self._bulk_save_status_notifications(notifications, request_id)
 
     def _save_comment_notifications(
         self, notifications: List[NotificationData], request_id: uuid.UUID
     ) -> List[int]:
-        """Сохранение уведомлений о комментариях в базу данных. Возвращает список успешно сохраненных MySQL ID."""
+        """
+        Сохранение уведомлений о комментариях в базу данных.
+
+        Одна проверка существующих и один commit на вызов (см.
+        _bulk_save_comment_notifications) вместо запроса и flush на каждую строку.
+        Возвращает MySQL ID строк, которые можно удалить из очереди.
+        """
         logger.info(
             f"[REQ_ID:{request_id}] _save_comment_notifications: {len(notifications)} уведомлений"
         )
-        saved_count = 0
-        newly_created_notifications_for_push = []
-        successfully_saved_mysql_ids = []
-
         if not notifications:
-            logger.info(
-                f"[REQ_ID:{request_id}] Нет коммент-уведомлений для сохранения."
-            )
+            logger.info(f"[REQ_ID:{request_id}] Нет коммент-уведомлений для сохранения.")
             return []
-
-        try:
-            for notification_data in notifications:
-                try:
-                    recipient_email = notification_data.data.get("recipient_email")
-                    existing_notification = NotificationsAddNotes.query.filter_by(
-                        user_id=notification_data.user_id,
-                        issue_id=notification_data.issue_id,
-                        notes=notification_data.message,
-                        author=notification_data.data.get("author"),
-                        date_created=notification_data.created_at,
-                    ).first()
-
-                    if existing_notification:
-                        logger.info(
-                            f"[REQ_ID:{request_id}] Коммент-уведомление уже существует (DB ID: {existing_notification.id}, source_id={notification_data.source_id}, issue_id={notification_data.issue_id}, recipient_email={recipient_email}). Пропуск."
-                        )
-                        continue
-
-                    new_notification_db = NotificationsAddNotes(
-                        user_id=notification_data.user_id,
-                        issue_id=notification_data.issue_id,
-                        author=notification_data.data.get("author"),
-                        notes=notification_data.message,
-                        date_created=notification_data.created_at,
-                        source_id=notification_data.source_id,
-                    )
-                    db.session.add(new_notification_db)
-                    db.session.flush()  # Для получения ID до коммита
-                    logger.info(
-                        f"[REQ_ID:{request_id}] Local save comment prepared: source_id={notification_data.source_id}, db_id={new_notification_db.id}, issue_id={notification_data.issue_id}, recipient_email={recipient_email}"
-                    )
-                    newly_created_notifications_for_push.append(notification_data)
-                    saved_count += 1
-
-                    # Добавляем MySQL ID в список успешно сохраненных
-                    if notification_data.source_id:
-                        successfully_saved_mysql_ids.append(notification_data.source_id)
-
-                except SQLAlchemyError as e:
-                    db.session.rollback()
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Ошибка SQLAlchemy при сохранении коммент-уведомления: {e}",
-                        exc_info=True,
-                    )
-                except Exception as e:
-                    db.session.rollback()
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Непредвиденная ошибка при подготовке коммент-уведомления: {e}",
-                        exc_info=True,
-                    )
-                    continue
-
-            if saved_count > 0:
-                db.session.commit()
-                logger.info(
-                    f"[REQ_ID:{request_id}] Успешно сохранено {saved_count} новых коммент-уведомлений."
-                )
-            else:
-                logger.info(
-                    f"[REQ_ID:{request_id}] Нет новых уникальных коммент-уведомлений для сохранения."
-                )
-
-        except RuntimeError as e:
-            if "Working outside of application context" in str(e):
-                logger.error(
-                    f"[REQ_ID:{request_id}] КРИТИЧЕСКАЯ ОШИБКА КОНТЕКСТА в _save_comment_notifications: {e}",
-                    exc_info=True,
-                )
-            else:
-                logger.error(
-                    f"[REQ_ID:{request_id}] Непредвиденная RuntimeError в _save_comment_notifications: {e}",
-                    exc_info=True,
-                )
-        except Exception as e:
-            logger.error(
-                f"[REQ_ID:{request_id}] Общая ошибка в _save_comment_notifications: {e}",
-                exc_info=True,
-            )
-            try:
-                db.session.rollback()
-            except:
-                pass
-
-        if newly_created_notifications_for_push:
-            logger.info(
-                f"[REQ_ID:{request_id}] Отправка {len(newly_created_notifications_for_push)} PUSH о комментариях."
-            )
-            for notification_data_to_push in newly_created_notifications_for_push:
-                try:
-                    self.push_service.send_push_notification(notification_data_to_push)
-                except Exception as push_error:
-                    logger.error(
-                        f"[REQ_ID:{request_id}] Ошибка отправки PUSH о комментарии для source_id={notification_data_to_push.source_id}, issue_id={notification_data_to_push.issue_id}, recipient_email={notification_data_to_push.data.get('recipient_email')}: {push_error}",
-                        exc_info=True,
-                    )
-        else:
-            logger.info(f"[REQ_ID:{request_id}] Нет коммент-уведомлений для PUSH.")
-
-        return successfully_saved_mysql_ids
+        return self._bulk_save_comment_notifications(notifications, request_id)
 
     def _delete_processed_status_notifications(
         self,
@@ -929,43 +1552,167 @@ class NotificationService:
                 exc_info=True,
             )
 
-    def get_user_notifications(self, user_id: int) -> Dict:
-        """Получение всех уведомлений пользователя"""
+    @staticmethod
+    def parse_page_cursor(value: str) -> Dict[str, Optional[Tuple[Optional[datetime], int]]]:
+        """
+        Разбирает курсор страницы "<status>,<comment>", где каждая часть —
+        "<date_created ISO>|<id>" последней отданной строки таблицы (пустая
+        дата — NULL, пустая часть — из таблицы еще ничего не отдано).
+        Старый курсор из одной даты означает "строго старше этой даты".
+
+        Raises:
+            ValueError: курсор не разбирается
+        """
+        if "|" not in value and "," not in value:
+            before = datetime.fromisoformat(value)
+            return {"status": (before, 0), "comment": (before, 0)}
+        status_part, comment_part = value.split(",", 1)
+        positions = {}
+        for kind, part in (("status", status_part), ("comment", comment_part)):
+            if not part:
+                positions[kind] = None
+                continue
+            date_str, id_str = part.rsplit("|", 1)
+            positions[kind] = (
+                datetime.fromisoformat(date_str) if date_str else None,
+                int(id_str),
+            )
+        return positions
+
+    @staticmethod
+    def _format_page_cursor(
+        positions: Dict[str, Optional[Tuple[Optional[datetime], int]]]
+    ) -> str:
+        parts = []
+        for kind in ("status", "comment"):
+            position = positions.get(kind)
+            if position is None:
+                parts.append("")
+                continue
+            date_created, row_id = position
+            parts.append(f"{date_created.isoformat() if date_created else ''}|{row_id}")
+        return ",".join(parts)
+
+    @staticmethod
+    def _after_position(model, position: Optional[Tuple[Optional[datetime], int]]):
+        """
+        Условие "после позиции" для порядка (date_created IS NULL,
+        date_created DESC, id DESC): строки с NULL-датой идут последними.
+        """
+        date_created, row_id = position
+        if date_created is None:
+            return and_(model.date_created.is_(None), model.id < row_id)
+        return or_(
+            model.date_created < date_created,
+            and_(model.date_created == date_created, model.id < row_id),
+            model.date_created.is_(None),
+        )
+
+    def get_user_notifications(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        sync: bool = True,
+        redmine_notifications: Optional[List[Dict]] = None,
+    ) -> Dict:
+        """
+        Получение непрочитанных уведомлений пользователя.
+
+        Фильтрация по is_read и подсчет выполняются в SQL (индекс
+        user_id, is_read, date_created), поэтому стоимость зависит от числа
+        непрочитанных, а не от всей истории пользователя.
+
+        Args:
+            limit: Размер страницы (None - без ограничения)
+            before: Курсор next_cursor предыдущей страницы (см. parse_page_cursor)
+            sync: Сначала подтянуть новые уведомления из Redmine (поток
+                уведомлений не синхронизирует, его будят события записи)
+            redmine_notifications: Готовый список из u_redmine_notifications
+                вместо запроса к MySQL (локальное обновление потока)
+
+        Returns:
+            Dict: списки уведомлений, total_count (все непрочитанные) и
+            next_cursor (позиции (date_created, id) в обеих таблицах или None)
+
+        Raises:
+            ValueError: некорректный курсор before
+        """
+        positions = self.parse_page_cursor(before) if before else {}
         try:
-            self._sync_requester_queue_notifications(user_id=user_id)
+            if sync:
+                # При чтении журнала заявитель получает уведомления из journals
+                if JOURNAL_INGESTION != "on":
+                    self._sync_requester_queue_notifications(user_id=user_id)
 
-            # Сначала обрабатываем новые Redmine уведомления
-            self._fetch_and_save_redmine_notifications(user_id)
+                # Сначала обрабатываем новые Redmine уведомления
+                self._fetch_and_save_redmine_notifications(user_id)
 
-            # Получаем непрочитанные уведомления (is_read=False или is_read=NULL)
-            # Сначала получаем все уведомления пользователя, затем фильтруем в Python
-            # ИСПРАВЛЕНО: Сортируем по убыванию даты (новые в начале)
-            all_status_notifications = (
-                Notifications.query.filter_by(user_id=user_id)
-                .order_by(Notifications.date_created.desc())
-                .all()
+            status_query = Notifications.query.filter_by(
+                user_id=user_id, is_read=False
+            )
+            comment_query = NotificationsAddNotes.query.filter_by(
+                user_id=user_id, is_read=False
             )
 
-            status_notifications = [
-                n
-                for n in all_status_notifications
-                if n.is_read is None or n.is_read is False
-            ]
+            status_unread_count = status_query.count()
+            comment_unread_count = comment_query.count()
 
-            all_comment_notifications = (
-                NotificationsAddNotes.query.filter_by(user_id=user_id)
-                .order_by(NotificationsAddNotes.date_created.desc())
-                .all()
-            )
+            # Keyset по (date_created, id): строки с одинаковой датой на границе
+            # страницы не теряются, строки без даты отдаются в конце
+            if positions.get("status") is not None:
+                status_query = status_query.filter(
+                    self._after_position(Notifications, positions["status"])
+                )
+            if positions.get("comment") is not None:
+                comment_query = comment_query.filter(
+                    self._after_position(NotificationsAddNotes, positions["comment"])
+                )
 
-            comment_notifications = [
-                n
-                for n in all_comment_notifications
-                if n.is_read is None or n.is_read is False
-            ]
+            # ИСПРАВЛЕНО: Сортируем по убыванию даты (новые в начале)
+            status_query = status_query.order_by(
+                Notifications.date_created.is_(None),
+                Notifications.date_created.desc(),
+                Notifications.id.desc(),
+            )
+            comment_query = comment_query.order_by(
+                NotificationsAddNotes.date_created.is_(None),
+                NotificationsAddNotes.date_created.desc(),
+                NotificationsAddNotes.id.desc(),
+            )
+            if limit is not None:
+                # Берем по limit+1 из каждой таблицы, чтобы понять, есть ли продолжение
+                status_query = status_query.limit(limit + 1)
+                comment_query = comment_query.limit(limit + 1)
+
+            status_notifications = status_query.all()
+            comment_notifications = comment_query.all()
+
+            next_cursor = None
+            if limit is not None:
+                # Общая страница: сливаем обе выборки в порядке запросов и обрезаем до limit
+                merged = sorted(
+                    [("status", n) for n in status_notifications]
+                    + [("comment", n) for n in comment_notifications],
+                    key=lambda item: (
+                        item[1].date_created is not None,
+                        item[1].date_created or datetime.min,
+                        item[1].id,
+                    ),
+                    reverse=True,
+                )
+                page = merged[:limit]
+                if len(merged) > limit:
+                    next_positions = dict(positions)
+                    for kind, notification in page:
+                        next_positions[kind] = (notification.date_created, notification.id)
+                    next_cursor = self._format_page_cursor(next_positions)
+                status_notifications = [n for kind, n in page if kind == "status"]
+                comment_notifications = [n for kind, n in page if kind == "comment"]
 
             # ИСПРАВЛЕНО: Для виджета получаем "горячие" уведомления напрямую из MySQL Redmine
-            redmine_notifications = [] if REDMINE_NOTIFICATIONS != "on" else self.get_redmine_notifications(user_id)
+            if redmine_notifications is None:
+                redmine_notifications = [] if REDMINE_NOTIFICATIONS != "on" else self.get_redmine_notifications(user_id)
 
             # Преобразуем SQLAlchemy объекты в словари для JSON сериализации
             status_data = []
@@ -1004,7 +1751,7 @@ class NotificationService:
                 )
 
             total_count = (
-                len(status_data) + len(comment_data) + len(redmine_notifications)
+                status_unread_count + comment_unread_count + len(redmine_notifications)
             )
 
             return {
@@ -1012,6 +1759,7 @@ class NotificationService:
                 "comment_notifications": comment_data,
                 "redmine_notifications": redmine_notifications,
                 "total_count": total_count,
+                "next_cursor": next_cursor,
             }
 
         except SQLAlchemyError as e:
@@ -1072,7 +1820,8 @@ class NotificationService:
     def get_notifications_for_page(self, user_id: int) -> Dict:
         """Получение уведомлений для страницы /notifications (из локальной базы blog.db)"""
         try:
-            self._sync_requester_queue_notifications(user_id=user_id)
+            if JOURNAL_INGESTION != "on":
+                self._sync_requester_queue_notifications(user_id=user_id)
 
             # ИСПРАВЛЕНИЕ: Сначала обновляем локальную базу данными из Redmine
             self._fetch_and_save_redmine_notifications(user_id)
@@ -1231,6 +1980,7 @@ class NotificationService:
             NotificationsAddNotes.query.filter_by(user_id=user_id).delete()
             RedmineNotification.query.filter_by(user_id=user_id).delete()
             db.session.commit()
+            notification_count_store.invalidate(user_id)
 
             # Шаг 2: Пометка Redmine уведомлений как прочитанных в основной базе Redmine
             user = User.query.get(user_id)
@@ -1292,6 +2042,7 @@ class NotificationService:
                 user_id=user_id
             ).delete()
             db.session.commit()
+            notification_count_store.invalidate(user_id)
             logger.info(
                 f"[CLEAR_WIDGET] Удалено локальных уведомлений: {deleted_status} статусов, {deleted_comments} комментариев."
             )
@@ -1369,37 +2120,51 @@ class NotificationService:
                 f"Ошибка при отметке Redmine уведомления id={notification_id} как прочитанного для user_id={user_id}: {e}",
                 exc_info=True,
             )
-            return False
+            return False
+
+    def mark_local_notification_as_read(self, model, notification_id: int) -> Optional[int]:
+        """
+        Отмечает статусное (Notifications) или комментарное (NotificationsAddNotes)
+        уведомление прочитанным. Возвращает id владельца или None, если
+        уведомление не найдено или уже прочитано.
+        """
+
+        def mark_read(session):
+            row = (
+                session.query(model.user_id)
+                .filter(model.id == notification_id)
+                .filter(or_(model.is_read == None, model.is_read == False))  # type: ignore
+                .first()
+            )
+            if row is None:
+                return None
+            session.query(model).filter(model.id == notification_id).update(
+                {model.is_read: True}, synchronize_session=False
+            )
+            return row.user_id
+
+        owner_id = db_writer.submit(mark_read)
+        if owner_id is not None:
+            notification_count_store.invalidate(owner_id)
+        return owner_id
 
     def mark_all_notifications_as_read(self, user_id: int) -> bool:
         """Отмечает все уведомления пользователя как прочитанные (для кнопки Очистить в виджете)."""
         try:
             # Отмечаем локальные уведомления как прочитанные (НЕ удаляем!)
-            status_notifications = (
-                Notifications.query.filter_by(user_id=user_id)
-                .filter(
-                    or_(Notifications.is_read == None, Notifications.is_read == False)  # type: ignore
-                )
-                .all()
-            )
-
-            for notification in status_notifications:
-                notification.is_read = True
-
-            comment_notifications = (
-                NotificationsAddNotes.query.filter_by(user_id=user_id)
-                .filter(
-                    or_(NotificationsAddNotes.is_read == None, NotificationsAddNotes.is_read == False)  # type: ignore
+            def mark_read(session):
+                return tuple(
+                    session.query(model)
+                    .filter(model.user_id == user_id)
+                    .filter(or_(model.is_read == None, model.is_read == False))  # type: ignore
+                    .update({model.is_read: True}, synchronize_session=False)
+                    for model in (Notifications, NotificationsAddNotes)
                 )
-                .all()
-            )
-
-            for notification in comment_notifications:
-                notification.is_read = True
 
-            db.session.commit()
+            status_count, comment_count = db_writer.submit(mark_read)
+            notification_count_store.invalidate(user_id)
             logger.info(
-                f"Отмечены как прочитанные {len(status_notifications)} статусных и {len(comment_notifications)} комментарных уведомлений для user_id={user_id}"
+                f"Отмечены как прочитанные {status_count} статусных и {comment_count} комментарных уведомлений для user_id={user_id}"
             )
 
             # Используем существующий метод для отметки Redmine уведомлений
@@ -1471,6 +2236,7 @@ class NotificationService:
 
                 db.session.delete(notification)
                 db.session.commit()
+                notification_count_store.invalidate(user_id)
                 logger.info(
                     f"[DELETE_REDMINE] Уведомление id={notification_id} успешно удалено из локальной базы и отмечено в MySQL."
                 )
@@ -1524,6 +2290,7 @@ class NotificationService:
                 return False
 
             db.session.commit()
+            notification_count_store.invalidate(user_id)
             logger.info(
                 f"Удалено уведомление {notification_type}:{notification_id} для пользователя {user_id}"
             )
@@ -1537,6 +2304,271 @@ class NotificationService:
             return False
 
 
+@dataclass
+class PushDeliveryJob:
+    """Задание на доставку одного push-уведомления на одну подписку"""
+
+    subscription_id: int
+    user_id: int
+    endpoint: str
+    original_endpoint: str
+    p256dh_key: str
+    auth_key: str
+    payload: str
+    vapid_private_key: str
+    vapid_claims: Dict
+    attempt: int = 0
+
+
+class PushDeliveryQueue:
+    """
+    Очередь доставки push-уведомлений с ограниченным пулом рабочих потоков.
+
+    Отправка на каждый endpoint выполняется с таймаутом; временные ошибки
+    (сеть, 429, 5xx) повторяются с экспоненциальной задержкой. Изменения
+    подписок (деактивация по 403/404/410, last_used, адаптированный endpoint)
+    накапливаются и записываются в БД одним коммитом, когда очередь опустела
+    или набралось flush_batch_size изменений.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    DEACTIVATE_STATUSES = {403, 404, 410}
+
+    def __init__(
+        self,
+        workers: int = 4,
+        maxsize: int = 1000,
+        timeout: float = 10,
+        max_retries: int = 3,
+        backoff_base: float = 2,
+        flush_batch_size: int = 50,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.flush_batch_size = flush_batch_size
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._deactivate_ids = set()
+        self._used_ids = set()
+        self._endpoint_updates = {}
+        self._local = threading.local()
+        self._app = None
+        self.stats = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "dropped": 0,
+            "deactivated": 0,
+        }
+
+    def enqueue(self, app, job: PushDeliveryJob) -> bool:
+        """Ставит задание в очередь. Не блокирует: при переполнении задание отбрасывается."""
+        self._app = app
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning(
+                f"[PUSH_QUEUE] Очередь доставки переполнена, push для подписки ID {job.subscription_id} отброшен"
+            )
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def join(self):
+        """Ожидает обработки всех заданий в очереди и записывает накопленные изменения."""
+        self._queue.join()
+        self.flush()
+
+    def _ensure_started(self):
+        # После fork (gunicorn) потоки родителя не существуют - запускаем свои
+        if self._pid == os.getpid() and self._threads:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"push-delivery-{index}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(
+                f"[PUSH_QUEUE] Запущено {self.workers} потоков доставки push-уведомлений (PID={self._pid})"
+            )
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._deliver(job)
+            except Exception as e:
+                logger.error(
+                    f"[PUSH_QUEUE] Непредвиденная ошибка доставки на подписку ID {job.subscription_id}: {e}",
+                    exc_info=True,
+                )
+            finally:
+                if self._queue.unfinished_tasks <= 1 or self._pending_size() >= self.flush_batch_size:
+                    self.flush()
+                self._queue.task_done()
+
+    def _get_session(self):
+        # Отдельная requests.Session на поток - переиспользуем соединения к push-сервисам
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _deliver(self, job: PushDeliveryJob):
+        try:
+            webpush(
+                subscription_info={
+                    "endpoint": job.endpoint,
+                    "keys": {"p256dh": job.p256dh_key, "auth": job.auth_key},
+                },
+                data=job.payload,
+                vapid_private_key=job.vapid_private_key,
+                vapid_claims=dict(job.vapid_claims or {}),
+                timeout=self.timeout,
+                requests_session=self._get_session(),
+            )
+        except WebPushException as e:
+            response = getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            if status in self.DEACTIVATE_STATUSES:
+                logger.warning(
+                    f"[PUSH_QUEUE] Подписка ID {job.subscription_id} вернула статус {status}. Деактивируем ее."
+                )
+                with self._pending_lock:
+                    self._deactivate_ids.add(job.subscription_id)
+                self.stats["failed"] += 1
+            elif status is None or status in self.RETRY_STATUSES:
+                self._retry_or_fail(job, e)
+            else:
+                logger.error(
+                    f"[PUSH_QUEUE] WebPushException для подписки ID {job.subscription_id} (статус {status}): {e}"
+                )
+                self.stats["failed"] += 1
+            return
+        except Exception as e:
+            # Таймауты и сетевые ошибки requests
+            self._retry_or_fail(job, e)
+            return
+
+        self.stats["sent"] += 1
+        with self._pending_lock:
+            self._used_ids.add(job.subscription_id)
+            if job.endpoint != job.original_endpoint:
+                self._endpoint_updates[job.subscription_id] = job.endpoint
+        logger.debug(
+            f"[PUSH_QUEUE] Push доставлен на подписку ID {job.subscription_id} пользователя {job.user_id} (попытка {job.attempt + 1})"
+        )
+
+    def _retry_or_fail(self, job: PushDeliveryJob, error: Exception):
+        if job.attempt >= self.max_retries:
+            logger.error(
+                f"[PUSH_QUEUE] Push на подписку ID {job.subscription_id} не доставлен после {job.attempt + 1} попыток: {error}"
+            )
+            self.stats["failed"] += 1
+            return
+
+        delay = self.backoff_base * (2 ** job.attempt)
+        job.attempt += 1
+        self.stats["retried"] += 1
+        logger.warning(
+            f"[PUSH_QUEUE] Временная ошибка доставки на подписку ID {job.subscription_id}: {error}. Повтор {job.attempt}/{self.max_retries} через {delay:.1f} сек."
+        )
+        if delay <= 0:
+            self._requeue(job)
+            return
+        timer = threading.Timer(delay, self._requeue, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, job: PushDeliveryJob):
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning(
+                f"[PUSH_QUEUE] Очередь переполнена, повтор для подписки ID {job.subscription_id} отброшен"
+            )
+
+    def _pending_size(self) -> int:
+        with self._pending_lock:
+            return (
+                len(self._deactivate_ids)
+                + len(self._used_ids)
+                + len(self._endpoint_updates)
+            )
+
+    def flush(self):
+        """Записывает накопленные изменения подписок в БД одним коммитом."""
+        with self._pending_lock:
+            deactivate_ids = self._deactivate_ids
+            used_ids = self._used_ids - deactivate_ids
+            endpoint_updates = self._endpoint_updates
+            self._deactivate_ids, self._used_ids, self._endpoint_updates = set(), set(), {}
+
+        if not (deactivate_ids or used_ids or endpoint_updates):
+            return
+        if self._app is None:
+            logger.error("[PUSH_QUEUE] Нет экземпляра приложения для записи изменений подписок")
+            return
+
+        with self._app.app_context():
+            self._apply_updates(deactivate_ids, used_ids, endpoint_updates)
+
+    def _apply_updates(self, deactivate_ids, used_ids, endpoint_updates):
+        try:
+            if deactivate_ids:
+                PushSubscription.query.filter(
+                    PushSubscription.id.in_(deactivate_ids)
+                ).update({"is_active": False}, synchronize_session=False)
+            if used_ids:
+                PushSubscription.query.filter(
+                    PushSubscription.id.in_(used_ids)
+                ).update({"last_used": datetime.utcnow()}, synchronize_session=False)
+            for subscription_id, endpoint in endpoint_updates.items():
+                PushSubscription.query.filter_by(id=subscription_id).update(
+                    {"endpoint": endpoint}, synchronize_session=False
+                )
+            db.session.commit()
+            self.stats["deactivated"] += len(deactivate_ids)
+            if deactivate_ids:
+                logger.info(
+                    f"[PUSH_QUEUE] Деактивировано подписок: {len(deactivate_ids)} ({sorted(deactivate_ids)})"
+                )
+        except Exception as e:
+            logger.error(
+                f"[PUSH_QUEUE] Ошибка пакетного обновления подписок: {e}", exc_info=True
+            )
+            db.session.rollback()
+
+
+push_delivery_queue = PushDeliveryQueue(
+    workers=PUSH_DELIVERY_WORKERS,
+    maxsize=PUSH_DELIVERY_QUEUE_SIZE,
+    timeout=PUSH_DELIVERY_TIMEOUT,
+    max_retries=PUSH_DELIVERY_MAX_RETRIES,
+    backoff_base=PUSH_DELIVERY_BACKOFF,
+)
+
+
 class BrowserPushService:
     """Сервис браузерных пуш-уведомлений"""
 
@@ -1827,6 +2859,11 @@ class BrowserPushService:
                 "results": [],
             }
 
+        if PUSH_DELIVERY_QUEUE == "on":
+            return self._enqueue_push(
+                notification, user_subscriptions, payload_json_string, claims
+            )
+
         # Отправляем уведомления
         success_count = 0
         failure_count = 0
@@ -1967,6 +3004,66 @@ class BrowserPushService:
                 "results": results,
             }
 
+    def _enqueue_push(
+        self,
+        notification: NotificationData,
+        user_subscriptions: List[PushSubscription],
+        payload_json_string: str,
+        claims: Optional[Dict] = None,
+    ):
+        """Ставит доставку на все подписки пользователя в очередь и сразу возвращает результат"""
+        app = current_app._get_current_object()
+        claims_to_use = claims or self.vapid_claims or {}
+        results = []
+        queued_count = 0
+
+        for subscription in user_subscriptions:
+            try:
+                endpoint_to_use = self._adapt_endpoint(
+                    subscription.endpoint, f"queue:{subscription.id}"
+                )
+            except WebPushException as e:
+                results.append(
+                    {
+                        "subscription_id": subscription.id,
+                        "status": "failed",
+                        "error": str(e),
+                    }
+                )
+                continue
+
+            job = PushDeliveryJob(
+                subscription_id=subscription.id,
+                user_id=notification.user_id,
+                endpoint=endpoint_to_use,
+                original_endpoint=subscription.endpoint,
+                p256dh_key=subscription.p256dh_key,
+                auth_key=subscription.auth_key,
+                payload=payload_json_string,
+                vapid_private_key=self.vapid_private_key,
+                vapid_claims=dict(claims_to_use),
+            )
+            if push_delivery_queue.enqueue(app, job):
+                queued_count += 1
+                results.append({"subscription_id": subscription.id, "status": "queued"})
+            else:
+                results.append(
+                    {
+                        "subscription_id": subscription.id,
+                        "status": "failed",
+                        "error": "Очередь доставки переполнена",
+                    }
+                )
+
+        logger.info(
+            f"[PUSH_SERVICE] Поставлено в очередь доставки {queued_count} из {len(user_subscriptions)} подписок для пользователя {notification.user_id}."
+        )
+        return {
+            "status": "queued" if queued_count else "all_failed",
+            "message": f"Поставлено в очередь: {queued_count} из {len(user_subscriptions)}.",
+            "results": results,
+        }
+
     def _get_user_subscriptions(self, user_id: int) -> List[PushSubscription]:
         """Получение активных подписок пользователя из БД"""
         try:
@@ -2014,59 +3111,7 @@ class BrowserPushService:
             f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Исходный endpoint для подписки ID {subscription.id}: '{original_endpoint[:70]}...'"
         )
 
-        # Начинаем адаптацию endpoint
-        endpoint_to_use = original_endpoint
-
-        # 1. Проверяем наличие https:// и добавляем, если отсутствует
-        if "fcm.googleapis.com" in endpoint_to_use and not endpoint_to_use.startswith(
-            "https://"
-        ):
-            endpoint_to_use = f"https://{endpoint_to_use}"
-            logger.info(
-                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Добавлен протокол https://: '{endpoint_to_use[:70]}...'"
-            )
-
-        # 2. Адаптируем старый формат FCM URL
-        if "fcm.googleapis.com/fcm/send/" in endpoint_to_use:
-            token = endpoint_to_use.split("/fcm/send/")[1]
-            endpoint_to_use = f"https://fcm.googleapis.com/wp/{token}"
-            logger.info(
-                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Старый формат преобразован в новый: '{endpoint_to_use[:70]}...'"
-            )
-
-        # 3. Проверяем наличие /wp/ для FCM и добавляем, если отсутствует
-        if "fcm.googleapis.com" in endpoint_to_use and "/wp/" not in endpoint_to_use:
-            # Делим URL на части и берем последнюю часть как токен
-            parts = endpoint_to_use.split("/")
-            if len(parts) > 0:
-                token = parts[-1]
-                # Если токен не пустой, формируем новый URL
-                if token:
-                    endpoint_to_use = f"https://fcm.googleapis.com/wp/{token}"
-                    logger.info(
-                        f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Добавлен префикс /wp/: '{endpoint_to_use[:70]}...'"
-                    )
-
-        # Если endpoint был изменен, логируем это
-        if endpoint_to_use != original_endpoint:
-            logger.info(
-                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Endpoint адаптирован с '{original_endpoint[:50]}...' на '{endpoint_to_use[:50]}...'"
-            )
-
-            # Проверяем наличие токена после /wp/ для FCM
-            if "fcm.googleapis.com/wp/" in endpoint_to_use:
-                token_parts = endpoint_to_use.split("/wp/")
-                if len(token_parts) > 1 and not token_parts[1]:
-                    logger.error(
-                        f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Отсутствует токен после /wp/ в адаптированном URL: '{endpoint_to_use}'"
-                    )
-                    raise WebPushException(
-                        f"Некорректный FCM endpoint: отсутствует токен после /wp/"
-                    )
-        else:
-            logger.info(
-                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Endpoint не требует адаптации: '{endpoint_to_use[:70]}...'"
-            )
+        endpoint_to_use = self._adapt_endpoint(original_endpoint, request_id)
 
         # Определяем, какие VAPID claims использовать
         if claims:
@@ -2166,6 +3211,67 @@ class BrowserPushService:
             )
             raise WebPushException(f"Неожиданная ошибка при отправке: {str(e)}")
 
+    def _adapt_endpoint(self, original_endpoint: str, request_id) -> str:
+        """
+        Приводит endpoint подписки к актуальному формату (https://, FCM /wp/).
+        При некорректном FCM endpoint вызывает WebPushException.
+        """
+        # Начинаем адаптацию endpoint
+        endpoint_to_use = original_endpoint
+
+        # 1. Проверяем наличие https:// и добавляем, если отсутствует
+        if "fcm.googleapis.com" in endpoint_to_use and not endpoint_to_use.startswith(
+            "https://"
+        ):
+            endpoint_to_use = f"https://{endpoint_to_use}"
+            logger.info(
+                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Добавлен протокол https://: '{endpoint_to_use[:70]}...'"
+            )
+
+        # 2. Адаптируем старый формат FCM URL
+        if "fcm.googleapis.com/fcm/send/" in endpoint_to_use:
+            token = endpoint_to_use.split("/fcm/send/")[1]
+            endpoint_to_use = f"https://fcm.googleapis.com/wp/{token}"
+            logger.info(
+                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Старый формат преобразован в новый: '{endpoint_to_use[:70]}...'"
+            )
+
+        # 3. Проверяем наличие /wp/ для FCM и добавляем, если отсутствует
+        if "fcm.googleapis.com" in endpoint_to_use and "/wp/" not in endpoint_to_use:
+            # Делим URL на части и берем последнюю часть как токен
+            parts = endpoint_to_use.split("/")
+            if len(parts) > 0:
+                token = parts[-1]
+                # Если токен не пустой, формируем новый URL
+                if token:
+                    endpoint_to_use = f"https://fcm.googleapis.com/wp/{token}"
+                    logger.info(
+                        f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Добавлен префикс /wp/: '{endpoint_to_use[:70]}...'"
+                    )
+
+        # Если endpoint был изменен, логируем это
+        if endpoint_to_use != original_endpoint:
+            logger.info(
+                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Endpoint адаптирован с '{original_endpoint[:50]}...' на '{endpoint_to_use[:50]}...'"
+            )
+
+            # Проверяем наличие токена после /wp/ для FCM
+            if "fcm.googleapis.com/wp/" in endpoint_to_use:
+                token_parts = endpoint_to_use.split("/wp/")
+                if len(token_parts) > 1 and not token_parts[1]:
+                    logger.error(
+                        f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Отсутствует токен после /wp/ в адаптированном URL: '{endpoint_to_use}'"
+                    )
+                    raise WebPushException(
+                        f"Некорректный FCM endpoint: отсутствует токен после /wp/"
+                    )
+        else:
+            logger.info(
+                f"[REQ_ID:{request_id}] [ADAPT_ENDPOINT_SEND_SUB] Endpoint не требует адаптации: '{endpoint_to_use[:70]}...'"
+            )
+
+        return endpoint_to_use
+
     def _deactivate_subscription(self, subscription_id: int):
         """Помечает подписку как неактивную в базе данных."""
         try:
@@ -2396,6 +3502,19 @@ def check_notifications_improved(user_email: str, user_id: int) -> int:
     return get_notification_service().process_notifications(user_email, user_id)
 
 
+def check_notifications_batch(recipients: List[Tuple[int, Optional[str]]]) -> int:
+    """
+    Пакетная проверка уведомлений для нескольких пользователей
+
+    Args:
+        recipients: Список пар (user_id, email)
+
+    Returns:
+        int: Количество обработанных уведомлений
+    """
+    return get_notification_service().sync_requester_queues_batch(recipients)
+
+
 def debug_notifications_for_user(user_email: str, user_id: int):
     """
     Диагностическая функция для проверки уведомлений пользователя
@@ -0,0 +1,138 @@
+"""
+Потоковая выгрузка отчетов в Excel/CSV.
+
+Строки читаются серверным курсором (SSDictCursor) порциями по
+EXPORT_FETCH_SIZE и сразу пишутся в файл, поэтому память воркера не растет
+с числом строк. CSV (и CSV.gz) отдается клиенту по мере чтения из базы.
+XLSX — это zip-архив, его нельзя отправлять до закрытия книги: книга пишется
+в write-only режиме openpyxl во временный файл и затем отдается кусками.
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from pymysql.cursors import SSDictCursor
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FETCH_SIZE = int(os.getenv("REPORT_EXPORT_FETCH_SIZE", "1000"))
+EXPORT_STREAM_CHUNK = 64 * 1024
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "csv.gz": "application/gzip",
+}
+
+HEADER_FONT = Font(bold=True)
+HEADER_FILL = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+
+
+def export_format(value: Optional[str]) -> str:
+    """Формат из параметра запроса: xlsx (по умолчанию), csv или csv.gz"""
+    value = (value or "xlsx").lower()
+    if value in ("gz", "csv_gz", "csvgz"):
+        value = "csv.gz"
+    if value not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {value}")
+    return value
+
+
+def iter_query_rows(conn, sql: str, params: Sequence, fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[dict]:
+    """Строки запроса порциями через серверный курсор, без fetchall()"""
+    cursor = conn.cursor(SSDictCursor)
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # Закрытие SS-курсора дочитывает остаток результата, иначе соединение
+        # нельзя вернуть в пул
+        cursor.close()
+
+
+def header_row(worksheet, headers: Iterable[str]) -> List[WriteOnlyCell]:
+    cells = []
+    for title in headers:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cells.append(cell)
+    return cells
+
+
+def new_workbook() -> Workbook:
+    return Workbook(write_only=True)
+
+
+def iter_workbook_bytes(workbook: Workbook) -> Iterator[bytes]:
+    """Сохраняет книгу во временный файл и отдает его кусками"""
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(EXPORT_STREAM_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_csv_bytes(headers: Sequence[str], rows: Iterable[Sequence], compress: bool = False) -> Iterator[bytes]:
+    """CSV (utf-8 с BOM для Excel) порциями; при compress — сразу в gzip"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        if buffer.tell() >= EXPORT_STREAM_CHUNK:
+            chunk = encode(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+    tail = encode(buffer.getvalue())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+
+def stream_export(conn, body: Callable[[], Iterator[bytes]], filename: str, fmt: str) -> Response:
+    """
+    Потоковый ответ с выгрузкой. Соединение conn переходит во владение
+    генератора и закрывается, когда клиент дочитал ответ или отключился.
+    """
+
+    def generate():
+        try:
+            yield from body()
+        except Exception as e:
+            logger.error(f"Ошибка потоковой выгрузки {filename}: {e}", exc_info=True)
+            raise
+        finally:
+            conn.close()
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
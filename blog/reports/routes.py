@@ -1,10 +1,9 @@
-from flask import render_template, request, send_file, flash, jsonify
+from flask import render_template, request, flash, jsonify
 from flask_login import login_required
 from datetime import datetime
-import pandas as pd
-import io
 import logging
-from openpyxl.styles import Font, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 
 # Импортируем функцию подключения и параметры из глобального модуля redmine
 from redmine import (
@@ -17,8 +16,20 @@ from redmine import (
 )
 
 from . import reports_bp
+from .exports import (
+    export_format,
+    header_row,
+    iter_csv_bytes,
+    iter_query_rows,
+    iter_workbook_bytes,
+    new_workbook,
+    stream_export,
+)
 logger = logging.getLogger(__name__)
 
+# Ширина колонок листа зависших задач (write-only книга не умеет автоподбор)
+STALE_EXPORT_COLUMN_WIDTHS = (10, 50, 22, 14, 18, 30, 18)
+
 def get_db_connection():
     return get_connection(
         db_redmine_host,
@@ -63,6 +74,118 @@ def get_executors():
     finally:
         conn.close()
 
+EXECUTOR_KEY_EXPRESSION = "CASE WHEN COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен') = 'Исполнитель не назначен' THEN 0 ELSE COALESCE(i.assigned_to_id, i.easy_closed_by_id) END"
+EXECUTOR_NAME_EXPRESSION = "COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен')"
+
+
+def _month_start(year, month):
+    return f"{year:04d}-{month:02d}-01 00:00:00"
+
+
+def _next_month_start(year, month):
+    return _month_start(year + 1, 1) if month == 12 else _month_start(year, month + 1)
+
+
+def build_period_filter(period_field, report_year=None, months=None, ym=None):
+    """
+    Условие по периоду в виде полуоткрытых диапазонов [начало, конец).
+
+    В отличие от YEAR()/MONTH() над колонкой такое условие использует индекс
+    по created_on/closed_on. Выбранные месяцы года склеиваются в непрерывные
+    диапазоны; если выбраны все месяцы, фильтр по месяцам не нужен. Без года
+    набор месяцев нельзя выразить диапазоном — тогда остается MONTH() IN.
+    """
+    if ym:
+        year, month = (int(part) for part in ym.split('-'))
+        return (
+            f" AND {period_field} >= %s AND {period_field} < %s",
+            [_month_start(year, month), _next_month_start(year, month)],
+        )
+
+    selected = sorted({int(m) for m in months or [] if 1 <= int(m) <= 12})
+    all_months = not selected or len(selected) == 12
+
+    if not report_year:
+        if all_months:
+            return "", []
+        placeholders = ','.join(['%s'] * len(selected))
+        return f" AND MONTH({period_field}) IN ({placeholders})", selected
+
+    if all_months:
+        return (
+            f" AND {period_field} >= %s AND {period_field} < %s",
+            [_month_start(report_year, 1), _month_start(report_year + 1, 1)],
+        )
+
+    # Соседние месяцы объединяются в один диапазон: [1, 2, 3, 7] -> янв-мар, июл
+    ranges = []
+    for month in selected:
+        if ranges and ranges[-1][1] == month - 1:
+            ranges[-1][1] = month
+        else:
+            ranges.append([month, month])
+    conditions = []
+    params = []
+    for first, last in ranges:
+        conditions.append(f"({period_field} >= %s AND {period_field} < %s)")
+        params.extend([_month_start(report_year, first), _next_month_start(report_year, last)])
+    return " AND (" + " OR ".join(conditions) + ")", params
+
+
+def _group_id(key):
+    # 0 — ключ группы без исполнителя, во фронтенде это 'unassigned'
+    return 'unassigned' if key == 0 or key == '0' else key
+
+
+def build_report_groups(rows, group_mode):
+    """
+    Собирает двухуровневый отчет из одной выборки, сгруппированной по
+    (исполнитель, месяц). Строки должны идти в порядке вывода верхнего
+    уровня: по исполнителю для EXECUTOR*, по месяцу для MONTH*.
+    """
+    if group_mode in ('EXECUTOR', 'EXECUTOR_MONTH'):
+        top = ('executor_key', 'executor_name')
+        child = ('ym', 'ym')
+    elif group_mode in ('MONTH', 'MONTH_EXECUTOR'):
+        top = ('ym', 'ym')
+        child = ('executor_key', 'executor_name')
+    else:
+        raise ValueError(f"Unknown group_mode: {group_mode}")
+    with_children = group_mode in ('EXECUTOR_MONTH', 'MONTH_EXECUTOR')
+
+    groups = {}
+    for row in rows:
+        group_id = _group_id(row[top[0]])
+        group = groups.get(group_id)
+        if group is None:
+            group = groups[group_id] = {
+                'id': group_id,
+                'name': row[top[1]],
+                'count': 0,
+                'children': [],
+                '_children': {},
+            }
+        group['count'] += row['cnt']
+        if with_children:
+            child_id = _group_id(row[child[0]])
+            item = group['_children'].get(child_id)
+            if item is None:
+                item = group['_children'][child_id] = {'id': child_id, 'name': row[child[1]], 'count': 0}
+                group['children'].append(item)
+            item['count'] += row['cnt']
+
+    if with_children and top[0] == 'ym':
+        # Внутри месяца исполнители по имени, как раньше в ORDER BY key_name
+        for group in groups.values():
+            group['children'].sort(key=lambda item: item['name'] or '')
+
+    result = []
+    for group in groups.values():
+        del group['_children']
+        result.append(group)
+    return result
+
+
 @reports_bp.route("/redmine-report", methods=["GET"])
 @login_required
 def redmine_report():
@@ -123,15 +246,10 @@ def redmine_report():
                 """
                 params = [project_id]
 
-                # Фильтр по году (если указан) и месяцам
-                if report_year:
-                    where_clause += f" AND YEAR({period_field}) = %s"
-                    params.append(report_year)
-
-                if months:
-                    placeholders = ','.join(['%s'] * len(months))
-                    where_clause += f" AND MONTH({period_field}) IN ({placeholders})"
-                    params.extend(months)
+                # Фильтр по году (если указан) и месяцам — диапазонами по дате
+                period_clause, period_params = build_period_filter(period_field, report_year, months)
+                where_clause += period_clause
+                params.extend(period_params)
 
                 # Дополнительный фильтр date_from/date_to (пересечение)
                 if date_from:
@@ -154,171 +272,38 @@ def redmine_report():
                     where_clause += " AND COALESCE(i.assigned_to_id, i.easy_closed_by_id) = %s"
                     params.append(executor_id)
 
-                # Шаг 1: Считаем общий итог по всем данным
-                total_sql = f"""
-                    SELECT COUNT(*) as total
-                    FROM redmine.issues i
-                    LEFT JOIN redmine.issue_statuses s ON s.id = i.status_id
-                    {where_clause}
-                """
-                with conn.cursor() as cursor:
-                    cursor.execute(total_sql, params)
-                    res = cursor.fetchone()
-                    total_issues_count = res['total'] if res else 0
-
-                # Определение ключей группировки в зависимости от режима
                 # group_mode: EXECUTOR, MONTH, EXECUTOR_MONTH, MONTH_EXECUTOR
-
-                key_expression = ""
-                name_expression = ""
-                group_by_clause = ""
-                order_by_clause = ""
-
-                second_level_needed = False
-
-                if group_mode == 'EXECUTOR' or group_mode == 'EXECUTOR_MONTH':
-                    # Use 0 as key for NULL assignees or empty names to ensure single group
-                    key_expression = "CASE WHEN COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен') = 'Исполнитель не назначен' THEN 0 ELSE COALESCE(i.assigned_to_id, i.easy_closed_by_id) END"
-                    name_expression = "COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен')"
-
-                    top_level_select = f"{key_expression} as key_id, {name_expression} as key_name"
-                    group_by_clause = f"{key_expression}, {name_expression}"
-                    order_by_clause = "key_name"
-
-                    if group_mode == 'EXECUTOR_MONTH':
-                        second_level_needed = True
-
-                elif group_mode == 'MONTH' or group_mode == 'MONTH_EXECUTOR':
-                    key_expression = f"DATE_FORMAT({period_field}, '%%Y-%%m')"
-                    name_expression = key_expression
-
-                    top_level_select = f"{key_expression} as key_name, {key_expression} as key_id"
-                    group_by_clause = key_expression
-                    order_by_clause = key_expression
-
-                    if group_mode == 'MONTH_EXECUTOR':
-                        second_level_needed = True
-
+                if group_mode in ('EXECUTOR', 'EXECUTOR_MONTH'):
+                    order_by_clause = "executor_name, executor_key, ym"
+                elif group_mode in ('MONTH', 'MONTH_EXECUTOR'):
+                    order_by_clause = "ym, executor_name, executor_key"
                 else:
                     raise ValueError(f"Unknown group_mode: {group_mode}")
 
-                # Шаг 2: Пагинация верхнего уровня
-                # Используем прямое выражение (key_expression) вместо алиаса
-                count_groups_sql = f"""
-                    SELECT COUNT(DISTINCT {key_expression}) as count
-                    FROM redmine.issues i
-                    LEFT JOIN redmine.issue_statuses s ON s.id = i.status_id
-                    LEFT JOIN redmine.users u ON u.id = COALESCE(i.assigned_to_id, i.easy_closed_by_id)
-                    {where_clause}
-                """
-                with conn.cursor() as cursor:
-                    cursor.execute(count_groups_sql, params)
-                    res = cursor.fetchone()
-                    total_rows = res['count'] if res else 0
-
-                # Получаем ключи для текущей страницы
-                page_keys_sql = f"""
-                    SELECT {top_level_select}, COUNT(*) as total_cnt
+                # Один проход: счетчики по (исполнитель, месяц). Оба уровня,
+                # число групп и общий итог собираются из этой выборки в Python
+                report_sql = f"""
+                    SELECT
+                        {EXECUTOR_KEY_EXPRESSION} as executor_key,
+                        {EXECUTOR_NAME_EXPRESSION} as executor_name,
+                        DATE_FORMAT({period_field}, '%%Y-%%m') as ym,
+                        COUNT(*) as cnt
                     FROM redmine.issues i
                     LEFT JOIN redmine.issue_statuses s ON s.id = i.status_id
                     LEFT JOIN redmine.users u ON u.id = COALESCE(i.assigned_to_id, i.easy_closed_by_id)
                     {where_clause}
-                    GROUP BY {group_by_clause}
+                    GROUP BY executor_key, executor_name, ym
                     ORDER BY {order_by_clause}
-                    LIMIT %s OFFSET %s
                 """
-                page_params = params.copy()
-                page_params.extend([page_size, (page - 1) * page_size])
-
-                top_level_groups = []
                 with conn.cursor() as cursor:
-                    cursor.execute(page_keys_sql, page_params)
-                    top_level_groups = cursor.fetchall()
-
-                # Шаг 3: Собираем данные (второй уровень, если нужен)
-                # Для каждой группы верхнего уровня формируем структуру
-                for group in top_level_groups:
-                    # Translate 0 to unassigned for frontend/API compatibility
-                    group_key = group['key_id']
-                    if group_key == 0 or group_key == '0':
-                        group_key = 'unassigned'
-                    group_item = {
-                        'id': group_key,
-                        'name': group['key_name'],
-                        'count': group['total_cnt'],
-                        'children': []
-                    }
-
-                    if second_level_needed:
-                        # Запрос для второго уровня
-                        # Нужно добавить условие фильтрации по родителю
-                        sub_where = where_clause
-                        sub_params = params.copy()
-
-                        sub_select = ""
-                        sub_group = ""
-                        sub_order = ""
-
-                        if group_mode == 'EXECUTOR_MONTH':
-                            # Родитель - Executor, Дети - Month
-                            if group_item['id'] == 'unassigned':
-                                sub_where += " AND COALESCE(i.assigned_to_id, i.easy_closed_by_id) IS NULL"
-                            else:
-                                sub_where += " AND COALESCE(i.assigned_to_id, i.easy_closed_by_id) = %s"
-                                sub_params.append(group_item['id'])
-
-                            sub_select = f"DATE_FORMAT({period_field}, '%%Y-%%m') as key_name, DATE_FORMAT({period_field}, '%%Y-%%m') as key_id"
-                            sub_group = "key_id"
-                            sub_order = "key_id"
-
-                        elif group_mode == 'MONTH_EXECUTOR':
-                            # Родитель - Month, Дети - Executor
-                            # Filter by month str check?
-                            # period_field is date. DATE_FORMAT returns string.
-                            # Better use DATE_FORMAT in WHERE or YEAR/MONTH
-                            # group_item['id'] is 'YYYY-MM'
-                            y, m = group_item['id'].split('-')
-                            sub_where += f" AND YEAR({period_field}) = %s AND MONTH({period_field}) = %s"
-                            sub_params.extend([y, m])
-
-                            sub_select = "CASE WHEN COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен') = 'Исполнитель не назначен' THEN 0 ELSE COALESCE(i.assigned_to_id, i.easy_closed_by_id) END as key_id, COALESCE(NULLIF(CONCAT_WS(' ', u.lastname, u.firstname), ''), 'Исполнитель не назначен') as key_name"
-                            sub_group = "key_id, key_name"
-                            sub_order = "key_name"
-
-                        children_sql = f"""
-                            SELECT {sub_select}, COUNT(*) as cnt
-                            FROM redmine.issues i
-                            LEFT JOIN redmine.issue_statuses s ON s.id = i.status_id
-                            LEFT JOIN redmine.users u ON u.id = COALESCE(i.assigned_to_id, i.easy_closed_by_id)
-                            {sub_where}
-                            GROUP BY {sub_group}
-                            ORDER BY {sub_order}
-                        """
-                        with conn.cursor() as cursor:
-                            cursor.execute(children_sql, sub_params)
-                            children = cursor.fetchall()
-                            for child in children:
-                                child_key = child['key_id']
-                                if child_key == 0 or child_key == '0':
-                                    child_key = 'unassigned'
-                                group_item['children'].append({
-                                    'id': child_key,
-                                    'name': child['key_name'],
-                                    'count': child['cnt']
-                                })
-
-                    report_data.append(group_item)
-
-                # Merge duplicate groups (safety net)
-                merged_data = {}
-                for g in report_data:
-                    gid = g['id']
-                    if gid in merged_data:
-                        merged_data[gid]['count'] += g['count']
-                        merged_data[gid]['children'].extend(g['children'])
-                    else:
-                        merged_data[gid] = g
-                report_data = list(merged_data.values())
+                    cursor.execute(report_sql, params)
+                    rows = cursor.fetchall()
+
+                all_groups = build_report_groups(rows, group_mode)
+                total_issues_count = sum(group['count'] for group in all_groups)
+                total_rows = len(all_groups)
+                offset = (page - 1) * page_size
+                report_data = all_groups[offset:offset + page_size]
 
             except Exception as e:
                 logger.error("Error in redmine_report: %s", e, exc_info=True)
@@ -401,22 +386,16 @@ def redmine_report_details():
         params = [project_id]
 
         # Основные фильтры
-        if report_year:
-            where_clause += f" AND YEAR({period_field}) = %s"
-            params.append(report_year)
-
-        # Months logic: filter by list AND ctx_ym intersection?
-        # Typically ctx_ym dictates the specific month.
-        # If ctx_ym is present, it overrides the list for this specific query scope basically.
-
-        if ctx_ym:
-            y, m = ctx_ym.split('-')
-            where_clause += f" AND YEAR({period_field}) = %s AND MONTH({period_field}) = %s"
-            params.extend([y, m])
-        elif months:
-            placeholders = ','.join(['%s'] * len(months))
-            where_clause += f" AND MONTH({period_field}) IN ({placeholders})"
-            params.extend(months)
+        # ctx_ym (месяц группы) задает конкретный месяц и заменяет список месяцев
+        if ctx_ym and report_year:
+            year_clause, year_params = build_period_filter(period_field, report_year)
+            where_clause += year_clause
+            params.extend(year_params)
+        period_clause, period_params = build_period_filter(
+            period_field, report_year, months, ym=ctx_ym or None
+        )
+        where_clause += period_clause
+        params.extend(period_params)
 
         if date_from:
             where_clause += f" AND {period_field} >= %s"
@@ -527,6 +506,10 @@ def redmine_report_export():
         if not months: months = [str(i) for i in range(1, 13)]
         executor_id = request.args.get('executor_id', type=int)
         group_mode = request.args.get('group_mode', 'EXECUTOR')
+        try:
+            fmt = export_format(request.args.get('format'))
+        except ValueError as e:
+            return str(e), 400
 
         conn = get_db_connection()
         if not conn: return "DB Error", 500
@@ -538,14 +521,9 @@ def redmine_report_export():
         where_clause = """
             WHERE i.project_id = %s
         """
-        if report_year:
-            where_clause += f" AND YEAR({period_field}) = %s"
-            where_params.append(report_year)
-
-        if months:
-            placeholders = ','.join(['%s'] * len(months))
-            where_clause += f" AND MONTH({period_field}) IN ({placeholders})"
-            where_params.extend(months)
+        period_clause, period_params = build_period_filter(period_field, report_year, months)
+        where_clause += period_clause
+        where_params.extend(period_params)
 
         if date_from:
             where_clause += f" AND {period_field} >= %s"
@@ -618,11 +596,13 @@ def redmine_report_export():
             """
             headers = ["Месяц", "Исполнитель", "Кол-во"]
 
-        with conn.cursor() as cursor:
-            cursor.execute(group_sql, agg_params)
-            rows_agg = cursor.fetchall()
+        rows_agg = []
+        if fmt == 'xlsx':
+            with conn.cursor() as cursor:
+                cursor.execute(group_sql, agg_params)
+                rows_agg = cursor.fetchall()
 
-        # 2. Details for "Issues" Sheet
+        # 2. Details for "Issues" Sheet — читаются серверным курсором при выгрузке
         issues_sql = f"""
             SELECT
                 i.id,
@@ -637,21 +617,25 @@ def redmine_report_export():
             {where_clause}
             ORDER BY {period_field} DESC
         """
-        with conn.cursor() as cursor:
-            cursor.execute(issues_sql, where_params)
-            rows_issues = cursor.fetchall()
+        issue_headers = ['ID', 'Тема', 'Статус', 'Создана', 'Закрыта', 'Исполнитель']
+        issue_columns = ['id', 'subject', 'status_name', 'created_on', 'closed_on', 'executor_name']
 
-        # CREATE EXCEL
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Sheet 1: Report
-            worksheet = writer.book.create_sheet('Report')
-            writer.sheets['Report'] = worksheet
+        def issue_values():
+            for row in iter_query_rows(conn, issues_sql, where_params):
+                yield [row[column] for column in issue_columns]
 
-            # Params
-            start_row = 1
-            worksheet.cell(row=start_row, column=1, value="Параметры отчёта").font = Font(bold=True, size=14)
-            start_row += 1
+        def build_csv():
+            # В CSV один лист — список задач; агрегаты остаются в XLSX
+            return iter_csv_bytes(issue_headers, issue_values(), compress=fmt == 'csv.gz')
+
+        def build_xlsx():
+            workbook = new_workbook()
+
+            # Sheet 1: Report
+            worksheet = workbook.create_sheet('Report')
+            title = WriteOnlyCell(worksheet, value="Параметры отчёта")
+            title.font = Font(bold=True, size=14)
+            worksheet.append([title])
             params_display = {
                "Project ID": project_id,
                "Period Type": period_type,
@@ -664,41 +648,35 @@ def redmine_report_export():
                "Generated": datetime.now().strftime("%Y-%m-%d %H:%M")
             }
             for k, v in params_display.items():
-                worksheet.cell(row=start_row, column=1, value=k)
-                worksheet.cell(row=start_row, column=2, value=str(v))
-                start_row += 1
-            start_row += 1
-
-            # Table Header
-            for c, h in enumerate(headers, 1):
-                cell = worksheet.cell(row=start_row, column=c, value=h)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-            start_row += 1
-
-            # Table Data
+                worksheet.append([k, str(v)])
+            worksheet.append([])
+
+            # Table Header + Data
+            worksheet.append(header_row(worksheet, headers))
             for r in rows_agg:
-                worksheet.cell(row=start_row, column=1, value=r['col1'])
-                worksheet.cell(row=start_row, column=2, value=r['col2'])
-                worksheet.cell(row=start_row, column=3, value=r['cnt'])
-                start_row += 1
+                worksheet.append([r['col1'], r['col2'], r['cnt']])
 
             # Sheet 2: Issues
-            df_issues = pd.DataFrame(rows_issues)
-            if not df_issues.empty:
-                # Rename columns for display
-                df_issues.columns = ['ID', 'Тема', 'Статус', 'Создана', 'Закрыта', 'Исполнитель']
-                # Convert timestamps to string to avoid tz issues in excel sometimes
-                df_issues['Создана'] = df_issues['Создана'].astype(str)
-                df_issues['Закрыта'] = df_issues['Закрыта'].astype(str)
-                df_issues.to_excel(writer, sheet_name='Issues', index=False)
-            else:
-                writer.book.create_sheet('Issues')
-                writer.sheets['Issues'].cell(row=1, column=1, value="Нет задач")
-
-        output.seek(0)
-        filename = f"redmine_report_v2_{project_id}.xlsx"
-        return send_file(output, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            issues_sheet = workbook.create_sheet('Issues')
+            issues_written = 0
+            for values in issue_values():
+                if not issues_written:
+                    issues_sheet.append(header_row(issues_sheet, issue_headers))
+                issues_sheet.append(values)
+                issues_written += 1
+            if not issues_written:
+                issues_sheet.append(["Нет задач"])
+
+            return iter_workbook_bytes(workbook)
+
+        response = stream_export(
+            conn,
+            build_csv if fmt != 'xlsx' else build_xlsx,
+            f"redmine_report_v2_{project_id}",
+            fmt,
+        )
+        conn = None  # соединение закроет генератор ответа
+        return response
 
     except Exception as e:
         logger.error("Export Error: %s", e, exc_info=True)
@@ -798,6 +776,10 @@ def redmine_stale_tasks_export():
         stale_days = request.args.get('stale_days', 7, type=int)
         status_id = request.args.get('status_id', type=int)
         executor_id = request.args.get('executor_id', type=int)
+        try:
+            fmt = export_format(request.args.get('format'))
+        except ValueError as e:
+            return str(e), 400
 
         conn = get_db_connection()
         if not conn:
@@ -831,36 +813,40 @@ def redmine_stale_tasks_export():
             ORDER BY stale_days DESC
         """
 
-        with conn.cursor() as cursor:
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df = pd.DataFrame(rows)
-            if not df.empty:
-                df.columns = ['ID', 'Тема', 'Статус', 'Возраст (дн)', 'Без движения (дн)', 'Исполнитель', 'Создана']
-                df.to_excel(writer, sheet_name='Зависшие задачи', index=False)
-                worksheet = writer.sheets['Зависшие задачи']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            else:
-                writer.book.create_sheet('Зависшие задачи')
-                writer.sheets['Зависшие задачи'].cell(row=1, column=1, value="Нет зависших задач")
-
-        output.seek(0)
-        filename = f"stale_tasks_{project_id}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        return send_file(output, as_attachment=True, download_name=filename,
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        headers = ['ID', 'Тема', 'Статус', 'Возраст (дн)', 'Без движения (дн)', 'Исполнитель', 'Создана']
+        columns = ['id', 'subject', 'status_name', 'age_days', 'stale_days', 'assigned_to_name', 'created_on']
+
+        def stale_values():
+            for row in iter_query_rows(conn, sql, params):
+                yield [row[column] for column in columns]
+
+        def build_csv():
+            return iter_csv_bytes(headers, stale_values(), compress=fmt == 'csv.gz')
+
+        def build_xlsx():
+            workbook = new_workbook()
+            worksheet = workbook.create_sheet('Зависшие задачи')
+            # В write-only режиме ширину задаем до записи строк
+            for letter, width in zip('ABCDEFG', STALE_EXPORT_COLUMN_WIDTHS):
+                worksheet.column_dimensions[letter].width = width
+            written = 0
+            for values in stale_values():
+                if not written:
+                    worksheet.append(header_row(worksheet, headers))
+                worksheet.append(values)
+                written += 1
+            if not written:
+                worksheet.append(["Нет зависших задач"])
+            return iter_workbook_bytes(workbook)
+
+        response = stream_export(
+            conn,
+            build_csv if fmt != 'xlsx' else build_xlsx,
+            f"stale_tasks_{project_id}_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            fmt,
+        )
+        conn = None  # соединение закроет генератор ответа
+        return response
 
     except Exception as e:
         logger.error("Stale tasks export Error: %s", e, exc_info=True)
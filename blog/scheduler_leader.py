@@ -0,0 +1,112 @@
+"""
+Выбор единственного воркера, в котором работает планировщик.
+
+Каждый воркер gunicorn вызывает create_app, и раньше в каждом стартовал свой
+APScheduler с глобальной проверкой уведомлений, а при входе пользователя
+добавлялась еще и персональная задача. Теперь планировщик запускает только
+воркер, захвативший эксклюзивную блокировку файла (fcntl.flock), остальные
+раз в retry_interval пытаются ее взять. Блокировку снимает ядро, когда
+процесс-лидер завершается (перезапуск по max_requests, падение), и задачи
+переходят к следующему воркеру без ручного вмешательства.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: выбор лидера недоступен
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerLeader:
+    def __init__(self, lock_path: Optional[str] = None, retry_interval: float = 30):
+        self.lock_path = lock_path
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._leader_pid: Optional[int] = None
+        self._watcher_pid: Optional[int] = None
+
+    def init_app(self, app):
+        self.lock_path = os.getenv(
+            "SCHEDULER_LOCK_PATH", os.path.join(app.instance_path, "scheduler.lock")
+        )
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+
+    @property
+    def is_leader(self) -> bool:
+        # Дочерний процесс после fork наследует файл, но лидером не является
+        return self._lock_file is not None and self._leader_pid == os.getpid()
+
+    def try_acquire(self) -> bool:
+        """Захватывает блокировку без ожидания; True, если этот процесс — лидер"""
+        with self._lock:
+            if self.is_leader:
+                return True
+
+            lock_file = open(self.lock_path, "a+")
+            if fcntl is None:
+                logger.warning(
+                    "fcntl недоступен: планировщик запускается без выбора лидера"
+                )
+            else:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return False
+
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{os.getpid()}\n")
+            lock_file.flush()
+            self._lock_file = lock_file
+            self._leader_pid = os.getpid()
+            logger.info(f"Процесс {os.getpid()} стал лидером планировщика")
+            return True
+
+    def start(self, on_elected: Callable[[], None]) -> None:
+        """
+        Вызывает on_elected, как только этот процесс станет лидером: сразу,
+        если блокировка свободна, иначе из фонового потока после ее захвата.
+        """
+        if self.try_acquire():
+            on_elected()
+            return
+        if self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        logger.info(
+            f"Планировщик работает в другом процессе, {os.getpid()} ожидает блокировку {self.lock_path}"
+        )
+
+        def watch():
+            while not self.try_acquire():
+                time.sleep(self.retry_interval)
+            try:
+                on_elected()
+            except Exception as e:
+                logger.error(f"Ошибка запуска планировщика после выбора лидера: {e}", exc_info=True)
+
+        threading.Thread(target=watch, name="scheduler-leader", daemon=True).start()
+
+    def release(self) -> None:
+        with self._lock:
+            if not self.is_leader:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+            self._leader_pid = None
+
+
+scheduler_leader = SchedulerLeader(
+    retry_interval=float(os.getenv("SCHEDULER_LEADER_RETRY", "30"))
+)
@@ -2,6 +2,7 @@ import logging
 import os
 import uuid
 import time # Добавляем импорт time
+import threading
 from flask import current_app # Добавляем импорт current_app
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -15,56 +16,132 @@ from blog import db
 
 # logger = logging.getLogger(__name__) # Удаляем или комментируем, будем использовать current_app.logger
 
+# Получателей в одном пакетном запросе к очередям Redmine (WHERE Author IN (...))
+NOTIFICATION_SHARD_SIZE = int(os.getenv("NOTIFICATION_SHARD_SIZE", "100"))
+
+# Долгоживущий экземпляр приложения для плановых задач.
+# Создается один раз на процесс, а не на каждом тике планировщика.
+_scheduler_app = None
+_scheduler_app_lock = threading.Lock()
+
+
+def get_scheduler_app():
+    """
+    Возвращает экземпляр Flask-приложения для выполнения плановых задач.
+
+    В первую очередь используется приложение, с которым был инициализирован
+    планировщик (scheduler.init_app в create_app). Если его нет (например,
+    задача запущена вне create_app), приложение создается один раз и
+    переиспользуется во всех последующих запусках.
+    """
+    global _scheduler_app
+
+    if _scheduler_app is not None:
+        return _scheduler_app
+
+    with _scheduler_app_lock:
+        if _scheduler_app is None:
+            # Импортируем здесь, чтобы избежать циклического импорта
+            from blog import scheduler
+
+            app_instance = getattr(scheduler, "app", None)
+            if app_instance is None:
+                from blog import create_app
+
+                app_instance = create_app()
+            _scheduler_app = app_instance
+
+    return _scheduler_app
+
+
+def _recipient_shards(recipients, shard_size):
+    """Делит получателей на шарды по shard_size (None — один шард на всех)"""
+    if not recipients:
+        return []
+    if not shard_size:
+        return [recipients]
+    return [recipients[i : i + shard_size] for i in range(0, len(recipients), shard_size)]
+
+
+def _format_run_timings(timings):
+    """Форматирует разбивку времени выполнения плановой проверки для лога."""
+    return ", ".join(f"{name}={value:.3f}s" for name, value in timings.items())
+
+
 def scheduled_check_all_user_notifications():
     """
     Плановая задача для проверки уведомлений для всех активных пользователей.
-    """
-    # Импортируем create_app здесь, чтобы избежать циклического импорта
-    from blog import create_app
 
-    # Для работы с базой данных и конфигурацией приложения нужен контекст приложения Flask
-    app_instance = create_app()
+    Выполняется в контексте долгоживущего приложения (см. get_scheduler_app),
+    поэтому стоимость запуска ограничивается самой обработкой уведомлений.
+    В конце каждого запуска логируется разбивка времени: app_setup, user_query,
+    queue_sync (пакетный режим) или user_sync/user_sync_max (по пользователям), total.
+    """
+    start_time = time.perf_counter()
+    app_instance = get_scheduler_app()
 
     with app_instance.app_context():
         logger = current_app.logger # Используем логгер Flask приложения
         run_id = uuid.uuid4()
         pid = os.getpid()
-        start_time = time.time()
+        timings = {"app_setup": time.perf_counter() - start_time}
 
         logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: НАЧАЛО плановой проверки уведомлений.")
 
+        query_start_time = time.perf_counter()
         try:
             active_users = User.query.filter_by(online=True).all()
         except SQLAlchemyError as e:
             logger.error(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Ошибка SQLAlchemy при получении активных пользователей: {e}", exc_info=True)
-            active_users = [] # Предотвращаем дальнейшее выполнение, если пользователи не получены
+            timings["user_query"] = time.perf_counter() - query_start_time
+            timings["total"] = time.perf_counter() - start_time
             # Завершаем задачу, если не можем получить пользователей
-            end_time = time.time()
-            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки (ошибка получения пользователей). Время выполнения: {end_time - start_time:.2f} сек.")
+            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки (ошибка получения пользователей). Тайминги: {_format_run_timings(timings)}")
             return
+        timings["user_query"] = time.perf_counter() - query_start_time
 
         if not active_users:
-            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Активные пользователи не найдены. Проверка уведомлений не требуется.")
-            end_time = time.time()
-            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки (нет активных пользователей). Время выполнения: {end_time - start_time:.2f} сек.")
+            timings["total"] = time.perf_counter() - start_time
+            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки (нет активных пользователей). Тайминги: {_format_run_timings(timings)}")
             return
 
         logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Найдено {len(active_users)} активных пользователей для проверки.")
 
+        from blog.notification_service import JOURNAL_INGESTION, NOTIFICATION_BATCH_SYNC
+
+        if NOTIFICATION_BATCH_SYNC == "on":
+            # Пакетный режим: фиксированное число запросов к MySQL на шард получателей
+            from blog.notification_service import check_notifications_batch
+
+            sync_start_time = time.perf_counter()
+            shards = _recipient_shards(
+                [(user.id, user.email) for user in active_users],
+                # Журнал Redmine читается один раз на всех получателей
+                None if JOURNAL_INGESTION == "on" else NOTIFICATION_SHARD_SIZE,
+            )
+            total_processed_notifications_for_run = 0
+            for shard_number, shard in enumerate(shards, 1):
+                try:
+                    total_processed_notifications_for_run += check_notifications_batch(shard)
+                except Exception as e:
+                    logger.error(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Исключение при пакетной проверке уведомлений (шард {shard_number}/{len(shards)}). Ошибка: {e}", exc_info=True)
+            timings["queue_sync"] = time.perf_counter() - sync_start_time
+            timings["total"] = time.perf_counter() - start_time
+            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки уведомлений (пакетный режим). Пользователей: {len(active_users)}, шардов: {len(shards)}, всего обработано: {total_processed_notifications_for_run} уведомлений. Тайминги: {_format_run_timings(timings)}")
+            return
+
+        # ИСПРАВЛЕНИЕ: Используем новую улучшенную функцию check_notifications_improved
+        from blog.notification_service import check_notifications_improved
+
         total_processed_notifications_for_run = 0
+        user_sync_total = 0.0
+        user_sync_max = 0.0
 
         for user in active_users:
-            logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Начало проверки уведомлений для пользователя ID: {user.id}, Email: {user.email}")
-            user_check_start_time = time.time()
+            user_check_start_time = time.perf_counter()
             try:
-                # ИСПРАВЛЕНИЕ: Используем новую улучшенную функцию check_notifications_improved
-                from blog.notification_service import check_notifications_improved
-
-                # Вызываем улучшенную функцию check_notifications_improved
                 processed_count = check_notifications_improved(user_email=user.email, user_id=user.id)
 
-                logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Обработано {processed_count} уведомлений для пользователя ID: {user.id}.")
-
                 if processed_count > 0:
                     total_processed_notifications_for_run += processed_count
                     logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Успешно обработано {processed_count} уведомлений для пользователя ID: {user.id}.")
@@ -73,8 +150,12 @@ def scheduled_check_all_user_notifications():
                 # Логируем ошибку, но продолжаем для других пользователей
                 logger.error(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Исключение при вызове check_notifications для пользователя ID: {user.id}. Ошибка: {e}", exc_info=True)
             finally:
-                user_check_end_time = time.time()
-                logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Завершение проверки уведомлений для пользователя ID: {user.id}. Время: {user_check_end_time - user_check_start_time:.2f} сек.")
-
-        end_time = time.time()
-        logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки уведомлений. Всего обработано: {total_processed_notifications_for_run} уведомлений. Общее время выполнения: {end_time - start_time:.2f} сек.")
+                user_check_elapsed = time.perf_counter() - user_check_start_time
+                user_sync_total += user_check_elapsed
+                user_sync_max = max(user_sync_max, user_check_elapsed)
+                logger.debug(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: Проверка уведомлений для пользователя ID: {user.id} заняла {user_check_elapsed:.3f} сек.")
+
+        timings["user_sync"] = user_sync_total
+        timings["user_sync_max"] = user_sync_max
+        timings["total"] = time.perf_counter() - start_time
+        logger.info(f"SCHEDULER_RUN: PID={pid}, RunID={run_id}: ЗАВЕРШЕНИЕ плановой проверки уведомлений. Пользователей: {len(active_users)}, всего обработано: {total_processed_notifications_for_run} уведомлений. Тайминги: {_format_run_timings(timings)}")
@@ -1,58 +1,402 @@
+import hashlib
 import json
+import math
 import os
 import re
+from collections import Counter, defaultdict
 from flask import current_app
 
+# Версия формата индекса на диске: при изменении структуры кэш пересобирается
+INDEX_VERSION = 1
+
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Слова заголовка весят как несколько вхождений в тексте
+TITLE_WEIGHT = 3
+# Сколько слов раскрывать по префиксу последнего слова запроса
+PREFIX_EXPANSIONS = 30
+
+VALID_GUIDE_IDS = {"1", "2", "3", "4", "5", "6"}
+
+STATIC_PAGES = [
+    {
+        'id': 'vdi',
+        'title': 'Инструкция VDI (Виртуальный рабочий стол)',
+        'url': '/vdi',
+        'keywords': 'vdi удаленный доступ рабочий стол virtual desktop vmware horizon'
+    },
+    {
+        'id': 'tez_cloud',
+        'title': 'Корпоративный файловый сервер CLOUD TEZ TOUR',
+        'url': '/tez_cloud',
+        'keywords': 'cloud облако облачное хранилище диск файлы обмен files share'
+    },
+    {
+        'id': 'auto_resp',
+        'title': 'Настройка автоответчика почты',
+        'url': '/auto_resp',
+        'keywords': 'почта автоответчик outlook отпуск заместитель'
+    },
+    {
+         'id': 'calls',
+         'title': 'Звонки и конференции',
+         'url': '/calls_and_conferences',
+         'keywords': 'телефон звонки конференция cisco jabber связь'
+    },
+    {
+        'id': 'vacuum_setup',
+        'title': 'Как настроить аккаунт Vacuum-IM?',
+        'url': '/vacuum_setup',
+        'keywords': 'vacuum im jabber chat чат программа сообщений'
+    },
+    {
+        'id': 'no_access_site',
+        'title': 'Веб-сайты не загружаются?',
+        'url': '/no_access_site',
+        'keywords': 'сайт доступ интернет не работает прокси'
+    },
+    {
+        'id': 'remote_connection',
+        'title': 'Удаленное подключение к Вам специалиста',
+        'url': '/remote_connection',
+        'keywords': 'удаленка помощь поддержка support teamviewer anydesk vnc rdp'
+    },
+    {
+        'id': 'adress_book',
+        'title': 'Корпоративная адресная книга',
+        'url': '/adress_book',
+        'keywords': 'адреса контакты телефоны сотрудники поиск людей'
+    },
+    {
+        'id': 'email_setup',
+        'title': 'Настройка почты на мобильных устройствах',
+        'url': '/email-setup',
+        'keywords': 'почта телефон android ios iphone настройка email'
+    },
+    {
+        'id': 'setup_mail_account',
+        'title': 'Настройка почтового ящика (Thunderbird/Outlook)',
+        'url': '/setup_mail_account',
+        'keywords': 'почта outlook thunderbird настройка пк windows email pop3 imap не работает'
+    },
+    {
+        'id': 'setup_mail_forwarding',
+        'title': 'Как переадресовать почту?',
+        'url': '/setup_mail_forwarding',
+        'keywords': 'почта переадресация пересылка правилa outlook'
+    },
+    {
+        'id': 'ciscoanyconnect',
+        'title': 'Как пользоваться Cisco AnyConnect',
+        'url': '/ciscoanyconnect',
+        'keywords': 'vpn cisco anyconnect доступ из дома удаленная работа'
+    },
+    {
+        'id': 'questionable_email',
+        'title': 'Подозрительное письмо?',
+        'url': '/questionable_email',
+        'keywords': 'фишинг вирус спам безопасность письмо мошенники'
+    },
+    {
+        'id': 'safe_internet',
+        'title': 'Безопасное использование интернета',
+        'url': '/safe_internet',
+        'keywords': 'безопасность интернет вирусы скачать защита'
+    }
+]
+
+
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Нижний регистр и ё -> е"""
+    return (text or '').lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return _WORD_RE.findall(normalize_text(text))
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PrefixTrie:
+    """Префиксное дерево слов словаря для автодополнения последнего слова запроса"""
+
+    END = ''
+
+    def __init__(self, root=None):
+        self.root = root if root is not None else {}
+
+    def insert(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[self.END] = 1
+
+    def words_with_prefix(self, prefix, limit=None):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        words = []
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if self.END in node:
+                words.append(word)
+                if limit and len(words) >= limit:
+                    break
+            for char, child in node.items():
+                if char != self.END:
+                    stack.append((child, word + char))
+        return words
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс для поиска по инструкциям и страницам.
+
+    Строится один раз: нормализованные токены, списки вхождений стемов
+    (postings) для BM25, префиксное дерево слов для автодополнения и
+    триграммы заголовков для совпадений внутри слова. Поиск затрагивает
+    только документы из списков вхождений, а не весь корпус.
+    """
+
+    def __init__(self):
+        self.docs = []
+        self.postings = {}  # стем -> {номер документа: взвешенная частота}
+        self.doc_len = []
+        self.avgdl = 0.0
+        self.word_stems = {}  # слово -> стем
+        self.title_words = {}  # слово заголовка -> номера документов
+        self.title_trigrams = {}
+        self.titles = []  # нормализованные заголовки
+        self.trie = PrefixTrie()
+
+    @staticmethod
+    def stem(word):
+        """Простейший стемминг для русского языка"""
+        if len(word) > 4:
+            if word.endswith(('ая', 'яя', 'ые', 'ие', 'ое', 'ее', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем', 'ах', 'ях', 'ую', 'юю')):
+                return word[:-2]
+            elif word.endswith(('а', 'я', 'о', 'е', 'ы', 'и', 'ь', 'у', 'ю')):
+                return word[:-1]
+        return word
+
+    def add(self, doc, content):
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        title_tokens = tokenize(doc['title'])
+        body_tokens = tokenize(content)
+
+        frequencies = Counter()
+        for weight, tokens in ((TITLE_WEIGHT, title_tokens), (1, body_tokens)):
+            for word in tokens:
+                stem = self.word_stems.get(word)
+                if stem is None:
+                    stem = self.word_stems[word] = self.stem(word)
+                    self.trie.insert(word)
+                frequencies[stem] += weight
+        for stem, tf in frequencies.items():
+            self.postings.setdefault(stem, {})[doc_id] = tf
+        self.doc_len.append(sum(frequencies.values()))
+        self.avgdl = sum(self.doc_len) / len(self.doc_len)
+
+        title = normalize_text(doc['title'])
+        self.titles.append(title)
+        for word in set(title_tokens):
+            self.title_words.setdefault(word, set()).add(doc_id)
+        for trigram in _trigrams(title):
+            self.title_trigrams.setdefault(trigram, set()).add(doc_id)
+
+    # ------------------------------------------------------------ поиск
+
+    def _title_candidates(self, query):
+        if len(query) >= 3:
+            sets = [self.title_trigrams.get(t, set()) for t in _trigrams(query)]
+            return set.intersection(*sets) if sets else set()
+        candidates = set()
+        for word in self.trie.words_with_prefix(query):
+            candidates |= self.title_words.get(word, set())
+        return candidates
+
+    def _query_stems(self, words):
+        stems = {self.word_stems.get(w) or self.stem(w) for w in words[:-1]}
+        last = words[-1]
+        stems.add(self.word_stems.get(last) or self.stem(last))
+        if len(last) >= 2:
+            expansions = self.trie.words_with_prefix(last)
+            # Самые редкие слова информативнее — берем их при обрезке
+            expansions.sort(key=lambda w: len(self.postings.get(self.word_stems[w], ())))
+            stems.update(self.word_stems[w] for w in expansions[:PREFIX_EXPANSIONS])
+        return stems
+
+    def bm25(self, stems):
+        scores = defaultdict(float)
+        total = len(self.docs)
+        for stem in stems:
+            postings = self.postings.get(stem)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / self.avgdl)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, limit=8):
+        query = normalize_text(query).strip()
+        words = _WORD_RE.findall(query)
+        if not words or not self.docs:
+            return []
+
+        scores = defaultdict(float)
+        # Совпадения с заголовком важнее текста, как и раньше
+        for doc_id in self._title_candidates(query):
+            title = self.titles[doc_id]
+            if title.startswith(query):
+                scores[doc_id] += 100
+            elif query in title:
+                scores[doc_id] += 80
+            if any(word.startswith(query) for word in title.split()):
+                scores[doc_id] += 60
+
+        for doc_id, score in self.bm25(self._query_stems(words)).items():
+            scores[doc_id] += score * 10
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            {
+                'title': self.docs[doc_id]['title'],
+                'url': self.docs[doc_id]['url'],
+                'type': self.docs[doc_id]['type'],
+                'score': round(score, 2),
+            }
+            for doc_id, score in ranked
+            if score > 0
+        ]
+
+    # ----------------------------------------------------- сериализация
+
+    def to_dict(self):
+        return {
+            'docs': self.docs,
+            'postings': {stem: list(p.items()) for stem, p in self.postings.items()},
+            'doc_len': self.doc_len,
+            'word_stems': self.word_stems,
+            'title_words': {w: sorted(ids) for w, ids in self.title_words.items()},
+            'title_trigrams': {t: sorted(ids) for t, ids in self.title_trigrams.items()},
+            'titles': self.titles,
+            'trie': self.trie.root,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.docs = data['docs']
+        index.postings = {stem: dict(p) for stem, p in data['postings'].items()}
+        index.doc_len = data['doc_len']
+        index.avgdl = sum(index.doc_len) / len(index.doc_len) if index.doc_len else 0.0
+        index.word_stems = data['word_stems']
+        index.title_words = {w: set(ids) for w, ids in data['title_words'].items()}
+        index.title_trigrams = {t: set(ids) for t, ids in data['title_trigrams'].items()}
+        index.titles = data['titles']
+        index.trie = PrefixTrie(data['trie'])
+        return index
+
+
 class SearchService:
     def __init__(self, app=None):
         self.index = []
+        self._search_index = SearchIndex()
+        self.cache_path = None
         if app:
             self.init_app(app)
 
     def init_app(self, app):
         """Инициализирует индекс при старте приложения"""
         self.root_path = app.root_path
+        self.cache_path = os.getenv(
+            'SEARCH_INDEX_CACHE_PATH',
+            os.path.join(app.instance_path, 'search_index.json'),
+        )
         with app.app_context():
-            self.build_index()
+            if not self.load_index():
+                self.build_index()
+                self.save_index()
 
-    def _normalize_word(self, word):
-        """Простейший стемминг для русского языка"""
-        word = word.lower()
-        if len(word) > 4:
-            if word.endswith(('ая', 'яя', 'ые', 'ие', 'ое', 'ее', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем', 'ах', 'ях', 'ую', 'юю')):
-                return word[:-2]
-            elif word.endswith(('а', 'я', 'о', 'е', 'ы', 'и', 'ь', 'у', 'ю')):
-                return word[:-1]
-        return word
+    def _docs_path(self):
+        project_root = os.path.dirname(self.root_path)
+        return os.path.join(project_root, 'docs', 'guides_content.json')
+
+    def _source_signature(self):
+        """Отпечаток исходников индекса: версия, JSON с инструкциями, статические страницы"""
+        digest = hashlib.sha1(f"v{INDEX_VERSION}".encode())
+        docs_path = self._docs_path()
+        if os.path.exists(docs_path):
+            stat = os.stat(docs_path)
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+        digest.update(json.dumps(STATIC_PAGES, sort_keys=True, ensure_ascii=False).encode())
+        return digest.hexdigest()
 
-    def _get_tokens(self, text):
-        """Разбивает текст на токены (стемы)"""
-        clean_text = re.sub(r'[^\w\s]', ' ', text.lower())
-        words = clean_text.split()
-        return set(self._normalize_word(w) for w in words)
+    def load_index(self):
+        """Загружает индекс с диска, если он собран из тех же исходников"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('signature') != self._source_signature():
+                return False
+            self._search_index = SearchIndex.from_dict(data['index'])
+            self.index = self._search_index.docs
+            print(f"[SearchService] Loaded search index from {self.cache_path}: {len(self.index)} items")
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[SearchService] Error loading search index cache: {e}")
+            return False
+
+    def save_index(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'signature': self._source_signature(), 'index': self._search_index.to_dict()},
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[SearchService] Error saving search index cache: {e}")
 
     def build_index(self):
         """Собирает контент из JSON и шаблонов для поиска"""
-        self.index = []
+        search_index = SearchIndex()
         print("[SearchService] Building search index...")
-        
-        project_root = os.path.dirname(self.root_path) 
-        docs_path = os.path.join(project_root, 'docs', 'guides_content.json')
-        
-        VALID_GUIDE_IDS = {"1", "2", "3", "4", "5", "6"}
-        
+
+        docs_path = self._docs_path()
+
         if os.path.exists(docs_path):
             try:
                 with open(docs_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    
+
                 for card_id, content_data in data.items():
                     if str(card_id) not in VALID_GUIDE_IDS:
                         continue
 
                     full_text = []
                     title = content_data.get('filename', f"Инструкция #{card_id}").replace('.md', '').replace('.docx', '')
-                    
+
                     first_header = None
                     for block in content_data.get('content', []):
                         text = block.get('text', '')
@@ -64,186 +408,38 @@ class SearchService:
                     if first_header:
                          title = first_header
 
-                    content_str = " ".join(full_text)
-                    
-                    self.index.append({
-                        'id': f"guide_{card_id}",
-                        'type': 'guide',
-                        'title': title,
-                        'url': f"/guide/{card_id}",
-                        'content': content_str,
-                        'tokens': self._get_tokens(title + " " + content_str)
-                    })
+                    search_index.add(
+                        {'id': f"guide_{card_id}", 'type': 'guide', 'title': title, 'url': f"/guide/{card_id}"},
+                        " ".join(full_text),
+                    )
                 print(f"[SearchService] Indexed {len(data)} guides from JSON (filtered)")
             except Exception as e:
                 print(f"[SearchService] Error indexing JSON: {e}")
         else:
             print(f"[SearchService] Docs file not found at {docs_path}")
 
-        static_pages = [
-            {
-                'id': 'vdi',
-                'title': 'Инструкция VDI (Виртуальный рабочий стол)',
-                'url': '/vdi',
-                'keywords': 'vdi удаленный доступ рабочий стол virtual desktop vmware horizon'
-            },
-            {
-                'id': 'tez_cloud',
-                'title': 'Корпоративный файловый сервер CLOUD TEZ TOUR',
-                'url': '/tez_cloud',
-                'keywords': 'cloud облако облачное хранилище диск файлы обмен files share'
-            },
-            {
-                'id': 'auto_resp',
-                'title': 'Настройка автоответчика почты',
-                'url': '/auto_resp',
-                'keywords': 'почта автоответчик outlook отпуск заместитель'
-            },
-            {
-                 'id': 'calls',
-                 'title': 'Звонки и конференции',
-                 'url': '/calls_and_conferences',
-                 'keywords': 'телефон звонки конференция cisco jabber связь'
-            },
-            {
-                'id': 'vacuum_setup',
-                'title': 'Как настроить аккаунт Vacuum-IM?',
-                'url': '/vacuum_setup',
-                'keywords': 'vacuum im jabber chat чат программа сообщений'
-            },
-            {
-                'id': 'no_access_site',
-                'title': 'Веб-сайты не загружаются?',
-                'url': '/no_access_site',
-                'keywords': 'сайт доступ интернет не работает прокси'
-            },
-            {
-                'id': 'remote_connection',
-                'title': 'Удаленное подключение к Вам специалиста',
-                'url': '/remote_connection',
-                'keywords': 'удаленка помощь поддержка support teamviewer anydesk vnc rdp'
-            },
-            {
-                'id': 'adress_book',
-                'title': 'Корпоративная адресная книга',
-                'url': '/adress_book',
-                'keywords': 'адреса контакты телефоны сотрудники поиск людей'
-            },
-            {
-                'id': 'email_setup',
-                'title': 'Настройка почты на мобильных устройствах',
-                'url': '/email-setup',
-                'keywords': 'почта телефон android ios iphone настройка email'
-            },
-            {
-                'id': 'setup_mail_account',
-                'title': 'Настройка почтового ящика (Thunderbird/Outlook)',
-                'url': '/setup_mail_account',
-                'keywords': 'почта outlook thunderbird настройка пк windows email pop3 imap не работает'
-            },
-            {
-                'id': 'setup_mail_forwarding',
-                'title': 'Как переадресовать почту?',
-                'url': '/setup_mail_forwarding',
-                'keywords': 'почта переадресация пересылка правилa outlook'
-            },
-            {
-                'id': 'ciscoanyconnect',
-                'title': 'Как пользоваться Cisco AnyConnect',
-                'url': '/ciscoanyconnect',
-                'keywords': 'vpn cisco anyconnect доступ из дома удаленная работа'
-            },
-            {
-                'id': 'questionable_email',
-                'title': 'Подозрительное письмо?',
-                'url': '/questionable_email',
-                'keywords': 'фишинг вирус спам безопасность письмо мошенники'
-            },
-            {
-                'id': 'safe_internet',
-                'title': 'Безопасное использование интернета',
-                'url': '/safe_internet',
-                'keywords': 'безопасность интернет вирусы скачать защита'
-            }
-        ]
-        
-        for page in static_pages:
-            content_combined = page['title'] + " " + page['keywords']
-            self.index.append({
-                'id': page['id'],
-                'type': 'page',
-                'title': page['title'],
-                'url': page['url'],
-                'content': content_combined,
-                'tokens': self._get_tokens(content_combined)
-            })
-        
+        for page in STATIC_PAGES:
+            search_index.add(
+                {'id': page['id'], 'type': 'page', 'title': page['title'], 'url': page['url']},
+                page['keywords'],
+            )
+
+        # Подменяем индекс целиком: параллельные запросы видят старый или новый
+        self._search_index = search_index
+        self.index = search_index.docs
         print(f"[SearchService] Index building complete. Total items: {len(self.index)}")
 
     def search(self, query):
-        """Поиск по индексу с ранжированием и префиксным совпадением"""
+        """Поиск по индексу: совпадения с заголовком, затем BM25 по тексту"""
         if not query:
             return []
-        
+
         query = query.strip()
         if len(query) < 2:  # Минимум 2 символа для поиска
             return []
-            
-        query_lower = query.lower()
-        results = []
-        
-        for item in self.index:
-            score = 0
-            title_lower = item['title'].lower()
-            content_lower = item['content'].lower()
-            
-            # ПРИОРИТЕТ 1: Точное совпадение в начале заголовка (например, "Th" -> "Thunderbird")
-            if title_lower.startswith(query_lower):
-                score += 100
-            
-            # ПРИОРИТЕТ 2: Точное совпадение подстроки в заголовке (например, "ундер" внутри "Thunderbird")
-            elif query_lower in title_lower:
-                score += 80
-            
-            # ПРИОРИТЕТ 3: Префиксное совпадение слов в заголовке
-            # Разбиваем заголовок на слова и проверяем, начинается ли какое-то слово с запроса
-            title_words = title_lower.split()
-            for word in title_words:
-                if word.startswith(query_lower):
-                    score += 60
-                    break
-            
-            # ПРИОРИТЕТ 4: Префиксное совпадение в контенте (слабое)
-            if score == 0:
-                content_words = content_lower.split()
-                for word in content_words:
-                    if word.startswith(query_lower):
-                        score += 20
-                        break
-            
-            # ПРИОРИТЕТ 5: Совпадение токенов (стемминг) для длинных запросов
-            if len(query) >= 4:
-                query_tokens = self._get_tokens(query)
-                item_tokens = item['tokens']
-                
-                for q_token in query_tokens:
-                    for item_token in item_tokens:
-                        # Префиксное совпадение токена
-                        if item_token.startswith(q_token):
-                            score += 10
-                            break
-            
-            if score > 0:
-                results.append({
-                    'title': item['title'],
-                    'url': item['url'],
-                    'type': item['type'],
-                    'score': score
-                })
-        
+
         # Сортируем по релевантности и ограничиваем до 8 результатов
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:8]
+        return self._search_index.search(query, limit=8)
 
 # Создаем глобальный экземпляр
 search_service = SearchService()
@@ -1043,6 +1043,9 @@
     let agencyDataCache = []; // Кэш для данных справочника
     let isCacheHoldingFullList = false; // <--- НОВЫЙ ФЛАГ
     let fetchAgenciesController = null; // Для отмены предыдущего запроса
+    let agencyListTotal = 0; // Всего агентств в справочнике (без фильтра)
+    let agencyListPage = 1; // Последняя загруженная страница полного списка
+    let agencyListHasMore = false; // Есть ли еще страницы полного списка
 
     function showLoadingAgencies(message = "Загрузка справочника агентств...") {
         agenciesStatusBar.style.display = 'block';
@@ -1055,7 +1058,7 @@
         agenciesStatusBar.style.display = 'none';
     }
 
-    function renderAgenciesTable(agencies) {
+    function renderAgenciesTable(agencies, total = null, hasMore = false) {
         agenciesTableBody.innerHTML = ''; // Очищаем перед рендерингом
         if (agencies.length === 0) {
             const noResultsRow = `<tr><td colspan="7" style="text-align:center; padding: 20px;"><i class="fas fa-search-minus" style="font-size: 1.5em; margin-bottom: 10px;"></i><p>Агентства не найдены по вашему запросу.</p></td></tr>`;
@@ -1110,7 +1113,43 @@
 
             agenciesTableBody.appendChild(row);
         });
-        agenciesCountDisplay.textContent = `Найдено: ${agencies.length}`;
+
+        // Полный список приходит постранично: догружаем следующую страницу по кнопке
+        if (hasMore) {
+            const moreRow = agenciesTableBody.insertRow();
+            const moreCell = moreRow.insertCell();
+            moreCell.colSpan = 7;
+            moreCell.style.textAlign = 'center';
+            moreCell.innerHTML = `<button class="action-btn agency-load-more-btn"><i class="fas fa-chevron-down"></i>Показать еще</button>`;
+            moreCell.querySelector('button').addEventListener('click', loadMoreAgencies);
+        }
+        agenciesCountDisplay.textContent = total !== null && total > agencies.length
+            ? `Показано: ${agencies.length} из ${total}`
+            : `Найдено: ${agencies.length}`;
+    }
+
+    function loadMoreAgencies() {
+        const nextPage = agencyListPage + 1;
+        fetch(`/api/agencies?page=${nextPage}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP error ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                if (!data.success || !data.agencies) {
+                    throw new Error(data.error || 'Не удалось загрузить справочник');
+                }
+                // Пока грузилась страница, пользователь мог начать поиск
+                if (!isCacheHoldingFullList) return;
+                agencyDataCache = agencyDataCache.concat(data.agencies);
+                agencyListPage = nextPage;
+                agencyListTotal = data.total;
+                agencyListHasMore = data.has_more;
+                renderAgenciesTable(agencyDataCache, agencyListTotal, agencyListHasMore);
+            })
+            .catch(error => {
+                console.error('Ошибка при догрузке справочника агентств:', error);
+            });
     }
 
     function filterAgencies() {
@@ -1146,7 +1185,7 @@
         // Используем кэш только если он содержит ПОЛНЫЙ список, не требуется принудительное обновление и нет поискового запроса
         if (isCacheHoldingFullList && !forceRefresh && !searchTerm) {
             console.log('[fetchAgencies] Using FULL LIST cache. Cache size:', agencyDataCache.length);
-            renderAgenciesTable(agencyDataCache);
+            renderAgenciesTable(agencyDataCache, agencyListTotal, agencyListHasMore);
             const cachedTimestamp = localStorage.getItem('agencyCacheTimestamp');
             agencyDirectoryInfoSpan.textContent = cachedTimestamp ? `Данные от ${cachedTimestamp}` : 'Данные из кэша (полный список)';
             return;
@@ -1157,6 +1196,8 @@
         let apiUrl = '/api/agencies';
         if (searchTerm) {
             apiUrl += `?search=${encodeURIComponent(searchTerm)}`;
+        } else {
+            apiUrl += forceRefresh ? '?page=1&refresh=1' : '?page=1';
         }
 
         fetch(apiUrl, { signal })
@@ -1171,8 +1212,11 @@
                 if (data.success && data.agencies) {
                     console.log('[fetchAgencies] Data received from API. Count:', data.agencies.length);
                     agencyDataCache = data.agencies;
-                    if (!searchTerm) { // Это был запрос на полный список
+                    if (!searchTerm) { // Это был запрос на первую страницу полного списка
                         isCacheHoldingFullList = true;
+                        agencyListPage = 1;
+                        agencyListTotal = data.total || data.agencies.length;
+                        agencyListHasMore = !!data.has_more;
                         const timestamp = new Date().toLocaleString('ru-RU', { day: '2-digit', month: '2-digit', year: 'numeric', hour: '2-digit', minute: '2-digit' });
                         localStorage.setItem('agencyCacheTimestamp', timestamp);
                         agencyDirectoryInfoSpan.textContent = `Данные обновлены: ${timestamp}`;
@@ -1180,7 +1224,11 @@
                         isCacheHoldingFullList = false;
                         agencyDirectoryInfoSpan.textContent = 'Результаты поиска';
                     }
-                    renderAgenciesTable(agencyDataCache);
+                    if (isCacheHoldingFullList) {
+                        renderAgenciesTable(agencyDataCache, agencyListTotal, agencyListHasMore);
+                    } else {
+                        renderAgenciesTable(agencyDataCache);
+                    }
                 } else {
                     agenciesTableBody.innerHTML = `<tr><td colspan="7" class="error-message">${data.error || 'Не удалось загрузить справочник'}</td></tr>`;
                     agencyDirectoryInfoSpan.textContent = 'Ошибка загрузки';
@@ -0,0 +1,132 @@
+/**
+ * Поток уведомлений (SSE) вместо опроса /get-notification-count и
+ * /api/notifications/poll.
+ *
+ * В браузере открыт один EventSource на все вкладки: вкладка, получившая
+ * Web Lock, держит соединение и пересылает события остальным через
+ * BroadcastChannel. Без этих API каждая вкладка открывает свой поток.
+ *
+ * События для страниц (window):
+ *   notificationsStreamCount  — detail: {count, unread}
+ *   notificationsStreamUpdate — detail: ответ в формате /api/notifications/poll
+ *
+ * Если поток недоступен (старый браузер, предел соединений на сервере,
+ * повторные ошибки), вызываются обработчики notificationStream.onFallback —
+ * страницы возвращаются к прежнему опросу по таймеру.
+ */
+(function () {
+    'use strict';
+
+    const STREAM_URL = '/api/notifications/stream';
+    const SHARED_NAME = 'notifications-stream';
+    const MAX_FAILURES = 3;
+
+    const supported = typeof window.EventSource === 'function';
+    const channel = typeof window.BroadcastChannel === 'function'
+        ? new BroadcastChannel(SHARED_NAME)
+        : null;
+    const canShare = Boolean(channel && navigator.locks && navigator.locks.request);
+
+    const fallbackCallbacks = [];
+    const lastMessages = {};
+    let fallback = !supported;
+    let isLeader = false;
+
+    function dispatch(message) {
+        if (message.type === 'count') {
+            window.dispatchEvent(new CustomEvent('notificationsStreamCount', { detail: message.data }));
+        } else if (message.type === 'notifications') {
+            window.dispatchEvent(new CustomEvent('notificationsStreamUpdate', { detail: message.data }));
+        } else if (message.type === 'fallback') {
+            enterFallback();
+        }
+    }
+
+    function relay(type, data) {
+        const message = { type: type, data: data };
+        lastMessages[type] = message;
+        dispatch(message);
+        if (channel) {
+            channel.postMessage(message);
+        }
+    }
+
+    function enterFallback() {
+        if (fallback) {
+            return;
+        }
+        fallback = true;
+        console.warn('[NotificationStream] Поток недоступен, переходим на опрос');
+        fallbackCallbacks.splice(0).forEach((callback) => {
+            try {
+                callback();
+            } catch (error) {
+                console.error('[NotificationStream] Ошибка обработчика fallback:', error);
+            }
+        });
+    }
+
+    function openStream() {
+        isLeader = true;
+        let failures = 0;
+        const source = new EventSource(STREAM_URL);
+
+        source.addEventListener('open', () => {
+            failures = 0;
+        });
+        source.addEventListener('count', (event) => relay('count', JSON.parse(event.data)));
+        source.addEventListener('notifications', (event) => relay('notifications', JSON.parse(event.data)));
+        source.addEventListener('error', () => {
+            // Сервер штатно закрывает поток раз в несколько минут — EventSource
+            // переподключается сам (readyState CONNECTING). CLOSED означает
+            // ответ не text/event-stream: 503 при пределе потоков, 404 при
+            // отключенном потоке или редирект на страницу входа.
+            failures += 1;
+            if (source.readyState === EventSource.CLOSED || failures >= MAX_FAILURES) {
+                source.close();
+                relay('fallback', null);
+            }
+        });
+        // Блокировку не отпускаем даже после fallback: другие вкладки не
+        // должны снова пробовать поток, пока эта открыта
+        return new Promise(() => {});
+    }
+
+    function start() {
+        if (!supported) {
+            return;
+        }
+        if (!canShare) {
+            openStream();
+            return;
+        }
+        channel.addEventListener('message', (event) => {
+            const message = event.data || {};
+            if (message.type === 'sync-request') {
+                if (isLeader) {
+                    Object.values(lastMessages).forEach((last) => channel.postMessage(last));
+                }
+                return;
+            }
+            dispatch(message);
+        });
+        navigator.locks.request(SHARED_NAME, openStream);
+        // Новая вкладка сразу получает последнее состояние от вкладки с потоком
+        channel.postMessage({ type: 'sync-request' });
+    }
+
+    window.notificationStream = {
+        get active() {
+            return !fallback;
+        },
+        onFallback(callback) {
+            if (fallback) {
+                callback();
+            } else {
+                fallbackCallbacks.push(callback);
+            }
+        },
+    };
+
+    start();
+})();
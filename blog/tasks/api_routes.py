@@ -11,7 +11,7 @@ import traceback
 from datetime import datetime
 
 # Импорты из существующих модулей
-from blog.utils.cache_manager import weekend_performance_optimizer
+from blog.utils.cache_manager import weekend_performance_optimizer, cache_manager, redmine_user_tag, issue_tag
 from blog.tasks.utils import create_redmine_connector
 from redmine import (
     get_connection,
@@ -91,22 +91,7 @@ def _get_redmine_connector_for_current_user(allow_api_key_fallback=True):
                     current_user.username,
                     password_source,
                 )
-    return connector
-
-
-def _invalidate_task_page_caches():
-    """Сбрасывает короткоживущие кэши страницы задач после изменения статуса."""
-    direct_sql_cache = getattr(current_app, '_tasks_direct_sql_cache', None)
-    if isinstance(direct_sql_cache, dict):
-        keys_to_delete = [key for key in direct_sql_cache if key and key[0] == current_user.id]
-        for key in keys_to_delete:
-            direct_sql_cache.pop(key, None)
-
-    stats_cache = getattr(current_app, '_tasks_stats_cache', None)
-    if isinstance(stats_cache, dict):
-        keys_to_delete = [key for key in stats_cache if key and key[0] == current_user.id]
-        for key in keys_to_delete:
-            stats_cache.pop(key, None)
+            return connector
 
     current_app.logger.warning(
         "[API] Не удалось создать RedmineConnector по локальным паролям для %s",
@@ -143,6 +128,24 @@ def _invalidate_task_page_caches():
     )
     return None
 
+
+def _invalidate_task_page_caches(task_id, *redmine_user_ids):
+    """
+    Сбрасывает кэши страницы задач, затронутые изменением задачи.
+
+    Удаляются только записи с тегами этой задачи и переданных пользователей
+    Redmine (исполнители до/после изменения) и текущего пользователя:
+    списки и Kanban, где задача присутствует, и статистика этих пользователей.
+    """
+    tags = [issue_tag(task_id), redmine_user_tag(current_user.id_redmine_user)]
+    tags.extend(redmine_user_tag(user_id) for user_id in redmine_user_ids)
+    invalidated = cache_manager.invalidate_tags(*tags)
+    current_app.logger.info(f"[API] Сброшено {invalidated} записей кэша задач после изменения задачи {task_id}")
+
+
+def _get_assignee_id(task):
+    return task.assigned_to.id if hasattr(task, 'assigned_to') and task.assigned_to else None
+
 # ===== API ENDPOINTS ДЛЯ ИЗМЕНЕНИЯ СТАТУСА =====
 
 @api_bp.route("/task/<int:task_id>", methods=["GET"])
@@ -509,7 +512,7 @@ def update_task_status(task_id):
                 "message": f"Статус задачи успешно изменен на '{new_status_name}'"
             }
 
-            _invalidate_task_page_caches()
+            _invalidate_task_page_caches(task_id, _get_assignee_id(task))
 
             # Обрабатываем уведомления после изменения статуса
             try:
@@ -771,6 +774,8 @@ def update_task_priority(task_id):
                 "message": f"Приоритет задачи успешно изменен на '{new_priority_name}'"
             }
 
+            _invalidate_task_page_caches(task_id, _get_assignee_id(task))
+
             # Обрабатываем уведомления после изменения приоритета
             try:
                 from blog.notification_service import check_notifications_improved
@@ -982,7 +987,7 @@ def update_task_assignee(task_id):
         try:
             # Получаем задачу для проверки прав доступа
             task = redmine_connector.redmine.issue.get(task_id)
-            old_assignee_id = task.assigned_to.id if hasattr(task, 'assigned_to') and task.assigned_to else None
+            old_assignee_id = _get_assignee_id(task)
 
             current_app.logger.info(f"[API] Задача {task_id}: текущий исполнитель {old_assignee_id} -> новый исполнитель {new_assignee_id}")
 
@@ -1048,6 +1053,8 @@ def update_task_assignee(task_id):
                 "message": ("Назначение исполнителя снято" if new_assignee_id is None else f"Исполнитель задачи успешно изменен на '{new_assignee_name}'")
             }
 
+            _invalidate_task_page_caches(task_id, old_assignee_id, new_assignee_id)
+
             # Обрабатываем уведомления после изменения исполнителя
             try:
                 from blog.notification_service import check_notifications_improved
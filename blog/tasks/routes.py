@@ -10,7 +10,7 @@ import traceback # Добавлен traceback
 import os
 # from redmine import RedmineConnector, ... (и другие из redmine.py)
 # from erp_oracle import connect_oracle, ... (и другие из erp_oracle.py)
-from blog.utils.cache_manager import weekend_performance_optimizer, tasks_cache_optimizer # Добавлен tasks_cache_optimizer
+from blog.utils.cache_manager import weekend_performance_optimizer, tasks_cache_optimizer, cache_manager, UncachedResult, redmine_user_tag, issue_tag # Добавлен tasks_cache_optimizer
 from blog.models import User, Notifications, NotificationsAddNotes # Исправлены имена моделей
 from redmine import RedmineConnector # Правильный путь импорта
 from erp_oracle import connect_oracle, get_user_erp_password, db_host, db_port, db_service_name, db_user_name, db_password # Правильный путь импорта
@@ -61,6 +61,14 @@ from werkzeug.utils import secure_filename
 # Константы для анонимного пользователя (из main/routes.py)
 ANONYMOUS_USER_ID = 4  # ID анонимного пользователя в Redmine
 DEFAULT_STATIC_ASSET_VERSION = "20260211"
+# Кэши страницы задач сбрасываются по тегам при изменении задач (см. api_routes._invalidate_task_page_caches)
+# во всех воркерах (Redis или файл cache_manager.init_tag_spool), поэтому TTL ограничивает
+# только изменения, сделанные напрямую в Redmine
+TASKS_STATS_CACHE_TTL = 300
+TASKS_KANBAN_CACHE_TTL = 120
+# Сколько секунд после истечения TTL можно отдавать статистику/фильтры, пока они пересчитываются в фоне
+TASKS_STATS_STALE_TTL = 120
+TASKS_FILTERS_STALE_TTL = 600
 
 
 def _parse_bool_query_param(value, default=False):
@@ -108,26 +116,11 @@ def _append_sql_in_filter(where_clauses, params, column_name, values):
     params.extend(values)
 
 
-def _get_direct_sql_cache_store():
-    cache_store = getattr(current_app, '_tasks_direct_sql_cache', None)
-    if cache_store is None:
-        cache_store = {}
-        current_app._tasks_direct_sql_cache = cache_store
-    return cache_store
+def _request_cache_key():
+    """Ключ кэша для ответа API: пользователь + строка запроса."""
+    return f"{current_user.id}:{request.query_string.decode('utf-8', 'replace')}"
 
 
-def _prune_direct_sql_cache(cache_store, ttl_seconds):
-    if not cache_store:
-        return
-
-    now = time.time()
-    expired_keys = [
-        key for key, value in cache_store.items()
-        if now - value.get('ts', 0) >= ttl_seconds
-    ]
-    for key in expired_keys:
-        cache_store.pop(key, None)
-
 def get_support_email():
     """
     Получает email службы технической поддержки из конфига
@@ -652,26 +645,35 @@ def get_my_tasks_paginated_api():
 @login_required
 def get_my_tasks_statistics_optimized():
     """API для получения статистики задач"""
+    # Кэш per-user and query string, namespace "tasks_stats" с тегом пользователя Redmine: одновременные
+    # запросы (вкладки, виджеты страницы) ждут одного расчёта, устаревшее значение
+    # отдаётся сразу и обновляется в фоне
+    try:
+        data = cache_manager.get_or_set(
+            _request_cache_key(),
+            _build_my_tasks_statistics,
+            ttl=TASKS_STATS_CACHE_TTL,
+            namespace="tasks_stats",
+            stale_ttl=TASKS_STATS_STALE_TTL,
+            tags=[redmine_user_tag(current_user.id_redmine_user)],
+        )
+    except UncachedResult as uncached:
+        payload, status_code = uncached.value
+        return jsonify(payload), status_code
+    return jsonify(data)
+
+
+def _build_my_tasks_statistics():
+    """Считает статистику задач текущего пользователя; ошибки возвращаются через UncachedResult."""
     try:
-        # === In-memory cache (60s) per-user and query string ===
-        try:
-            import time as _t
-            if not hasattr(current_app, '_tasks_stats_cache'):
-                current_app._tasks_stats_cache = {}
-            _key = (current_user.id, bytes(request.query_string))
-            _entry = current_app._tasks_stats_cache.get(_key)
-            if _entry and (_t.time() - _entry['ts'] < 60):
-                return jsonify(_entry['data'])
-        except Exception:
-            pass
         if not current_user.is_redmine_user:
-            return jsonify({
+            raise UncachedResult(({
                 "error": "У вас нет доступа к модулю 'Мои задачи'.",
                 "total_tasks": 0,
                 "new_tasks": 0,
                 "in_progress_tasks": 0,
                 "closed_tasks": 0
-            }), 403
+            }, 403))
 
         # Создаем коннектор Redmine
         redmine_connector = create_redmine_connector(
@@ -688,7 +690,7 @@ def get_my_tasks_statistics_optimized():
                 "in_progress_tasks": 0,
                 "closed_tasks": 0
             }
-            return jsonify(payload), 500
+            raise UncachedResult((payload, 500))
 
         # Получаем ID пользователя Redmine из SQLite (НЕ из Redmine API!)
         redmine_user_id = current_user.id_redmine_user
@@ -701,13 +703,13 @@ def get_my_tasks_statistics_optimized():
         mysql_conn = get_connection(db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port)
         if not mysql_conn:
             current_app.logger.error(f"❌ [STATISTICS] Не удалось подключиться к MySQL для подсчета статистики")
-            return jsonify({
+            raise UncachedResult(({
                 "error": "Ошибка подключения к базе данных статистики",
                 "total_tasks": 0,
                 "new_tasks": 0,
                 "in_progress_tasks": 0,
                 "closed_tasks": 0
-            }), 500
+            }, 500))
 
         cursor = mysql_conn.cursor()
 
@@ -844,13 +846,13 @@ def get_my_tasks_statistics_optimized():
             current_app.logger.error(f"❌ [STATISTICS] Ошибка SQL-запросов статистики: {e_sql}")
             cursor.close()
             mysql_conn.close()
-            return jsonify({
+            raise UncachedResult(({
                 "error": f"Ошибка при получении статистики: {str(e_sql)}",
                 "total_tasks": 0,
                 "new_tasks": 0,
                 "in_progress_tasks": 0,
                 "closed_tasks": 0
-            }), 500
+            }, 500))
         finally:
             cursor.close()
             mysql_conn.close()
@@ -909,61 +911,64 @@ def get_my_tasks_statistics_optimized():
                 }
             }
         }
-        try:
-            current_app._tasks_stats_cache[_key] = { 'ts': _t.time(), 'data': data }
-        except Exception:
-            pass
-        return jsonify(data)
+        return data
 
+    except UncachedResult:
+        raise
     except Exception as e:
         current_app.logger.error(f"Ошибка в get_my_tasks_statistics_optimized: {e}")
-        return jsonify({
+        raise UncachedResult(({
             "error": str(e),
             "total_tasks": 0,
             "new_tasks": 0,
             "in_progress_tasks": 0,
             "closed_tasks": 0
-        }), 500
+        }, 500))
 
 @tasks_bp.route("/get-my-tasks-filters-optimized", methods=["GET"])
 @login_required
 def get_my_tasks_filters_optimized():
     """ОПТИМИЗИРОВАННЫЙ API для получения фильтров задач с использованием прямых SQL запросов"""
+    if not current_user.is_redmine_user:
+        return jsonify({
+            "error": "У вас нет доступа к модулю 'Мои задачи'.",
+            "statuses": [],
+            "projects": [],
+            "priorities": []
+        }), 403
+
+    # Короткий кеш фильтров (namespace "tasks_filters"): данные редко меняются, но запрашиваются часто.
+    # Одновременные промахи ждут одного расчёта, устаревшее значение отдаётся сразу и обновляется в фоне.
+    try:
+        response_payload = cache_manager.get_or_set(
+            "global",
+            _build_my_tasks_filters,
+            ttl=300,
+            namespace="tasks_filters",
+            stale_ttl=TASKS_FILTERS_STALE_TTL,
+        )
+    except UncachedResult as uncached:
+        payload, status_code = uncached.value
+        return jsonify(payload), status_code
+    return jsonify(response_payload)
+
+
+def _build_my_tasks_filters():
+    """Загружает статусы, проекты и приоритеты для фильтров; ошибки возвращаются через UncachedResult."""
     start_time = time.time()
 
     current_app.logger.info("🚀 [PERFORMANCE] Запуск ОПТИМИЗИРОВАННОГО API фильтров...")
 
     try:
-        if not current_user.is_redmine_user:
-            return jsonify({
-                "error": "У вас нет доступа к модулю 'Мои задачи'.",
-                "statuses": [],
-                "projects": [],
-                "priorities": []
-            }), 403
-
-        # Короткий кеш фильтров: данные редко меняются, но запрашиваются часто
-        try:
-            now_ts = time.time()
-            cache_ttl = 300
-            cache_key = "global"
-            if not hasattr(current_app, "_tasks_filters_cache"):
-                current_app._tasks_filters_cache = {}
-            cache_entry = current_app._tasks_filters_cache.get(cache_key)
-            if cache_entry and (now_ts - cache_entry["ts"] < cache_ttl):
-                return jsonify(cache_entry["data"])
-        except Exception:
-            pass
-
         # Получаем подключение к MySQL Redmine (ИСПРАВЛЕНО!)
         mysql_conn = get_connection(db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port)
         if not mysql_conn:
-            return jsonify({
+            raise UncachedResult(({
                 "error": "Ошибка подключения к MySQL Redmine",
                 "statuses": [],
                 "projects": [],
                 "priorities": []
-            }), 500
+            }, 500))
 
         cursor = mysql_conn.cursor()
         statuses = []
@@ -1058,27 +1063,21 @@ def get_my_tasks_filters_optimized():
             }
         }
 
-        try:
-            current_app._tasks_filters_cache["global"] = {
-                "ts": time.time(),
-                "data": response_payload
-            }
-        except Exception:
-            pass
-
-        return jsonify(response_payload)
+        return response_payload
 
+    except UncachedResult:
+        raise
     except Exception as e:
         total_time = time.time() - start_time
         current_app.logger.error(f"❌ [PERFORMANCE] Ошибка в оптимизированном API фильтров за {total_time:.3f}с: {e}")
         import traceback
         current_app.logger.error(f"❌ [PERFORMANCE] Traceback: {traceback.format_exc()}")
-        return jsonify({
+        raise UncachedResult(({
             "error": str(e),
             "statuses": [],
             "projects": [],
             "priorities": []
-        }), 500
+        }, 500))
 
 @tasks_bp.route("/get-my-tasks-filters-direct-api", methods=["GET"])
 @login_required
@@ -2100,15 +2099,13 @@ def get_my_tasks_direct_sql():
         project_filter_values = _get_query_filter_values('project_id')
         priority_filter_values = _get_query_filter_values('priority_id')
 
-        cache_ttl_seconds = 10 if view == 'kanban' else 0
+        cache_ttl_seconds = TASKS_KANBAN_CACHE_TTL if view == 'kanban' else 0
         cache_key = None
         if cache_ttl_seconds:
-            cache_store = _get_direct_sql_cache_store()
-            _prune_direct_sql_cache(cache_store, cache_ttl_seconds)
-            cache_key = (current_user.id, bytes(request.query_string))
-            cache_entry = cache_store.get(cache_key)
-            if cache_entry and time.time() - cache_entry.get('ts', 0) < cache_ttl_seconds:
-                return jsonify(cache_entry['data'])
+            cache_key = _request_cache_key()
+            cached_response = cache_manager.get(cache_key, namespace="tasks_direct_sql")
+            if cached_response is not None:
+                return jsonify(cached_response)
 
         # Подключаемся к базе данных
         mysql_conn = get_connection(db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port)
@@ -2295,11 +2292,9 @@ def get_my_tasks_direct_sql():
                 response_data["status_counts"] = kanban_status_counts
 
             if cache_ttl_seconds and cache_key is not None:
-                cache_store = _get_direct_sql_cache_store()
-                cache_store[cache_key] = {
-                    'ts': time.time(),
-                    'data': response_data
-                }
+                cache_tags = [redmine_user_tag(current_user.id_redmine_user)]
+                cache_tags.extend(issue_tag(task['id']) for task in tasks)
+                cache_manager.set(cache_key, response_data, ttl=cache_ttl_seconds, namespace="tasks_direct_sql", tags=cache_tags)
 
             return jsonify(response_data)
 
@@ -1,13 +1,17 @@
 # blog/tasks/utils.py
 import traceback
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from flask import current_app
 from flask import request
 from datetime import date, datetime
 
 # Импорты из корневой директории проекта
 from redmine import RedmineConnector # Исправленный импорт
-from redmine import get_connection, db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name
+from redmine import get_connection, db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, db_redmine_port
 
 # ANONYMOUS_USER_ID будет браться из get('redmine', 'api_key') в create_redmine_connector для анонимных случаев,
 # или должен быть получен через get('redmine', 'anonymous_user_id') если нужен именно ID.
@@ -31,6 +35,110 @@ def _tasks_debug_log(level, message, *args, **kwargs):
         log_method(message, *args, **kwargs)
 
 
+class RedmineConnectorPool:
+    """
+    Ограниченный LRU-пул коннекторов Redmine на процесс.
+
+    Ключ - отпечаток учетных данных (логин/пароль или API ключ), поэтому
+    коннектор с keep-alive сессией requests переиспользуется между запросами
+    одного пользователя. Запись удаляется после idle_ttl секунд простоя.
+    Успешная проверка /users/current запоминается на auth_ttl секунд.
+
+    Сессия закрывается только у записи, простоявшей idle_ttl. Вытесненный
+    из LRU, замененный или не прошедший проверку коннектор лишь убирается из
+    пула: его может еще использовать другой поток, а сессию requests
+    освободит сборщик мусора, когда коннектор никому не будет нужен.
+    """
+
+    def __init__(self, max_size=64, idle_ttl=600, auth_ttl=300):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.auth_ttl = auth_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, user_login=None, password=None, api_key=None):
+        raw_key = "\x1f".join(str(part or "") for part in (url, user_login, password, api_key))
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry["last_used"] > self.idle_ttl:
+                self._close_entry(self._entries.pop(key))
+                return None
+            entry["last_used"] = now
+            self._entries.move_to_end(key)
+            return entry["connector"]
+
+    def put(self, key, connector):
+        now = time.monotonic()
+        connector._pool_key = key
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                "connector": connector,
+                "last_used": now,
+                "auth_valid_until": 0.0,
+            }
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return connector
+
+    def invalidate(self, key):
+        """Убирает коннектор из пула, не закрывая сессию, которой пользуются другие потоки"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def is_authenticated(self, connector):
+        """Проверяет аутентификацию с учетом запомненного успешного результата"""
+        key = getattr(connector, "_pool_key", None)
+        now = time.monotonic()
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["auth_valid_until"] > now:
+                    return True
+
+        if not connector.is_user_authenticated():
+            if key is not None:
+                self.invalidate(key)
+            return False
+
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["auth_valid_until"] = now + self.auth_ttl
+        return True
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close_entry(entry)
+
+    @staticmethod
+    def _close_entry(entry):
+        try:
+            session = entry["connector"].redmine.engine.session
+            session.close()
+        except Exception:
+            pass
+
+
+redmine_connector_pool = RedmineConnectorPool(
+    max_size=int(os.getenv('REDMINE_CONNECTOR_POOL_SIZE', '64')),
+    idle_ttl=int(os.getenv('REDMINE_CONNECTOR_POOL_IDLE_TTL', '600')),
+    auth_ttl=int(os.getenv('REDMINE_CONNECTOR_POOL_AUTH_TTL', '300')),
+)
+
+
 def _should_include_description():
     return request.args.get('with_description') == '1'
 
@@ -38,6 +146,28 @@ def _should_include_description():
 def _should_search_in_description():
     return request.args.get('search_in_description') == '1' or _should_include_description()
 
+
+# Поиск и фильтрация по именам выполняются SQL-запросом к MySQL Redmine
+# (on/off). При off или ошибке MySQL используется прежняя фильтрация в Python.
+TASKS_SQL_SEARCH = os.getenv('TASKS_SQL_SEARCH', 'on').lower()
+
+# Завершённые статусы (5=Закрыта, 6=Отклонена, 14=Перенаправлена)
+COMPLETED_STATUS_IDS = ('5', '6', '14')
+
+# Сопоставление сортировки Redmine API со столбцами SQL-запроса
+SQL_SORT_COLUMNS = {
+    'id': 'i.id',
+    'project.name': 'p.name',
+    'tracker.name': 't.name',
+    'status.name': 'us.name',
+    'priority.name': 'e.position',
+    'subject': 'i.subject',
+    'assigned_to.name': 'ua.lastname',
+    'updated_on': 'i.updated_on',
+    'created_on': 'i.created_on',
+    'due_date': 'i.due_date',
+}
+
 def create_redmine_connector(is_redmine_user, user_login, password=None, api_key_param=None):
     try:
         # Получаем URL Redmine из переменных окружения
@@ -74,6 +204,12 @@ def create_redmine_connector(is_redmine_user, user_login, password=None, api_key
                 current_app.logger.error(f"Недостаточно данных для пользователя Redmine - login: {user_login}, password: {'***' if password else 'None'}")
                 return None
 
+            pool_key = RedmineConnectorPool.make_key(url, user_login, password, effective_api_key)
+            connector = redmine_connector_pool.get(pool_key)
+            if connector is not None:
+                _tasks_debug_log('info', "Коннектор для пользователя Redmine %s взят из пула", user_login)
+                return connector
+
             connector = RedmineConnector(
                 url=url,
                 username=user_login,
@@ -81,12 +217,18 @@ def create_redmine_connector(is_redmine_user, user_login, password=None, api_key
                 api_key=effective_api_key
             )
             _tasks_debug_log('info', "Создан коннектор для пользователя Redmine: %s", user_login)
-            return connector
+            return redmine_connector_pool.put(pool_key, connector)
         else:
             if not effective_api_key:
                 current_app.logger.error("API ключ не найден для анонимного пользователя")
                 return None
 
+            pool_key = RedmineConnectorPool.make_key(url, api_key=effective_api_key)
+            connector = redmine_connector_pool.get(pool_key)
+            if connector is not None:
+                _tasks_debug_log('info', "Коннектор с API ключом взят из пула")
+                return connector
+
             connector = RedmineConnector(
                 url=url,
                 username=None,
@@ -94,7 +236,7 @@ def create_redmine_connector(is_redmine_user, user_login, password=None, api_key
                 api_key=effective_api_key
             )
             _tasks_debug_log('info', "Создан коннектор для анонимного пользователя")
-            return connector
+            return redmine_connector_pool.put(pool_key, connector)
 
     except Exception as e:
         current_app.logger.error(f"Ошибка при создании коннектора Redmine: {e}")
@@ -125,7 +267,7 @@ def get_redmine_connector(current_user_obj, user_password_erp):
                 )
 
                 if redmine_conn_system and hasattr(redmine_conn_system, 'is_user_authenticated'):
-                    if redmine_conn_system.is_user_authenticated():
+                    if redmine_connector_pool.is_authenticated(redmine_conn_system):
                         current_app.logger.info(f"✅ Системный API ключ успешно использован для пользователя {username}")
                         return redmine_conn_system
                     current_app.logger.warning(
@@ -147,7 +289,7 @@ def get_redmine_connector(current_user_obj, user_password_erp):
         )
 
         if redmine_conn and hasattr(redmine_conn, 'is_user_authenticated'):
-            if redmine_conn.is_user_authenticated():
+            if redmine_connector_pool.is_authenticated(redmine_conn):
                 current_app.logger.info(f"✅ Аутентификация по паролю успешна для пользователя {username}")
                 return redmine_conn
             else:
@@ -164,7 +306,7 @@ def get_redmine_connector(current_user_obj, user_password_erp):
             )
 
             if redmine_conn_api and hasattr(redmine_conn_api, 'is_user_authenticated'):
-                if redmine_conn_api.is_user_authenticated():
+                if redmine_connector_pool.is_authenticated(redmine_conn_api):
                     current_app.logger.info(f"✅ Аутентификация по API ключу успешна для пользователя {username}")
                     return redmine_conn_api
                 else:
@@ -182,7 +324,7 @@ def get_redmine_connector(current_user_obj, user_password_erp):
             )
 
             if redmine_conn_system and hasattr(redmine_conn_system, 'is_user_authenticated'):
-                if redmine_conn_system.is_user_authenticated():
+                if redmine_connector_pool.is_authenticated(redmine_conn_system):
                     current_app.logger.info(f"✅ Fallback к системному API успешен для пользователя {username} (режим только чтения)")
                     return redmine_conn_system
                 current_app.logger.warning(
@@ -205,14 +347,10 @@ def get_redmine_connector(current_user_obj, user_password_erp):
 def get_user_redmine_password(username):
     """Получает оригинальный пароль пользователя из Oracle для подключения к Redmine"""
     try:
-        from erp_oracle import connect_oracle, get_user_erp_password, db_host, db_port, db_service_name, db_user_name, db_password
-
-        oracle_conn = connect_oracle(db_host, db_port, db_service_name, db_user_name, db_password)
-        if not oracle_conn:
-            current_app.logger.error("Не удалось подключиться к Oracle для получения пароля")
-            return None
+        from erp_oracle import fetch_user_erp_password
 
-        user_password_erp = get_user_erp_password(oracle_conn, username)
+        # Кеш учетных данных + пул соединений Oracle (см. erp_oracle)
+        user_password_erp = fetch_user_erp_password(username)
         if not user_password_erp:
             current_app.logger.error(f"Не удалось получить пароль для пользователя {username} из ERP")
             return None
@@ -367,6 +505,138 @@ def get_accurate_task_count(redmine_connector, filter_params):
         current_app.logger.warning(f"Ошибка точного подсчета: {str(e)}. Trace: {traceback.format_exc()}")
         return None
 
+def _escape_sql_like(value):
+    """Экранирует спецсимволы LIKE, чтобы поисковая строка искалась буквально."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_user_assigned_tasks_sql(
+        redmine_user_id, page=1, per_page=25, search_term='', search_in_description=False,
+        name_filters=None, status_id=None, project_id=None, priority_id=None, issue_id=None,
+        all_statuses=False, exclude_completed=False, sort_column='updated_on', sort_direction='desc'
+    ):
+    """
+    Ищет задачи пользователя напрямую в MySQL Redmine (как /tasks/get-my-tasks-direct-sql).
+
+    Текстовый поиск (subject и, опционально, description), фильтры по имени
+    статуса/проекта/приоритета, сортировка и пагинация выполняются в SQL.
+    Фильтры по статусу повторяют семантику Redmine API: без status_id
+    возвращаются только открытые задачи, project_id включает подпроекты.
+
+    Возвращает (список ID задач текущей страницы, точное общее количество)
+    или None, если MySQL недоступен.
+    """
+    mysql_conn = get_connection(db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port)
+    if not mysql_conn:
+        return None
+
+    name_filters = name_filters or {}
+    from_sql = """
+        FROM issues i
+        LEFT JOIN projects p ON i.project_id = p.id
+        LEFT JOIN trackers t ON i.tracker_id = t.id
+        LEFT JOIN u_statuses us ON i.status_id = us.id
+        LEFT JOIN issue_statuses ist ON i.status_id = ist.id
+        LEFT JOIN enumerations e ON i.priority_id = e.id AND e.type = 'IssuePriority'
+        LEFT JOIN u_Priority up ON e.id = up.id
+        LEFT JOIN users ua ON i.assigned_to_id = ua.id
+    """
+    where_clauses = ["i.assigned_to_id = %s"]
+    params = [redmine_user_id]
+
+    status_id = str(status_id).strip() if status_id else ''
+    if all_statuses or status_id == '*':
+        pass
+    elif status_id == 'closed':
+        where_clauses.append("ist.is_closed = 1")
+    elif status_id and status_id != 'open':
+        where_clauses.append("i.status_id = %s")
+        params.append(status_id)
+    else:
+        where_clauses.append("ist.is_closed = 0")
+
+    if exclude_completed:
+        where_clauses.append(f"i.status_id NOT IN ({', '.join(['%s'] * len(COMPLETED_STATUS_IDS))})")
+        params.extend(COMPLETED_STATUS_IDS)
+
+    if project_id:
+        # Как и Redmine API, фильтр по проекту включает его подпроекты
+        where_clauses.append(
+            "i.project_id IN (SELECT child.id FROM projects child "
+            "JOIN projects parent ON child.lft >= parent.lft AND child.rgt <= parent.rgt "
+            "WHERE parent.id = %s)"
+        )
+        params.append(project_id)
+
+    if priority_id:
+        where_clauses.append("i.priority_id = %s")
+        params.append(priority_id)
+
+    if issue_id:
+        where_clauses.append("i.id = %s")
+        params.append(issue_id)
+
+    # Имена сравниваются и с локализованными, и с исходными названиями Redmine
+    if name_filters.get('status_name'):
+        where_clauses.append("(us.name = %s OR ist.name = %s)")
+        params.extend([name_filters['status_name']] * 2)
+    if name_filters.get('project_name'):
+        where_clauses.append("p.name = %s")
+        params.append(name_filters['project_name'])
+    if name_filters.get('priority_name'):
+        where_clauses.append("(up.name = %s OR e.name = %s)")
+        params.extend([name_filters['priority_name']] * 2)
+
+    search_term = (search_term or '').strip()
+    if search_term:
+        like_value = f"%{_escape_sql_like(search_term)}%"
+        if search_in_description:
+            where_clauses.append("(i.subject LIKE %s OR i.description LIKE %s)")
+            params.extend([like_value, like_value])
+        else:
+            where_clauses.append("i.subject LIKE %s")
+            params.append(like_value)
+
+    where_sql = " WHERE " + " AND ".join(where_clauses)
+    order_column = SQL_SORT_COLUMNS.get(sort_column, 'i.updated_on')
+    order_direction = 'ASC' if str(sort_direction).lower() == 'asc' else 'DESC'
+
+    cursor = mysql_conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) AS total_count" + from_sql + where_sql, params)
+        count_row = cursor.fetchone()
+        total_count = int(count_row['total_count']) if count_row else 0
+
+        if total_count == 0:
+            return [], 0
+
+        cursor.execute(
+            "SELECT i.id" + from_sql + where_sql
+            + f" ORDER BY {order_column} {order_direction}, i.id {order_direction} LIMIT %s OFFSET %s",
+            [*params, per_page, (page - 1) * per_page]
+        )
+        issue_ids = [row['id'] for row in cursor.fetchall()]
+        return issue_ids, total_count
+    finally:
+        cursor.close()
+        mysql_conn.close()
+
+
+def _fetch_issues_by_ids(redmine_connector, issue_ids, includes):
+    """Загружает задачи по списку ID одним запросом к API, сохраняя порядок ID."""
+    if not issue_ids:
+        return []
+
+    issues = redmine_connector.redmine.issue.filter(
+        issue_id=','.join(str(issue_id) for issue_id in issue_ids),
+        status_id='*',
+        include=includes,
+        limit=len(issue_ids),
+    )
+    issues_by_id = {issue.id: issue for issue in issues}
+    return [issues_by_id[issue_id] for issue_id in issue_ids if issue_id in issues_by_id]
+
+
 def get_user_assigned_tasks_paginated_optimized(
         redmine_connector, redmine_user_id, page=1, per_page=25,
         search_term='', sort_column='updated_on', sort_direction='desc',
@@ -486,6 +756,43 @@ def get_user_assigned_tasks_paginated_optimized(
         # Объединение логики текстового поиска и фильтрации по имени
         use_python_search_or_filter = use_python_only_search or use_python_filtering
 
+        # Поиск и фильтрация по именам: выполняем в MySQL с LIMIT/OFFSET и точным COUNT(*),
+        # а из Redmine API загружаем только задачи текущей страницы
+        if use_python_search_or_filter and TASKS_SQL_SEARCH == 'on':
+            try:
+                sql_result = search_user_assigned_tasks_sql(
+                    redmine_user_id,
+                    page=page,
+                    per_page=per_page,
+                    search_term=search_term if use_python_only_search else '',
+                    search_in_description=search_in_description,
+                    name_filters=python_filters,
+                    status_id=status_ids[0] if status_ids and isinstance(status_ids, list) else None,
+                    project_id=project_ids[0] if project_ids and isinstance(project_ids, list) else None,
+                    priority_id=priority_ids[0] if priority_ids and isinstance(priority_ids, list) else None,
+                    issue_id=filter_params.get('issue_id'),
+                    all_statuses=force_load,
+                    exclude_completed=exclude_completed,
+                    sort_column=sort_column,
+                    sort_direction=sort_direction,
+                )
+            except Exception as sql_error:
+                current_app.logger.warning(f"SQL-поиск задач недоступен, используется фильтрация в Python: {sql_error}")
+                sql_result = None
+
+            if sql_result is not None:
+                issue_ids, total_count_final = sql_result
+                issues_list_to_return = _fetch_issues_by_ids(redmine_connector, issue_ids, includes_base)
+                _tasks_debug_log(
+                    'info',
+                    "SQL search ready: page=%s per_page=%s found_on_page=%s total=%s",
+                    page,
+                    per_page,
+                    len(issues_list_to_return),
+                    total_count_final,
+                )
+                return issues_list_to_return, total_count_final
+
         # Выполняем запрос к Redmine REST API
         try:
             if use_python_search_or_filter:
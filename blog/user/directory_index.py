@@ -0,0 +1,206 @@
+"""
+Индекс справочника пользователей для /api/users/search.
+
+Раньше каждый запрос автодополнения загружал из SQLite всех пользователей и
+нормализовал (unicodedata, casefold) все их поля. Теперь нормализованный
+текст (логин, email, ФИО, должность, отдел, офис, телефон и его цифры)
+хранится в памяти процесса вместе с триграммами и отсортированным списком
+слов, а поиск возвращает только id подходящих пользователей.
+
+Индекс перестраивается, когда меняется версия справочника: ее обновляют
+события SQLAlchemy на вставку, изменение и удаление User (через cache_manager
+версия видна и другим воркерам, если подключен Redis). Полная перезагрузка
+раз в full_reload_interval страхует от правок в обход ORM.
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from blog import db
+from blog.models import User
+from blog.utils.cache_manager import cache_manager
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = (
+    "username",
+    "email",
+    "full_name",
+    "position",
+    "department",
+    "office",
+    "phone",
+)
+
+VERSION_NAMESPACE = "user_directory"
+VERSION_KEY = "version"
+
+_WORD_RE = re.compile(r"\w+")
+_NON_DIGIT_RE = re.compile(r"\D")
+_PHONE_QUERY_RE = re.compile(r"^[\d\s()+\-.]+$")
+
+
+def normalize_search_text(value) -> str:
+    """casefold, без диакритики, ё -> е, схлопнутые пробелы"""
+    if value is None:
+        return ""
+
+    text = unicodedata.normalize("NFKD", str(value)).casefold()
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.replace("ё", "е")
+    return " ".join(text.split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class UserDirectoryIndex:
+    """
+    Нормализованный справочник пользователей в памяти процесса.
+
+    Слова запроса от трех символов ищутся как подстрока (пересечение
+    триграммных списков и проверка кандидатов), более короткие — по началу
+    слов. Запрос из цифр и телефонных символов сравнивается с цифрами номера.
+    """
+
+    def __init__(self, full_reload_interval: int = 300):
+        self.full_reload_interval = full_reload_interval
+        self._lock = threading.Lock()
+        self._texts: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._tokens: List[Tuple[str, int]] = []
+        self._local_version = 0
+        self._built_version: Optional[Tuple[int, Optional[str]]] = None
+        self._built_at = 0.0
+
+    def mark_changed(self) -> None:
+        """Сбрасывает индекс в этом процессе и в остальных воркерах"""
+        with self._lock:
+            self._local_version += 1
+        cache_manager.set(
+            VERSION_KEY, f"{os.getpid()}:{time.time_ns()}", namespace=VERSION_NAMESPACE
+        )
+
+    def _current_version(self) -> Tuple[int, Optional[str]]:
+        return self._local_version, cache_manager.get(VERSION_KEY, namespace=VERSION_NAMESPACE)
+
+    def ensure_fresh(self) -> None:
+        version = self._current_version()
+        if (
+            version == self._built_version
+            and time.time() - self._built_at < self.full_reload_interval
+        ):
+            return
+        with self._lock:
+            version = self._current_version()
+            if (
+                version == self._built_version
+                and time.time() - self._built_at < self.full_reload_interval
+            ):
+                return
+            self._build(self._load_rows())
+            self._built_version = version
+            self._built_at = time.time()
+
+    @staticmethod
+    def _load_rows():
+        columns = [User.id] + [getattr(User, field) for field in SEARCH_FIELDS]
+        return db.session.query(*columns).all()
+
+    def _build(self, rows) -> None:
+        texts = {}
+        postings: Dict[str, Set[int]] = {}
+        tokens = []
+        for row in rows:
+            user_id = row[0]
+            parts = [normalize_search_text(value) for value in row[1:] if value]
+            phone = row[SEARCH_FIELDS.index("phone") + 1]
+            digits = _NON_DIGIT_RE.sub("", phone) if phone else ""
+            if digits:
+                parts.append(digits)
+            text = " ".join(part for part in parts if part)
+            texts[user_id] = text
+            for trigram in _trigrams(text):
+                postings.setdefault(trigram, set()).add(user_id)
+            tokens.extend((token, user_id) for token in set(_WORD_RE.findall(text)))
+        tokens.sort()
+
+        # Подменяем структуры целиком: поиск без блокировки видит старый или новый индекс
+        self._texts, self._postings, self._tokens = texts, postings, tokens
+        logger.info(f"Индекс пользователей перестроен: {len(texts)} записей")
+
+    def search(self, query: str) -> Set[int]:
+        """id пользователей, у которых все слова запроса встречаются в полях"""
+        self.ensure_fresh()
+        normalized = normalize_search_text(query)
+        if not normalized:
+            return set()
+        if _PHONE_QUERY_RE.match(normalized):
+            digits = _NON_DIGIT_RE.sub("", normalized)
+            words = [digits] if len(digits) >= 3 else _WORD_RE.findall(normalized)
+        else:
+            words = _WORD_RE.findall(normalized) or [normalized]
+
+        texts, postings, tokens = self._texts, self._postings, self._tokens
+        matched: Optional[Set[int]] = None
+        for word in sorted(words, key=len, reverse=True):
+            if len(word) < 3:
+                candidates = self._prefix_match(tokens, word)
+            else:
+                candidates = self._substring_match(texts, postings, word, matched)
+            matched = candidates if matched is None else matched & candidates
+            if not matched:
+                return set()
+        return matched or set()
+
+    @staticmethod
+    def _substring_match(texts, postings, word, within) -> Set[int]:
+        lists = []
+        for trigram in _trigrams(word):
+            ids = postings.get(trigram)
+            if not ids:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = set(lists[0]) if within is None else within & lists[0]
+        for ids in lists[1:]:
+            candidates &= ids
+        return {user_id for user_id in candidates if word in texts[user_id]}
+
+    @staticmethod
+    def _prefix_match(tokens, prefix) -> Set[int]:
+        result = set()
+        position = bisect.bisect_left(tokens, (prefix, -1))
+        while position < len(tokens) and tokens[position][0].startswith(prefix):
+            result.add(tokens[position][1])
+            position += 1
+        return result
+
+
+user_directory_index = UserDirectoryIndex(
+    full_reload_interval=int(os.getenv("USER_DIRECTORY_RELOAD_INTERVAL", "300"))
+)
+
+
+def _user_inserted_or_deleted(mapper, connection, target):
+    user_directory_index.mark_changed()
+
+
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS):
+        user_directory_index.mark_changed()
+
+
+event.listen(User, "after_insert", _user_inserted_or_deleted)
+event.listen(User, "after_delete", _user_inserted_or_deleted)
+event.listen(User, "after_update", _user_updated)
@@ -2,11 +2,9 @@ import shutil
 import logging
 import os
 import traceback
-import unicodedata
 from configparser import ConfigParser
 from datetime import datetime, timedelta
 import time
-from apscheduler.jobstores.base import JobLookupError
 import oracledb
 import sqlalchemy
 from sqlalchemy import func, or_, text
@@ -32,10 +30,11 @@ import requests
 from flask_login import current_user, logout_user, login_required, login_user, AnonymousUserMixin
 from sqlalchemy.orm import sessionmaker, load_only
 from werkzeug.utils import redirect
-from blog import db, scheduler
+from blog import db
 from blog.models import User, Post, PushSubscription
 from blog.user.forms import RegistrationForm, LoginForm, UpdateAccountForm
 from blog.user.utils import save_picture, random_avatar, quality_control_required, validate_user_image_path
+from blog.user.directory_index import user_directory_index
 from erp_oracle import (
     connect_oracle,
     db_host,
@@ -43,6 +42,7 @@ from erp_oracle import (
     db_service_name,
     db_user_name,
     db_password,
+    erp_credential_cache,
     get_user_erp_data,
     get_user_erp_password,
 )
@@ -400,7 +400,7 @@ def handle_successful_login(user: User, form: LoginForm):
         # чтобы соединение с ней устанавливалось только после авторизации
         init_quality_db()
 
-        check_notifications_and_start_scheduler(user.email, user.id)
+        check_notifications_on_login(user.email, user.id)
 
         flash(f"Вы вошли как пользователь {user.username}", "success")
 
@@ -417,8 +417,8 @@ def handle_successful_login(user: User, form: LoginForm):
         return redirect(url_for("users.login"))
 
 
-def check_notifications_and_start_scheduler(email, user_id):
-    logger.debug(f"[DEBUG] Запуск функции check_notifications_and_start_scheduler для пользователя ID: {user_id}, Email: {email}")
+def check_notifications_on_login(email, user_id):
+    logger.debug(f"[DEBUG] Запуск функции check_notifications_on_login для пользователя ID: {user_id}, Email: {email}")
 
     # Добавляем диагностику уведомлений
     try:
@@ -439,14 +439,8 @@ def check_notifications_and_start_scheduler(email, user_id):
         import traceback
         logger.error(traceback.format_exc())
 
-    # Запускаем задачу планировщика
-    try:
-        logger.debug(f"[DEBUG] Запуск планировщика start_user_job({email}, {user_id}, 60)")
-        start_user_job(email, user_id, 60)
-    except Exception as e:
-        logger.error(f"[DEBUG] Ошибка при запуске планировщика: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+    # Дальше уведомления проверяет одна глобальная задача планировщика
+    # (blog.scheduler_tasks), персональных задач на пользователя больше нет
 
 
 def setup_user_as_online(user):
@@ -486,81 +480,6 @@ def setup_user_as_offline(user):
             break
 
 
-def start_user_job(current_user_email, current_user_id, timeout):
-    job_id = f"notification_job_{current_user_id}"
-    logger.debug(f"[SCHEDULER] Попытка добавить/обновить задачу: {job_id} с интервалом {timeout} сек.")
-    try:
-
-        # Проверяем доступ к планировщику и модулю notification_service
-        from blog.notification_service import check_notifications_improved
-        logger.debug(f"[DEBUG] Модуль notification_service доступен, импортирован успешно")
-        logger.debug(f"[DEBUG] Функция check_notifications_improved доступна: {hasattr(check_notifications_improved, '__call__')}")
-
-        # Создаем обертку, которая будет выполняться в контексте приложения
-        # Получаем реальный объект приложения, так как current_app недоступен в фоновом потоке
-        app_obj = current_app._get_current_object()
-
-        def job_function():
-            with app_obj.app_context():
-                check_notifications_improved(current_user_email, current_user_id)
-
-        scheduler.add_job( # <--- Используем импортированный scheduler
-            func=job_function,  # Используем обернутую функцию
-            trigger="interval",
-            # args теперь не нужны, так как они передаются через замыкание в job_function
-            seconds=timeout,
-            id=job_id,  # Уникальный идентификатор для задачи этого пользователя
-            replace_existing=True,  # Заменяем предыдущую задачу, если она существовала
-        )
-        logger.debug(f"[SCHEDULER] Задача {job_id} успешно добавлена/обновлена.")
-    except Exception as e:
-        logger.error(f"[SCHEDULER] Ошибка при добавлении/обновлении задачи {job_id}: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        logger.error(f"[SCHEDULER] Ошибка при добавлении/обновлении задачи {job_id}: {e}", exc_info=True)
-
-    if not scheduler.running: # <--- Используем импортированный scheduler
-        try:
-            scheduler.start() # <--- Используем импортированный scheduler
-            logger.debug("[SCHEDULER] Планировщик стартовал.")
-        except Exception as e:
-            logger.error(f"[SCHEDULER] Ошибка при старте планировщика: {e}")
-            logger.error(f"[SCHEDULER] Ошибка при старте планировщика: {e}", exc_info=True)
-
-    # Это сообщение теперь должно появляться благодаря изменению уровня логирования
-    logger.info(f"User-specific job {job_id} successfully started or updated.")
-
-
-def stop_user_job(user_id):
-    """Остановка задачи планировщика для конкретного пользователя"""
-    try:
-        job_id = f"notification_job_{user_id}"
-        logger.debug(f"[SCHEDULER] Попытка остановить задачу: {job_id}")
-
-        # global scheduler_instance # Больше не нужна
-        if scheduler is None: # <--- Проверяем импортированный scheduler
-            logger.warning(f"[SCHEDULER] Планировщик не инициализирован, задача {job_id} не может быть остановлена")
-            return
-
-        # Проверяем, существует ли задача
-        try:
-            job = scheduler.get_job(job_id) # <--- Используем импортированный scheduler
-            if job:
-                scheduler.remove_job(job_id) # <--- Используем импортированный scheduler
-                logger.debug(f"[SCHEDULER] Задача {job_id} успешно остановлена")
-                logging.info(f"User-specific job {job_id} successfully stopped.")
-        except JobLookupError:
-            logger.warning(f"[SCHEDULER] Задача {job_id} не найдена (JobLookupError)")
-            logging.warning(f"User-specific job {job_id} was not found when attempting to stop it.")
-        except Exception as e:
-            logger.error(f"[SCHEDULER] Ошибка при остановке задачи {job_id}: {e}")
-            logging.error(f"Error stopping user-specific job {job_id}: {e}")
-
-    except Exception as e:
-        logger.error(f"[SCHEDULER] Общая ошибка при остановке задачи пользователя {user_id}: {e}")
-        logging.error(f"General error stopping user-specific job for user {user_id}: {e}")
-
-
 @users.route("/account", methods=["GET", "POST"])
 @login_required
 def account():
@@ -741,14 +660,8 @@ def all_users():
         return render_template("users.html", title="Пользователи", users=users_fallback)
 
 
-def _normalize_user_search_text(value):
-    if value is None:
-        return ""
-
-    text = unicodedata.normalize("NFKD", str(value)).casefold()
-    text = "".join(char for char in text if not unicodedata.combining(char))
-    text = text.replace("ё", "е")
-    return " ".join(text.split())
+# Сколько карточек показывать в результатах глобального поиска
+USER_SEARCH_LIMIT = int(os.getenv("USER_SEARCH_LIMIT", "50"))
 
 
 @users.get("/api/users/search")
@@ -763,47 +676,34 @@ def users_search():
         if not query_text:
             return jsonify({"success": True, "html": "", "count": 0})
 
-        normalized_query = _normalize_user_search_text(query_text)
+        matched_ids = user_directory_index.search(query_text)
 
-        users_data = (
-            User.query.options(
-                load_only(
-                    User.id,
-                    User.username,
-                    User.email,
-                    User.full_name,
-                    User.position,
-                    User.department,
-                    User.office,
-                    User.phone,
-                    User.last_seen,
-                    User.online,
-                    User.image_file,
+        matched_users = []
+        if matched_ids:
+            matched_users = (
+                User.query.options(
+                    load_only(
+                        User.id,
+                        User.username,
+                        User.email,
+                        User.full_name,
+                        User.position,
+                        User.department,
+                        User.office,
+                        User.phone,
+                        User.last_seen,
+                        User.online,
+                        User.image_file,
+                    )
                 )
+                .filter(User.id.in_(matched_ids))
+                .order_by(User.last_seen.desc())
+                .limit(USER_SEARCH_LIMIT)
+                .all()
             )
-            .order_by(User.last_seen.desc())
-            .all()
-        )
 
-        from blog.user.utils import batch_validate_user_images
-        users_data = batch_validate_user_images(users_data)
-
-        matched_users = []
-        for user_obj in users_data:
-            searchable_fields = [
-                user_obj.username,
-                user_obj.email,
-                user_obj.full_name,
-                user_obj.position,
-                user_obj.department,
-                user_obj.office,
-                user_obj.phone,
-            ]
-            normalized_blob = " ".join(
-                _normalize_user_search_text(field) for field in searchable_fields if field
-            )
-            if normalized_query in normalized_blob:
-                matched_users.append(user_obj)
+            from blog.user.utils import batch_validate_user_images
+            matched_users = batch_validate_user_images(matched_users)
 
         rendered_cards = render_template(
             "partials/users_cards.html",
@@ -816,6 +716,7 @@ def users_search():
                 "success": True,
                 "html": rendered_cards,
                 "count": len(matched_users),
+                "total": len(matched_ids),
             }
         )
     except Exception as e:
@@ -979,9 +880,6 @@ def logout():
         if not isinstance(current_user, AnonymousUserMixin):
             user_id = current_user.id
 
-            # Останавливаем задачи пользователя
-            stop_user_job(user_id)
-
             try:
                 # Создаем новую сессию для операции
                 session_maker = sessionmaker(bind=db.engine)
@@ -1326,6 +1224,7 @@ def refresh_password():
                 # Обновляем пароль в сессии
                 session["user_password_erp"] = user_password_erp
                 session.modified = True
+                erp_credential_cache.set(current_user.username, user_password_erp)
 
                 # Обновляем пароль в базе данных
                 user = User.query.filter_by(username=current_user.username).first()
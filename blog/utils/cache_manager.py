@@ -1,29 +1,80 @@
 """
 Enhanced cache manager for performance optimization
 """
+import os
 import time
 import json
 import hashlib
 import logging
+import uuid
 from typing import Any, Optional, Dict
 from functools import wraps
-from flask import g
+from flask import g, has_app_context, has_request_context, copy_current_request_context, current_app
 try:
     import redis
 except ImportError:
     redis = None
-from threading import Lock
+from threading import Lock, Event, Thread
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+class UncachedResult(Exception):
+    """Raised by a get_or_set producer to pass a value back without caching it
+
+    Used for error responses: every caller waiting on the same computation
+    receives the exception, and the next request computes the value again.
+    """
+
+    def __init__(self, value: Any):
+        super().__init__("uncached result")
+        self.value = value
+
+
+class _InFlight:
+    """A computation in progress for one cache key (single-flight)"""
+
+    def __init__(self):
+        self.event = Event()
+        self.value = None
+        self.error = None
+
+
 class CacheManager:
-    """Enhanced cache manager with Redis backend and fallback to memory cache"""
+    """Enhanced cache manager with Redis backend and fallback to memory cache
+
+    Keys are grouped into namespaces. Each namespace can be configured with its
+    own TTL, LRU size limit (memory backend) and whether it may be stored in the
+    shared Redis backend. Hits, misses, evictions and expirations are counted
+    per namespace and reported by get_stats().
+    """
+
+    DEFAULT_NAMESPACE = "default"
 
-    def __init__(self, redis_url: str = None, default_ttl: int = 300):
+    def __init__(self, redis_url: str = None, default_ttl: int = 300, max_entries: int = 1000):
         self.default_ttl = default_ttl
-        self.memory_cache = {}
-        self.cache_locks = {}
+        self.max_entries = max_entries
+        # namespace -> OrderedDict(cache_key -> {'value', 'expires'}) in LRU order
+        self.memory_cache: Dict[str, OrderedDict] = {}
+        self.namespaces: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+        # cache_key -> _InFlight for computations started by get_or_set
+        self.cache_locks: Dict[str, _InFlight] = {}
+        # tag -> {(namespace, cache_key)} for tag-based invalidation (memory backend)
+        self.tag_index: Dict[str, set] = {}
+        # Sequence number of the last invalidation per tag, so a computation that
+        # started before an invalidation of its tags is not cached (bounded LRU)
+        self.invalidation_seq = 0
+        self.tag_invalidations: OrderedDict = OrderedDict()
+        self.invalidation_floor = 0
+        self.max_tracked_invalidations = 10000
+        # Append-only file that shares invalidate_tags() between worker processes
+        self.tag_spool_path = None
+        self.tag_spool_max_bytes = 256 * 1024
+        self._tag_spool_offset = 0
+        self._tag_spool_inode = None
         self.lock = Lock()
+        self.single_flight_timeout = 30
 
         # Try to connect to Redis
         self.redis_client = None
@@ -36,6 +87,206 @@ class CacheManager:
                 logger.warning("⚠️ Redis connection failed, using memory cache: %s", e)
                 self.redis_client = None
 
+    def configure_namespace(self, namespace: str, ttl: int = None, max_entries: int = None,
+                            shared: bool = True) -> None:
+        """Set TTL, LRU size limit and shared-backend usage for a namespace.
+
+        shared=False keeps the namespace in process memory even when Redis is
+        available (for values that are not JSON round-trippable).
+        """
+        with self.lock:
+            self.namespaces[namespace] = {
+                'ttl': ttl,
+                'max_entries': max_entries,
+                'shared': shared,
+            }
+
+    def _namespace_name(self, namespace: str = None) -> str:
+        return namespace or self.DEFAULT_NAMESPACE
+
+    def _namespace_option(self, namespace: str, option: str, default: Any) -> Any:
+        value = self.namespaces.get(self._namespace_name(namespace), {}).get(option)
+        return default if value is None else value
+
+    def _uses_shared_backend(self, namespace: str = None) -> bool:
+        return self.redis_client is not None and self._namespace_option(namespace, 'shared', True)
+
+    def _count(self, namespace: str, counter: str, amount: int = 1) -> None:
+        """Increment a per-namespace counter (caller may or may not hold the lock)."""
+        counters = self.counters.get(namespace)
+        if counters is None:
+            counters = self.counters.setdefault(namespace, {
+                'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+                'sets': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+            })
+        counters[counter] += amount
+
+    def _forget_tags(self, namespace_name: str, cache_key: str, entry: Dict[str, Any]) -> None:
+        """Remove a memory entry from the tag index (lock held)"""
+        for tag in entry.get('tags', ()):
+            tagged = self.tag_index.get(tag)
+            if tagged is not None:
+                tagged.discard((namespace_name, cache_key))
+                if not tagged:
+                    del self.tag_index[tag]
+
+    def init_tag_spool(self, path: str, max_bytes: int = 256 * 1024) -> None:
+        """Share invalidate_tags() with other processes through a spool file
+
+        Without Redis every gunicorn worker has its own memory cache, so a tag
+        invalidated in one worker would stay cached in the others until its
+        TTL. Each invalidation appends "<writer> <tag> ..." to the file; before
+        serving a memory entry a process reads lines appended since its last
+        check (one stat() when nothing changed) and evicts those tags too.
+
+        Past max_bytes the file is rotated: a new file holding only a
+        "# <generation>" header is renamed over it. A reader remembers the
+        inode and generation together with its offset, so it notices the
+        rotation however long it stayed idle (even if the inode number is
+        reused), and evicts every tagged entry, since lines of the old file
+        may have been missed. A writer whose line landed in a file rotated
+        away under it appends the line again to the new file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.lock:
+            self.tag_spool_path = path
+            self.tag_spool_max_bytes = max_bytes
+            try:
+                with open(path, "rb") as spool:
+                    stat = os.fstat(spool.fileno())
+                    self._tag_spool_inode = self._spool_identity(spool, stat)
+                    self._tag_spool_offset = stat.st_size
+            except OSError:
+                self._tag_spool_inode = None
+                self._tag_spool_offset = 0
+
+    def _spool_writer_id(self) -> str:
+        # pid alone is not enough for several managers in one process (tests)
+        return f"{os.getpid()}.{id(self)}"
+
+    def _sync_tag_spool(self) -> None:
+        """Apply tag invalidations written by other processes since the last check"""
+        path = self.tag_spool_path
+        if not path:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        known = self._tag_spool_inode
+        if known and (stat.st_dev, stat.st_ino) == known[:2] and stat.st_size == self._tag_spool_offset:
+            return
+
+        with self.lock:
+            try:
+                with open(path, "rb") as spool:
+                    # The file may have been rotated again since stat(): trust the open handle
+                    stat = os.fstat(spool.fileno())
+                    inode = self._spool_identity(spool, stat)
+                    if inode != self._tag_spool_inode or stat.st_size < self._tag_spool_offset:
+                        # Rotated (or truncated in place by hand)
+                        if self._tag_spool_inode is not None:
+                            self._evict_all_tagged()
+                        self._tag_spool_inode = inode
+                        self._tag_spool_offset = 0
+                    if stat.st_size <= self._tag_spool_offset:
+                        return
+                    spool.seek(self._tag_spool_offset)
+                    chunk = spool.read(stat.st_size - self._tag_spool_offset)
+            except OSError as e:
+                logger.warning("⚠️ Cache tag spool read failed: %s", e)
+                return
+            end = chunk.rfind(b"\n") + 1
+            self._tag_spool_offset += end
+
+            own_id = self._spool_writer_id()
+            tags = set()
+            for line in chunk[:end].decode(errors="ignore").splitlines():
+                parts = line.split()
+                if len(parts) > 1 and parts[0] not in (own_id, "#"):
+                    tags.update(parts[1:])
+            if tags:
+                self._evict_tags(tags)
+                self._record_invalidation(tags)
+
+    @staticmethod
+    def _spool_identity(spool, stat) -> tuple:
+        """(device, inode, generation header) of an open spool file"""
+        spool.seek(0)
+        header = spool.readline(64)
+        generation = header.strip() if header.startswith(b"# ") else b""
+        return stat.st_dev, stat.st_ino, generation
+
+    def _evict_all_tagged(self) -> None:
+        """Invalidations may have been missed: drop every tagged entry (lock held)"""
+        self._evict_tags(set(self.tag_index))
+        self.invalidation_seq += 1
+        self.invalidation_floor = self.invalidation_seq
+
+    def _publish_tags(self, tags: set) -> None:
+        if not self.tag_spool_path:
+            return
+        path = self.tag_spool_path
+        data = f"{self._spool_writer_id()} {' '.join(sorted(tags))}\n".encode()
+        try:
+            # Retry once if the file was rotated between open() and write()
+            for _ in range(2):
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    # One O_APPEND write keeps lines of different workers intact
+                    os.write(fd, data)
+                    written = os.fstat(fd)
+                finally:
+                    os.close(fd)
+                try:
+                    current = os.stat(path)
+                except OSError:
+                    continue
+                if (current.st_dev, current.st_ino) == (written.st_dev, written.st_ino):
+                    break
+            if written.st_size > self.tag_spool_max_bytes:
+                self._rotate_tag_spool(path)
+        except OSError as e:
+            logger.warning("⚠️ Cache tag spool write failed: %s", e)
+
+    def _rotate_tag_spool(self, path: str) -> None:
+        """Replace the spool with an empty file (new inode) so readers notice"""
+        fresh = f"{path}.{self._spool_writer_id()}.tmp"
+        fd = os.open(fresh, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, f"# {uuid.uuid4().hex}\n".encode())
+        finally:
+            os.close(fd)
+        os.replace(fresh, path)
+
+    def _record_invalidation(self, tags: set) -> None:
+        """Remember when tags were invalidated (lock held)"""
+        self.invalidation_seq += 1
+        for tag in tags:
+            self.tag_invalidations[tag] = self.invalidation_seq
+            self.tag_invalidations.move_to_end(tag)
+        while len(self.tag_invalidations) > self.max_tracked_invalidations:
+            _, seq = self.tag_invalidations.popitem(last=False)
+            self.invalidation_floor = max(self.invalidation_floor, seq)
+
+    def _invalidated_since(self, tags, seq: int) -> bool:
+        """True if any of tags was (or may have been) invalidated after seq (lock held)"""
+        if self.invalidation_floor > seq:
+            return True
+        return any(self.tag_invalidations.get(tag, 0) > seq for tag in tags)
+
+    def _evict_tags(self, tags) -> int:
+        """Drop memory entries tagged with any of tags (lock held)"""
+        deleted = 0
+        for tag in tags:
+            for namespace_name, cache_key in self.tag_index.pop(tag, set()):
+                segment = self.memory_cache.get(namespace_name)
+                if segment and cache_key in segment:
+                    self._forget_tags(namespace_name, cache_key, segment.pop(cache_key))
+                    self._count(namespace_name, 'invalidations')
+                    deleted += 1
+        return deleted
+
     def _generate_key(self, key: str, namespace: str = None) -> str:
         """Generate a cache key with optional namespace"""
         if namespace:
@@ -64,25 +315,51 @@ class CacheManager:
             logger.error("❌ Failed to deserialize cache value: %s", e)
             return value
 
+    def _memory_get(self, cache_key: str, namespace_name: str, allow_stale: bool = False) -> Optional[Any]:
+        """Read a live entry from the memory backend and mark it recently used (lock held)
+
+        Expired entries are kept until their stale window ends; they are only
+        returned when allow_stale is set.
+        """
+        segment = self.memory_cache.get(namespace_name)
+        if not segment or cache_key not in segment:
+            return None
+
+        cached_item = segment[cache_key]
+        now = time.time()
+        if now >= cached_item['expires']:
+            if now < cached_item.get('stale_until', 0):
+                return cached_item if allow_stale else None
+            del segment[cache_key]
+            self._forget_tags(namespace_name, cache_key, cached_item)
+            self._count(namespace_name, 'expirations')
+            return None
+
+        segment.move_to_end(cache_key)
+        return cached_item
+
     def get(self, key: str, namespace: str = None) -> Optional[Any]:
         """Get value from cache"""
         cache_key = self._generate_key(key, namespace)
+        namespace_name = self._namespace_name(namespace)
 
         try:
-            if self.redis_client:
-                value = self.redis_client.get(cache_key)
-                if value:
-                    return self._deserialize_value(value)
+            if self._uses_shared_backend(namespace):
+                value = self._shared_get(cache_key)
+                if value is not None and value[1] > time.time():
+                    with self.lock:
+                        self._count(namespace_name, 'hits')
+                    return value[0]
+                with self.lock:
+                    self._count(namespace_name, 'misses')
             else:
                 # Fallback to memory cache
+                self._sync_tag_spool()
                 with self.lock:
-                    if cache_key in self.memory_cache:
-                        cached_item = self.memory_cache[cache_key]
-                        if time.time() < cached_item['expires']:
-                            return cached_item['value']
-                        else:
-                            # Expired, remove it
-                            del self.memory_cache[cache_key]
+                    cached_item = self._memory_get(cache_key, namespace_name)
+                    self._count(namespace_name, 'hits' if cached_item is not None else 'misses')
+                    if cached_item is not None:
+                        return cached_item['value']
 
             return None
 
@@ -90,23 +367,68 @@ class CacheManager:
             logger.error("❌ Cache get error for key %s: %s", cache_key, e)
             return None
 
-    def set(self, key: str, value: Any, ttl: int = None, namespace: str = None) -> bool:
-        """Set value in cache"""
+    def _shared_get(self, cache_key: str):
+        """Read (value, expires_at) from Redis; plain values never go stale"""
+        raw_value = self.redis_client.get(cache_key)
+        if raw_value is None:
+            return None
+
+        value = self._deserialize_value(raw_value)
+        if isinstance(value, dict) and '__stale_envelope__' in value:
+            return value['value'], value['__stale_envelope__']
+        return value, float('inf')
+
+    def set(self, key: str, value: Any, ttl: int = None, namespace: str = None,
+            stale_ttl: int = 0, tags=None) -> bool:
+        """Set value in cache
+
+        stale_ttl keeps the value for that many seconds after expiry so that
+        get_or_set can serve it while a refresh is running. tags (e.g.
+        redmine_user_tag / issue_tag) let invalidate_tags() evict the entry.
+        """
         cache_key = self._generate_key(key, namespace)
-        ttl = ttl or self.default_ttl
+        namespace_name = self._namespace_name(namespace)
+        ttl = ttl or self._namespace_option(namespace, 'ttl', self.default_ttl)
+        stale_ttl = stale_ttl or 0
+        tags = set(tags or ())
 
         try:
-            serialized_value = self._serialize_value(value)
-
-            if self.redis_client:
-                return self.redis_client.setex(cache_key, ttl, serialized_value)
+            if self._uses_shared_backend(namespace):
+                if stale_ttl:
+                    value = {'__stale_envelope__': time.time() + ttl, 'value': value}
+                stored = self.redis_client.setex(cache_key, ttl + stale_ttl, self._serialize_value(value))
+                if tags:
+                    pipeline = self.redis_client.pipeline()
+                    for tag in tags:
+                        pipeline.sadd(f"tag:{tag}", cache_key)
+                        pipeline.expire(f"tag:{tag}", max(ttl + stale_ttl, self.default_ttl))
+                    pipeline.execute()
+                with self.lock:
+                    self._count(namespace_name, 'sets')
+                return stored
             else:
-                # Fallback to memory cache
+                # Fallback to memory cache, bounded per namespace in LRU order
+                max_entries = self._namespace_option(namespace, 'max_entries', self.max_entries)
                 with self.lock:
-                    self.memory_cache[cache_key] = {
+                    segment = self.memory_cache.setdefault(namespace_name, OrderedDict())
+                    previous = segment.get(cache_key)
+                    if previous is not None:
+                        self._forget_tags(namespace_name, cache_key, previous)
+                    expires = time.time() + ttl
+                    segment[cache_key] = {
                         'value': value,
-                        'expires': time.time() + ttl
+                        'expires': expires,
+                        'stale_until': expires + stale_ttl,
+                        'tags': tags,
                     }
+                    segment.move_to_end(cache_key)
+                    for tag in tags:
+                        self.tag_index.setdefault(tag, set()).add((namespace_name, cache_key))
+                    self._count(namespace_name, 'sets')
+                    while len(segment) > max_entries:
+                        evicted_key, evicted = segment.popitem(last=False)
+                        self._forget_tags(namespace_name, evicted_key, evicted)
+                        self._count(namespace_name, 'evictions')
                 return True
 
         except Exception as e:
@@ -118,13 +440,15 @@ class CacheManager:
         cache_key = self._generate_key(key, namespace)
 
         try:
-            if self.redis_client:
+            if self._uses_shared_backend(namespace):
                 return bool(self.redis_client.delete(cache_key))
             else:
                 # Fallback to memory cache
                 with self.lock:
-                    if cache_key in self.memory_cache:
-                        del self.memory_cache[cache_key]
+                    namespace_name = self._namespace_name(namespace)
+                    segment = self.memory_cache.get(namespace_name)
+                    if segment and cache_key in segment:
+                        self._forget_tags(namespace_name, cache_key, segment.pop(cache_key))
                         return True
                 return False
 
@@ -137,19 +461,13 @@ class CacheManager:
         cache_key = self._generate_key(key, namespace)
 
         try:
-            if self.redis_client:
+            if self._uses_shared_backend(namespace):
                 return bool(self.redis_client.exists(cache_key))
             else:
                 # Fallback to memory cache
+                self._sync_tag_spool()
                 with self.lock:
-                    if cache_key in self.memory_cache:
-                        cached_item = self.memory_cache[cache_key]
-                        if time.time() < cached_item['expires']:
-                            return True
-                        else:
-                            # Expired, remove it
-                            del self.memory_cache[cache_key]
-                return False
+                    return self._memory_get(cache_key, self._namespace_name(namespace)) is not None
 
         except Exception as e:
             logger.error("❌ Cache exists error for key %s: %s", cache_key, e)
@@ -158,7 +476,7 @@ class CacheManager:
     def clear_namespace(self, namespace: str) -> int:
         """Clear all keys in a namespace"""
         try:
-            if self.redis_client:
+            if self._uses_shared_backend(namespace):
                 pattern = f"{namespace}:*"
                 keys = self.redis_client.keys(pattern)
                 if keys:
@@ -167,37 +485,189 @@ class CacheManager:
             else:
                 # Fallback to memory cache
                 with self.lock:
-                    keys_to_delete = [
-                        key for key in self.memory_cache.keys()
-                        if key.startswith(f"{namespace}:")
-                    ]
-                    for key in keys_to_delete:
-                        del self.memory_cache[key]
-                    return len(keys_to_delete)
+                    namespace_name = self._namespace_name(namespace)
+                    segment = self.memory_cache.pop(namespace_name, None) or {}
+                    for cache_key, entry in segment.items():
+                        self._forget_tags(namespace_name, cache_key, entry)
+                    return len(segment)
 
         except Exception as e:
             logger.error("❌ Cache clear namespace error for %s: %s", namespace, e)
             return 0
 
-    def get_or_set(self, key: str, func, ttl: int = None, namespace: str = None) -> Any:
-        """Get value from cache or set it using function"""
-        cached_value = self.get(key, namespace)
-        if cached_value is not None:
-            return cached_value
+    def _get_with_staleness(self, key: str, namespace: str = None):
+        """Return (value, is_stale) for a cached value, or None on a miss"""
+        cache_key = self._generate_key(key, namespace)
+        namespace_name = self._namespace_name(namespace)
+
+        try:
+            if self._uses_shared_backend(namespace):
+                entry = self._shared_get(cache_key)
+                result = (entry[0], entry[1] <= time.time()) if entry is not None else None
+            else:
+                self._sync_tag_spool()
+                with self.lock:
+                    cached_item = self._memory_get(cache_key, namespace_name, allow_stale=True)
+                result = (
+                    (cached_item['value'], time.time() >= cached_item['expires'])
+                    if cached_item is not None else None
+                )
+        except Exception as e:
+            logger.error("❌ Cache get error for key %s: %s", cache_key, e)
+            result = None
+
+        with self.lock:
+            self._count(namespace_name, 'misses' if result is None else ('stale_hits' if result[1] else 'hits'))
+        return result
+
+    def _single_flight(self, key: str, func, ttl: int = None, namespace: str = None,
+                       stale_ttl: int = 0, tags=None) -> Any:
+        """Run func once per key in this process; concurrent callers wait for its result
+
+        With the shared backend a short Redis lock extends this across workers:
+        callers that lose the lock poll the shared cache until the value appears.
+        """
+        cache_key = self._generate_key(key, namespace)
+        with self.lock:
+            flight = self.cache_locks.get(cache_key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self.cache_locks[cache_key] = _InFlight()
+            else:
+                self._count(self._namespace_name(namespace), 'coalesced')
+
+        if not is_leader:
+            if not flight.event.wait(self.single_flight_timeout):
+                logger.warning("⚠️ Single-flight wait timed out for key %s, computing locally", cache_key)
+                return func()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._compute_and_store(key, func, ttl, namespace, stale_ttl, tags)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.cache_locks.pop(cache_key, None)
+            flight.event.set()
+
+    def _compute_and_store(self, key: str, func, ttl: int = None, namespace: str = None,
+                           stale_ttl: int = 0, tags=None) -> Any:
+        """Compute a value (coordinating with other workers via Redis) and cache it
+
+        The value is not cached if one of its tags was invalidated while it was
+        being computed: it may have been read before the change.
+        """
+        with self.lock:
+            started_seq = self.invalidation_seq
+        lock_key = None
+        if self._uses_shared_backend(namespace):
+            lock_key = f"lock:{self._generate_key(key, namespace)}"
+            try:
+                if not self.redis_client.set(lock_key, "1", nx=True, ex=self.single_flight_timeout):
+                    lock_key = None
+                    deadline = time.time() + self.single_flight_timeout
+                    while time.time() < deadline:
+                        time.sleep(0.05)
+                        cached = self._get_with_staleness(key, namespace)
+                        if cached is not None and not cached[1]:
+                            return cached[0]
+            except Exception as e:
+                logger.warning("⚠️ Shared single-flight lock failed for key %s: %s", key, e)
+                lock_key = None
 
-        # Value not in cache, compute it
         try:
             value = func()
-            self.set(key, value, ttl, namespace)
-            return value
+        except UncachedResult:
+            raise
         except Exception as e:
             logger.error("❌ Error in get_or_set for key %s: %s", key, e)
             raise
+        finally:
+            if lock_key:
+                try:
+                    self.redis_client.delete(lock_key)
+                except Exception:
+                    pass
+
+        if callable(tags):
+            tags = tags(value)
+        tags = set(tags or ())
+        if tags:
+            self._sync_tag_spool()
+            with self.lock:
+                outdated = self._invalidated_since(tags, started_seq)
+            if outdated:
+                logger.debug("🧹 Not caching %s: its tags were invalidated during computation", key)
+                return value
+
+        self.set(key, value, ttl, namespace, stale_ttl=stale_ttl, tags=tags)
+        if tags:
+            # An invalidation between the check above and set() would be lost
+            with self.lock:
+                outdated = self._invalidated_since(tags, started_seq)
+            if outdated:
+                self.delete(key, namespace)
+        return value
+
+    def _refresh_in_background(self, key: str, func, ttl: int = None, namespace: str = None,
+                               stale_ttl: int = 0, tags=None) -> None:
+        """Start one background refresh for a stale key (skipped if one is running)"""
+        with self.lock:
+            if self._generate_key(key, namespace) in self.cache_locks:
+                return
+
+        # Producers often read request data (current_user, request.args)
+        if has_request_context():
+            func = copy_current_request_context(func)
+        elif has_app_context():
+            app = current_app._get_current_object()
+            producer = func
+
+            def func():
+                with app.app_context():
+                    return producer()
+
+        def refresh():
+            try:
+                self._single_flight(key, func, ttl, namespace, stale_ttl, tags)
+            except UncachedResult:
+                pass
+            except Exception as e:
+                logger.warning("⚠️ Background cache refresh failed for key %s: %s", key, e)
+
+        Thread(target=refresh, name=f"cache-refresh-{key}"[:64], daemon=True).start()
+
+    def get_or_set(self, key: str, func, ttl: int = None, namespace: str = None,
+                   stale_ttl: int = 0, tags=None) -> Any:
+        """Get value from cache or set it using function
+
+        Concurrent misses for the same key share one call of func
+        (single-flight). With stale_ttl an expired value is returned
+        immediately for up to stale_ttl seconds while a single background
+        refresh recomputes it (stale-while-revalidate).
+
+        tags may be an iterable or a callable that derives tags from the value.
+        func may raise UncachedResult to skip caching (e.g. for an error
+        response); it is re-raised to every caller waiting on that computation.
+        """
+        cached = self._get_with_staleness(key, namespace)
+        if cached is not None:
+            value, is_stale = cached
+            if is_stale:
+                self._refresh_in_background(key, func, ttl, namespace, stale_ttl, tags)
+            return value
+
+        return self._single_flight(key, func, ttl, namespace, stale_ttl, tags)
 
     def invalidate_pattern(self, pattern: str, namespace: str = None) -> int:
         """Invalidate keys matching pattern"""
         try:
-            if self.redis_client:
+            if self._uses_shared_backend(namespace):
                 search_pattern = f"{namespace}:{pattern}" if namespace else pattern
                 keys = self.redis_client.keys(search_pattern)
                 if keys:
@@ -206,24 +676,72 @@ class CacheManager:
             else:
                 # Fallback to memory cache
                 with self.lock:
-                    keys_to_delete = []
-                    for key in self.memory_cache.keys():
-                        if namespace and not key.startswith(f"{namespace}:"):
-                            continue
-                        if pattern in key:
-                            keys_to_delete.append(key)
-
-                    for key in keys_to_delete:
-                        del self.memory_cache[key]
-                    return len(keys_to_delete)
+                    if namespace:
+                        segments = [(namespace, self.memory_cache.get(namespace) or {})]
+                    else:
+                        segments = list(self.memory_cache.items())
+
+                    deleted = 0
+                    for namespace_name, segment in segments:
+                        keys_to_delete = [key for key in segment if pattern in key]
+                        for key in keys_to_delete:
+                            self._forget_tags(namespace_name, key, segment.pop(key))
+                        deleted += len(keys_to_delete)
+                    return deleted
 
         except Exception as e:
             logger.error("❌ Cache invalidate pattern error for %s: %s", pattern, e)
             return 0
 
+    def invalidate_tags(self, *tags) -> int:
+        """Evict every entry (any namespace) tagged with one of tags
+
+        Other processes learn about it from the tag spool (init_tag_spool)
+        or, for values stored in Redis, from the shared tag sets.
+        """
+        tags = {tag for tag in tags if tag}
+        if not tags:
+            return 0
+
+        deleted = 0
+        try:
+            with self.lock:
+                deleted = self._evict_tags(tags)
+                self._record_invalidation(tags)
+            self._publish_tags(tags)
+
+            if self.redis_client:
+                for tag in tags:
+                    tagged_keys = self.redis_client.smembers(f"tag:{tag}")
+                    if tagged_keys:
+                        deleted += self.redis_client.delete(*tagged_keys)
+                    self.redis_client.delete(f"tag:{tag}")
+
+            logger.debug("🧹 Invalidated %s cache entries for tags %s", deleted, sorted(tags))
+            return deleted
+
+        except Exception as e:
+            logger.error("❌ Cache invalidate tags error for %s: %s", sorted(tags), e)
+            return deleted
+
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         try:
+            with self.lock:
+                namespaces = {}
+                for name in set(self.counters) | set(self.memory_cache) | set(self.namespaces):
+                    config = self.namespaces.get(name, {})
+                    counters = dict(self.counters.get(name, {}))
+                    lookups = counters.get('hits', 0) + counters.get('misses', 0)
+                    namespaces[name] = {
+                        **counters,
+                        'hit_rate': round(counters.get('hits', 0) / lookups, 4) if lookups else None,
+                        'entries': len(self.memory_cache.get(name, ())),
+                        'ttl': config.get('ttl') or self.default_ttl,
+                        'max_entries': config.get('max_entries') or self.max_entries,
+                        'backend': 'redis' if self._uses_shared_backend(name) else 'memory',
+                    }
+
             if self.redis_client:
                 info = self.redis_client.info()
                 return {
@@ -232,15 +750,15 @@ class CacheManager:
                     'used_memory': info.get('used_memory_human', '0B'),
                     'keyspace_hits': info.get('keyspace_hits', 0),
                     'keyspace_misses': info.get('keyspace_misses', 0),
-                    'total_commands_processed': info.get('total_commands_processed', 0)
+                    'total_commands_processed': info.get('total_commands_processed', 0),
+                    'namespaces': namespaces,
                 }
             else:
-                with self.lock:
-                    return {
-                        'backend': 'memory',
-                        'total_keys': len(self.memory_cache),
-                        'memory_usage': f"{len(str(self.memory_cache))} bytes"
-                    }
+                return {
+                    'backend': 'memory',
+                    'total_keys': sum(item['entries'] for item in namespaces.values()),
+                    'namespaces': namespaces,
+                }
 
         except Exception as e:
             logger.error("❌ Cache stats error: %s", e)
@@ -297,8 +815,20 @@ def cached(ttl: int = 300, namespace: str = None, key_func=None):
         return wrapper
     return decorator
 
-# Global cache manager instance
-cache_manager = CacheManager()
+# Global cache manager instance, shared by all blueprints of the process.
+# CACHE_REDIS_URL enables the shared backend so gunicorn workers reuse values.
+cache_manager = CacheManager(redis_url=os.getenv("CACHE_REDIS_URL"))
+
+# Namespaces of the application caches: TTL (seconds) and LRU limits per worker
+cache_manager.configure_namespace("my_issues", ttl=60, max_entries=2000, shared=False)
+cache_manager.configure_namespace("notification_count", ttl=10, max_entries=5000)
+cache_manager.configure_namespace("tasks_stats", ttl=300, max_entries=1000)
+cache_manager.configure_namespace("tasks_direct_sql", ttl=120, max_entries=1000)
+cache_manager.configure_namespace("tasks_filters", ttl=300, max_entries=16)
+cache_manager.configure_namespace("calls", ttl=30, max_entries=16)
+cache_manager.configure_namespace("xml_agency", ttl=120, max_entries=2000)
+cache_manager.configure_namespace("agency_by_ani", ttl=600, max_entries=10000)
+cache_manager.configure_namespace("user_directory", ttl=86400, max_entries=4)
 
 # Legacy classes for backward compatibility
 class TasksCacheOptimizer:
@@ -342,6 +872,14 @@ def api_cache_key(endpoint: str, **params) -> str:
     param_str = "_".join(f"{k}_{v}" for k, v in sorted(params.items()))
     return f"api_{endpoint}_{param_str}"
 
+def redmine_user_tag(redmine_user_id) -> Optional[str]:
+    """Cache tag for data that depends on a Redmine user's assigned tasks"""
+    return f"redmine_user:{redmine_user_id}" if redmine_user_id else None
+
+def issue_tag(issue_id) -> Optional[str]:
+    """Cache tag for data that contains a Redmine issue"""
+    return f"issue:{issue_id}" if issue_id else None
+
 def database_cache_key(table: str, **conditions) -> str:
     """Generate cache key for database queries"""
     condition_str = "_".join(f"{k}_{v}" for k, v in sorted(conditions.items()))
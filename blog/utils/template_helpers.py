@@ -5,7 +5,7 @@ Helper функции для использования в шаблонах Jinj
 
 from flask import current_app
 from blog.settings import Config
-from redmine import get_connection
+from redmine import get_connection, redmine_reference_cache
 import logging
 from datetime import datetime
 from flask import Flask
@@ -41,24 +41,8 @@ class TemplateHelpers:
             return "Не указан"
 
         try:
-            conn = self.get_mysql_connection()
-            if not conn:
-                return f"Статус #{status_id}"
-
-            cursor = conn.cursor()
-            sql = """
-            SELECT COALESCE(us.name, s.name) as name
-            FROM issue_statuses s
-            LEFT JOIN u_statuses us ON s.id = us.id
-            WHERE s.id = %s
-            """
-            cursor.execute(sql, (status_id,))
-            result = cursor.fetchone()
-
-            if result:
-                return result['name']
-            else:
-                return f"Статус #{status_id}"
+            name = redmine_reference_cache.status_display_name(status_id)
+            return name if name else f"Статус #{status_id}"
 
         except Exception as e:
             logger.error(f"Ошибка получения названия статуса {status_id}: {e}")
@@ -70,21 +54,9 @@ class TemplateHelpers:
             return "Не назначен"
 
         try:
-            conn = self.get_mysql_connection()
-            if not conn:
-                return f"Пользователь #{user_id}"
-
-            cursor = conn.cursor()
-            sql = """
-            SELECT CONCAT(firstname, ' ', lastname) as full_name
-            FROM users
-            WHERE id = %s
-            """
-            cursor.execute(sql, (user_id,))
-            result = cursor.fetchone()
-
-            if result and result['full_name']:
-                return result['full_name'].strip()
+            full_name = redmine_reference_cache.user_full_name(user_id, first_name_first=True)
+            if full_name and full_name.strip():
+                return full_name.strip()
             else:
                 return f"Пользователь #{user_id}"
 
@@ -98,19 +70,8 @@ class TemplateHelpers:
             return "Не указан"
 
         try:
-            conn = self.get_mysql_connection()
-            if not conn:
-                return f"Проект #{project_id}"
-
-            cursor = conn.cursor()
-            sql = "SELECT name FROM projects WHERE id = %s"
-            cursor.execute(sql, (project_id,))
-            result = cursor.fetchone()
-
-            if result:
-                return result['name']
-            else:
-                return f"Проект #{project_id}"
+            name = redmine_reference_cache.get("projects", project_id)
+            return name if name is not None else f"Проект #{project_id}"
 
         except Exception as e:
             logger.error(f"Ошибка получения названия проекта {project_id}: {e}")
@@ -122,24 +83,8 @@ class TemplateHelpers:
             return "Не указан"
 
         try:
-            conn = self.get_mysql_connection()
-            if not conn:
-                return f"Приоритет #{priority_id}"
-
-            cursor = conn.cursor()
-            sql = """
-            SELECT COALESCE(up.name, e.name) as name
-            FROM enumerations e
-            LEFT JOIN u_Priority up ON e.id = up.id
-            WHERE e.id = %s AND e.type = 'IssuePriority'
-            """
-            cursor.execute(sql, (priority_id,))
-            result = cursor.fetchone()
-
-            if result:
-                return result['name']
-            else:
-                return f"Приоритет #{priority_id}"
+            name = redmine_reference_cache.priority_display_name(priority_id)
+            return name if name else f"Приоритет #{priority_id}"
 
         except Exception as e:
             logger.error(f"Ошибка получения названия приоритета {priority_id}: {e}")
@@ -1,8 +1,11 @@
 from configparser import ConfigParser
 import os
 import logging
+import threading
+import time
 from flask import flash
 import oracledb
+from cryptography.fernet import Fernet, InvalidToken
 
 os.environ["NLS_LANG"] = "Russian.AL32UTF8"
 
@@ -45,6 +48,150 @@ logger.info(f"[ORACLE CONFIG] os.getenv('ORACLE_HOST')={os.getenv('ORACLE_HOST')
 logger.info(f"[ORACLE CONFIG] Using secure_config: {locals().get('secure_config', 'None')}")
 
 
+# Toggle for pooled Oracle connections (off = new connection per call)
+ORACLE_POOL = os.getenv("ORACLE_POOL", "on").lower()
+ORACLE_POOL_MIN = int(os.getenv("ORACLE_POOL_MIN", "1"))
+ORACLE_POOL_MAX = int(os.getenv("ORACLE_POOL_MAX", "4"))
+ORACLE_POOL_INCREMENT = int(os.getenv("ORACLE_POOL_INCREMENT", "1"))
+# Соединение, простаивавшее дольше ping_interval секунд, проверяется перед выдачей
+ORACLE_POOL_PING_INTERVAL = int(os.getenv("ORACLE_POOL_PING_INTERVAL", "60"))
+# Сколько миллисекунд ждать свободного соединения, если пул исчерпан
+ORACLE_POOL_WAIT_TIMEOUT_MS = int(os.getenv("ORACLE_POOL_WAIT_TIMEOUT_MS", "5000"))
+
+# Время жизни пароля ERP в кеше процесса (0 - кеш отключен)
+ERP_CREDENTIAL_CACHE_TTL = int(os.getenv("ERP_CREDENTIAL_CACHE_TTL", "120"))
+
+
+class OraclePoolRegistry:
+    """
+    Пулы соединений Oracle (oracledb.create_pool), по одному на набор параметров.
+
+    Пул создается лениво при первом обращении и пересоздается после fork
+    (gunicorn), так как сокеты родительского процесса использовать нельзя.
+    Пулы держат от min до max сессий и пингуют соединения, простаивавшие
+    дольше ping_interval, перед выдачей вызывающему коду.
+    """
+
+    def __init__(self, min_size=1, max_size=4, increment=1, ping_interval=60, wait_timeout_ms=5000):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.increment = increment
+        self.ping_interval = ping_interval
+        self.wait_timeout_ms = wait_timeout_ms
+        self._pools = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def acquire(self, host, port, service_name, user, password, tcp_timeout):
+        """Выдает соединение из пула. Вызов close() у соединения возвращает его в пул."""
+        return self._get_pool(host, port, service_name, user, password, tcp_timeout).acquire()
+
+    def _get_pool(self, host, port, service_name, user, password, tcp_timeout):
+        key = (host, str(port), service_name, user)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pools = {}
+                self._pid = os.getpid()
+
+            pool = self._pools.get(key)
+            if pool is None:
+                logger.info(
+                    f"[ORACLE POOL] Создание пула {host}:{port}/{service_name} (min={self.min_size}, max={self.max_size})"
+                )
+                pool = oracledb.create_pool(
+                    user=user,
+                    password=password,
+                    host=host,
+                    port=port,
+                    service_name=service_name,
+                    min=self.min_size,
+                    max=self.max_size,
+                    increment=self.increment,
+                    ping_interval=self.ping_interval,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=self.wait_timeout_ms,
+                    tcp_connect_timeout=tcp_timeout,
+                )
+                self._pools[key] = pool
+            return pool
+
+    def close_all(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            try:
+                pool.close(force=True)
+            except Exception as e:
+                logger.warning(f"[ORACLE POOL] Ошибка закрытия пула: {e}")
+
+
+oracle_pool_registry = OraclePoolRegistry(
+    min_size=ORACLE_POOL_MIN,
+    max_size=ORACLE_POOL_MAX,
+    increment=ORACLE_POOL_INCREMENT,
+    ping_interval=ORACLE_POOL_PING_INTERVAL,
+    wait_timeout_ms=ORACLE_POOL_WAIT_TIMEOUT_MS,
+)
+
+
+class ErpCredentialCache:
+    """
+    Кратковременный кеш паролей ERP в памяти процесса.
+
+    Пароли хранятся зашифрованными (Fernet) ключом, который генерируется при
+    старте процесса и нигде не сохраняется, поэтому содержимое кеша бесполезно
+    вне процесса. Кеш не выносится в Redis/общий кеш намеренно.
+    """
+
+    def __init__(self, ttl=120, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._fernet = Fernet(Fernet.generate_key())
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        if self.ttl <= 0 or not username:
+            return None
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                return None
+        try:
+            return self._fernet.decrypt(token).decode("utf-8")
+        except InvalidToken:
+            self.invalidate(username)
+            return None
+
+    def set(self, username, password):
+        if self.ttl <= 0 or not username or password is None:
+            return
+        token = self._fernet.encrypt(str(password).encode("utf-8"))
+        with self._lock:
+            if len(self._entries) >= self.max_entries and username not in self._entries:
+                now = time.monotonic()
+                self._entries = {
+                    key: value for key, value in self._entries.items() if value[1] > now
+                }
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[username] = (token, time.monotonic() + self.ttl)
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+
+erp_credential_cache = ErpCredentialCache(ttl=ERP_CREDENTIAL_CACHE_TTL)
+
+
 def connect_oracle(
     oracle_host, oracle_port, oracle_service_name, oracle_user_name, oracle_password
 ):
@@ -70,6 +217,20 @@ def connect_oracle(
             tcp_timeout = 15
             logger.info(f"[ORACLE DEBUG] Increased timeout for mobile device to: {tcp_timeout} seconds")
         logger.info(f"[ORACLE DEBUG] TCP timeout set to: {tcp_timeout} seconds")
+        if ORACLE_POOL == "on":
+            try:
+                oracle_connection = oracle_pool_registry.acquire(
+                    oracle_host,
+                    oracle_port,
+                    oracle_service_name,
+                    oracle_user_name,
+                    oracle_password,
+                    tcp_timeout,
+                )
+                logger.info("[ORACLE DEBUG] Oracle connection acquired from pool")
+                return oracle_connection
+            except Exception as e:
+                logger.warning(f"[ORACLE POOL] Не удалось получить соединение из пула, прямое подключение: {e}")
         oracle_connection = oracledb.connect(
             user=oracle_user_name,
             password=oracle_password,
@@ -168,3 +329,32 @@ def get_user_erp_password(connection, user_username):
         logging.error("Ошибка выполнения запроса к базе данных TEZ ERP: %s", str(e))
         flash("Произошла ошибка при выполнении запроса к базе данных TEZ ERP.", "error")
         return None  # Лучше возвращать None в случае ошибки
+
+
+def fetch_user_erp_password(user_username, use_cache=True):
+    """
+    Возвращает пароль ERP пользователя.
+
+    Сначала проверяется кеш учетных данных (erp_credential_cache), затем
+    выполняется запрос через пул соединений Oracle; соединение сразу
+    возвращается в пул. Возвращает строку или None.
+    """
+    if use_cache:
+        cached_password = erp_credential_cache.get(user_username)
+        if cached_password is not None:
+            return cached_password
+
+    connection = connect_oracle(db_host, db_port, db_service_name, db_user_name, db_password)
+    if connection is None:
+        return None
+    try:
+        password = get_user_erp_password(connection, user_username)
+    finally:
+        try:
+            connection.close()
+        except oracledb.DatabaseError as e:
+            logging.error("Ошибка выполнения закрытия соединения: %s", str(e))
+
+    if password:
+        erp_credential_cache.set(user_username, password)
+    return password
@@ -1,12 +1,20 @@
 # Gunicorn configuration file
 # Используется для production запуска
 
+import os
+
 # Привязка к сокету
 bind = "unix:/run/its-teztour/gunicorn.sock"
 
 # Количество воркеров
 workers = 3
 
+# Потоки в воркере: открытый поток уведомлений (/api/notifications/stream)
+# занимает поток на все время соединения, поэтому их нужно с запасом
+# (не меньше NOTIFICATION_STREAM_MAX плюс обычные запросы)
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "96"))
+
 # Таймаут воркера (в секундах)
 # Увеличен для обработки медленных Oracle подключений
 timeout = 120
@@ -0,0 +1,38 @@
+"""Create call_daily_stats rollup table
+
+Revision ID: create_call_daily_stats_table
+Revises: add_easy_email_to_redmine_notifications
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'create_call_daily_stats_table'
+down_revision = 'add_easy_email_to_redmine_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'call_daily_stats',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('operator_id', sa.Integer(), nullable=False),
+        sa.Column('operator_name', sa.String(length=255), nullable=True),
+        sa.Column('call_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'operator_id', name='uq_call_daily_stats_day_operator'),
+    )
+    with op.batch_alter_table('call_daily_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_call_daily_stats_day'), ['day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('call_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_call_daily_stats_day'))
+
+    op.drop_table('call_daily_stats')
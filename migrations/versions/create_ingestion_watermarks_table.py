@@ -0,0 +1,31 @@
+"""Create ingestion_watermarks table
+
+Revision ID: create_ingestion_watermarks_table
+Revises: create_call_daily_stats_table
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'create_ingestion_watermarks_table'
+down_revision = 'create_call_daily_stats_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ingestion_watermarks',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('created_on', sa.DateTime(), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('ingestion_watermarks')
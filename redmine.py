@@ -4,6 +4,7 @@ import uuid
 from datetime import timedelta, datetime
 import logging
 import functools
+import threading
 import time
 from builtins import Exception
 from urllib.parse import urlparse
@@ -113,7 +114,7 @@ except ImportError:
 
 # Глобальный пул соединений MySQL
 _connection_pools = {}
-_pool_lock = __import__('threading').Lock()
+_pool_lock = threading.Lock()
 
 
 def _get_pool_key(host, port, name, user_name):
@@ -228,6 +229,212 @@ def get_connection(host, user_name, password, name, port=3306, max_attempts=None
     return None
 
 
+# Справочники Redmine: (SELECT ... FROM ..., базовое условие, колонка для инкрементального обновления)
+REFERENCE_TABLES = {
+    "u_statuses": ("SELECT id, IFNULL(name,'') AS name FROM u_statuses", None, None),
+    "issue_statuses": ("SELECT id, IFNULL(name,'') AS name FROM issue_statuses", None, None),
+    "u_priorities": ("SELECT id, IFNULL(name,'') AS name FROM u_Priority", None, None),
+    "priorities": (
+        "SELECT id, IFNULL(name,'') AS name FROM enumerations",
+        "type = 'IssuePriority'",
+        None,
+    ),
+    "projects": ("SELECT id, IFNULL(name,'') AS name, updated_on FROM projects", None, "updated_on"),
+    "users": ("SELECT id, firstname, lastname, updated_on FROM users", None, "updated_on"),
+}
+
+
+class RedmineReferenceCache:
+    """
+    Кэш справочников Redmine в памяти процесса: статусы, приоритеты, проекты, пользователи.
+
+    Справочники загружаются целиком одним запросом на таблицу и обновляются
+    не чаще refresh_interval: маленькие таблицы перечитываются полностью,
+    projects и users — инкрементально по updated_on (полная перезагрузка раз
+    в full_reload_interval). Поиск по ID — обычный dict. Неизвестный ID
+    проекта или пользователя догружается одним запросом, а отсутствующий
+    запоминается до следующего обновления.
+    """
+
+    def __init__(self, refresh_interval=60, full_reload_interval=3600, retry_interval=10):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.retry_interval = retry_interval
+        self._data = {kind: {} for kind in REFERENCE_TABLES}
+        self._missing = {kind: set() for kind in REFERENCE_TABLES}
+        self._watermarks = {}
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize_id(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _row_value(kind, row):
+        if kind == "users":
+            return row.get("firstname"), row.get("lastname")
+        return row["name"]
+
+    def _open_connection(self):
+        return get_connection(
+            db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port
+        )
+
+    def _run(self, connection, callback):
+        """Выполняет callback на переданном соединении или на собственном из пула."""
+        own_connection = None
+        try:
+            if connection is None:
+                own_connection = connection = self._open_connection()
+                if connection is None:
+                    return False
+            callback(connection)
+            return True
+        except Exception as e:
+            # Справочник не должен ронять рендеринг шаблона: вызывающий вернет запасное значение
+            logger.error(f"Ошибка загрузки справочников Redmine: {e}", exc_info=True)
+            return False
+        finally:
+            if own_connection is not None:
+                own_connection.close()
+
+    def _select(self, connection, kind, conditions, params):
+        select_sql, base_condition, _ = REFERENCE_TABLES[kind]
+        where = [base_condition] if base_condition else []
+        where.extend(conditions)
+        sql = select_sql + (" WHERE " + " AND ".join(where) if where else "")
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _refresh(self, connection, full):
+        loaded_rows = 0
+        for kind, (_, _, watermark_column) in REFERENCE_TABLES.items():
+            watermark = self._watermarks.get(kind)
+            if full or watermark_column is None or watermark is None:
+                rows = self._select(connection, kind, [], [])
+                self._data[kind] = {row["id"]: self._row_value(kind, row) for row in rows}
+            else:
+                rows = self._select(connection, kind, [f"{watermark_column} >= %s"], [watermark])
+                self._data[kind].update((row["id"], self._row_value(kind, row)) for row in rows)
+
+            if watermark_column:
+                updated_values = [row[watermark_column] for row in rows if row.get(watermark_column)]
+                if not full and watermark is not None:
+                    updated_values.append(watermark)
+                if updated_values:
+                    self._watermarks[kind] = max(updated_values)
+            self._missing[kind] = set()
+            loaded_rows += len(rows)
+
+        logger.info(f"Справочники Redmine {'загружены' if full else 'обновлены'}: {loaded_rows} строк")
+
+    def _ensure_fresh(self, connection=None):
+        now = time.monotonic()
+        if self._loaded and now - self._last_refresh < self.refresh_interval:
+            return
+        if not self._loaded and now < self._retry_after:
+            return
+
+        # Пока идет обновление, остальные потоки читают текущие данные
+        if not self._lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            now = time.monotonic()
+            if self._loaded and now - self._last_refresh < self.refresh_interval:
+                return
+            full = not self._loaded or now - self._last_full_load >= self.full_reload_interval
+            if self._run(connection, lambda conn: self._refresh(conn, full)):
+                self._loaded = True
+                self._last_refresh = now
+                if full:
+                    self._last_full_load = now
+            elif self._loaded:
+                self._last_refresh = now
+            else:
+                self._retry_after = now + self.retry_interval
+        finally:
+            self._lock.release()
+
+    def _fetch_missing(self, kind, ids, connection=None):
+        placeholders = ",".join(["%s"] * len(ids))
+
+        def load(conn):
+            rows = self._select(conn, kind, [f"id IN ({placeholders})"], list(ids))
+            with self._lock:
+                for row in rows:
+                    self._data[kind][row["id"]] = self._row_value(kind, row)
+                self._missing[kind].update(set(ids) - {row["id"] for row in rows})
+
+        self._run(connection, load)
+
+    def get_many(self, kind, ids, connection=None):
+        """Возвращает {id: значение} для найденных ID справочника kind."""
+        self._ensure_fresh(connection)
+        data = self._data[kind]
+        normalized_ids = {self._normalize_id(value) for value in ids}
+        normalized_ids.discard(None)
+
+        # Маленькие справочники загружены целиком: отсутствие ID в них окончательно.
+        # В projects/users между обновлениями могут появиться новые записи.
+        unknown_ids = [
+            item_id for item_id in normalized_ids
+            if item_id not in data and item_id not in self._missing[kind]
+        ]
+        if unknown_ids and (REFERENCE_TABLES[kind][2] or not self._loaded):
+            self._fetch_missing(kind, unknown_ids, connection)
+            data = self._data[kind]
+
+        return {item_id: data[item_id] for item_id in normalized_ids if item_id in data}
+
+    def get(self, kind, item_id, connection=None):
+        """Возвращает значение справочника kind по ID или None."""
+        normalized_id = self._normalize_id(item_id)
+        if normalized_id is None:
+            return None
+        return self.get_many(kind, [normalized_id], connection).get(normalized_id)
+
+    def user_full_name(self, user_id, connection=None, first_name_first=False):
+        """Имя пользователя в формате 'Фамилия Имя' (или 'Имя Фамилия')."""
+        names = self.get("users", user_id, connection)
+        if names is None:
+            return None
+        firstname, lastname = names
+        parts = (firstname, lastname) if first_name_first else (lastname, firstname)
+        return f"{parts[0] or ''} {parts[1] or ''}"
+
+    def status_display_name(self, status_id, connection=None):
+        """Локализованное название статуса, иначе исходное из issue_statuses."""
+        return self.get("u_statuses", status_id, connection) or self.get("issue_statuses", status_id, connection)
+
+    def priority_display_name(self, priority_id, connection=None):
+        """Локализованное название приоритета, иначе исходное из enumerations."""
+        return self.get("u_priorities", priority_id, connection) or self.get("priorities", priority_id, connection)
+
+    def clear(self):
+        with self._lock:
+            self._data = {kind: {} for kind in REFERENCE_TABLES}
+            self._missing = {kind: set() for kind in REFERENCE_TABLES}
+            self._watermarks = {}
+            self._loaded = False
+            self._retry_after = 0.0
+
+
+redmine_reference_cache = RedmineReferenceCache(
+    refresh_interval=int(os.getenv('REDMINE_REFERENCE_REFRESH_INTERVAL', '60')),
+)
+
+
 def convert_datetime_msk_format(input_datetime, redmine_timezone_str="Europe/Moscow"):
     output_format = "%d.%m.%Y %H:%M"
 
@@ -242,212 +449,154 @@ def convert_datetime_msk_format(input_datetime, redmine_timezone_str="Europe/Mos
 
 
 def get_user_full_name_from_id(connection, property_value):
-    sql = "SELECT CONCAT(IFNULL(lastname, ''), ' ', IFNULL(firstname, '')) AS full_name FROM users WHERE id=%s"
-    cursor = None
-    full_name = None
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, (property_value,))
-        for row in cursor:
-            full_name = row["full_name"]
-            break  # Выходим из цикла после первой итерации
-    except pymysql.Error as e:
-        print(f"{ERROR_MESSAGE} {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-    return full_name
+    return redmine_reference_cache.user_full_name(property_value, connection)
 
 
 def get_project_name_from_id(connection, project_id):
-    sql = "SELECT IFNULL(name,'') as name FROM projects WHERE id=%s"
-    cursor = None
-    project_name = None
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, (project_id,))
-        for row in cursor:
-            project_name = row["name"]
-            break
-    except pymysql.Error as e:
-        print(f"{ERROR_MESSAGE} {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-    return project_name
+    return redmine_reference_cache.get("projects", project_id, connection)
 
 
 def get_status_name_from_id(connection, status_id):
-    sql = "SELECT IFNULL(name,'') as name FROM u_statuses WHERE id=%s"
-    cursor = None
-    status_name = None  # Инициализация по умолчанию
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, (status_id,))
-        for row in cursor:
-            status_name = row["name"]
-            break
-    except pymysql.Error as e:
-        print(f"{ERROR_MESSAGE} {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-    return status_name
+    return redmine_reference_cache.get("u_statuses", status_id, connection)
 
 
 def get_priority_name_from_id(connection, priority_id):
-    sql = "SELECT IFNULL(name,'') as name FROM u_Priority WHERE id=%s"
-    cursor = None
-    priority_name = None  # Инициализация по умолчанию
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, (priority_id,))
-        for row in cursor:
-            priority_name = row["name"]
-            break
-    except pymysql.Error as e:
-        print(f"{ERROR_MESSAGE} {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-    return priority_name
+    return redmine_reference_cache.get("u_priorities", priority_id, connection)
 
 
 def get_property_name(property_name, prop_key, old_value, value):
-    connection = get_connection(
-        db_redmine_host, db_redmine_user_name, db_redmine_password, db_redmine_name, port=db_redmine_port
-    )
+    # Названия берутся из redmine_reference_cache: соединение из пула
+    # используется только при обновлении справочников или промахе кэша
+    connection = None
     result = None  # Инициализируем result
-    if connection:
-        with connection:
-            if prop_key == "project_id":
-                project_name_from = get_project_name_from_id(connection, old_value)
-                project_name_to = get_project_name_from_id(connection, value)
-                result = (
-                    "Параметр&nbsp;<b>Проект</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + (project_name_from or "None")
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + (project_name_to or "None")
-                    + "</b>"
-                )
+    if prop_key == "project_id":
+        project_name_from = get_project_name_from_id(connection, old_value)
+        project_name_to = get_project_name_from_id(connection, value)
+        result = (
+            "Параметр&nbsp;<b>Проект</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + (project_name_from or "None")
+            + "</b>&nbsp;на&nbsp;<b>"
+            + (project_name_to or "None")
+            + "</b>"
+        )
 
-            elif prop_key == "assigned_to_id":
-                assigned_name_from = None
-                assigned_name_to = None
-                if old_value is None:
-                    assigned_name_to = get_user_full_name_from_id(connection, value)
-                else:
-                    assigned_name_from = get_user_full_name_from_id(
-                        connection, old_value
-                    )
-                    assigned_name_to = get_user_full_name_from_id(connection, value)
-                result = (
-                    "Параметр&nbsp;<b>Назначена</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + (assigned_name_from or "None")
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + (assigned_name_to or "None")
-                    + "</b>"
-                )
+    elif prop_key == "assigned_to_id":
+        assigned_name_from = None
+        assigned_name_to = None
+        if old_value is None:
+            assigned_name_to = get_user_full_name_from_id(connection, value)
+        else:
+            assigned_name_from = get_user_full_name_from_id(
+                connection, old_value
+            )
+            assigned_name_to = get_user_full_name_from_id(connection, value)
+        result = (
+            "Параметр&nbsp;<b>Назначена</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + (assigned_name_from or "None")
+            + "</b>&nbsp;на&nbsp;<b>"
+            + (assigned_name_to or "None")
+            + "</b>"
+        )
 
-            elif prop_key == "status_id":
-                status_name_from = get_status_name_from_id(connection, old_value)
-                status_name_to = get_status_name_from_id(connection, value)
-                result = (
-                    "Параметр&nbsp;<b>Статус</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + str(status_name_from)
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + str(status_name_to)
-                    + "</b>"
-                )
+    elif prop_key == "status_id":
+        status_name_from = get_status_name_from_id(connection, old_value)
+        status_name_to = get_status_name_from_id(connection, value)
+        result = (
+            "Параметр&nbsp;<b>Статус</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + str(status_name_from)
+            + "</b>&nbsp;на&nbsp;<b>"
+            + str(status_name_to)
+            + "</b>"
+        )
 
-            elif prop_key == "priority_id":
-                priority_name_from = get_priority_name_from_id(connection, old_value)
-                priority_name_to = get_priority_name_from_id(connection, value)
-                result = (
-                    "Параметр&nbsp;<b>Приоритет</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + str(priority_name_from)
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + str(priority_name_to)
-                    + "</b>"
-                )
+    elif prop_key == "priority_id":
+        priority_name_from = get_priority_name_from_id(connection, old_value)
+        priority_name_to = get_priority_name_from_id(connection, value)
+        result = (
+            "Параметр&nbsp;<b>Приоритет</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + str(priority_name_from)
+            + "</b>&nbsp;на&nbsp;<b>"
+            + str(priority_name_to)
+            + "</b>"
+        )
 
-            elif prop_key == "subject":
-                result = (
-                    "Параметр&nbsp;<b>Тема</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + str(old_value)
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + str(value)
-                    + "</b>"
-                )
+    elif prop_key == "subject":
+        result = (
+            "Параметр&nbsp;<b>Тема</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + str(old_value)
+            + "</b>&nbsp;на&nbsp;<b>"
+            + str(value)
+            + "</b>"
+        )
 
-            elif prop_key == "easy_helpdesk_need_reaction":
-                old_reaction_text = "Да" if old_value == "1" else "Нет"
-                new_reaction_text = "Да" if value == "1" else "Нет"
-                result = (
-                    "Параметр&nbsp;<b>Нужна&nbsp;реакция?</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + old_reaction_text
-                    + "</b>&nbsp;на&nbsp;<b>"
-                    + new_reaction_text
-                    + "</b>"
-                )
+    elif prop_key == "easy_helpdesk_need_reaction":
+        old_reaction_text = "Да" if old_value == "1" else "Нет"
+        new_reaction_text = "Да" if value == "1" else "Нет"
+        result = (
+            "Параметр&nbsp;<b>Нужна&nbsp;реакция?</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + old_reaction_text
+            + "</b>&nbsp;на&nbsp;<b>"
+            + new_reaction_text
+            + "</b>"
+        )
 
-            elif prop_key == "done_ratio":
-                result = (
-                    "Параметр&nbsp;<b>Готовность</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                    + str(old_value)
-                    + "%</b>&nbsp;на&nbsp;<b>"
-                    + str(value)
-                    + "%</b>"
-                )
+    elif prop_key == "done_ratio":
+        result = (
+            "Параметр&nbsp;<b>Готовность</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+            + str(old_value)
+            + "%</b>&nbsp;на&nbsp;<b>"
+            + str(value)
+            + "%</b>"
+        )
 
-            elif prop_key == "16":  # Кастомное поле "Что нового"
-                if old_value and not value:
-                    # Удаление значения: было что-то, стало пустое (None/null)
-                    old_text = "Да" if str(old_value) != "0" else "Нет"
-                    result = (
-                        "Значение&nbsp;<b>"
-                        + old_text
-                        + "</b>&nbsp;параметра&nbsp;<b>Что&nbsp;нового</b>&nbsp;удалено"
-                    )
-                elif not old_value and value:
-                    # Добавление значения: было пустое (None/null), стало что-то
-                    new_text = "Да" if str(value) != "0" else "Нет"
-                    result = (
-                        "Параметр&nbsp;<b>Что&nbsp;нового</b>&nbsp;изменился&nbsp;на&nbsp;<b>"
-                        + new_text
-                        + "</b>"
-                    )
-                else:
-                    # Обычное изменение значения
-                    old_text = "Да" if old_value and str(old_value) != "0" else "Нет"
-                    new_text = "Да" if value and str(value) != "0" else "Нет"
-                    result = (
-                        "Параметр&nbsp;<b>Что&nbsp;нового</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
-                        + old_text
-                        + "</b>&nbsp;на&nbsp;<b>"
-                        + new_text
-                        + "</b>"
-                    )
+    elif prop_key == "16":  # Кастомное поле "Что нового"
+        if old_value and not value:
+            # Удаление значения: было что-то, стало пустое (None/null)
+            old_text = "Да" if str(old_value) != "0" else "Нет"
+            result = (
+                "Значение&nbsp;<b>"
+                + old_text
+                + "</b>&nbsp;параметра&nbsp;<b>Что&nbsp;нового</b>&nbsp;удалено"
+            )
+        elif not old_value and value:
+            # Добавление значения: было пустое (None/null), стало что-то
+            new_text = "Да" if str(value) != "0" else "Нет"
+            result = (
+                "Параметр&nbsp;<b>Что&nbsp;нового</b>&nbsp;изменился&nbsp;на&nbsp;<b>"
+                + new_text
+                + "</b>"
+            )
+        else:
+            # Обычное изменение значения
+            old_text = "Да" if old_value and str(old_value) != "0" else "Нет"
+            new_text = "Да" if value and str(value) != "0" else "Нет"
+            result = (
+                "Параметр&nbsp;<b>Что&nbsp;нового</b>&nbsp;изменился&nbsp;c&nbsp;<b>"
+                + old_text
+                + "</b>&nbsp;на&nbsp;<b>"
+                + new_text
+                + "</b>"
+            )
 
-            elif property_name == "attachment":
-                result = "Файл&nbsp;<b>" + str(value) + "</b>&nbsp;добавлен"
+    elif property_name == "attachment":
+        result = "Файл&nbsp;<b>" + str(value) + "</b>&nbsp;добавлен"
 
-            elif property_name == "relation" and prop_key == "relates":
-                result = (
-                    "Задача&nbsp;связана&nbsp;с&nbsp;задачей&nbsp;<b>#"
-                    + str(value)
-                    + "</b>"
-                )
+    elif property_name == "relation" and prop_key == "relates":
+        result = (
+            "Задача&nbsp;связана&nbsp;с&nbsp;задачей&nbsp;<b>#"
+            + str(value)
+            + "</b>"
+        )
 
-            elif (
-                prop_key == "subtask"
-                and property_name == "relation"
-                and value is not None
-            ):
-                result = "Добавлена&nbsp;подзадача&nbsp;<b>#" + str(value) + "</b>"
+    elif (
+        prop_key == "subtask"
+        and property_name == "relation"
+        and value is not None
+    ):
+        result = "Добавлена&nbsp;подзадача&nbsp;<b>#" + str(value) + "</b>"
 
-            else:
-                result = None
+    else:
+        result = None
 
     return result
 
@@ -1929,39 +2078,18 @@ def get_multiple_user_names(connection, user_ids):
     Returns:
         dict: Словарь {user_id: full_name}
     """
-    if not user_ids or not connection:
-        return {}
-
-    # Удаляем дубликаты и None значения
-    clean_ids = list(set(filter(None, user_ids)))
-    if not clean_ids:
+    if not user_ids:
         return {}
 
-    # Создаем плейсхолдеры для параметризованного запроса
-    placeholders = ",".join(["%s"] * len(clean_ids))
-    sql = f"""
-        SELECT id, CONCAT(IFNULL(lastname, ''), ' ', IFNULL(firstname, '')) AS full_name
-        FROM users
-        WHERE id IN ({placeholders})
-    """
-
-    cursor = None
-    result = {}
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, clean_ids)
-        for row in cursor:
-            result[row["id"]] = row["full_name"].strip()
-        logger.info(
-            f"Загружено {len(result)} имен пользователей из {len(clean_ids)} запрошенных"
-        )
-        return result
-    except pymysql.Error as e:
-        logger.error(f"Ошибка при пакетной загрузке имен пользователей: {e}")
-        result = {}
-    finally:
-        if cursor:
-            cursor.close()
+    # Имена берутся из справочника в памяти; в БД догружаются только неизвестные ID
+    names = redmine_reference_cache.get_many("users", user_ids, connection)
+    result = {
+        user_id: f"{lastname or ''} {firstname or ''}".strip()
+        for user_id, (firstname, lastname) in names.items()
+    }
+    logger.debug(
+        f"Получено {len(result)} имен пользователей из {len(set(filter(None, user_ids)))} запрошенных"
+    )
     return result
 
 
@@ -1976,35 +2104,14 @@ def get_multiple_project_names(connection, project_ids):
     Returns:
         dict: Словарь {project_id: name}
     """
-    if not project_ids or not connection:
+    if not project_ids:
         return {}
 
-    clean_ids = list(set(filter(None, project_ids)))
-    if not clean_ids:
-        return {}
-
-    placeholders = ",".join(["%s"] * len(clean_ids))
-    sql = (
-        f"SELECT id, IFNULL(name,'') as name FROM projects WHERE id IN ({placeholders})"
+    # Названия берутся из справочника в памяти; в БД догружаются только неизвестные ID
+    result = redmine_reference_cache.get_many("projects", project_ids, connection)
+    logger.debug(
+        f"Получено {len(result)} названий проектов из {len(set(filter(None, project_ids)))} запрошенных"
     )
-
-    cursor = None
-    result = {}
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, clean_ids)
-        for row in cursor:
-            result[row["id"]] = row["name"]
-        logger.info(
-            f"Загружено {len(result)} названий проектов из {len(clean_ids)} запрошенных"
-        )
-        return result
-    except pymysql.Error as e:
-        logger.error(f"Ошибка при пакетной загрузке названий проектов: {e}")
-        result = {}
-    finally:
-        if cursor:
-            cursor.close()
     return result
 
 
@@ -2019,33 +2126,14 @@ def get_multiple_status_names(connection, status_ids):
     Returns:
         dict: Словарь {status_id: name}
     """
-    if not status_ids or not connection:
+    if not status_ids:
         return {}
 
-    clean_ids = list(set(filter(None, status_ids)))
-    if not clean_ids:
-        return {}
-
-    placeholders = ",".join(["%s"] * len(clean_ids))
-    sql = f"SELECT id, IFNULL(name,'') as name FROM u_statuses WHERE id IN ({placeholders})"
-
-    cursor = None
-    result = {}
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, clean_ids)
-        for row in cursor:
-            result[row["id"]] = row["name"]
-        logger.info(
-            f"Загружено {len(result)} названий статусов из {len(clean_ids)} запрошенных"
-        )
-        return result
-    except pymysql.Error as e:
-        logger.error(f"Ошибка при пакетной загрузке названий статусов: {e}")
-        result = {}
-    finally:
-        if cursor:
-            cursor.close()
+    # Названия берутся из справочника в памяти; в БД догружаются только неизвестные ID
+    result = redmine_reference_cache.get_many("u_statuses", status_ids, connection)
+    logger.debug(
+        f"Получено {len(result)} названий статусов из {len(set(filter(None, status_ids)))} запрошенных"
+    )
     return result
 
 
@@ -2060,33 +2148,14 @@ def get_multiple_priority_names(connection, priority_ids):
     Returns:
         dict: Словарь {priority_id: name}
     """
-    if not priority_ids or not connection:
+    if not priority_ids:
         return {}
 
-    clean_ids = list(set(filter(None, priority_ids)))
-    if not clean_ids:
-        return {}
-
-    placeholders = ",".join(["%s"] * len(clean_ids))
-    sql = f"SELECT id, IFNULL(name,'') as name FROM u_Priority WHERE id IN ({placeholders})"
-
-    cursor = None
-    result = {}
-    try:
-        cursor = connection.cursor()
-        cursor.execute(sql, clean_ids)
-        for row in cursor:
-            result[row["id"]] = row["name"]
-        logger.info(
-            f"Загружено {len(result)} названий приоритетов из {len(clean_ids)} запрошенных"
-        )
-        return result
-    except pymysql.Error as e:
-        logger.error(f"Ошибка при пакетной загрузке названий приоритетов: {e}")
-        result = {}
-    finally:
-        if cursor:
-            cursor.close()
+    # Названия берутся из справочника в памяти; в БД догружаются только неизвестные ID
+    result = redmine_reference_cache.get_many("u_priorities", priority_ids, connection)
+    logger.debug(
+        f"Получено {len(result)} названий приоритетов из {len(set(filter(None, priority_ids)))} запрошенных"
+    )
     return result
 
 
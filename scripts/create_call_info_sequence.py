@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Создание последовательности Oracle для CALL_INFO_ID (T_CALL_INFO).
+
+Последовательность (CALL_INFO_SEQUENCE, по умолчанию SEQ_T_CALL_INFO)
+начинается выше текущего MAX(CALL_INFO_ID); если она уже есть, скрипт
+ничего не меняет. Без нее запись статистики звонков не создается.
+
+Использование:
+    python scripts/create_call_info_sequence.py           # создать
+    python scripts/create_call_info_sequence.py --print   # только показать DDL
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from blog.call.routes import CALL_INFO_SEQUENCE_DDL, call_info_id_allocator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--print", action="store_true", help="вывести DDL без выполнения")
+    args = parser.parse_args()
+
+    ddl = CALL_INFO_SEQUENCE_DDL.format(sequence_name=call_info_id_allocator.sequence_name)
+    if args.print:
+        print(ddl)
+        return 0
+
+    call_info_id_allocator.create_sequence()
+    print(f"Последовательность {call_info_id_allocator.sequence_name} готова")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Общие настройки тестов.
+
+blog/__init__.py и модули с подключениями к MySQL читают переменные
+окружения при импорте, поэтому они задаются до сборки тестовых модулей.
+"""
+
+import os
+
+
+for key, value in {
+    "MYSQL_HOST": "127.0.0.1",
+    "MYSQL_PORT": "3306",
+    "MYSQL_DATABASE": "redmine",
+    "MYSQL_USER": "easyredmine",
+    "MYSQL_PASSWORD": "x",
+    "MYSQL_QUALITY_HOST": "127.0.0.1",
+    "MYSQL_QUALITY_PORT": "3306",
+    "MYSQL_QUALITY_DATABASE": "redmine",
+    "MYSQL_QUALITY_USER": "easyredmine",
+    "MYSQL_QUALITY_PASSWORD": "x",
+    "SECRET_KEY": "test-secret",
+}.items():
+    os.environ.setdefault(key, value)
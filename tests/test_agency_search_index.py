@@ -0,0 +1,119 @@
+import unittest
+
+from blog.call.agency_index import AgencySearchIndex
+
+
+def make_agency(agency_id, name, city=None, phone=None, english_name=None):
+    row = {
+        "ID_TR": agency_id,
+        "NAME_RU": name,
+        "NAME_EN": english_name,
+        "ADDRESS": None,
+        "CITY_NAME": city,
+        "METRO_STATION_NAME": None,
+        "DISTRICT_NAME": None,
+    }
+    for i in range(1, 8):
+        row[f"telephone_{i}_number"] = phone if i == 1 else None
+    return row
+
+
+class FakeCursor:
+    def __init__(self, source):
+        self.source = source
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        self.source.queries.append((query, list(params or [])))
+        after_id = params[0] if params else 0
+        self.result = [dict(row) for row in self.source.rows if row["ID_TR"] > after_id]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeSource:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def connect(self):
+        source = self
+
+        class Connection:
+            def cursor(self, *args):
+                return FakeCursor(source)
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+class AgencySearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.source = FakeSource(
+            [
+                make_agency(1, "Ёлка Тур", city="Москва", phone="+7 (495) 123-45-67"),
+                make_agency(2, "Альфа Трэвел", city="Казань", english_name="Alpha Travel"),
+                make_agency(3, "Мир Путешествий", city="Москва", phone="8 812 555 00 11"),
+            ]
+        )
+        self.index = AgencySearchIndex(self.source.connect)
+        self.index.ensure_fresh()
+
+    def names(self, term):
+        return [row["NAME_RU"] for row in self.index.search(term)]
+
+    def test_substring_prefix_and_phone_search(self):
+        self.assertEqual(self.names("елка"), ["Ёлка Тур"])
+        self.assertEqual(self.names("травел"), [])
+        self.assertEqual(self.names("travel"), ["Альфа Трэвел"])
+        self.assertEqual(self.names("москва тур"), ["Ёлка Тур"])
+        self.assertEqual(self.names("ми"), ["Мир Путешествий"])
+        self.assertEqual(self.names("4951234567"), ["Ёлка Тур"])
+        self.assertEqual(self.names("555-00"), ["Мир Путешествий"])
+        self.assertEqual(
+            self.index.search("москва")[0]["ALL_TELEPHONES_CONCAT"],
+            "+7 (495) 123-45-67",
+        )
+
+    def test_paging_and_incremental_refresh(self):
+        rows, total = self.index.page(1, 2)
+        self.assertEqual(total, 3)
+        self.assertEqual([row["NAME_RU"] for row in rows], ["Альфа Трэвел", "Ёлка Тур"])
+
+        self.source.rows.append(make_agency(4, "Бета Тур"))
+        self.index._last_refresh = 0
+        self.index.ensure_fresh()
+
+        self.assertEqual(self.source.queries[-1][1], [3])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.names("бета"), ["Бета Тур"])
+
+    def test_full_reload_swaps_in_a_complete_snapshot(self):
+        before = self.index._snapshot
+        self.source.rows = [row for row in self.source.rows if row["ID_TR"] != 2]
+        self.source.rows.append(make_agency(5, "Гамма Тур"))
+
+        self.index.ensure_fresh(force=True)
+
+        # Читатель, взявший старый срез до перезагрузки, дочитывает его целиком
+        self.assertEqual(
+            [before.rows[i]["NAME_RU"] for i in before.order],
+            ["Альфа Трэвел", "Ёлка Тур", "Мир Путешествий"],
+        )
+        self.assertNotIn("гам", before.postings)
+        rows, total = self.index.page(1, 10)
+        self.assertEqual(total, 3)
+        self.assertEqual(
+            [row["NAME_RU"] for row in rows],
+            ["Гамма Тур", "Ёлка Тур", "Мир Путешествий"],
+        )
+        self.assertEqual(self.names("альфа"), [])
@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import blog.utils.cache_manager as cache_manager_module
+from blog.utils.cache_manager import CacheManager, UncachedResult, issue_tag, redmine_user_tag
+
+
+class CacheManagerTests(unittest.TestCase):
+    def test_namespace_lru_limit_evicts_least_recently_used(self):
+        cache = CacheManager()
+        cache.configure_namespace("users", ttl=60, max_entries=2)
+
+        cache.set("a", 1, namespace="users")
+        cache.set("b", 2, namespace="users")
+        self.assertEqual(cache.get("a", namespace="users"), 1)
+        cache.set("c", 3, namespace="users")
+
+        self.assertIsNone(cache.get("b", namespace="users"))
+        self.assertEqual(cache.get("a", namespace="users"), 1)
+        self.assertEqual(cache.get("c", namespace="users"), 3)
+
+        stats = cache.get_stats()["namespaces"]["users"]
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 2)
+
+    def test_namespace_ttl_is_used_when_ttl_not_passed(self):
+        cache = CacheManager(default_ttl=300)
+        cache.configure_namespace("short", ttl=5)
+
+        with patch.object(cache_manager_module.time, "time", return_value=1000.0):
+            cache.set("k", "v", namespace="short")
+        with patch.object(cache_manager_module.time, "time", return_value=1006.0):
+            self.assertIsNone(cache.get("k", namespace="short"))
+
+        self.assertEqual(cache.get_stats()["namespaces"]["short"]["expirations"], 1)
+
+    def test_clear_namespace_leaves_other_namespaces(self):
+        cache = CacheManager()
+        cache.set("k", 1, namespace="one")
+        cache.set("k", 2, namespace="two")
+
+        self.assertEqual(cache.clear_namespace("one"), 1)
+        self.assertIsNone(cache.get("k", namespace="one"))
+        self.assertEqual(cache.get("k", namespace="two"), 2)
+
+    def test_concurrent_misses_share_one_computation(self):
+        cache = CacheManager()
+        calls = []
+        release = threading.Event()
+
+        def produce():
+            calls.append(1)
+            release.wait(2)
+            return {"value": 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set("k", produce, namespace="stats")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 42}] * 5)
+        self.assertEqual(cache.get_stats()["namespaces"]["stats"]["coalesced"], 4)
+
+    def test_stale_value_is_served_while_refreshing_in_background(self):
+        cache = CacheManager()
+        refreshed = threading.Event()
+
+        with patch.object(cache_manager_module.time, "time", return_value=1000.0):
+            cache.set("k", "old", ttl=10, namespace="stats", stale_ttl=60)
+
+        def produce():
+            refreshed.set()
+            return "new"
+
+        with patch.object(cache_manager_module.time, "time", return_value=1015.0):
+            self.assertEqual(cache.get_or_set("k", produce, ttl=10, namespace="stats", stale_ttl=60), "old")
+
+            self.assertTrue(refreshed.wait(2))
+            for _ in range(50):
+                if cache.get("k", namespace="stats") == "new":
+                    break
+                time.sleep(0.01)
+            self.assertEqual(cache.get("k", namespace="stats"), "new")
+
+    def test_uncached_result_is_not_stored(self):
+        cache = CacheManager()
+
+        def produce():
+            raise UncachedResult(({"error": "db"}, 500))
+
+        with self.assertRaises(UncachedResult) as raised:
+            cache.get_or_set("k", produce, namespace="stats")
+
+        self.assertEqual(raised.exception.value, ({"error": "db"}, 500))
+        self.assertFalse(cache.exists("k", namespace="stats"))
+
+    def test_invalidate_tags_evicts_only_tagged_entries(self):
+        cache = CacheManager()
+        cache.set("kanban-7", [101, 102], namespace="lists", tags=[redmine_user_tag(7), issue_tag(101), issue_tag(102)])
+        cache.set("kanban-8", [103], namespace="lists", tags=[redmine_user_tag(8), issue_tag(103)])
+        cache.get_or_set("stats-8", lambda: {"total": 1}, namespace="stats", tags=lambda value: [redmine_user_tag(8)])
+
+        self.assertEqual(cache.invalidate_tags(issue_tag(101)), 1)
+        self.assertIsNone(cache.get("kanban-7", namespace="lists"))
+        self.assertEqual(cache.get("kanban-8", namespace="lists"), [103])
+
+        self.assertEqual(cache.invalidate_tags(redmine_user_tag(8)), 2)
+        self.assertIsNone(cache.get("stats-8", namespace="stats"))
+        self.assertEqual(cache.tag_index, {})
+
+    def test_tag_invalidation_reaches_other_workers_through_spool(self):
+        spool = os.path.join(tempfile.mkdtemp(), "cache_tags.spool")
+        self.addCleanup(shutil.rmtree, os.path.dirname(spool))
+        workers = [CacheManager() for _ in range(2)]
+        for worker in workers:
+            worker.init_tag_spool(spool)
+            worker.set("kanban-7", [101], namespace="lists", tags=[issue_tag(101)])
+            worker.set("kanban-8", [103], namespace="lists", tags=[issue_tag(103)])
+
+        workers[0].invalidate_tags(issue_tag(101))
+
+        self.assertIsNone(workers[1].get("kanban-7", namespace="lists"))
+        self.assertEqual(workers[1].get("kanban-8", namespace="lists"), [103])
+
+        # Обрезанный журнал: строки могли потеряться, сбрасываются все записи с тегами
+        with open(spool, "w"):
+            pass
+        self.assertIsNone(workers[1].get("kanban-8", namespace="lists"))
+
+    def test_idle_worker_notices_rotation_after_spool_regrows(self):
+        spool = os.path.join(tempfile.mkdtemp(), "cache_tags.spool")
+        self.addCleanup(shutil.rmtree, os.path.dirname(spool))
+        writer, idle = CacheManager(), CacheManager()
+        writer.init_tag_spool(spool, max_bytes=200)
+        idle.init_tag_spool(spool, max_bytes=200)
+        idle.set("kanban-8", [103], namespace="lists", tags=[issue_tag(103)])
+        writer.invalidate_tags(issue_tag(1))
+        self.assertEqual(idle.get("kanban-8", namespace="lists"), [103])
+        inode = os.stat(spool).st_ino
+        offset = idle._tag_spool_offset
+
+        # Пока idle не обращался к кешу, журнал ротирован и вырос дальше его позиции;
+        # строка про задачу 103 ушла вместе со старым файлом
+        writer.invalidate_tags(issue_tag(103))
+        rotated = False
+        for tag in range(200, 300):
+            writer.invalidate_tags(issue_tag(tag))
+            rotated = rotated or os.stat(spool).st_ino != inode
+            if rotated and os.path.getsize(spool) > offset:
+                break
+        self.assertTrue(rotated)
+
+        self.assertIsNone(idle.get("kanban-8", namespace="lists"))
+        self.assertEqual(idle._tag_spool_offset, os.path.getsize(spool))
+
+    def test_new_generation_is_noticed_even_if_inode_is_reused(self):
+        spool = os.path.join(tempfile.mkdtemp(), "cache_tags.spool")
+        self.addCleanup(shutil.rmtree, os.path.dirname(spool))
+        idle = CacheManager()
+        idle.init_tag_spool(spool)
+        idle.set("kanban-9", [104], namespace="lists", tags=[issue_tag(104)])
+        with open(spool, "a") as f:
+            f.write("other issue:1\n")
+        self.assertEqual(idle.get("kanban-9", namespace="lists"), [104])
+
+        # Файл с новым поколением занял тот же inode и вырос дальше позиции idle
+        with open(spool, "r+") as f:
+            f.truncate(0)
+            f.write("# 0123456789abcdef\n" + "other issue:2\n" * 4)
+
+        self.assertIsNone(idle.get("kanban-9", namespace="lists"))
+        self.assertEqual(idle._tag_spool_offset, os.path.getsize(spool))
+
+    def test_value_computed_across_an_invalidation_is_not_cached(self):
+        cache = CacheManager()
+
+        def produce():
+            # Задача изменилась, пока считались данные
+            cache.invalidate_tags(issue_tag(101))
+            return [101]
+
+        self.assertEqual(
+            cache.get_or_set("kanban-7", produce, namespace="lists", tags=[issue_tag(101)]), [101]
+        )
+        self.assertFalse(cache.exists("kanban-7", namespace="lists"))
+
+        cache.get_or_set("kanban-7", lambda: [101], namespace="lists", tags=[issue_tag(101)])
+        self.assertTrue(cache.exists("kanban-7", namespace="lists"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import queue
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import blog.call.routes as call_routes
+from blog.call.routes import (
+    CALL_INFO_AGENCY_NAME_SQL,
+    CALL_INFO_END_SQL,
+    CALL_INFO_INSERT_SQL,
+    CallInfoIdAllocator,
+    CallInfoIdUnavailable,
+    CallStatWriter,
+)
+
+
+def _sqlite_engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE T_CALL_INFO (CALL_INFO_ID INTEGER PRIMARY KEY, TIME_BEGIN TEXT, "
+                "TIME_END TEXT, PHONE_NUMBER TEXT, CURRATOR TEXT, THEME TEXT, AGENCY_ID TEXT, "
+                "REGION TEXT, AGENCY_NAME TEXT, AGENCY_MANAGER TEXT)"
+            )
+        )
+        connection.execute(text("INSERT INTO T_CALL_INFO (CALL_INFO_ID) VALUES (41)"))
+    return engine
+
+
+def _insert_params(call_id):
+    return {
+        "id": call_id,
+        "time_begin": "2026-01-01 10:00:00",
+        "time_end": "2026-01-01 10:00:00",
+        "phone": "+37060011111",
+        "curator": None,
+        "theme": None,
+        "agency_id": "7",
+        "region": "lt",
+    }
+
+
+class CallInfoIdAllocatorTests(unittest.TestCase):
+    def test_missing_sequence_fails_and_is_retried_after_backoff(self):
+        allocator = CallInfoIdAllocator(_sqlite_engine(), "SEQ_T_CALL_INFO", block_size=2)
+        clock = [100.0]
+        with patch.object(call_routes.time, "monotonic", side_effect=lambda: clock[0]):
+            # Без последовательности ID не выдается вовсе, MAX+1 не используется
+            with self.assertRaises(CallInfoIdUnavailable):
+                allocator.next_id()
+
+            with patch.object(allocator, "_fetch_block", return_value=[500, 501]) as fetch:
+                with self.assertRaises(CallInfoIdUnavailable):
+                    allocator.next_id()
+                fetch.assert_not_called()
+
+                clock[0] += allocator.retry_interval
+                self.assertEqual([allocator.next_id(), allocator.next_id()], [500, 501])
+                fetch.assert_called_once()
+
+    def test_rejects_unsafe_sequence_name(self):
+        with self.assertRaises(ValueError):
+            CallInfoIdAllocator(_sqlite_engine(), "SEQ; DROP TABLE T_CALL_INFO")
+
+
+class CallStatWriterTests(unittest.TestCase):
+    def test_updates_are_applied_after_their_insert(self):
+        engine = _sqlite_engine()
+        writer = CallStatWriter(engine, batch_size=10)
+
+        for call_id in (50, 51):
+            writer.submit(CALL_INFO_INSERT_SQL, _insert_params(call_id))
+        writer.submit(CALL_INFO_AGENCY_NAME_SQL, {"agency_name": "Test Travel", "call_id": 50})
+        writer.submit(CALL_INFO_END_SQL, {"time_end": "2026-01-01 10:05:00", "call_id": 51})
+        self.assertTrue(writer.drain(timeout=5))
+
+        with engine.connect() as connection:
+            rows = connection.execute(
+                text("SELECT CALL_INFO_ID, AGENCY_NAME, TIME_END FROM T_CALL_INFO WHERE CALL_INFO_ID >= 50 ORDER BY 1")
+            ).fetchall()
+        self.assertEqual(
+            [tuple(row) for row in rows],
+            [(50, "Test Travel", "2026-01-01 10:00:00"), (51, None, "2026-01-01 10:05:00")],
+        )
+
+    def test_full_queue_never_writes_out_of_order(self):
+        engine = _sqlite_engine()
+        writer = CallStatWriter(engine, maxsize=1, put_timeout=0.01)
+        writer._queue.put((CALL_INFO_INSERT_SQL, _insert_params(70)))
+
+        # Поток записи не запущен: очередь остается заполненной
+        with patch.object(writer, "_ensure_started"), patch.object(writer, "_execute_batch") as execute_batch:
+            self.assertFalse(
+                writer.submit(CALL_INFO_END_SQL, {"time_end": "2026-01-01 10:05:00", "call_id": 70})
+            )
+        # Обновление не выполнено в обход очереди, вставка в ней осталась первой
+        execute_batch.assert_not_called()
+        self.assertEqual(writer._queue.get_nowait()[0], CALL_INFO_INSERT_SQL)
+        with self.assertRaises(queue.Empty):
+            writer._queue.get_nowait()
+
+    def test_bad_row_does_not_drop_the_rest_of_the_batch(self):
+        engine = _sqlite_engine()
+        writer = CallStatWriter(engine, batch_size=10)
+
+        writer._execute_batch(
+            [
+                (CALL_INFO_INSERT_SQL, _insert_params(41)),  # дубликат ключа
+                (CALL_INFO_INSERT_SQL, _insert_params(60)),
+            ]
+        )
+
+        with engine.connect() as connection:
+            count = connection.execute(text("SELECT COUNT(*) FROM T_CALL_INFO")).scalar()
+        self.assertEqual(count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import datetime
+import unittest
+
+from flask import Flask
+
+from blog import db
+from blog.call.stats_rollup import CallStatsRollup
+
+
+TODAY = datetime.date.today()
+OLD_DAY = TODAY - datetime.timedelta(days=5)
+
+CALLS = [
+    (datetime.datetime.combine(OLD_DAY, datetime.time(10)), 1, "Anna"),
+    (datetime.datetime.combine(OLD_DAY, datetime.time(11)), 1, "Anna"),
+    (datetime.datetime.combine(OLD_DAY, datetime.time(12)), 2, "Boris"),
+    (datetime.datetime.combine(OLD_DAY, datetime.time(13)), None, None),
+    (datetime.datetime.combine(TODAY, datetime.time(9)), 2, "Boris"),
+]
+
+
+class FakeCursor:
+    def __init__(self, queries):
+        self.queries = queries
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        if "MIN(datetime)" in query:
+            self.result = [{"first_call": min(call[0] for call in CALLS)}]
+            return
+        start = params[0]
+        end = params[1] if len(params) > 1 else datetime.datetime.max
+        grouped = {}
+        for moment, operator_id, operator_name in CALLS:
+            if start <= moment < end:
+                key = (moment.date(), operator_id, operator_name)
+                grouped[key] = grouped.get(key, 0) + 1
+        self.result = [
+            {"day": day, "operator_id": op_id, "operator_name": name, "call_count": count}
+            for (day, op_id, name), count in grouped.items()
+        ]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def cursor(self, *args):
+        return FakeCursor(self.queries)
+
+    def close(self):
+        pass
+
+
+class CallStatsRollupTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        self.queries = []
+        self.rollup = CallStatsRollup(lambda: FakeConnection(self.queries), live_days=2)
+
+    def test_closed_days_are_rolled_up_once(self):
+        stats = self.rollup.operator_stats(OLD_DAY)
+        queries_after_first_call = len(self.queries)
+        again = self.rollup.operator_stats(OLD_DAY)
+
+        expected = [
+            {"operator_name": "Anna", "call_count": 2},
+            {"operator_name": "Boris", "call_count": 1},
+        ]
+        self.assertEqual(stats, expected)
+        self.assertEqual(again, expected)
+        self.assertEqual(len(self.queries), queries_after_first_call)
+        self.assertTrue(all("DATE(cls.datetime) =" not in query for query in self.queries))
+
+    def test_monthly_stats_combine_rollup_and_live_days(self):
+        stats = self.rollup.monthly_stats()
+
+        counts = {(row["year"], row["month"]): row["count"] for row in stats}
+        self.assertEqual(sum(counts.values()), len(CALLS))
+        self.assertEqual(self.rollup.operator_stats(TODAY), [{"operator_name": "Boris", "call_count": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
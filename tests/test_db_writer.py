@@ -0,0 +1,151 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from unittest.mock import call, patch
+
+from flask import Flask
+from sqlalchemy import event, text
+
+from blog import db
+from blog.db_writer import SQLiteWriteQueue
+from blog.models import Notifications
+
+
+class SQLiteWriteQueueTests(unittest.TestCase):
+    def setUp(self):
+        # Файловая база: поток-писатель открывает собственное соединение
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp.name, 'blog.db')}"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        self.addCleanup(db.engine.dispose)
+        self.addCleanup(db.session.remove)
+        Notifications.__table__.create(db.engine)
+
+        self.commits = []
+        event.listen(db.engine, "commit", lambda conn: self.commits.append(1))
+
+    @staticmethod
+    def _insert(issue_id):
+        def job(session):
+            session.add(
+                Notifications(
+                    user_id=1,
+                    issue_id=issue_id,
+                    old_status="Новая",
+                    new_status="В работе",
+                    old_subj="Заявка",
+                    date_created=datetime(2026, 1, 1),
+                )
+            )
+            return issue_id
+
+        return job
+
+    def _submit_concurrently(self, writer, jobs):
+        results, errors = {}, {}
+
+        def run(index, job):
+            try:
+                results[index] = writer.submit(job)
+            except Exception as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=run, args=item) for item in enumerate(jobs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_sqlite_pragmas_applied(self):
+        with db.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(connection.execute(text("PRAGMA synchronous")).scalar(), 1)
+            self.assertGreater(connection.execute(text("PRAGMA busy_timeout")).scalar(), 0)
+
+    def test_concurrent_jobs_share_one_commit(self):
+        writer = SQLiteWriteQueue(max_batch=10, max_delay=0.5)
+        writer.init_app(self.app)
+
+        results, errors = self._submit_concurrently(writer, [self._insert(i) for i in range(5)])
+
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(results.values()), [0, 1, 2, 3, 4])
+        self.assertEqual(Notifications.query.count(), 5)
+        self.assertEqual(len(self.commits), 1)
+
+    def test_failed_job_does_not_cancel_batch(self):
+        writer = SQLiteWriteQueue(max_batch=10, max_delay=0.5)
+        writer.init_app(self.app)
+
+        def broken(session):
+            raise ValueError("broken job")
+
+        results, errors = self._submit_concurrently(
+            writer, [self._insert(1), broken, self._insert(2)]
+        )
+
+        self.assertEqual(sorted(results.values()), [1, 2])
+        self.assertEqual(list(errors), [1])
+        self.assertIsInstance(errors[1], ValueError)
+        self.assertEqual(Notifications.query.count(), 2)
+
+    def test_timeout_waits_for_running_job_and_cancels_queued_one(self):
+        writer = SQLiteWriteQueue(timeout=0.1)
+        writer.init_app(self.app)
+        started, release = threading.Event(), threading.Event()
+
+        def slow(session):
+            started.set()
+            release.wait(5)
+            return self._insert(1)(session)
+
+        results = {}
+        blocking = threading.Thread(
+            target=lambda: results.setdefault("slow", writer.submit(slow))
+        )
+        blocking.start()
+        self.assertTrue(started.wait(5))
+
+        # Писатель занят: задание в очереди снимается и не будет выполнено
+        with self.assertRaises(FutureTimeoutError):
+            writer.submit(self._insert(2))
+        release.set()
+        blocking.join(5)
+
+        # Задание, которое писатель уже начал, дожидается своего commit
+        self.assertEqual(results, {"slow": 1})
+        self.assertEqual(
+            [row.issue_id for row in Notifications.query.all()], [1]
+        )
+
+    def test_collect_takes_queued_jobs_without_waiting(self):
+        writer = SQLiteWriteQueue(max_delay=0)
+        for issue_id in (3, 4):
+            writer._queue.put((self._insert(issue_id), Future()))
+
+        with patch.object(writer._queue, "get", wraps=writer._queue.get) as get:
+            batch = writer._collect()
+
+        self.assertEqual(len(batch), 2)
+        # Одна блокирующая выборка первого задания, остальное — без ожидания
+        self.assertEqual(get.call_args_list, [call(), call(block=False), call(block=False)])
+
+    def test_runs_inline_without_app(self):
+        writer = SQLiteWriteQueue()
+
+        self.assertEqual(writer.submit(self._insert(7)), 7)
+        self.assertEqual(Notifications.query.count(), 1)
+        self.assertEqual(len(self.commits), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import erp_oracle
+from erp_oracle import ErpCredentialCache, OraclePoolRegistry
+
+
+class ErpCredentialCacheTests(unittest.TestCase):
+    def test_passwords_are_stored_encrypted_and_expire(self):
+        cache = ErpCredentialCache(ttl=60)
+        cache.set("ivanov", "s3cret")
+
+        token, _ = cache._entries["ivanov"]
+        self.assertNotIn(b"s3cret", token)
+        self.assertEqual(cache.get("ivanov"), "s3cret")
+
+        with patch.object(erp_oracle.time, "monotonic", return_value=10**9):
+            self.assertIsNone(cache.get("ivanov"))
+        self.assertNotIn("ivanov", cache._entries)
+
+    def test_warm_lookup_does_not_touch_oracle(self):
+        cache = ErpCredentialCache(ttl=60)
+        connection = MagicMock()
+
+        with patch.object(erp_oracle, "erp_credential_cache", cache), patch.object(
+            erp_oracle, "connect_oracle", return_value=connection
+        ) as connect, patch.object(
+            erp_oracle, "get_user_erp_password", return_value="s3cret"
+        ):
+            self.assertEqual(erp_oracle.fetch_user_erp_password("ivanov"), "s3cret")
+            self.assertEqual(erp_oracle.fetch_user_erp_password("ivanov"), "s3cret")
+
+        connect.assert_called_once()
+        connection.close.assert_called_once()
+
+
+class OraclePoolRegistryTests(unittest.TestCase):
+    def test_pool_is_created_once_per_dsn(self):
+        registry = OraclePoolRegistry(min_size=1, max_size=2)
+        pool = MagicMock()
+
+        with patch.object(erp_oracle.oracledb, "create_pool", return_value=pool) as create_pool:
+            registry.acquire("db", 1521, "erp", "app", "pwd", 10)
+            registry.acquire("db", 1521, "erp", "app", "pwd", 10)
+
+        create_pool.assert_called_once()
+        self.assertEqual(create_pool.call_args.kwargs["max"], 2)
+        self.assertEqual(pool.acquire.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
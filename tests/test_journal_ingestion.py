@@ -0,0 +1,317 @@
+import unittest
+from collections import defaultdict
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy.exc import SQLAlchemyError
+
+import blog.notification_service as notification_service_module
+from blog import db
+from blog.journal_ingestion import WATERMARK_NAME, JournalIngestor
+from blog.models import IngestionWatermark, Notifications, NotificationsAddNotes, User
+from blog.notification_service import NotificationService, NotificationType
+
+
+T0 = datetime(2026, 3, 1, 10, 0, 0)
+T1 = datetime(2026, 3, 1, 10, 5, 0)
+
+
+def journal(journal_id, created_on, user_id, notes="", private_notes=0):
+    return {
+        "id": journal_id,
+        "issue_id": 500,
+        "project_id": 7,
+        "user_id": user_id,
+        "notes": notes,
+        "private_notes": private_notes,
+        "created_on": created_on,
+        "subject": "Не работает VPN",
+        "author_id": 10,
+        "assigned_to_id": 11,
+        "easy_email_to": "Client@Example.com",
+        "author_name": "Иван  Петров",
+    }
+
+
+class FakeRedmine:
+    def __init__(self):
+        self.journals = [journal(1, T0, 11)]
+        self.statuses = {}
+        self.watchers = [{"issue_id": 500, "user_id": 12}]
+        self.private_readers = []
+        # Очереди заявителя, которые Redmine заполняет параллельно с journals
+        self.requester_queue = {"u_its_update_status": [], "u_its_add_notes": []}
+        self.queries = []
+
+    def connect(self):
+        redmine = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, sql, params=()):
+                redmine.queries.append(sql)
+                self.rowcount = 0
+                if sql.startswith("DELETE FROM"):
+                    table = sql.split()[2]
+                    cutoff, limit = params
+                    rows = redmine.requester_queue[table]
+                    retired = [r for r in rows if r["RowDateCreated"] < cutoff][:limit]
+                    redmine.requester_queue[table] = [r for r in rows if r not in retired]
+                    self.rowcount = len(retired)
+                    self.rows = []
+                elif "FROM u_its_" in sql:
+                    table = sql.split("FROM ")[1].split()[0]
+                    self.rows = list(redmine.requester_queue[table])
+                elif "ORDER BY created_on DESC" in sql:
+                    last = redmine.journals[-1]
+                    self.rows = [{"created_on": last["created_on"], "id": last["id"]}]
+                elif "j.id <= %s" in sql:
+                    since, created_on, _, last_id, limit = params
+                    self.rows = [
+                        j for j in redmine.journals
+                        if j["created_on"] >= since and (j["created_on"], j["id"]) <= (created_on, last_id)
+                    ][:limit]
+                elif "FROM journals j" in sql:
+                    created_on, _, last_id, limit = params
+                    self.rows = [
+                        j for j in redmine.journals
+                        if (j["created_on"], j["id"]) > (created_on, last_id)
+                    ][:limit]
+                elif "FROM members m" in sql:
+                    self.rows = [
+                        r for r in redmine.private_readers
+                        if r["project_id"] is None or r["project_id"] in params
+                    ]
+                elif "FROM journal_details" in sql:
+                    self.rows = [
+                        {"journal_id": jid, "old_status": old, "new_status": new}
+                        for jid, (old, new) in redmine.statuses.items() if jid in params
+                    ]
+                else:
+                    self.rows = [w for w in redmine.watchers if w["issue_id"] in params]
+
+            def fetchall(self):
+                return self.rows
+
+            def fetchone(self):
+                return self.rows[0] if self.rows else None
+
+        class Connection:
+            def cursor(self, *args):
+                return Cursor()
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+class FakeDeduplicator:
+    def __init__(self):
+        self.seen = set()
+
+    def is_duplicate(self, notification, request_id=None):
+        hash_key = notification.get_hash()
+        if hash_key in self.seen:
+            return True
+        self.seen.add(hash_key)
+        return False
+
+    def release(self, *notifications):
+        self.seen.difference_update(notification.get_hash() for notification in notifications)
+
+
+class FakeNotificationService:
+    def __init__(self):
+        self.deduplicator = FakeDeduplicator()
+        self.saved = defaultdict(list)
+        self.staged = defaultdict(list)
+        self.fail_comments = False
+
+    def _stage_status_notifications(self, notifications):
+        self.staged["status"].extend(notifications)
+        return [], notifications
+
+    def _stage_comment_notifications(self, notifications):
+        if self.fail_comments:
+            raise SQLAlchemyError("disk I/O error")
+        self.staged["comment"].extend(notifications)
+        return [], notifications
+
+    def _after_notifications_saved(self, notifications, request_id):
+        # Вызывается только после commit
+        for kind, staged in self.staged.items():
+            self.saved[kind].extend(staged)
+        self.staged.clear()
+
+
+class JournalIngestorTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        User.__table__.create(db.engine)
+        db.session.add_all(
+            [
+                User(id=1, username="author", email="a@tez.ru", password="x", is_redmine_user=True, id_redmine_user=10),
+                User(id=2, username="assignee", email="b@tez.ru", password="x", is_redmine_user=True, id_redmine_user=11),
+                User(id=3, username="watcher", email="c@tez.ru", password="x", is_redmine_user=True, id_redmine_user=12),
+                User(id=4, username="client", email="client@example.com", password="x"),
+                User(id=5, username="other", email="d@tez.ru", password="x", id_redmine_user=10),
+            ]
+        )
+        db.session.commit()
+
+        self.redmine = FakeRedmine()
+        self.service = FakeNotificationService()
+        self.ingestor = JournalIngestor(
+            self.redmine.connect, lambda: self.service, batch_size=2, min_interval=0
+        )
+
+    def test_first_run_starts_from_latest_journal(self):
+        self.assertEqual(self.ingestor.run(), {})
+        watermark = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        self.assertEqual((watermark.created_on, watermark.last_id), (T0, 1))
+        self.assertEqual(dict(self.service.saved), {})
+
+    def test_new_journals_fan_out_to_recipients_in_batches(self):
+        self.ingestor.run()
+        self.redmine.journals += [
+            journal(2, T1, 11, notes="Проверьте настройки"),
+            journal(3, T1, 10),
+            journal(4, T1, 12),
+        ]
+        self.redmine.statuses = {3: ("Новая", "В работе")}
+
+        created = self.ingestor.run()
+
+        comments = self.service.saved["comment"]
+        statuses = self.service.saved["status"]
+        # Исполнитель (11) — автор комментария, ему уведомление не нужно
+        self.assertEqual(sorted(n.user_id for n in comments), [1, 3, 4])
+        self.assertEqual(comments[0].data["author"], "Иван Петров")
+        self.assertEqual(sorted(n.user_id for n in statuses), [2, 3, 4])
+        self.assertEqual(statuses[0].notification_type, NotificationType.STATUS_CHANGE)
+        self.assertEqual(statuses[0].data["new_status"], "В работе")
+        self.assertEqual(created, {1: 1, 2: 1, 3: 2, 4: 2})
+
+        watermark = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        self.assertEqual((watermark.created_on, watermark.last_id), (T1, 4))
+        journal_reads = [q for q in self.redmine.queries if "j.id > %s" in q]
+        self.assertEqual(len(journal_reads), 3)
+
+        self.assertEqual(self.ingestor.run(), {})
+
+    def test_batch_claimed_by_another_worker_is_skipped(self):
+        # Повторное чтение окна здесь не нужно: записи "другого воркера" не сохранены
+        self.ingestor.overlap = 0
+        self.ingestor.run()
+        self.redmine.journals.append(journal(2, T1, 11, notes="Готово"))
+        self.assertFalse(self.ingestor._claim((T1, 99), (T1, 100)))
+        db.session.query(IngestionWatermark).update({"last_id": 2, "created_on": T1})
+        db.session.commit()
+
+        self.assertEqual(self.ingestor.run(), {})
+        self.assertEqual(dict(self.service.saved), {})
+
+    def test_private_notes_only_reach_users_allowed_to_see_them(self):
+        self.ingestor.run()
+        self.redmine.journals.append(journal(2, T1, 11, notes="Пароль от VPN", private_notes=1))
+        self.redmine.statuses = {2: ("Новая", "В работе")}
+        # Право view_private_notes в проекте есть только у автора заявки (10)
+        self.redmine.private_readers = [{"project_id": 7, "user_id": 10}]
+
+        self.ingestor.run()
+
+        comments = self.service.saved["comment"]
+        self.assertEqual([n.user_id for n in comments], [1])
+        # Смена статуса не приватна и уходит всем получателям
+        self.assertEqual(sorted(n.user_id for n in self.service.saved["status"]), [1, 3, 4])
+        reader_queries = [q for q in self.redmine.queries if "FROM members m" in q]
+        self.assertEqual(len(reader_queries), 1)
+
+    def test_failed_save_rolls_back_batch_and_watermark(self):
+        self.ingestor.run()
+        self.redmine.journals.append(journal(2, T1, 11, notes="Готово"))
+        self.redmine.statuses = {2: ("Новая", "Решена")}
+        self.service.fail_comments = True
+
+        self.assertEqual(self.ingestor.run(), {})
+        watermark = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        self.assertEqual((watermark.created_on, watermark.last_id), (T0, 1))
+        self.assertEqual(dict(self.service.saved), {})
+
+        self.service.fail_comments = False
+        self.service.staged.clear()
+        self.assertEqual(self.ingestor.run(), {1: 2, 3: 2, 4: 2})
+        watermark = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        self.assertEqual((watermark.created_on, watermark.last_id), (T1, 2))
+
+    def test_late_committed_journal_is_picked_up_from_overlap(self):
+        self.ingestor.run()
+        self.redmine.journals.append(journal(3, T1, 11, notes="Готово"))
+        self.ingestor.run()
+        # Запись 2 зафиксирована в MySQL позже записи 3, но created_on у нее раньше
+        self.redmine.journals.insert(1, journal(2, T1 - timedelta(seconds=1), 10, notes="Забыл приложить файл"))
+
+        self.assertEqual(self.ingestor.run(), {2: 1, 3: 1, 4: 1})
+        comments = [n.source_id for n in self.service.saved["comment"]]
+        self.assertEqual(sorted(comments), [2, 2, 2, 3, 3, 3])
+        watermark = db.session.get(IngestionWatermark, WATERMARK_NAME)
+        self.assertEqual((watermark.created_on, watermark.last_id), (T1, 3))
+
+    def test_requester_gets_one_notification_per_journal(self):
+        Notifications.__table__.create(db.engine)
+        NotificationsAddNotes.__table__.create(db.engine)
+        service = NotificationService()
+        self.ingestor.notification_service_factory = lambda: service
+        self.ingestor.run()
+        self.redmine.journals.append(journal(2, T1, 11, notes="Проверьте настройки"))
+        self.redmine.statuses = {2: ("Новая", "В работе")}
+        # Тот же переход Redmine положил и в очереди заявителя
+        queue_row = {"ID": 901, "Author": "client@example.com", "RowDateCreated": T1 + timedelta(seconds=1)}
+        self.redmine.requester_queue["u_its_update_status"].append(
+            dict(queue_row, IssueID=500, OldStatus="Новая", NewStatus="В работе", OldSubj="Не работает VPN", Body="")
+        )
+        self.redmine.requester_queue["u_its_add_notes"].append(
+            dict(queue_row, issue_id=500, notes="Проверьте настройки", date_created=T1)
+        )
+
+        with patch.object(notification_service_module, "JOURNAL_INGESTION", "on"), patch.object(
+            notification_service_module, "NOTIFICATION_DEDUP_STORE", "memory"
+        ), patch.object(notification_service_module, "REDMINE_NOTIFICATIONS", "off"), patch.object(
+            notification_service_module.redmine, "get_connection", side_effect=lambda *a, **k: self.redmine.connect()
+        ), patch.object(service, "_send_push_notifications"), patch.object(
+            service, "get_local_redmine_notifications", return_value=[]
+        ):
+            self.ingestor.run()
+            result = service.get_user_notifications(4)
+            service.get_notifications_for_page(4)
+
+        self.assertEqual(len(result["status_notifications"]), 1)
+        self.assertEqual(len(result["comment_notifications"]), 1)
+        self.assertEqual(Notifications.query.filter_by(user_id=4).count(), 1)
+        self.assertEqual(NotificationsAddNotes.query.filter_by(user_id=4).count(), 1)
+        self.assertFalse([q for q in self.redmine.queries if "FROM u_its_" in q and "SELECT" in q])
+
+        # Строки очередей за позицией журнала удаляются, а не копятся
+        self.redmine.requester_queue["u_its_add_notes"].append(
+            dict(queue_row, ID=902, RowDateCreated=T1 - timedelta(minutes=5))
+        )
+        self.ingestor.run()
+        self.assertEqual(
+            [r["ID"] for r in self.redmine.requester_queue["u_its_add_notes"]], [901]
+        )
+
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import patch
+
+from blog.notification_service import NotificationCountStore
+
+
+class NotificationCountStoreTests(unittest.TestCase):
+    def test_counts_are_cached_until_invalidated(self):
+        store = NotificationCountStore(ttl_seconds=60)
+        computed = [{"total": 3, "unread": 1}, {"total": 4, "unread": 2}]
+
+        with patch.object(
+            NotificationCountStore,
+            "_count_local_notifications",
+            side_effect=lambda user_id: computed.pop(0),
+        ) as count_mock:
+            self.assertEqual(store.get_counts(24)["total"], 3)
+            self.assertEqual(store.get_counts(24)["total"], 3)
+            self.assertEqual(count_mock.call_count, 1)
+
+            store.invalidate(24)
+
+            self.assertEqual(store.get_counts(24), {"total": 4, "unread": 2})
+            self.assertEqual(count_mock.call_count, 2)
+
+    def test_invalidation_during_count_is_not_overwritten(self):
+        store = NotificationCountStore(ttl_seconds=60)
+
+        def count_with_concurrent_write(user_id):
+            store.invalidate(user_id)
+            return {"total": 1, "unread": 1}
+
+        with patch.object(
+            NotificationCountStore,
+            "_count_local_notifications",
+            side_effect=count_with_concurrent_write,
+        ) as count_mock:
+            store.get_counts(24)
+            store.get_counts(24)
+
+        self.assertEqual(count_mock.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
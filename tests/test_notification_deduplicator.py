@@ -0,0 +1,100 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import blog.notification_service as notification_service_module
+from blog.notification_service import (
+    NotificationData,
+    NotificationDeduplicator,
+    NotificationType,
+    SQLiteDedupStore,
+)
+
+
+def notification(source_id, user_id=1):
+    return NotificationData(
+        user_id=user_id,
+        issue_id=100,
+        notification_type=NotificationType.COMMENT_ADDED,
+        title="Новый комментарий",
+        message="",
+        data={},
+        created_at=datetime(2026, 3, 1, 10, 0),
+        source_id=source_id,
+    )
+
+
+class NotificationDeduplicatorTests(unittest.TestCase):
+    def test_local_entries_expire_in_order_and_are_bounded(self):
+        clock = [1000.0]
+        with patch.object(notification_service_module, "NOTIFICATION_DEDUP_STORE", "memory"), patch.object(
+            notification_service_module.time, "monotonic", side_effect=lambda: clock[0]
+        ):
+            deduplicator = NotificationDeduplicator(ttl_minutes=1, max_entries=2)
+            self.assertFalse(deduplicator.is_duplicate(notification(1)))
+            self.assertTrue(deduplicator.is_duplicate(notification(1)))
+
+            clock[0] += 30
+            self.assertFalse(deduplicator.is_duplicate(notification(2)))
+            clock[0] += 31
+            self.assertTrue(deduplicator.is_duplicate(notification(2)))
+            # Первая запись истекла и снята с начала очереди, вторая еще жива
+            self.assertEqual(list(deduplicator._cache), [notification(2).get_hash()])
+
+            self.assertFalse(deduplicator.is_duplicate(notification(3)))
+            self.assertFalse(deduplicator.is_duplicate(notification(4)))
+            self.assertEqual(len(deduplicator._cache), 2)
+            self.assertNotIn(notification(2).get_hash(), deduplicator._cache)
+
+
+class SQLiteDedupStoreTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "dedup.db")
+
+    def test_event_is_claimed_once_across_workers(self):
+        workers = [
+            NotificationDeduplicator(store=SQLiteDedupStore(self.path)) for _ in range(3)
+        ]
+        results = [worker.is_duplicate(notification(7)) for worker in workers]
+        self.assertEqual(results, [False, True, True])
+        # Повторная проверка отвечает из локального кеша
+        self.assertTrue(workers[1].is_duplicate(notification(7)))
+        self.assertFalse(workers[2].is_duplicate(notification(7, user_id=2)))
+
+    def test_released_claim_can_be_taken_by_any_worker(self):
+        first, second = (
+            NotificationDeduplicator(store=SQLiteDedupStore(self.path)) for _ in range(2)
+        )
+        self.assertFalse(first.is_duplicate(notification(8)))
+        # Сохранение не удалось — отметка снимается и локально, и в общем хранилище
+        first.release(notification(8))
+
+        self.assertFalse(second.is_duplicate(notification(8)))
+        self.assertTrue(first.is_duplicate(notification(8)))
+
+    def test_expired_claim_can_be_taken_again_and_size_is_bounded(self):
+        store = SQLiteDedupStore(self.path, max_entries=2)
+        clock = [1000.0]
+        with patch.object(notification_service_module.time, "time", side_effect=lambda: clock[0]):
+            self.assertTrue(store.claim("a", 60))
+            self.assertFalse(store.claim("a", 60))
+            clock[0] += 61
+            self.assertTrue(store.claim("a", 60))
+
+            store.claim("b", 60)
+            store.claim("c", 60)
+            clock[0] += 1
+            store.claim("d", 60)
+            store.cleanup()
+
+        rows = sqlite3.connect(self.path).execute(
+            "SELECT hash FROM notification_dedup ORDER BY hash"
+        ).fetchall()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(("d",), rows)
@@ -1,26 +1,13 @@
-import os
 import uuid
 import unittest
 from datetime import datetime
 from unittest.mock import patch
 
-
-for key, value in {
-    "MYSQL_HOST": "127.0.0.1",
-    "MYSQL_PORT": "3306",
-    "MYSQL_DATABASE": "redmine",
-    "MYSQL_USER": "easyredmine",
-    "MYSQL_PASSWORD": "x",
-    "MYSQL_QUALITY_HOST": "127.0.0.1",
-    "MYSQL_QUALITY_PORT": "3306",
-    "MYSQL_QUALITY_DATABASE": "redmine",
-    "MYSQL_QUALITY_USER": "easyredmine",
-    "MYSQL_QUALITY_PASSWORD": "x",
-    "SECRET_KEY": "test-secret",
-}.items():
-    os.environ.setdefault(key, value)
+from flask import Flask
 
 import blog.notification_service as notification_service_module
+from blog import db
+from blog.models import Notifications, NotificationsAddNotes, RedmineNotification, User
 from blog.notification_service import NotificationService
 
 
@@ -54,6 +41,14 @@ class FakeCursor:
         self.closed = True
 
 
+class ContextCursor(FakeCursor):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
 class FakeConnection:
     def __init__(self, cursor):
         self._cursor = cursor
@@ -66,9 +61,18 @@ class EmptyQuery:
     def filter_by(self, **kwargs):
         return self
 
+    def filter(self, *args, **kwargs):
+        return self
+
     def order_by(self, *args, **kwargs):
         return self
 
+    def limit(self, *args, **kwargs):
+        return self
+
+    def count(self):
+        return 0
+
     def all(self):
         return []
 
@@ -77,15 +81,20 @@ class FakeDateColumn:
     def desc(self):
         return self
 
+    def is_(self, other):
+        return self
+
 
 class FakeNotificationsModel:
     query = EmptyQuery()
     date_created = FakeDateColumn()
+    id = FakeDateColumn()
 
 
 class FakeNotificationsAddNotesModel:
     query = EmptyQuery()
     date_created = FakeDateColumn()
+    id = FakeDateColumn()
 
 
 class NotificationServiceRequesterQueueTests(unittest.TestCase):
@@ -201,6 +210,8 @@ class NotificationServiceRequesterQueueTests(unittest.TestCase):
         call_order = []
 
         with patch.object(
+            notification_service_module, "JOURNAL_INGESTION", "off"
+        ), patch.object(
             service,
             "_sync_requester_queue_notifications",
             side_effect=lambda user_id, user_email=None, request_id=None: call_order.append(
@@ -226,12 +237,40 @@ class NotificationServiceRequesterQueueTests(unittest.TestCase):
 
         self.assertEqual(call_order[0], ("sync", 24))
         self.assertEqual(result["total_count"], 0)
+        self.assertIsNone(result["next_cursor"])
+
+    def test_journal_ingestion_replaces_per_user_queue_sync(self):
+        service = NotificationService()
+
+        with patch.object(
+            notification_service_module, "JOURNAL_INGESTION", "on"
+        ), patch.object(
+            service, "_sync_requester_queue_notifications"
+        ) as queue_sync, patch.object(
+            service, "_fetch_and_save_redmine_notifications"
+        ), patch.object(
+            service, "get_local_redmine_notifications", side_effect=lambda user_id: []
+        ), patch.object(
+            notification_service_module, "REDMINE_NOTIFICATIONS", "off"
+        ), patch.object(
+            notification_service_module, "Notifications", FakeNotificationsModel
+        ), patch.object(
+            notification_service_module,
+            "NotificationsAddNotes",
+            FakeNotificationsAddNotesModel,
+        ):
+            service.get_user_notifications(24)
+            service.get_notifications_for_page(24)
+
+        queue_sync.assert_not_called()
 
     def test_get_notifications_for_page_syncs_requester_queue(self):
         service = NotificationService()
         call_order = []
 
         with patch.object(
+            notification_service_module, "JOURNAL_INGESTION", "off"
+        ), patch.object(
             service,
             "_sync_requester_queue_notifications",
             side_effect=lambda user_id, user_email=None, request_id=None: call_order.append(
@@ -259,5 +298,238 @@ class NotificationServiceRequesterQueueTests(unittest.TestCase):
         self.assertEqual(result["total_count"], 0)
 
 
+    def test_batch_sync_groups_queue_rows_by_recipient(self):
+        service = NotificationService()
+        cursor = FakeCursor(
+            [
+                [
+                    {
+                        "ID": 701,
+                        "IssueID": 270445,
+                        "OldStatus": "Открыта",
+                        "NewStatus": "В работе",
+                        "OldSubj": "Ошибка входа",
+                        "Body": "Описание",
+                        "RowDateCreated": datetime(2026, 3, 11, 13, 4, 16),
+                        "Author": "DMITRI@TEZTOUR.EE",
+                    },
+                    {
+                        "ID": 702,
+                        "IssueID": 270446,
+                        "OldStatus": "В работе",
+                        "NewStatus": "Закрыта",
+                        "OldSubj": "Принтер",
+                        "Body": "Описание",
+                        "RowDateCreated": datetime(2026, 3, 11, 13, 5, 0),
+                        "Author": "anna@teztour.ee",
+                    },
+                ],
+                [],
+            ]
+        )
+        connection = FakeConnection(cursor)
+        connection.close = lambda: None
+        saved_notifications = []
+        deleted_batches = []
+
+        with patch.object(
+            notification_service_module, "JOURNAL_INGESTION", "off"
+        ), patch.object(
+            notification_service_module.redmine,
+            "get_connection",
+            return_value=connection,
+        ), patch.object(
+            service.deduplicator, "is_duplicate", side_effect=lambda *_: False
+        ), patch.object(
+            service,
+            "_bulk_save_status_notifications",
+            side_effect=lambda notifications, request_id: saved_notifications.extend(
+                notifications
+            )
+            or [notification.source_id for notification in notifications],
+        ), patch.object(
+            service,
+            "_delete_processed_status_notifications",
+            side_effect=lambda connection, ids_to_delete, request_id, recipient_email=None: deleted_batches.append(
+                ids_to_delete
+            ),
+        ):
+            processed_count = service.sync_requester_queues_batch(
+                [(24, " Dmitri@Teztour.EE "), (25, "anna@teztour.ee"), (26, None)]
+            )
+
+        self.assertEqual(processed_count, 2)
+        self.assertIn("WHERE Author IN (%s, %s)", cursor.executed[0][0])
+        self.assertIn(
+            "PARTITION BY LOWER(TRIM(Author)) ORDER BY RowDateCreated DESC",
+            cursor.executed[0][0],
+        )
+        self.assertIn("WHERE recipient_row <= %s", cursor.executed[0][0])
+        self.assertEqual(
+            cursor.executed[0][1], ("dmitri@teztour.ee", "anna@teztour.ee", 50)
+        )
+        self.assertIn("FROM u_its_add_notes WHERE Author IN", cursor.executed[1][0])
+        self.assertEqual(len(cursor.executed), 2)
+        self.assertEqual(
+            {(n.user_id, n.source_id) for n in saved_notifications},
+            {(24, 701), (25, 702)},
+        )
+        self.assertEqual(deleted_batches, [[701, 702]])
+
+    def test_batch_sync_deletes_duplicates_already_saved(self):
+        service = NotificationService()
+        row = {
+            "ID": 801,
+            "IssueID": 270445,
+            "OldStatus": "Открыта",
+            "NewStatus": "В работе",
+            "OldSubj": "Ошибка входа",
+            "Body": "Описание",
+            "RowDateCreated": datetime(2026, 3, 11, 13, 4, 16),
+            "Author": "dmitri@teztour.ee",
+        }
+        in_flight = dict(row, ID=802, IssueID=270446)
+        cursor = FakeCursor([[row, in_flight], []])
+        connection = FakeConnection(cursor)
+        connection.close = lambda: None
+        saved_key = NotificationService._status_key(
+            NotificationService._build_status_notification(row, 24, "dmitri@teztour.ee")
+        )
+        deleted_batches = []
+
+        with patch.object(
+            notification_service_module, "JOURNAL_INGESTION", "off"
+        ), patch.object(
+            notification_service_module.redmine,
+            "get_connection",
+            return_value=connection,
+        ), patch.object(
+            service.deduplicator, "is_duplicate", side_effect=lambda *_: True
+        ), patch.object(
+            NotificationService,
+            "_existing_status_keys",
+            staticmethod(lambda notifications: {saved_key}),
+        ), patch.object(
+            service, "_bulk_save_status_notifications"
+        ) as bulk_save, patch.object(
+            service,
+            "_delete_processed_status_notifications",
+            side_effect=lambda connection, ids_to_delete, request_id, recipient_email=None: deleted_batches.append(
+                ids_to_delete
+            ),
+        ):
+            processed_count = service.sync_requester_queues_batch(
+                [(24, "dmitri@teztour.ee")]
+            )
+
+        self.assertEqual(processed_count, 0)
+        bulk_save.assert_not_called()
+        # 802 еще сохраняет другой воркер — строка остается в очереди
+        self.assertEqual(deleted_batches, [[801]])
+
+
+class UserNotificationsCursorTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        self.addCleanup(db.session.remove)
+        Notifications.__table__.create(db.engine)
+        NotificationsAddNotes.__table__.create(db.engine)
+
+    def test_pages_cover_equal_timestamps_and_null_dates(self):
+        same = datetime(2026, 3, 11, 13, 0, 0)
+        for issue_id, date_created in [
+            (1, same),
+            (2, same),
+            (3, same),
+            (4, None),
+            (5, datetime(2026, 3, 10)),
+        ]:
+            db.session.add(
+                Notifications(24, issue_id, "Новая", "В работе", "Заявка", date_created)
+            )
+        for issue_id, date_created in [(6, same), (7, None)]:
+            db.session.add(
+                NotificationsAddNotes(24, issue_id, "Автор", "Комментарий", date_created, None)
+            )
+        db.session.commit()
+
+        service = NotificationService()
+        seen, cursor = [], None
+        with patch.object(notification_service_module, "REDMINE_NOTIFICATIONS", "off"):
+            for _ in range(10):
+                result = service.get_user_notifications(
+                    24, limit=2, before=cursor, sync=False
+                )
+                seen += [n["issue_id"] for n in result["status_notifications"]]
+                seen += [n["issue_id"] for n in result["comment_notifications"]]
+                cursor = result["next_cursor"]
+                if cursor is None:
+                    break
+
+        self.assertEqual(sorted(seen), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(result["total_count"], 7)
+        with self.assertRaises(ValueError):
+            service.get_user_notifications(24, limit=2, before="garbage", sync=False)
+
+
+class RedmineNotificationsSyncTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        self.addCleanup(db.session.remove)
+        User.__table__.create(db.engine)
+        RedmineNotification.__table__.create(db.engine)
+        db.session.add(
+            User(
+                id=24,
+                username="dmitri",
+                email="dmitri@teztour.ee",
+                password="x",
+                is_redmine_user=True,
+                id_redmine_user=77,
+            )
+        )
+        db.session.commit()
+
+    def test_nothing_new_skips_the_writer(self):
+        row = {
+            "id": 901,
+            "redmine_issue_id": 270445,
+            "issue_subject": "Ошибка входа",
+            "group_name": None,
+            "author_email": "anna@teztour.ee",
+            "created_at": datetime(2026, 3, 11, 13, 4, 16),
+        }
+        connection = FakeConnection(ContextCursor([[row], [row]]))
+        connection.close = lambda: None
+        service = NotificationService()
+
+        with patch.object(
+            notification_service_module, "REDMINE_NOTIFICATIONS", "on"
+        ), patch.object(
+            notification_service_module.redmine,
+            "get_connection",
+            return_value=connection,
+        ), patch.object(
+            notification_service_module.db_writer,
+            "submit",
+            wraps=notification_service_module.db_writer.submit,
+        ) as submit:
+            service._fetch_and_save_redmine_notifications(24)
+            service._fetch_and_save_redmine_notifications(24)
+
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(RedmineNotification.query.count(), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import blog.main.routes as routes
+from blog.notification_events import NotificationEventBus, format_sse
+
+
+def parse_event(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+class NotificationEventBusTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.spool = os.path.join(directory, "events.spool")
+        self.bus = NotificationEventBus(self.spool, poll_interval=3600, max_spool_bytes=64)
+
+    def write_foreign(self, text):
+        with open(self.spool, "a") as spool:
+            spool.write(text)
+
+    def test_events_from_other_workers_wake_subscribers(self):
+        forgotten = []
+        self.bus.add_remote_listener(forgotten.append)
+        first = self.bus.subscribe(7)
+        other = self.bus.subscribe(8)
+
+        self.bus.publish(7)
+        self.assertTrue(first.is_set())
+        self.assertFalse(other.is_set())
+        # Свои строки журнала повторно не обрабатываются
+        self.assertEqual(self.bus.poll_spool(), set())
+
+        first.clear()
+        self.write_foreign("1 8\n1 9\n1 ")
+        self.assertEqual(self.bus.poll_spool(), {8, 9})
+        self.assertTrue(other.is_set())
+        self.assertFalse(first.is_set())
+        self.assertEqual(forgotten, [{8, 9}])
+
+        # Недописанная строка дочитывается при следующем проходе
+        self.write_foreign("7\n")
+        self.assertEqual(self.bus.poll_spool(), {7})
+
+    def test_truncated_spool_wakes_everyone(self):
+        event = self.bus.subscribe(7)
+        self.write_foreign("1 8\n" * 20)
+        self.bus.poll_spool()
+        self.bus.publish(9)  # журнал больше max_spool_bytes — обрезается
+        self.assertEqual(os.path.getsize(self.spool), 0)
+
+        self.bus.poll_spool()
+        self.assertTrue(event.is_set())
+        self.bus.unsubscribe(7, event)
+        self.assertEqual(self.bus.subscriber_count(), 0)
+
+
+class NotificationStreamTests(unittest.TestCase):
+    def setUp(self):
+        self.bus = NotificationEventBus()
+        self.counts = {"total": 2, "unread": 1}
+        self.items = [{"id": 1}]
+        self.payload_calls = []
+
+        def build_payload(user_id, sync=True, redmine_notifications=None):
+            self.payload_calls.append((sync, redmine_notifications is not None))
+            return {
+                "success": True,
+                "notifications": {
+                    "status_notifications": list(self.items),
+                    "redmine_notifications": redmine_notifications or [],
+                },
+                "total_count": len(self.items),
+            }
+
+        for target, attribute, value in (
+            (routes, "notification_event_bus", self.bus),
+            (routes, "build_notifications_payload", build_payload),
+            (routes, "db", MagicMock()),
+            (routes.notification_count_store, "get_counts", lambda user_id: dict(self.counts)),
+        ):
+            patcher = patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sends_only_changes_and_keep_alive(self):
+        stream = routes.iter_notification_stream(5, lifetime=0.5, heartbeat=0.05, resync=60)
+
+        self.assertEqual(next(stream), "retry: 10000\n\n")
+        self.assertEqual(parse_event(next(stream)), ("count", {"count": 2, "unread": 1}))
+        self.assertEqual(parse_event(next(stream))[0], "notifications")
+        self.assertEqual(self.bus.subscriber_count(), 1)
+
+        # Событие без изменений ничего не отправляет, дальше — keep-alive
+        self.bus.publish(5)
+        self.assertEqual(next(stream), ": keep-alive\n\n")
+
+        self.counts = {"total": 3, "unread": 2}
+        self.items.append({"id": 2})
+        self.bus.publish(5)
+        self.assertEqual(parse_event(next(stream)), ("count", {"count": 3, "unread": 2}))
+        event, payload = parse_event(next(stream))
+        self.assertEqual(payload["total_count"], 2)
+
+        rest = list(stream)
+        self.assertTrue(rest)
+        self.assertTrue(all(message == ": keep-alive\n\n" for message in rest))
+        self.assertEqual(self.bus.subscriber_count(), 0)
+        # Поток не синхронизирует Redmine; список из MySQL читается при
+        # подключении и по событиям шины
+        self.assertEqual(self.payload_calls, [(False, False)] * 3)
+
+    def test_resync_rereads_only_local_state(self):
+        stream = routes.iter_notification_stream(5, lifetime=0.3, heartbeat=1, resync=0.1)
+        list(stream)
+
+        self.assertGreater(len(self.payload_calls), 1)
+        self.assertEqual(self.payload_calls[0], (False, False))
+        # По таймеру — без синхронизации и с прежним списком Redmine
+        self.assertTrue(all(call == (False, True) for call in self.payload_calls[1:]))
+
+    def test_format_sse_splits_multiline_data(self):
+        self.assertEqual(format_sse(None, "a\nb"), "data: a\ndata: b\n\n")
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import blog.notification_service as notification_service_module
+from blog.notification_service import PushDeliveryJob, PushDeliveryQueue
+
+
+def _job(subscription_id, endpoint="https://push.example/a"):
+    return PushDeliveryJob(
+        subscription_id=subscription_id,
+        user_id=1,
+        endpoint=endpoint,
+        original_endpoint=endpoint,
+        p256dh_key="p256dh",
+        auth_key="auth",
+        payload="{}",
+        vapid_private_key="key",
+        vapid_claims={"sub": "mailto:admin@example.com"},
+    )
+
+
+def _push_error(status_code):
+    error = notification_service_module.WebPushException("push failed")
+    error.response = MagicMock(status_code=status_code)
+    return error
+
+
+class PushDeliveryQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.delivery_queue = PushDeliveryQueue(
+            workers=2, maxsize=10, timeout=1, max_retries=2, backoff_base=0
+        )
+        self.delivery_queue._app = MagicMock()
+        self.updates = []
+        patcher = patch.object(
+            self.delivery_queue,
+            "_apply_updates",
+            side_effect=lambda *args: self.updates.append(args),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transient_errors_are_retried_then_delivered(self):
+        fake_webpush = MagicMock(side_effect=[_push_error(503), TimeoutError(), None])
+
+        with patch.object(notification_service_module, "webpush", fake_webpush):
+            self.delivery_queue.enqueue(self.delivery_queue._app, _job(7))
+            self.delivery_queue.join()
+
+        self.assertEqual(fake_webpush.call_count, 3)
+        self.assertEqual(fake_webpush.call_args.kwargs["timeout"], 1)
+        self.assertEqual(self.delivery_queue.stats["sent"], 1)
+        self.assertEqual(self.delivery_queue.stats["retried"], 2)
+        used_ids = set().union(*(update[1] for update in self.updates))
+        self.assertEqual(used_ids, {7})
+
+    def test_gone_subscriptions_are_deactivated_in_one_batch(self):
+        def fake_webpush(subscription_info, **kwargs):
+            if subscription_info["endpoint"].endswith("gone"):
+                raise _push_error(410)
+
+        with patch.object(notification_service_module, "webpush", fake_webpush):
+            self.delivery_queue._ensure_started = lambda: None
+            for subscription_id in (1, 2, 3):
+                self.delivery_queue.enqueue(
+                    self.delivery_queue._app,
+                    _job(subscription_id, "https://push.example/gone"),
+                )
+            self.delivery_queue.enqueue(self.delivery_queue._app, _job(4))
+            # Потоки не запущены: обрабатываем очередь в текущем потоке
+            while not self.delivery_queue._queue.empty():
+                self.delivery_queue._deliver(self.delivery_queue._queue.get())
+                self.delivery_queue._queue.task_done()
+            self.delivery_queue.flush()
+
+        self.assertEqual(len(self.updates), 1)
+        deactivate_ids, used_ids, endpoint_updates = self.updates[0]
+        self.assertEqual(deactivate_ids, {1, 2, 3})
+        self.assertEqual(used_ids, {4})
+        self.assertEqual(endpoint_updates, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
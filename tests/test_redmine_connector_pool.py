@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import blog.tasks.utils as tasks_utils_module
+from blog.tasks.utils import RedmineConnectorPool
+
+
+class RedmineConnectorPoolTests(unittest.TestCase):
+    def test_lru_eviction_keeps_most_recently_used(self):
+        pool = RedmineConnectorPool(max_size=2, idle_ttl=600, auth_ttl=300)
+        first, second, third = MagicMock(), MagicMock(), MagicMock()
+
+        pool.put("a", first)
+        pool.put("b", second)
+        self.assertIs(pool.get("a"), first)
+        pool.put("c", third)
+
+        self.assertIs(pool.get("a"), first)
+        self.assertIsNone(pool.get("b"))
+        self.assertIs(pool.get("c"), third)
+
+    def test_idle_entries_expire(self):
+        pool = RedmineConnectorPool(max_size=2, idle_ttl=10, auth_ttl=300)
+        connector = MagicMock()
+
+        with patch.object(tasks_utils_module.time, "monotonic", return_value=100.0):
+            pool.put("a", connector)
+        with patch.object(tasks_utils_module.time, "monotonic", return_value=111.0):
+            self.assertIsNone(pool.get("a"))
+        connector.redmine.engine.session.close.assert_called_once_with()
+
+    def test_successful_auth_is_remembered_and_failure_evicts(self):
+        pool = RedmineConnectorPool(max_size=2, idle_ttl=600, auth_ttl=300)
+        connector = MagicMock()
+        connector.is_user_authenticated.return_value = True
+        pool.put("a", connector)
+
+        self.assertTrue(pool.is_authenticated(connector))
+        self.assertTrue(pool.is_authenticated(connector))
+        self.assertEqual(connector.is_user_authenticated.call_count, 1)
+
+        rejected = MagicMock()
+        rejected.is_user_authenticated.return_value = False
+        pool.put("b", rejected)
+
+        self.assertFalse(pool.is_authenticated(rejected))
+        self.assertIsNone(pool.get("b"))
+        # Другой поток мог уже взять этот коннектор — сессию не закрываем
+        rejected.redmine.engine.session.close.assert_not_called()
+
+    def test_key_depends_on_credentials(self):
+        self.assertNotEqual(
+            RedmineConnectorPool.make_key("https://r", "user", "old"),
+            RedmineConnectorPool.make_key("https://r", "user", "new"),
+        )
+        self.assertEqual(
+            RedmineConnectorPool.make_key("https://r", api_key="k"),
+            RedmineConnectorPool.make_key("https://r", api_key="k"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
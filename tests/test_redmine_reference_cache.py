@@ -0,0 +1,108 @@
+import datetime
+import unittest
+from unittest.mock import patch
+
+import redmine as redmine_module
+from redmine import RedmineReferenceCache
+
+
+UPDATED = datetime.datetime(2026, 1, 1, 12, 0)
+
+TABLES = {
+    "u_statuses": [{"id": 1, "name": "Новая"}, {"id": 5, "name": "Закрыта"}],
+    "issue_statuses": [{"id": 1, "name": "New"}, {"id": 5, "name": "Closed"}, {"id": 9, "name": "Feedback"}],
+    "u_Priority": [{"id": 2, "name": "Обычный"}],
+    "enumerations": [{"id": 2, "name": "Normal"}, {"id": 3, "name": "High"}],
+    "projects": [{"id": 10, "name": "Helpdesk", "updated_on": UPDATED}],
+    "users": [{"id": 7, "firstname": "Иван", "lastname": "Петров", "updated_on": UPDATED}],
+}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, sql, params):
+        self.connection.queries.append((sql, list(params)))
+        table = sql.split(" FROM ")[1].split()[0]
+        rows = TABLES[table]
+        if "id IN" in sql:
+            rows = [row for row in rows if row["id"] in params]
+        elif "updated_on >=" in sql:
+            rows = [row for row in rows if row["updated_on"] >= params[0]]
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+class RedmineReferenceCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        patcher = patch.object(redmine_module, "get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookups_after_bulk_load_do_not_query(self):
+        cache = RedmineReferenceCache(refresh_interval=60)
+
+        self.assertEqual(cache.get("u_statuses", "5"), "Закрыта")
+        loaded_queries = len(self.connection.queries)
+        self.assertEqual(loaded_queries, len(redmine_module.REFERENCE_TABLES))
+
+        for _ in range(100):
+            self.assertEqual(cache.user_full_name(7), "Петров Иван")
+            self.assertEqual(cache.get("projects", 10), "Helpdesk")
+            self.assertEqual(cache.status_display_name(9), "Feedback")
+            self.assertEqual(cache.priority_display_name(3), "High")
+
+        self.assertEqual(len(self.connection.queries), loaded_queries)
+
+    def test_unknown_id_is_fetched_once(self):
+        cache = RedmineReferenceCache(refresh_interval=60)
+        cache.get("projects", 10)
+        loaded_queries = len(self.connection.queries)
+
+        self.assertIsNone(cache.get("projects", 404))
+        self.assertIsNone(cache.get("projects", 404))
+
+        self.assertEqual(len(self.connection.queries), loaded_queries + 1)
+
+    def test_refresh_is_incremental_by_updated_on(self):
+        cache = RedmineReferenceCache(refresh_interval=0, full_reload_interval=3600)
+        cache.get("users", 7)
+        self.connection.queries.clear()
+
+        cache.get("users", 7)
+
+        users_query = [query for query in self.connection.queries if " FROM users" in query[0]]
+        self.assertEqual(users_query[0][1], [UPDATED])
+        self.assertIn("updated_on >= %s", users_query[0][0])
+
+    def test_unexpected_load_error_does_not_propagate(self):
+        cache = RedmineReferenceCache(refresh_interval=60)
+
+        with patch.object(redmine_module, "get_connection", side_effect=OSError("pool exhausted")):
+            self.assertIsNone(cache.get("projects", 10))
+        cache = RedmineReferenceCache(refresh_interval=60)
+        with patch.object(cache, "_select", side_effect=KeyError("name")):
+            self.assertIsNone(cache.status_display_name(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
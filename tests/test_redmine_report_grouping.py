@@ -0,0 +1,52 @@
+import unittest
+
+from blog.reports.routes import build_period_filter, build_report_groups
+
+
+ROWS_BY_EXECUTOR = [
+    {"executor_key": 7, "executor_name": "Иванов Иван", "ym": "2025-01", "cnt": 3},
+    {"executor_key": 7, "executor_name": "Иванов Иван", "ym": "2025-02", "cnt": 2},
+    {"executor_key": 0, "executor_name": "Исполнитель не назначен", "ym": "2025-01", "cnt": 4},
+]
+
+
+class PeriodFilterTest(unittest.TestCase):
+    def test_year_and_months_become_date_ranges(self):
+        clause, params = build_period_filter("i.created_on", 2025, [str(m) for m in range(1, 13)])
+        self.assertEqual(clause, " AND i.created_on >= %s AND i.created_on < %s")
+        self.assertEqual(params, ["2025-01-01 00:00:00", "2026-01-01 00:00:00"])
+
+        clause, params = build_period_filter("i.closed_on", 2025, ["1", "2", "3", "12"])
+        self.assertNotIn("MONTH(", clause)
+        self.assertEqual(
+            params,
+            ["2025-01-01 00:00:00", "2025-04-01 00:00:00", "2025-12-01 00:00:00", "2026-01-01 00:00:00"],
+        )
+
+        self.assertEqual(build_period_filter("i.created_on", None, []), ("", []))
+        self.assertEqual(
+            build_period_filter("i.created_on", None, [], ym="2024-12")[1],
+            ["2024-12-01 00:00:00", "2025-01-01 00:00:00"],
+        )
+
+
+class ReportGroupsTest(unittest.TestCase):
+    def test_executor_month_tree_from_single_result_set(self):
+        groups = build_report_groups(ROWS_BY_EXECUTOR, "EXECUTOR_MONTH")
+        self.assertEqual([g["id"] for g in groups], [7, "unassigned"])
+        self.assertEqual(groups[0]["count"], 5)
+        self.assertEqual(
+            groups[0]["children"],
+            [{"id": "2025-01", "name": "2025-01", "count": 3}, {"id": "2025-02", "name": "2025-02", "count": 2}],
+        )
+
+        flat = build_report_groups(ROWS_BY_EXECUTOR, "EXECUTOR")
+        self.assertEqual([g["children"] for g in flat], [[], []])
+
+    def test_month_executor_tree(self):
+        rows = sorted(ROWS_BY_EXECUTOR, key=lambda r: (r["ym"], r["executor_name"]))
+        groups = build_report_groups(rows, "MONTH_EXECUTOR")
+        self.assertEqual([(g["id"], g["count"]) for g in groups], [("2025-01", 7), ("2025-02", 2)])
+        self.assertEqual(
+            [child["id"] for child in groups[0]["children"]], [7, "unassigned"]
+        )
@@ -0,0 +1,87 @@
+import gzip
+import io
+import unittest
+
+from flask import Flask
+from openpyxl import load_workbook
+
+from blog.reports import exports
+
+
+class FakeServerCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetch_sizes = []
+        self.closed = False
+
+    def execute(self, sql, params):
+        pass
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeServerCursor(rows)
+        self.closed = False
+
+    def cursor(self, cursorclass=None):
+        return self.cursor_obj
+
+    def close(self):
+        self.closed = True
+
+
+ROWS = [{"id": i, "subject": f"Задача {i}", "status_name": None} for i in range(1, 6)]
+
+
+class ReportExportsTest(unittest.TestCase):
+    def test_rows_are_fetched_in_chunks(self):
+        conn = FakeConnection(ROWS)
+        rows = list(exports.iter_query_rows(conn, "SELECT 1", [], fetch_size=2))
+        self.assertEqual([row["id"] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(conn.cursor_obj.fetch_sizes, [2, 2, 2, 2])
+        self.assertTrue(conn.cursor_obj.closed)
+
+    def test_csv_gzip_stream_and_connection_closed(self):
+        app = Flask(__name__)
+        conn = FakeConnection(ROWS)
+
+        def body():
+            values = ([row["id"], row["subject"], row["status_name"]]
+                      for row in exports.iter_query_rows(conn, "SELECT 1", []))
+            return exports.iter_csv_bytes(["ID", "Тема", "Статус"], values, compress=True)
+
+        with app.test_request_context():
+            response = exports.stream_export(conn, body, "issues", exports.export_format("csv.gz"))
+            self.assertTrue(response.is_streamed)
+            data = b"".join(response.response)
+
+        text = gzip.decompress(data).decode("utf-8-sig").splitlines()
+        self.assertEqual(text[0], "ID;Тема;Статус")
+        self.assertEqual(text[1], "1;Задача 1;")
+        self.assertEqual(len(text), 6)
+        self.assertTrue(conn.closed)
+        self.assertIn('filename="issues.csv.gz"', response.headers["Content-Disposition"])
+
+    def test_write_only_workbook(self):
+        workbook = exports.new_workbook()
+        sheet = workbook.create_sheet("Issues")
+        sheet.append(exports.header_row(sheet, ["ID", "Тема"]))
+        for row in ROWS:
+            sheet.append([row["id"], row["subject"]])
+
+        data = b"".join(exports.iter_workbook_bytes(workbook))
+        loaded = load_workbook(io.BytesIO(data))["Issues"]
+        self.assertEqual(loaded.max_row, 6)
+        self.assertTrue(loaded["A1"].font.bold)
+        self.assertEqual(loaded["B6"].value, "Задача 5")
+
+        with self.assertRaises(ValueError):
+            exports.export_format("pdf")
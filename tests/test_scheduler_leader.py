@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from blog.scheduler_leader import SchedulerLeader
+
+
+class SchedulerLeaderTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.lock_path = os.path.join(directory, "scheduler.lock")
+
+    def test_only_one_leader_and_failover_on_release(self):
+        first = SchedulerLeader(self.lock_path, retry_interval=0.01)
+        second = SchedulerLeader(self.lock_path, retry_interval=0.01)
+        self.addCleanup(first.release)
+        self.addCleanup(second.release)
+
+        started = []
+        first.start(lambda: started.append("first"))
+        elected = threading.Event()
+        second.start(lambda: (started.append("second"), elected.set()))
+
+        self.assertEqual(started, ["first"])
+        self.assertTrue(first.is_leader)
+        self.assertFalse(second.is_leader)
+        with open(self.lock_path) as lock_file:
+            self.assertEqual(lock_file.read().strip(), str(os.getpid()))
+
+        # Лидер завершился — ожидающий процесс запускает планировщик сам
+        first.release()
+        self.assertTrue(elected.wait(2))
+        self.assertEqual(started, ["first", "second"])
+        self.assertTrue(second.is_leader)
+        self.assertFalse(first.try_acquire())
+
+
+if __name__ == "__main__":
+    unittest.main()
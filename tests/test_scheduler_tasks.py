@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import blog
+import blog.scheduler_tasks as scheduler_tasks_module
+
+
+class SchedulerAppReuseTests(unittest.TestCase):
+    def setUp(self):
+        scheduler_tasks_module._scheduler_app = None
+
+    def tearDown(self):
+        scheduler_tasks_module._scheduler_app = None
+
+    def test_uses_app_bound_to_scheduler(self):
+        bound_app = MagicMock()
+
+        with patch.object(blog.scheduler, "app", bound_app), patch.object(
+            blog, "create_app"
+        ) as create_app_mock:
+            first = scheduler_tasks_module.get_scheduler_app()
+            second = scheduler_tasks_module.get_scheduler_app()
+
+        self.assertIs(first, bound_app)
+        self.assertIs(second, bound_app)
+        create_app_mock.assert_not_called()
+
+    def test_creates_app_only_once_without_scheduler_app(self):
+        created_app = MagicMock()
+
+        with patch.object(blog.scheduler, "app", None), patch.object(
+            blog, "create_app", return_value=created_app
+        ) as create_app_mock:
+            scheduler_tasks_module.get_scheduler_app()
+            scheduler_tasks_module.get_scheduler_app()
+            scheduler_tasks_module.get_scheduler_app()
+
+        self.assertEqual(create_app_mock.call_count, 1)
+        self.assertIs(scheduler_tasks_module._scheduler_app, created_app)
+
+
+class RecipientShardsTests(unittest.TestCase):
+    def test_splits_recipients_into_fixed_size_shards(self):
+        recipients = [(user_id, f"user{user_id}@tez.ru") for user_id in range(5)]
+
+        shards = scheduler_tasks_module._recipient_shards(recipients, 2)
+
+        self.assertEqual([len(shard) for shard in shards], [2, 2, 1])
+        self.assertEqual(sum(shards, []), recipients)
+        self.assertEqual(scheduler_tasks_module._recipient_shards(recipients, None), [recipients])
+        self.assertEqual(scheduler_tasks_module._recipient_shards([], 2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+from blog.services.search_service import PrefixTrie, SearchService
+
+
+GUIDES = {
+    "1": {
+        "filename": "guide.docx",
+        "content": [
+            {"type": "paragraph", "text": "Настройка принтера"},
+            {"type": "paragraph", "text": "Ёлочные игрушки не помогут: проверьте драйвер принтера и очередь печати."},
+        ],
+    },
+    "9": {"filename": "hidden.md", "content": [{"type": "paragraph", "text": "Скрытая инструкция"}]},
+}
+
+
+class SearchServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "docs"))
+        with open(os.path.join(self.tmp.name, "docs", "guides_content.json"), "w", encoding="utf-8") as f:
+            json.dump(GUIDES, f, ensure_ascii=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_service(self):
+        service = SearchService()
+        service.root_path = os.path.join(self.tmp.name, "blog")
+        service.cache_path = os.path.join(self.tmp.name, "instance", "search_index.json")
+        return service
+
+    def test_ranking_prefix_and_yo_folding(self):
+        service = self.make_service()
+        service.build_index()
+
+        self.assertEqual(service.search("Thun")[0]["url"], "/setup_mail_account")
+        self.assertEqual(service.search("underb")[0]["url"], "/setup_mail_account")
+        self.assertEqual(service.search("елочн")[0]["url"], "/guide/1")
+        self.assertEqual(service.search("принтер")[0]["title"], "Настройка принтера")
+        self.assertEqual(service.search("скрыт"), [])
+        self.assertEqual(service.search("п"), [])
+        self.assertLessEqual(len(service.search("почта")), 8)
+
+    def test_index_round_trips_through_disk(self):
+        service = self.make_service()
+        service.build_index()
+        service.save_index()
+        expected = service.search("настройка почт")
+
+        loaded = self.make_service()
+        self.assertTrue(loaded.load_index())
+        self.assertEqual(loaded.search("настройка почт"), expected)
+
+        # Изменение исходного JSON делает кэш недействительным
+        path = os.path.join(self.tmp.name, "docs", "guides_content.json")
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(self.make_service().load_index())
+
+    def test_trie_prefix_lookup(self):
+        trie = PrefixTrie()
+        for word in ("почта", "почтовый", "повар"):
+            trie.insert(word)
+        self.assertEqual(sorted(trie.words_with_prefix("поч")), ["почта", "почтовый"])
+        self.assertEqual(trie.words_with_prefix("х"), [])
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+
+import blog.tasks.utils as tasks_utils_module
+
+
+class FakeCursor:
+    def __init__(self, total_count, ids):
+        self.total_count = total_count
+        self.ids = ids
+        self.executed = []
+
+    def execute(self, query, params):
+        self.executed.append((query, list(params)))
+
+    def fetchone(self):
+        return {"total_count": self.total_count}
+
+    def fetchall(self):
+        return [{"id": issue_id} for issue_id in self.ids]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+class SearchUserAssignedTasksSqlTests(unittest.TestCase):
+    def test_search_and_name_filters_are_paged_in_sql(self):
+        cursor = FakeCursor(total_count=240, ids=[31, 30])
+
+        with patch.object(tasks_utils_module, "get_connection", return_value=FakeConnection(cursor)):
+            issue_ids, total = tasks_utils_module.search_user_assigned_tasks_sql(
+                7,
+                page=3,
+                per_page=25,
+                search_term="50%_off",
+                search_in_description=True,
+                name_filters={"status_name": "Новая"},
+                sort_column="subject",
+                sort_direction="asc",
+            )
+
+        self.assertEqual(issue_ids, [31, 30])
+        self.assertEqual(total, 240)
+
+        count_query, count_params = cursor.executed[0]
+        self.assertIn("COUNT(*)", count_query)
+        self.assertIn("ist.is_closed = 0", count_query)
+        self.assertIn("i.description LIKE %s", count_query)
+        self.assertIn("%50\\%\\_off%", count_params)
+
+        page_query, page_params = cursor.executed[1]
+        self.assertIn("ORDER BY i.subject ASC", page_query)
+        self.assertEqual(page_params[-2:], [25, 50])
+
+    def test_empty_result_skips_page_query(self):
+        cursor = FakeCursor(total_count=0, ids=[])
+
+        with patch.object(tasks_utils_module, "get_connection", return_value=FakeConnection(cursor)):
+            result = tasks_utils_module.search_user_assigned_tasks_sql(7, search_term="abc", all_statuses=True)
+
+        self.assertEqual(result, ([], 0))
+        self.assertEqual(len(cursor.executed), 1)
+        self.assertNotIn("is_closed", cursor.executed[0][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
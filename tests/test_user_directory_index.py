@@ -0,0 +1,65 @@
+import unittest
+
+from unittest.mock import patch
+
+from flask import Flask
+
+from blog import db
+from blog.models import User
+from blog.user.directory_index import UserDirectoryIndex, normalize_search_text
+from blog.user import directory_index
+
+
+class UserDirectoryIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        User.__table__.create(db.engine)
+
+        db.session.add_all(
+            [
+                User(id=1, username="ivanov", email="ivanov@tez.ru", password="x",
+                     full_name="Иванов Пётр", department="ИТ отдел", phone="+7 (495) 111-22-33"),
+                User(id=2, username="smirnova", email="smirnova@tez.ru", password="x",
+                     full_name="Смирнова Анна", department="Бухгалтерия"),
+            ]
+        )
+        db.session.commit()
+
+        self.index = UserDirectoryIndex(full_reload_interval=3600)
+        patcher = patch.object(directory_index, "user_directory_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_substring_prefix_and_phone_lookup(self):
+        self.assertEqual(self.index.search("петр"), {1})
+        self.assertEqual(self.index.search("ИВАНОВ ПЁТР"), {1})
+        self.assertEqual(self.index.search("галтер"), {2})
+        self.assertEqual(self.index.search("ит"), {1})
+        self.assertEqual(self.index.search("4951112233"), {1})
+        self.assertEqual(self.index.search("111-22"), {1})
+        self.assertEqual(self.index.search("tez.ru"), {1, 2})
+        self.assertEqual(self.index.search("нет такого"), set())
+        self.assertEqual(normalize_search_text("  Café  Ёж "), "cafe еж")
+
+    def test_index_is_rebuilt_after_user_changes(self):
+        self.assertEqual(self.index.search("анна"), {2})
+        with patch.object(UserDirectoryIndex, "_load_rows", wraps=self.index._load_rows) as load:
+            self.index.search("анна")
+            self.assertEqual(load.call_count, 0)
+
+            user = db.session.get(User, 2)
+            user.full_name = "Смирнова Мария"
+            db.session.commit()
+            self.assertEqual(self.index.search("анна"), set())
+            self.assertEqual(self.index.search("мария"), {2})
+
+            db.session.add(User(id=3, username="annakova", email="a@tez.ru", password="x"))
+            db.session.commit()
+            self.assertEqual(self.index.search("анна"), set())
+            self.assertEqual(self.index.search("anna"), {3})
+            self.assertEqual(load.call_count, 2)
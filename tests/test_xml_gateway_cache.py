@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import blog.call.routes as call_routes
+from blog.call.routes import XmlGatewaySession
+from blog.utils.cache_manager import CacheManager
+
+
+AUTH_XML = b"<auth><sessionId>{sid}</sessionId></auth>"
+AGENCY_XML = b"""<response><agency>
+<name>Test Travel</name><blackList>false</blackList>
+<managers><manager>Anna</manager></managers>
+<contacts><contact><value>+370 600 11111</value><person>Ivan</person>
+<description>office</description></contact></contacts>
+</agency></response>"""
+
+
+def _response(content):
+    response = MagicMock(content=content)
+    response.raise_for_status.return_value = None
+    return response
+
+
+class XmlGatewayCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.session = XmlGatewaySession(ttl=900)
+        self.cache = CacheManager()
+        self.cache.configure_namespace("xml_agency", ttl=120, max_entries=10)
+        self.logins = 0
+
+        def fake_get(url, timeout=None):
+            if "auth_data" in url:
+                self.logins += 1
+                return _response(AUTH_XML.replace(b"{sid}", str(self.logins).encode()))
+            if "aid=1" in url:
+                # Первая сессия "истекла" на стороне шлюза
+                return _response(b"<error>session expired</error>")
+            return _response(AGENCY_XML)
+
+        for target, name, value in (
+            (call_routes, "xml_gateway_session", self.session),
+            (call_routes, "cache_manager", self.cache),
+            (call_routes.requests, "get", fake_get),
+        ):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_expired_session_is_refreshed_and_card_is_cached(self):
+        card = call_routes.get_agency_card(42)
+        again = call_routes.get_agency_card(42)
+
+        self.assertEqual(self.logins, 2)
+        self.assertEqual(card["agency_name"], "Test Travel")
+        self.assertEqual(card["agency_blacklist"], "No")
+        self.assertEqual(card["contacts"][0]["person"], "Ivan")
+        self.assertEqual(again, card)
+
+    def test_session_id_is_reused_between_agencies(self):
+        self.session.get()
+        self.session.get(force_refresh=True)
+        call_routes.get_agency_card(1)
+        call_routes.get_agency_card(2)
+
+        self.assertEqual(self.logins, 2)
+        self.assertTrue(call_routes.get_xml_agency_not_blacklist(2))
+
+
+if __name__ == "__main__":
+    unittest.main()